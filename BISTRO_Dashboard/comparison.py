@@ -0,0 +1,119 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# KPIs that can be compared across any number of submissions:
+# title -> (data product, column of the categories, columns of the series).
+# Series None means every numeric column but the categories.
+COMPARISON_KPIS = OrderedDict([
+    ('Scores', ('normalized_scores_data', 'Component Name',
+                ['Weighted Score'])),
+    ('Mode split - planned', ('mode_planned_pie_chart_data', 'Mode',
+                              ['perc', 'value'])),
+    ('Mode split - realized', ('mode_realized_pie_chart_data', 'Mode',
+                               ['perc', 'value'])),
+    ('Mode choice by hour', ('mode_choice_by_time_data', 'hours', None)),
+    ('Mode choice by income group', ('mode_choice_by_income_group_data',
+                                     'realizedTripMode', None)),
+    ('Mode choice by age group', ('mode_choice_by_age_group_data',
+                                  'realizedTripMode', None)),
+    ('Mode choice by trip distance', ('mode_choice_by_distance_data',
+                                      'Trip Distance (miles)', None)),
+    ('Travel time by mode', ('congestion_travel_time_by_mode_data', 'x',
+                             ['y'])),
+    ('Travel time per passenger-trip by hour',
+     ('congestion_travel_time_per_passenger_trip_data', 'index', None)),
+    ('Miles traveled by mode', ('congestion_miles_traveled_per_mode_data',
+                                'modes', ['vmt'])),
+    ('Car VMT by hour', ('congestion_car_vmt_by_time_data', 'Hour',
+                         ['Distance_m'])),
+    ('Bus VMT by ridership', ('congestion_bus_vmt_by_ridership_data', 'Hour',
+                              None)),
+    ('On-demand VMT by phase', ('congestion_on_demand_vmt_by_phases_data',
+                                'Hour', None)),
+    ('Travel speed', ('congestion_travel_speed_data',
+                      'Start time interval (hour)', None)),
+    ('Travel expenditure by hour', ('los_travel_expenditure_data',
+                                    'hour_of_day', None)),
+    ('Cost burden by income group', ('los_cost_burden_by_income_data',
+                                     'income_group', None)),
+    ('Crowding by route', ('los_crowding_data', 'route_id', None)),
+    ('Parking overhead by hour', ('los_parking_overhead_data', 'Hour', None)),
+    ('Transit operational costs by route', ('transit_cb_costs_data',
+                                            'route_id', None)),
+    ('Transit fare revenue by route', ('transit_cb_benefits_data',
+                                       'route_id', ['Fare'])),
+    ('Incentives by hour', ('transit_inc_by_mode_data', 'hour_of_day', None)),
+    ('Toll revenue by hour', ('toll_revenue_by_time_data', 'Hour', ['Toll'])),
+    ('PM 2.5 emissions by mode', ('sustainability_25pm_per_mode_data',
+                                  'modes', ['emissions'])),
+    ('GHG emissions by mode', ('sustainability_ghg_per_mode_data', 'modes',
+                               ['emissions'])),
+])
+
+
+def _product(submission, kpi):
+    data_name = COMPARISON_KPIS[kpi][0]
+    return getattr(submission, data_name)
+
+
+def comparison_series(kpi, submissions):
+    """Series of kpi available in at least one of the submissions"""
+    _, x_col, series = COMPARISON_KPIS[kpi]
+    if series is not None:
+        return list(series)
+    found = []
+    for submission in submissions:
+        for col, values in _product(submission, kpi).items():
+            if col != x_col and col not in found and \
+                    np.asarray(values).dtype.kind in 'biuf':
+                found.append(col)
+    return found
+
+
+def make_comparison_data(kpi, series, submissions):
+    """
+    Long-form data of one series of a KPI across submissions: one row per
+    (category, submission), in the order of the categories of the first
+    submissions that have them.
+
+    Parameters
+    ----------
+    kpi : str
+        Key of COMPARISON_KPIS
+    series : str
+        Value column of the KPI data product
+    submissions : OrderedDict
+        Submissions (with their data products made) keyed by sub_key
+
+    Returns
+    -------
+    data : dict
+        Columns 'x' (category), 'submission', 'factor' ((category,
+        submission) for nested axes) and 'value'
+    categories : list of str
+    """
+    _, x_col, _ = COMPARISON_KPIS[kpi]
+    categories = []
+    known = set()
+    xs, keys, values = [], [], []
+    for sub_key, submission in submissions.items():
+        product = _product(submission, kpi)
+        x = [str(category) for category in product[x_col]]
+        if series in product:
+            y = np.asarray(product[series], dtype=float)
+        else:
+            y = np.full(len(x), np.nan)
+        for category in x:
+            if category not in known:
+                known.add(category)
+                categories.append(category)
+        xs += x
+        keys += [sub_key] * len(x)
+        values.append(y)
+
+    values = np.concatenate(values) if values else np.empty(0)
+    data = {'x': xs, 'submission': keys,
+            'factor': list(zip(xs, keys)),
+            'value': values}
+    return data, categories
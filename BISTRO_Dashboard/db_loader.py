@@ -1,17 +1,169 @@
 import configparser
-
-import mysql.connector
-from mysql.connector import Error, errorcode
+import math
+import sqlite3
+from os.path import dirname, isabs, join
 
 import pandas as pd
 
+from id_index import IdDictionary
+from iteration_history import IterationHistory
+
 
 def parse_credential(db_profile):
+    """
+    Read the [DB_LOGIN] section of db_profile. DATABASE_BACKEND selects
+    the backend (mysql by default); the sqlite and duckdb backends read
+    DATABASE_NAME as the path of the database file, relative to db_profile.
+    """
     config = configparser.ConfigParser()
     config.read(db_profile)
     db_login = config['DB_LOGIN']
-    return (db_login['DATABASE_NAME'], db_login['DATABASE_USER_NAME'],
-            db_login['DATABASE_KEY'], db_login['DATABASE_HOST'])
+    backend = db_login.get('DATABASE_BACKEND', 'mysql')
+    db_name = db_login['DATABASE_NAME']
+    if backend != 'mysql' and not isabs(db_name):
+        db_name = join(dirname(db_profile), db_name)
+    return (db_name, db_login.get('DATABASE_USER_NAME', ''),
+            db_login.get('DATABASE_KEY', ''),
+            db_login.get('DATABASE_HOST', 'localhost'), backend)
+
+
+def hour_bin(column):
+    """
+    SQL expression of the hour of the day of the times in seconds of
+    column, and the condition selecting the times binned, as
+    timebins.hour_codes: times past midnight fold onto the hours of the day
+    """
+    expression = "FLOOR({} / 3600.0) % 24".format(column)
+    condition = "{} >= 0".format(column)
+    return expression, condition
+
+
+class MySQLBackend(object):
+    """Remote MySQL server of the BISTRO database"""
+
+    placeholder = '%s'
+    # names of the tables of the database
+    tables_query = """
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = DATABASE()"""
+
+    def __init__(self, db_name, user_name, db_key, host='localhost'):
+        self.db_name = db_name
+        self.user_name = user_name
+        self.db_key = db_key
+        self.host = host
+
+    def connect(self):
+        return BistroDB.connect_to_db(self.host, self.user_name, self.db_key)
+
+    def get_cursor(self, connection):
+        """
+        return the cursor from connection that's using the db_name database
+        """
+        if not self.db_name:
+            print("You have not set db_name for BistroDB")
+            return
+
+        cursor = connection.cursor()
+
+        cursor.execute("USE {}".format(self.db_name))
+        return cursor
+
+    def close(self, connection):
+        if connection.is_connected():
+            connection.close()
+            print("Connection to DB {} closed".format(self.db_name))
+
+    def insert(self, connection, table, df):
+        """Insert the rows of df in the columns of table of the same names"""
+        statement = "INSERT INTO {} ({}) VALUES ({})".format(
+            table, ', '.join(df.columns),
+            ', '.join([self.placeholder] * len(df.columns)))
+        # python scalars, None for missing values
+        rows = df.astype(object).where(df.notnull(), None).values.tolist()
+        cursor = connection.cursor()
+        cursor.executemany(statement, rows)
+        connection.commit()
+
+
+class SQLiteBackend(object):
+    """
+    In-process SQLite database file, see local_db.py to build one from
+    submission directories. Run ids are stored as uuid strings, so
+    UUID_TO_BIN and BIN_TO_UUID are identities.
+    """
+
+    placeholder = '?'
+    create_indexes = True
+    tables_query = "SELECT name FROM sqlite_master WHERE type = 'table'"
+
+    def __init__(self, db_name, user_name=None, db_key=None, host=None):
+        self.db_name = db_name
+
+    def connect(self):
+        # the dashboard queries the database from the Bokeh server threads
+        connection = sqlite3.connect(self.db_name, check_same_thread=False)
+        # SQLite is only built with FLOOR from 3.35 and with the math
+        # functions enabled
+        functions = [('UUID_TO_BIN', lambda value: value),
+                     ('BIN_TO_UUID', lambda value: value),
+                     ('FLOOR', lambda value: None if value is None
+                      else math.floor(value))]
+        for function, func in functions:
+            try:
+                connection.create_function(function, 1, func,
+                                           deterministic=True)
+            except (TypeError, sqlite3.NotSupportedError):
+                # Python < 3.8 or SQLite < 3.8.3
+                connection.create_function(function, 1, func)
+        return connection
+
+    def get_cursor(self, connection):
+        return connection.cursor()
+
+    def close(self, connection):
+        connection.close()
+
+    insert = MySQLBackend.insert
+
+
+class DuckDBBackend(SQLiteBackend):
+    """
+    In-process DuckDB (columnar) database file, see local_db.py. Needs the
+    optional duckdb package.
+    """
+
+    # DuckDB scans columns without indexes, which would only slow down the
+    # imports
+    create_indexes = False
+    tables_query = "SELECT table_name FROM information_schema.tables"
+
+    def connect(self):
+        import duckdb
+        connection = duckdb.connect(self.db_name)
+        for function in ('UUID_TO_BIN', 'BIN_TO_UUID'):
+            connection.execute(
+                "CREATE OR REPLACE TEMPORARY MACRO {}(value) AS value"
+                .format(function))
+        return connection
+
+    def get_cursor(self, connection):
+        # the cursors of DuckDB are new connections, which do not see the
+        # temporary macros
+        return connection
+
+    def insert(self, connection, table, df):
+        # scanning the frame is much faster than inserting row by row
+        connection.register('frame', df)
+        try:
+            connection.execute("INSERT INTO {0} ({1}) SELECT {1} FROM frame"
+                               .format(table, ', '.join(df.columns)))
+        finally:
+            connection.unregister('frame')
+
+
+BACKENDS = {'mysql': MySQLBackend, 'sqlite': SQLiteBackend,
+            'duckdb': DuckDBBackend}
 
 
 class BistroDB(object):
@@ -23,20 +175,21 @@ class BistroDB(object):
     connection = None
     cursor = None
 
-    def __init__(self, db_name, user_name, db_key, host='localhost'):
+    def __init__(self, db_name, user_name, db_key, host='localhost',
+                 backend='mysql'):
 
         self.db_name = db_name
         self.user_name = user_name
         self.db_key = db_key
         self.host = host
+        self.backend = BACKENDS[backend](db_name, user_name, db_key, host)
 
-        self.connection = self.connect_to_db(self.host, self.user_name, self.db_key)
+        self.connection = self.backend.connect()
         self.cursor = self.get_cursor()
 
     def __del__(self):
-        if self.connection and (self.connection.is_connected()):
-            self.connection.close()
-            print("Connection to DB {} closed".format(self.db_name))
+        if self.connection:
+            self.backend.close(self.connection)
 
     @staticmethod
     def connect_to_db(host, user_name, db_key):
@@ -45,6 +198,8 @@ class BistroDB(object):
         If input invalid or connection has problem, return None
 
         """
+        import mysql.connector
+        from mysql.connector import Error
 
         if not user_name or not db_key:
             print("You have not set user_name or db_key for BistroDB")
@@ -70,14 +225,7 @@ class BistroDB(object):
         """
         return the cursor from connection that's using the db_name database
         """
-        if not self.db_name:
-            print("You have not set db_name for BistroDB")
-            return 
-
-        cursor = self.connection.cursor()
-
-        cursor.execute("USE {}".format(self.db_name))
-        return cursor
+        return self.backend.get_cursor(self.connection)
 
     def get_table(self, table_name, cols=None, condition=''):
         """refer to the bistro_dbschema.py for detail columns definition"""
@@ -95,18 +243,26 @@ class BistroDB(object):
         self.cursor.execute(q)
         return self.cursor.fetchall()
 
+    def has_table(self, table_name):
+        """
+        Whether the database has table_name: the tables of the outputs
+        imported by local_db.py are missing from older databases
+        """
+        return table_name in set(
+            row[0] for row in self.query(self.backend.tables_query))
+
     @staticmethod
     def binary_ids(simulation_ids):
         return ','.join(
             ["UUID_TO_BIN('{}')".format(s_id) for s_id in simulation_ids])
 
-    def load_simulation_df(self):
+    def load_simulation_df(self, scenario='sioux_faux-15k'):
         data = self.query("""
             SELECT BIN_TO_UUID(simulationrun.run_id), simulationrun.datetime,simulationrun.scenario, simulationrun.name, simulationtag.tag
             FROM simulationrun
             LEFT JOIN simulationtag ON simulationtag.name = simulationrun.name
-            WHERE simulationrun.scenario = 'sioux_faux-15k'
-            """)
+            WHERE simulationrun.scenario = '{}'
+            """.format(scenario))
         return pd.DataFrame(
             data, columns=['simulation_id','datetime','scenario', 'name', 'tag'])
 
@@ -209,6 +365,43 @@ class BistroDB(object):
             )
         return df
 
+    def load_parking_stats(self, simulation_id):
+        """parkingStats of the last iteration, None if it is not stored"""
+        if not self.has_table('parkingstats'):
+            return None
+        db_cols = ['time_bin', 'taz', 'outbound_overhead_time',
+                   'inbound_overhead_time', 'inbound_overhead_cost']
+        data = self.get_table(
+            'parkingstats', cols=db_cols,
+            condition="WHERE run_id = UUID_TO_BIN('{}')".format(simulation_id))
+
+        df = pd.DataFrame(
+            data,
+            columns=['timeBin', 'TAZ', 'outboundParkingOverheadTime',
+                     'inboundParkingOverheadTime', 'inboundParkingOverheadCost'])
+        return df if len(df) else None
+
+    def load_stage_runtimes(self, simulation_id):
+        """
+        Stage durations of the stopwatch of every run of the simulation, as
+        read_stopwatch, none if they are not stored
+        """
+        if not self.has_table('stopwatch'):
+            return []
+        db_cols = ['run_num', 'iteration', 'stage', 'duration']
+        data = self.get_table(
+            'stopwatch', cols=db_cols,
+            condition="WHERE run_id = UUID_TO_BIN('{}')".format(simulation_id))
+
+        df = pd.DataFrame(data, columns=db_cols)
+        runs = []
+        for _, run in df.groupby('run_num'):
+            durations = run.pivot_table(index='iteration', columns='stage',
+                                        values='duration')
+            runs.append(IterationHistory(durations.index.values,
+                                         durations.columns, durations.values))
+        return runs
+
     def load_scores(self, simulation_ids):
         db_cols = ['component','weight','z_mean','z_stddev', 'raw_score',
                    'submission_score']
@@ -225,6 +418,28 @@ class BistroDB(object):
             )
         return df
 
+    def load_score_table(self, simulation_ids=None):
+        """
+        Scores of all the components of many runs (all of them by default)
+        in a single query, one row per (run, component)
+        """
+        condition = ''
+        if simulation_ids is not None:
+            condition = "WHERE run_id IN ({})".format(
+                self.binary_ids(simulation_ids))
+        data = self.query("""
+            SELECT BIN_TO_UUID(run_id), component, weight, z_mean, z_stddev,
+                   raw_score, submission_score
+            FROM score {}
+            """.format(condition))
+
+        df = pd.DataFrame(
+            data,
+            columns=['simulation_id', 'Component Name', 'Weight', 'Z-Mean',
+                     'Z-StdDev', 'Raw Score', 'Weighted Score']
+            )
+        return df
+
     def load_activities(self, scenario):
         db_cols = ['person_id', 'activity_num', 'activity_type']
 
@@ -296,7 +511,15 @@ class BistroDB(object):
 
         return df
 
-    def load_paths(self, simulation_ids, scenario):
+    def load_paths(self, simulation_ids, scenario, id_dictionary=None):
+        """
+        Load the path traversals of a run joined with their vehicle type.
+
+        The join runs on the int32 vehicle codes of id_dictionary, which
+        registers the vehicles of the scenario again when the run has
+        vehicles without a registered type. A temporary dictionary is used
+        when none is given.
+        """
         # mode length vehicle "numPassengers", "vehicleType", "departureTime", "arrivalTime" fuelCost
 
         db_cols = ['vehicle_id','distance','mode','start_time','end_time',
@@ -312,8 +535,14 @@ class BistroDB(object):
             columns=['vehicle','length','mode','departureTime','arrivalTime',
                      'numPassengers','fuelCost','fuelConsumed'])
 
-        vehicle_df = self.load_vehicles(scenario)
-        return path_df.merge(vehicle_df, left_on='vehicle', right_on='vehicle')
+        if id_dictionary is None:
+            id_dictionary = IdDictionary()
+        if pd.isnull(id_dictionary.vehicle_types_of(
+                path_df['vehicle'].values)).any():
+            # vehicles of the scenario first seen in this run, or imported
+            # after the types were registered
+            id_dictionary.set_vehicle_types(self.load_vehicles(scenario))
+        return id_dictionary.join_vehicle_types(path_df)
 
     def load_person(self, scenario):
         db_cols = ['person_id','age','income']
@@ -356,7 +585,7 @@ class BistroDB(object):
 
         df = pd.DataFrame(data, columns=['iterations', 'mode', 'count'])
         df = df.pivot_table(index='iterations', columns='mode', values='count') 
-        del df.columns.name
+        df.columns.name = None
         return df.reset_index()
 
     def load_hourly_mode_choice(self, simulation_ids):
@@ -369,7 +598,7 @@ class BistroDB(object):
         df = pd.DataFrame(
             data, columns=['Modes', 'Hour', 'Count'])
         df = df.pivot_table(index='Modes', columns='Hour', values='Count')
-        del df.columns.name
+        df.columns.name = None
         df.rename(
             columns={hour:'Bin_'+str(hour) for hour in df.columns},
             inplace=True)
@@ -385,9 +614,122 @@ class BistroDB(object):
 
         df = pd.DataFrame(data, columns=['TravelTimeMode\\Hour','Hour','Traveltime'])
         df = df.pivot_table(index='TravelTimeMode\\Hour', columns='Hour', values='Traveltime')
-        del df.columns.name
+        df.columns.name = None
         return df.reset_index()
 
+    def load_car_vmt_by_hour(self, simulation_id):
+        """
+        Meters driven by car legs per hour of the day (of their start), as
+        the legs of make_congestion_car_vmt_by_time_data
+        """
+        hour, in_day = hour_bin('leg_start')
+        data = self.query("""
+            SELECT {0} AS hour_bin, SUM(distance)
+            FROM leg
+            WHERE run_id = UUID_TO_BIN('{2}') AND leg_mode = 'car' AND {1}
+            GROUP BY hour_bin
+            """.format(hour, in_day, simulation_id))
+
+        df = pd.DataFrame(data, columns=['Hour', 'Distance_m'])
+        df['Hour'] = df['Hour'].astype(int)
+        return df
+
+    def load_bus_vmt_by_ridership(self, simulation_id, scenario):
+        """
+        Meters driven by buses per hour of the day (of their departure) and
+        ridership, in percents of the seating capacity then of the standing
+        room, as the paths of make_congestion_bus_vmt_by_ridership_data
+        """
+        hour, in_day = hour_bin('p.start_time')
+        data = self.query("""
+            SELECT {0} AS hour_bin,
+                   CASE WHEN p.num_passengers > t.seating_capacity
+                        THEN 100.0 + (p.num_passengers - t.seating_capacity)
+                                     * 100.0 / t.standing_capacity
+                        ELSE p.num_passengers * 100.0 / t.seating_capacity
+                   END AS ridership_perc,
+                   SUM(p.distance)
+            FROM pathtraversal p
+            INNER JOIN vehicle v ON v.vehicle_id = p.vehicle_id
+                                 AND v.scenario = '{3}'
+            INNER JOIN vehicletype t ON t.vehicle_type = v.type
+                                     AND t.scenario = '{3}'
+            WHERE p.run_id = UUID_TO_BIN('{2}') AND p.mode = 'bus' AND {1}
+            GROUP BY hour_bin, ridership_perc
+            """.format(hour, in_day, simulation_id, scenario))
+
+        df = pd.DataFrame(data, columns=['Hour', 'ridershipPerc', 'length'])
+        df['Hour'] = df['Hour'].astype(int)
+        return df
+
+    def load_on_demand_vmt_by_hour(self, simulation_id):
+        """
+        Meters driven by ride hail vehicles per hour of the day (of their
+        departure) and driving state: fetch without passenger, fare with
+        one, as the paths of make_congestion_on_demand_vmt_by_phases_data
+        """
+        hour, in_day = hour_bin('start_time')
+        data = self.query("""
+            SELECT {0} AS hour_bin,
+                   CASE WHEN num_passengers < 1 THEN 'fetch' ELSE 'fare'
+                   END AS driving_state,
+                   SUM(distance)
+            FROM pathtraversal
+            WHERE run_id = UUID_TO_BIN('{2}')
+                  AND vehicle_id LIKE '%rideHailVehicle%' AND {1}
+                  AND num_passengers >= 0 AND num_passengers < 2
+            GROUP BY hour_bin, driving_state
+            """.format(hour, in_day, simulation_id))
+
+        df = pd.DataFrame(data, columns=['Hour', 'drivingState', 'length'])
+        df['Hour'] = df['Hour'].astype(int)
+        return df
+
+    def load_travel_speed(self, simulation_id, edges):
+        """
+        Mean speed in miles per hour of the trips per realized mode and
+        interval of the hour of the day of their start, between consecutive
+        edges in hours and labelled '[start, end)', as the trips of
+        make_congestion_travel_speed_data. Trips starting out of the
+        intervals are left out.
+        """
+        hour, in_day = hour_bin('trip_start')
+        intervals = ' '.join(
+            "WHEN {0} >= {1} AND {0} < {2} THEN '[{1}, {2})'".format(
+                hour, start, end)
+            for start, end in zip(edges[:-1], edges[1:]))
+        data = self.query("""
+            SELECT CASE {0} END AS time_interval, realized_mode,
+                   AVG(2.23694 * distance / (trip_end - trip_start))
+            FROM trip
+            WHERE run_id = UUID_TO_BIN('{2}') AND trip_end - trip_start > 0
+                  AND realized_mode IS NOT NULL AND {1}
+            GROUP BY time_interval, realized_mode
+            """.format(intervals, in_day, simulation_id))
+
+        df = pd.DataFrame(
+            data,
+            columns=['Start time interval (hour)', 'realizedTripMode',
+                     'Average Speed (miles/hour)'])
+        return df.dropna(subset=['Start time interval (hour)'])
+
+    def load_toll_revenue_by_hour(self, simulation_id):
+        """
+        Tolls paid per hour of the day of the start of the trips, as the
+        trips of make_toll_revenue_by_time_data
+        """
+        hour, in_day = hour_bin('trip_start')
+        data = self.query("""
+            SELECT {0} AS hour_bin, SUM(toll)
+            FROM trip
+            WHERE run_id = UUID_TO_BIN('{2}') AND {1}
+            GROUP BY hour_bin
+            """.format(hour, in_day, simulation_id))
+
+        df = pd.DataFrame(data, columns=['Hour', 'Toll'])
+        df['Hour'] = df['Hour'].astype(int)
+        return df
+
     def load_vehicle_cost(self, scenario):
         db_cols = ['vehicle_type', 'operation_cost']
         data = self.get_table(
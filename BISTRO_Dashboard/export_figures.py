@@ -0,0 +1,191 @@
+"""
+Batch export of the dashboard figures of many submissions to png/svg.
+
+Submissions are exported in parallel, one submission per task, by a pool
+of worker processes that each keep a single headless browser for all
+their exports. A figure is only rendered again when the content of the
+data sources it is drawn from changed since the last export.
+
+Usage::
+
+    # submission directories under data/submissions, e.g. synthetic runs
+    python synthetic.py 15k
+    python export_figures.py sioux_faux-15k/synthetic --format png svg
+    # simulations of the database, by run id
+    python export_figures.py --run-ids 5673feca-f45a-11e9-ba19-acde48001122
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+from multiprocessing.util import Finalize
+from os.path import dirname, exists, isdir, join
+
+from bokeh.models import ColumnDataSource
+
+from plots import (
+    create_dir_tree, export_figure, figure_path, make_sources,
+    make_submission_plots)
+from source_update import column_digest
+from submission import Submission
+
+MANIFEST = 'export_manifest.json'
+
+# Headless browser of the worker process, created by init_worker
+_webdriver = None
+
+
+def init_worker():
+    global _webdriver
+    from bokeh.io.webdriver import create_phantomjs_webdriver
+    _webdriver = create_phantomjs_webdriver()
+    Finalize(_webdriver, _webdriver.quit, exitpriority=10)
+
+
+def figure_digest(plot, name, fmt):
+    """Digest of a figure inputs: the content of all its data sources"""
+    digest = hashlib.sha1('{}.{}'.format(name, fmt).encode())
+    source_digests = sorted(
+        column_digest(values) + col
+        for source in plot.select({'type': ColumnDataSource})
+        for col, values in source.data.items())
+    digest.update(''.join(source_digests).encode())
+    return digest.hexdigest()
+
+
+def export_submission(task):
+    """
+    Compute the data products of a submission and export its figures.
+
+    Parameters
+    ----------
+    task : tuple
+        (scenario, name, simulation_ids, formats, root, force); sub_key
+        'scenario/name' is used for the figure tree and plot titles
+
+    Returns
+    -------
+    sub_key, exported, skipped : str, int, int
+    """
+    scenario, name, simulation_ids, formats, root, force = task
+    sub_key = '{}/{}'.format(scenario, name)
+
+    submission = Submission(name, scenario, simulation_ids=simulation_ids)
+    submission.get_data()
+    submission.make_data_sources()
+    sources = make_sources(submission, link_index=Submission.load_link_index(
+        submission.scenario, submission.link_data))
+    plots = make_submission_plots(sources, sub_key, submission.route_ids)
+
+    create_dir_tree(sub_key, root=root)
+    manifest_path = join(root, sub_key, MANIFEST)
+    manifest = {}
+    if exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    exported = skipped = 0
+    for plot_name, plot in sorted(plots.items()):
+        for fmt in formats:
+            key = '{}.{}'.format(plot_name, fmt)
+            digest = figure_digest(plot, plot_name, fmt)
+            if manifest.get(key) == digest and exists(
+                    figure_path(sub_key, plot_name, fmt=fmt, root=root)):
+                skipped += 1
+                continue
+            export_figure(plot, sub_key, plot_name, fmt=fmt, root=root,
+                          webdriver=_webdriver)
+            manifest[key] = digest
+            exported += 1
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return sub_key, exported, skipped
+
+
+def find_submissions(sub_keys):
+    """
+    (scenario, name, None) of submission directories under data/submissions
+
+    Raises
+    ------
+    IOError
+        naming the submissions that are missing or lack input files
+    """
+    runs = []
+    errors = []
+    for sub_key in sub_keys:
+        scenario, name = sub_key.split('/', 1)
+        submission = Submission(name, scenario)
+        if not isdir(submission.submissions_dir):
+            errors.append('{}: no directory {}'.format(
+                sub_key, submission.submissions_dir))
+        elif submission.missing_files():
+            errors.append('{}: missing {}'.format(
+                sub_key, ', '.join(submission.missing_files())))
+        runs.append((scenario, name, None))
+    if errors:
+        raise IOError('\n'.join(errors))
+    return runs
+
+
+def find_runs(run_ids):
+    """(scenario, name, [run_id]) of simulations of the database"""
+    from db_loader import BistroDB, parse_credential
+    db = BistroDB(*parse_credential(join(dirname(__file__),
+                                         'dashboard_profile.ini')))
+    simulations = db.load_simulation_df().set_index('simulation_id')
+    unknown = [run_id for run_id in run_ids if run_id not in simulations.index]
+    if unknown:
+        raise IOError('unknown run ids: {}'.format(', '.join(unknown)))
+    runs = []
+    for run_id in run_ids:
+        simulation = simulations.loc[run_id]
+        name = simulation['name'] if simulation['tag'] is None else \
+            simulation['tag'] + '(' + simulation['name'] + ')'
+        runs.append((simulation['scenario'], name, [run_id]))
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        'submissions', nargs='+',
+        help='scenario/name submission directories, or run ids with '
+             '--run-ids')
+    parser.add_argument('--run-ids', action='store_true',
+                        help='load the submissions from the database')
+    parser.add_argument('--format', nargs='+', default=['png'],
+                        choices=['png', 'svg'], dest='formats')
+    parser.add_argument('--output', default='figures',
+                        help='root of the figures tree (default: figures)')
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='number of worker processes')
+    parser.add_argument('--force', action='store_true',
+                        help='export even the figures whose inputs did not '
+                             'change')
+    args = parser.parse_args(argv)
+
+    try:
+        runs = (find_runs if args.run_ids else find_submissions)(
+            args.submissions)
+    except IOError as e:
+        parser.error(str(e))
+
+    tasks = [(scenario, name, simulation_ids, args.formats, args.output,
+              args.force) for scenario, name, simulation_ids in runs]
+    pool = multiprocessing.Pool(
+        processes=max(1, min(args.jobs, len(tasks))), initializer=init_worker)
+    try:
+        for sub_key, exported, skipped in pool.imap_unordered(
+                export_submission, tasks):
+            print('{}: {} figures exported, {} unchanged'.format(
+                sub_key, exported, skipped))
+    finally:
+        pool.close()
+        pool.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+FARE_COLUMNS = ["agencyId", "routeId", "age", "amount"]
+
+
+def route_labels(route_ids):
+    """
+    Route ids as strings, 1340 for the 1340.0 of a column with missing
+    values, None where missing
+    """
+    route_ids = pd.Series(route_ids, dtype=object)
+    labels = {route_id: str(int(route_id))
+              if isinstance(route_id, float) and route_id.is_integer()
+              else str(route_id)
+              for route_id in pd.unique(route_ids.dropna().values)}
+    labels['nan'] = None
+    return route_ids.map(labels).where(route_ids.notnull(), None)
+
+
+def expand_fare_rules(fares, route_ids):
+    """
+    Replace the fare rules without routeId (applying to every route) by one
+    rule per route of route_ids, in a single cross join.
+
+    Parameters
+    ----------
+    fares : pandas DataFrame
+        MassTransitFares.csv input file
+    route_ids : list of str
+        Routes of the scenario
+
+    Returns
+    -------
+    fares : pandas DataFrame
+        One rule per route, in the order of the rules of the input, with
+        string route ids
+    """
+    fares = fares[FARE_COLUMNS].reset_index(drop=True)
+    routes = route_labels(fares["routeId"]).values
+    every_route = pd.isnull(routes)
+
+    repeats = np.where(every_route, len(route_ids), 1)
+    expanded = fares.iloc[np.repeat(np.arange(len(fares)), repeats)] \
+        .reset_index(drop=True)
+    expanded_routes = np.repeat(routes, repeats)
+    expanded_routes[np.repeat(every_route, repeats)] = np.tile(
+        np.asarray(route_ids, dtype=object), every_route.sum())
+    expanded["routeId"] = expanded_routes
+    return expanded
+
+
+class FareIndex(object):
+    """
+    Fare of a (route, age) pair, looked up in a dense (route x age) table
+    of the expanded fare rules.
+
+    As in BEAM, the first rule of a route whose age range (bounds included)
+    holds the age applies. Pairs without a rule have no fare (NaN).
+    """
+
+    def __init__(self, fares, max_age=120):
+        """
+        Parameters
+        ----------
+        fares : pandas DataFrame
+            Expanded fare rules (expand_fare_rules) with their age ranges
+            split into min_age and max_age (Submission.splitting_min_max)
+        max_age : int
+            Oldest age of the table
+        """
+        fares = fares[fares["amount"].notnull()]
+        self.routes = pd.Index(pd.unique(fares["routeId"].values))
+        self.route_codes = {route: code for code, route in
+                            enumerate(self.routes)}
+        self.max_age = max_age
+        self.table = np.full((len(self.routes), max_age + 1), np.nan)
+
+        rules = zip(self.routes.get_indexer(fares["routeId"].values),
+                    fares["min_age"].values, fares["max_age"].values,
+                    fares["amount"].values.astype(float))
+        # the rules are written last first, so that the first one wins
+        for code, low, high, amount in reversed(list(rules)):
+            self.table[code, max(low, 0):min(high, max_age) + 1] = amount
+
+    def fare(self, route_id, age):
+        """Fare of route_id for a passenger of age, NaN without a rule"""
+        code = self.route_codes.get(str(route_id))
+        if code is None or not 0 <= age <= self.max_age:
+            return np.nan
+        return self.table[code, int(age)]
+
+    def fares(self, route_ids, ages):
+        """Fares of arrays of route ids and ages, as fare"""
+        codes = self.routes.get_indexer(
+            np.asarray(route_ids).astype(str).astype(object))
+        ages = np.asarray(ages, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            known = (codes >= 0) & (ages >= 0) & (ages <= self.max_age)
+        fares = np.full(len(codes), np.nan)
+        fares[known] = self.table[codes[known], ages[known].astype(int)]
+        return fares
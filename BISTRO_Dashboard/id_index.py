@@ -0,0 +1,113 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class IdIndex(object):
+    """
+    Append-only dictionary encoding ids (TAZ, person, vehicle, link...) into
+    dense int32 codes.
+
+    Codes never change once assigned, so arrays built with an older version
+    of the index stay valid: they only need to be padded to the current size.
+    Indexes are shared by the submissions of a scenario, so encode() can be
+    called from the thread making the exact products of a submission while
+    the document thread encodes another one.
+    """
+
+    def __init__(self, ids=None):
+        self.index = pd.Index([] if ids is None else pd.unique(ids))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def ids(self):
+        return self.index.values
+
+    def encode(self, values, grow=True):
+        """
+        Return the int32 codes of values. Unknown ids are appended to the
+        index when grow is True, otherwise they are encoded as -1.
+        """
+        values = np.asarray(values)
+        # the hash table of a pd.Index is built lazily by its first lookup,
+        # which is not thread-safe either
+        with self._lock:
+            codes = self.index.get_indexer(values)
+            missing = codes == -1
+            if grow and missing.any():
+                self.index = self.index.append(
+                    pd.Index(pd.unique(values[missing])))
+                codes = self.index.get_indexer(values)
+        return codes.astype(np.int32)
+
+    def decode(self, codes):
+        return self.index.values[np.asarray(codes)]
+
+
+def pad_to(array, size, axis=0):
+    """Pad array with zeros along axis so that it covers size ids"""
+    missing = size - array.shape[axis]
+    if missing <= 0:
+        return array
+    pad_width = [(0, 0)] * array.ndim
+    pad_width[axis] = (0, missing)
+    return np.pad(array, pad_width, mode='constant')
+
+
+class IdDictionary(object):
+    """
+    Scenario-wide interning of the person, vehicle and link ids.
+
+    All the simulations of a scenario encode their ids with the same indexes
+    so that the codes of two submissions can be compared directly. The
+    vehicle types are kept as an array aligned on the vehicle codes, which
+    turns the path traversal / vehicle join into array indexing.
+    """
+
+    def __init__(self):
+        self.persons = IdIndex()
+        self.vehicles = IdIndex()
+        self.links = IdIndex()
+        self.vehicle_types = np.empty(0, dtype=object)
+        self._lock = threading.Lock()
+
+    def set_vehicle_types(self, vehicles_df):
+        """Register the (vehicle, vehicleType) table of the scenario"""
+        with self._lock:
+            codes = self.vehicles.encode(vehicles_df['vehicle'].values)
+            vehicle_types = np.full(len(self.vehicles), None, dtype=object)
+            vehicle_types[:len(self.vehicle_types)] = self.vehicle_types
+            vehicle_types[codes] = vehicles_df['vehicleType'].values
+            self.vehicle_types = vehicle_types
+
+    def vehicle_types_of(self, vehicles):
+        """
+        Registered types of vehicles, None for the vehicles without one:
+        unknown, or encoded (by another submission of the scenario) after
+        the types were registered
+        """
+        codes = self.vehicles.encode(vehicles, grow=False)
+        types = np.full(len(codes), None, dtype=object)
+        registered = (codes >= 0) & (codes < len(self.vehicle_types))
+        types[registered] = self.vehicle_types[codes[registered]]
+        return types
+
+    def join_vehicle_types(self, path_df):
+        """
+        Inner join of path_df with the registered vehicle types, on the
+        integer codes of the 'vehicle' column
+        """
+        types = self.vehicle_types_of(path_df['vehicle'].values)
+        known = pd.notnull(types)
+        path_df = path_df[known].reset_index(drop=True)
+        path_df['vehicleType'] = types[known]
+        return path_df
+
+    def vehicles_matching(self, pattern):
+        """Boolean array, by vehicle code, of the ids containing pattern"""
+        return pd.Series(self.vehicles.ids, dtype=object).astype(str) \
+            .str.contains(pattern, regex=False).values
@@ -0,0 +1,230 @@
+import warnings
+from glob import glob
+from os.path import exists, join
+
+import numpy as np
+import pandas as pd
+
+
+# (file name, KPI prefix, iteration column, read_csv keyword arguments)
+HISTORY_FILES = [
+    ('summaryStats.csv', '', 'Iteration', {}),
+    ('modeChoice.csv', 'modeChoice: ', 'iterations', {}),
+    ('realizedModeChoice.csv', 'realizedModeChoice: ', 'iterations', {}),
+    ('scorestats.txt', 'score: ', 'ITERATION', {'sep': '\t'}),
+]
+
+# Stage durations reported by BEAM in stopwatch.txt, in execution order
+STOPWATCH_STAGES = ['iterationStartsListeners', 'replanning', 'dump all plans',
+                    'beforeMobsimListeners', 'mobsim', 'afterMobsimListeners',
+                    'scoring', 'iterationEndsListeners', 'iteration']
+
+
+class IterationHistory(object):
+    """
+    Iteration x KPI matrix gathering every per-iteration output of a run.
+
+    All the history files are aligned on the union of their iterations and
+    stored in a single float64 array so that the convergence diagnostics can
+    be computed for all the KPIs at once.
+    """
+
+    def __init__(self, iterations, kpis, values):
+        self.iterations = np.asarray(iterations, dtype=np.int64)
+        self.kpis = list(kpis)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.kpi_index = {kpi: i for i, kpi in enumerate(self.kpis)}
+        self.diagnostics = None
+
+    @classmethod
+    def from_frames(cls, frames):
+        """
+        Build the matrix from a list of (df, prefix, iteration_col) tuples.
+        Iterations missing from a file are filled with NaN.
+        """
+        frames = [(df, prefix, it_col) for df, prefix, it_col in frames
+                  if df is not None and len(df) > 0]
+        if not frames:
+            return cls([], [], np.empty((0, 0)))
+
+        iterations = np.unique(np.concatenate(
+            [df[it_col].values.astype(np.int64) for df, _, it_col in frames]))
+
+        kpis = []
+        blocks = []
+        for df, prefix, it_col in frames:
+            rows = np.searchsorted(
+                iterations, df[it_col].values.astype(np.int64))
+            cols = [col for col in df.columns if col != it_col]
+            block = np.full((len(iterations), len(cols)), np.nan)
+            block[rows, :] = df[cols].apply(
+                pd.to_numeric, errors='coerce').values
+            kpis += [prefix + str(col) for col in cols]
+            blocks.append(block)
+
+        return cls(iterations, kpis, np.hstack(blocks))
+
+    @classmethod
+    def from_directory(cls, path):
+        """Load every history file found in a submission directory"""
+        frames = []
+        for file_name, prefix, it_col, kwargs in HISTORY_FILES:
+            file_path = join(path, file_name)
+            if not exists(file_path):
+                continue
+            frames.append((pd.read_csv(file_path, **kwargs), prefix, it_col))
+        return cls.from_frames(frames)
+
+    def compute_diagnostics(self, window=10, tol=0.05):
+        """
+        Compute rolling convergence diagnostics for all the KPIs at once.
+
+        Parameters
+        ----------
+        window: int
+            Number of iterations used by the rolling statistics
+        tol: float
+            A KPI is stable at an iteration when its rolling standard
+            deviation is lower than tol times its rolling mean (in absolute
+            value)
+
+        Returns
+        -------
+        diagnostics: dict
+            'relative_change' and 'rolling_std' are (iteration x KPI) arrays,
+            'iterations_to_stabilize' holds, for each KPI, the first iteration
+            after which the KPI stays stable (NaN if it never does)
+        """
+        values = pd.DataFrame(self.values)
+
+        previous = values.shift(1).values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative_change = np.where(
+                previous != 0, (self.values - previous) / np.abs(previous),
+                0.0)
+
+        rolling = values.rolling(window, min_periods=window)
+        rolling_std = rolling.std().values
+        rolling_mean = rolling.mean().values
+
+        with np.errstate(invalid='ignore'):
+            stable = rolling_std <= tol * np.abs(rolling_mean)
+        # A KPI has stabilized at iteration i if it stays stable from i on:
+        # reversed cumulative AND over the iteration axis.
+        stays_stable = np.logical_and.accumulate(stable[::-1], axis=0)[::-1]
+        if len(self.iterations):
+            first = stays_stable.argmax(axis=0)
+            never = ~stays_stable.any(axis=0)
+            iterations_to_stabilize = np.where(
+                never, np.nan, self.iterations[first] - self.iterations[0])
+        else:
+            iterations_to_stabilize = np.empty(0)
+
+        self.diagnostics = {
+            'window': window,
+            'tol': tol,
+            'relative_change': relative_change,
+            'rolling_std': rolling_std,
+            'iterations_to_stabilize': iterations_to_stabilize,
+        }
+        return self.diagnostics
+
+    def kpi_data(self, kpi):
+        """Return the line data of a single KPI (empty if it is missing)"""
+        if self.diagnostics is None:
+            self.compute_diagnostics()
+
+        if kpi not in self.kpi_index:
+            return dict(iteration=[], value=[], relative_change=[],
+                        rolling_std=[])
+
+        i = self.kpi_index[kpi]
+        return dict(
+            iteration=self.iterations,
+            value=self.values[:, i],
+            relative_change=self.diagnostics['relative_change'][:, i],
+            rolling_std=self.diagnostics['rolling_std'][:, i])
+
+    def summary_data(self):
+        """Return the per-KPI convergence summary table"""
+        if self.diagnostics is None:
+            self.compute_diagnostics()
+
+        if len(self.iterations):
+            last_value = self.values[-1]
+            last_change = self.diagnostics['relative_change'][-1]
+        else:
+            last_value = last_change = np.empty(0)
+
+        return dict(
+            kpi=self.kpis,
+            last_value=last_value,
+            last_relative_change=last_change,
+            iterations_to_stabilize=
+                self.diagnostics['iterations_to_stabilize'])
+
+
+def read_stopwatch(path):
+    """
+    Parse a BEAM stopwatch.txt into an (iteration x stage) matrix of stage
+    durations in seconds. Timestamp columns (BEGIN/END ...) are dropped and
+    stages that did not run in an iteration are NaN.
+    """
+    df = pd.read_csv(path, sep='\t', dtype=str)
+    stages = [col for col in df.columns
+              if col != 'Iteration' and not col.startswith('Unnamed')
+              and not col.startswith('BEGIN ') and not col.startswith('END ')]
+
+    durations = pd.to_timedelta(
+        df[stages].values.ravel(), errors='coerce'
+    ).total_seconds().values.reshape(len(df), len(stages))
+
+    return IterationHistory(df['Iteration'].astype(int).values, stages,
+                            durations)
+
+
+def find_stopwatch_files(path):
+    """
+    Return the stopwatch files of a submission directory: the directory
+    itself for a single run, or one per run directory for a multi-seed
+    submission.
+    """
+    if exists(join(path, 'stopwatch.txt')):
+        return [join(path, 'stopwatch.txt')]
+    return sorted(glob(join(path, '*', 'stopwatch.txt')))
+
+
+def stage_runtime_distribution(runs, stages=STOPWATCH_STAGES):
+    """
+    Summarize stage durations over all the iterations of all the runs.
+
+    Parameters
+    ----------
+    runs: list of IterationHistory
+        Stage durations of each run, as returned by read_stopwatch
+    stages: list of str
+        Stages to report, in that order
+
+    Returns
+    -------
+    data: dict
+        Box plot statistics (seconds) for each stage; NaN when a stage is
+        missing from every run
+    """
+    stacked = np.vstack(
+        [np.empty((0, len(stages)))] +
+        [np.column_stack(
+            [run.values[:, run.kpi_index[stage]] if stage in run.kpi_index
+             else np.full(len(run.iterations), np.nan) for stage in stages])
+         for run in runs if len(run.iterations)])
+
+    with warnings.catch_warnings():
+        # all-NaN stages legitimately produce NaN statistics
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q = np.nanpercentile(stacked, [0, 25, 50, 75, 100], axis=0) \
+            if len(stacked) else np.full((5, len(stages)), np.nan)
+        mean = np.nanmean(stacked, axis=0) if len(stacked) \
+            else np.full(len(stages), np.nan)
+
+    return dict(stage=list(stages), min=q[0], q1=q[1], median=q[2], q3=q[3],
+                max=q[4], mean=mean)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from scoring import ScoringEngine, make_score_matrix, rank
+from submission import compact_array
+
+ALL = 'All'
+
+
+class Leaderboard(object):
+    """
+    Scores of all the simulations, from a precomputed (run x KPI) matrix:
+    filtering only selects rows of the matrix, without loading any run.
+    Runs are listed by rank of their case study aggregate score, which a
+    ScoringEngine recomputes for all the runs under what-if weights.
+
+    Parameters
+    ----------
+    simulations : pd.DataFrame
+        BistroDB.load_simulation_df()
+    scores : pd.DataFrame
+        BistroDB.load_score_table() of the same simulations
+    """
+
+    def __init__(self, simulations, scores):
+        matrix = make_score_matrix(scores)
+        runs = simulations.set_index('simulation_id')
+        tagged = runs['tag'].notnull()
+        names = runs['name'].astype(str).where(
+            ~tagged, runs['tag'].astype(str) + '(' + runs['name'] + ')')
+        self.runs = pd.DataFrame({
+            'submission': runs['scenario'] + '/' + names,
+            'scenario': runs['scenario'],
+            'tag': runs['tag'].where(tagged, ''),
+            'datetime': runs['datetime'].astype(str)})
+        self.components = list(matrix.columns)
+        # one field per component, component names are not valid field names
+        self.fields = ['kpi_{}'.format(i) for i in range(len(self.components))]
+        self.matrix = matrix.reindex(self.runs.index).values
+
+        self.scoring = ScoringEngine(scores)
+        self.scoring_rows = np.array(
+            [self.scoring.run_index.get(run, -1) for run in self.runs.index],
+            dtype=np.int64)
+
+    @property
+    def scenarios(self):
+        return [ALL] + sorted(self.runs['scenario'].unique())
+
+    @property
+    def tags(self):
+        return [ALL] + sorted(tag for tag in self.runs['tag'].unique() if tag)
+
+    def make_data(self, scenario=ALL, tag=ALL, group_weights=None,
+                  component_weights=None):
+        """
+        Column data of the runs of scenario and tag ('All' for any), by
+        rank of their aggregate score under the weights (those of
+        casestudy_kpis.yaml and of the score table by default)
+        """
+        keep = np.ones(len(self.runs), dtype=bool)
+        if scenario != ALL:
+            keep &= (self.runs['scenario'] == scenario).values
+        if tag != ALL:
+            keep &= (self.runs['tag'] == tag).values
+
+        aggregate = self.scoring.aggregate_scores(
+            group_weights, component_weights)
+        rows = self.scoring_rows[keep]
+        scores = np.where(rows >= 0, aggregate[rows], np.nan)
+        ranks = rank(scores)
+        order = np.argsort(ranks)
+        keep = np.nonzero(keep)[0][order]
+
+        data = {col: self.runs[col].values[keep]
+                for col in ('submission', 'scenario', 'tag', 'datetime')}
+        data['rank'] = ranks[order]
+        data['aggregate'] = compact_array(scores[order])
+        for field, values in zip(self.fields, self.matrix[keep].T):
+            data[field] = compact_array(values)
+        return data
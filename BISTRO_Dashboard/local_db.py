@@ -0,0 +1,515 @@
+"""
+Local copy of the BISTRO database in a SQLite (or DuckDB) file.
+
+import_submission() loads a submission directory, in the layout read by
+Submission.get_data in file mode, into the tables that BistroDB queries,
+so that the dashboard and export_figures.py run in database mode without
+a MySQL server. Set DATABASE_BACKEND=sqlite (or duckdb) and DATABASE_NAME
+to the path of the file in dashboard_profile.ini to use it.
+
+The tables of the scenario shared by all its runs (network, population,
+activities, vehicle types and costs, bus lines) are loaded with the first
+run of the scenario. Files missing from a submission leave their tables
+empty for that run.
+
+Usage: python local_db.py database submission [submission ...]
+                          [--scenario S] [--backend sqlite|duckdb]
+                          [--tag TAG]
+
+where each submission is a directory, e.g.
+data/submissions/sioux_faux-15k/synthetic, or <scenario>/<name> under
+data/submissions. The run ids are printed, see Submission(name, scenario,
+simulation_ids=[run_id]).
+"""
+import argparse
+import datetime
+import uuid
+from collections import OrderedDict
+from os import listdir
+from os.path import abspath, basename, dirname, exists, getmtime, isdir, join
+
+import numpy as np
+import pandas as pd
+
+from db_loader import BistroDB
+from iteration_history import find_stopwatch_files, read_stopwatch
+
+SUBMISSIONS_DIR = join(dirname(__file__), 'data/submissions')
+REFERENCE_DIR = join(dirname(__file__), 'data/sioux_faux_bus_lines')
+# rows read at once from the largest dataframes
+CHUNK_ROWS = 500000
+
+# fleetmix rows of the routes of the fleet mix without frequency adjustment
+# get the service Submission gives routes without adjustment (all day, every
+# 3 hours), and the rows of the routes without vehicle type the default bus,
+# so that BistroDB reads every row as it does from MySQL
+DEFAULT_SERVICE = OrderedDict([('start_time', 0), ('end_time', 24 * 3600),
+                               ('headway_secs', 10800)])
+DEFAULT_VEHICLE_TYPE = 'BUS-DEFAULT'
+
+SCHEMA = OrderedDict([
+    ('simulationrun', [('run_id', 'TEXT'), ('datetime', 'TEXT'),
+                       ('scenario', 'TEXT'), ('name', 'TEXT')]),
+    ('simulationtag', [('name', 'TEXT'), ('tag', 'TEXT')]),
+    # scenario tables
+    ('link', [('link_id', 'BIGINT'), ('original_node_id', 'BIGINT'),
+              ('destination_node_id', 'BIGINT'), ('scenario', 'TEXT')]),
+    ('node', [('node_id', 'BIGINT'), ('x', 'DOUBLE'), ('y', 'DOUBLE'),
+              ('scenario', 'TEXT')]),
+    ('person', [('person_id', 'TEXT'), ('age', 'BIGINT'),
+                ('income', 'DOUBLE'), ('scenario', 'TEXT')]),
+    ('activity', [('person_id', 'TEXT'), ('activity_num', 'BIGINT'),
+                  ('activity_type', 'TEXT'), ('scenario', 'TEXT')]),
+    ('vehicle', [('vehicle_id', 'TEXT'), ('type', 'TEXT'),
+                 ('scenario', 'TEXT')]),
+    ('vehicletype', [('vehicle_type', 'TEXT'), ('seating_capacity', 'BIGINT'),
+                     ('standing_capacity', 'BIGINT'), ('scenario', 'TEXT')]),
+    ('vehiclecost', [('vehicle_type', 'TEXT'), ('operation_cost', 'DOUBLE'),
+                     ('scenario', 'TEXT')]),
+    ('transittrip', [('trip_id', 'TEXT'), ('route_id', 'BIGINT'),
+                     ('scenario', 'TEXT')]),
+    ('agency', [('agency_id', 'BIGINT'), ('scenario', 'TEXT')]),
+    ('transitroute', [('route_id', 'BIGINT'), ('scenario', 'TEXT')]),
+    # run tables
+    ('fleetmix', [('run_id', 'TEXT'), ('agency_id', 'BIGINT'),
+                  ('route_id', 'BIGINT'), ('service_start', 'BIGINT'),
+                  ('service_end', 'BIGINT'), ('frequency', 'BIGINT'),
+                  ('vehicle_type', 'TEXT')]),
+    ('transitfare', [('run_id', 'TEXT'), ('route_id', 'BIGINT'),
+                     ('age_min', 'BIGINT'), ('age_max', 'BIGINT'),
+                     ('amount', 'DOUBLE')]),
+    ('incentive', [('run_id', 'TEXT'), ('trip_mode', 'TEXT'),
+                   ('age_min', 'BIGINT'), ('age_max', 'BIGINT'),
+                   ('income_min', 'BIGINT'), ('income_max', 'BIGINT'),
+                   ('amount', 'DOUBLE')]),
+    ('tollcircle', [('run_id', 'TEXT'), ('type', 'TEXT'), ('toll', 'DOUBLE'),
+                    ('center_lat', 'DOUBLE'), ('center_lon', 'DOUBLE'),
+                    ('border_lat', 'DOUBLE'), ('border_lon', 'DOUBLE')]),
+    ('score', [('run_id', 'TEXT'), ('component', 'TEXT'), ('weight', 'DOUBLE'),
+               ('z_mean', 'DOUBLE'), ('z_stddev', 'DOUBLE'),
+               ('raw_score', 'DOUBLE'), ('submission_score', 'DOUBLE')]),
+    ('trip', [('run_id', 'TEXT'), ('person_id', 'TEXT'),
+              ('realized_mode', 'TEXT'), ('distance', 'DOUBLE'),
+              ('trip_num', 'BIGINT'), ('trip_start', 'BIGINT'),
+              ('trip_end', 'BIGINT'), ('fuel_cost', 'DOUBLE'),
+              ('fare', 'DOUBLE'), ('toll', 'DOUBLE'), ('incentives', 'DOUBLE'),
+              ('dest_act', 'TEXT')]),
+    ('leg', [('run_id', 'TEXT'), ('person_id', 'TEXT'), ('trip_num', 'BIGINT'),
+             ('leg_num', 'BIGINT'), ('distance', 'DOUBLE'),
+             ('leg_mode', 'TEXT'), ('vehicle', 'TEXT'),
+             ('leg_start', 'BIGINT'), ('fare', 'DOUBLE'),
+             ('fuel_cost', 'DOUBLE'), ('toll', 'DOUBLE')]),
+    ('leg_link', [('run_id', 'TEXT'), ('person_id', 'TEXT'),
+                  ('trip_num', 'BIGINT'), ('leg_num', 'BIGINT'),
+                  ('link_id', 'BIGINT')]),
+    ('pathtraversal', [('run_id', 'TEXT'), ('vehicle_id', 'TEXT'),
+                       ('distance', 'DOUBLE'), ('mode', 'TEXT'),
+                       ('start_time', 'BIGINT'), ('end_time', 'BIGINT'),
+                       ('num_passengers', 'BIGINT'), ('fuel_cost', 'DOUBLE'),
+                       ('fuel_consumed', 'DOUBLE')]),
+    ('modechoice', [('run_id', 'TEXT'), ('iterations', 'BIGINT'),
+                    ('mode', 'TEXT'), ('count', 'BIGINT')]),
+    ('realizedmodechoice', [('run_id', 'TEXT'), ('iterations', 'BIGINT'),
+                            ('mode', 'TEXT'), ('count', 'BIGINT')]),
+    ('hourlymodechoice', [('run_id', 'TEXT'), ('mode', 'TEXT'),
+                          ('hour', 'BIGINT'), ('count', 'BIGINT')]),
+    ('traveltime', [('run_id', 'TEXT'), ('mode', 'TEXT'), ('hour', 'BIGINT'),
+                    ('averagetime', 'DOUBLE')]),
+    ('parkingstats', [('run_id', 'TEXT'), ('time_bin', 'BIGINT'),
+                      ('taz', 'DOUBLE'), ('outbound_overhead_time', 'DOUBLE'),
+                      ('inbound_overhead_time', 'DOUBLE'),
+                      ('inbound_overhead_cost', 'DOUBLE')]),
+    # stage durations of stopwatch.txt, in seconds, per run of the
+    # submission (one per seed of a multi-seed submission)
+    ('stopwatch', [('run_id', 'TEXT'), ('run_num', 'BIGINT'),
+                   ('iteration', 'BIGINT'), ('stage', 'TEXT'),
+                   ('duration', 'DOUBLE')]),
+])
+# Indexed columns of the tables queried by other columns than their run_id
+# or scenario
+INDEXES = {'vehicle': ['scenario', 'vehicle_id'],
+           'vehicletype': ['scenario', 'vehicle_type']}
+RUN_TABLES = [table for table, columns in SCHEMA.items()
+              if columns[0][0] == 'run_id']
+
+
+def connect(path, backend='sqlite'):
+    """BistroDB over the database file at path, with the tables created"""
+    db = BistroDB(path, None, None, backend=backend)
+    create_schema(db)
+    return db
+
+
+def create_schema(db):
+    """Create the tables (and indexes) of SCHEMA that do not exist yet"""
+    for table, columns in SCHEMA.items():
+        db.cursor.execute("CREATE TABLE IF NOT EXISTS {} ({})".format(
+            table, ', '.join('{} {}'.format(*column) for column in columns)))
+        if db.backend.create_indexes and table not in ('simulationrun',
+                                                       'simulationtag'):
+            keys = INDEXES.get(table, [
+                columns[0][0] if table in RUN_TABLES else 'scenario'])
+            db.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS {}_{} ON {} ({})".format(
+                    table, '_'.join(keys), table, ', '.join(keys)))
+    db.connection.commit()
+
+
+def insert(db, table, df):
+    if df is not None and len(df):
+        db.backend.insert(db.connection, table, df)
+    return 0 if df is None else len(df)
+
+
+def read_csv(path, **kwargs):
+    """The file at path as a DataFrame (chunks with chunksize), or None"""
+    if not exists(path):
+        return None
+    return pd.read_csv(path, **kwargs)
+
+
+def chunks(path, usecols=None):
+    """Chunks of CHUNK_ROWS rows of the file at path, none if it is missing"""
+    reader = read_csv(path, usecols=usecols, chunksize=CHUNK_ROWS)
+    return reader if reader is not None else []
+
+
+def parse_range(values):
+    """'[min:max]' ranges of the submission inputs as (min, max) columns"""
+    bounds = values.str.extract(r'^\s*[\[(]\s*([^:]*):([^\])]*)[\])]\s*$')
+    return (pd.to_numeric(bounds[0], errors='coerce'),
+            pd.to_numeric(bounds[1], errors='coerce'))
+
+
+def last_iteration_dir(submission_dir):
+    """ITERS/it.<n> of the last iteration, as read by Submission.get_data"""
+    path = join(submission_dir, 'ITERS')
+    if not isdir(path):
+        return None, None
+    iter_num = max([int(name.split('.')[1]) for name in listdir(path)
+                    if name.startswith('it.')])
+    return join(path, 'it.{}'.format(iter_num)), iter_num
+
+
+def scenario_loaded(db, scenario):
+    return bool(db.get_table('vehicletype', cols=['vehicle_type'],
+                             condition="WHERE scenario = '{}' LIMIT 1"
+                             .format(scenario)))
+
+
+def import_scenario(db, submission_dir, scenario,
+                    reference_dir=REFERENCE_DIR):
+    """
+    Load the tables shared by the runs of scenario: bus lines and vehicle
+    types from reference_dir, network, persons and activities from
+    submission_dir. Returns the rows inserted per table.
+    """
+    rows = OrderedDict()
+
+    vehicle_types = pd.read_csv(join(reference_dir, 'availableVehicleTypes.csv'))
+    rows['vehicletype'] = insert(db, 'vehicletype', pd.DataFrame(OrderedDict([
+        ('vehicle_type', vehicle_types['vehicleTypeId']),
+        ('seating_capacity', vehicle_types['seatingCapacity']),
+        ('standing_capacity', vehicle_types['standingRoomCapacity']),
+        ('scenario', scenario)])))
+    costs = pd.read_csv(join(reference_dir, 'vehicleCosts.csv'))
+    rows['vehiclecost'] = insert(db, 'vehiclecost', pd.DataFrame(OrderedDict([
+        ('vehicle_type', costs['vehicleTypeId']),
+        ('operation_cost', costs['opAndMaintCost']),
+        ('scenario', scenario)])))
+    trips = pd.read_csv(join(reference_dir, 'gtfs_data/trips.txt'))
+    rows['transittrip'] = insert(db, 'transittrip', pd.DataFrame(OrderedDict([
+        ('trip_id', trips['trip_id']), ('route_id', trips['route_id']),
+        ('scenario', scenario)])))
+    agencies = pd.read_csv(join(reference_dir, 'gtfs_data/agency.txt'))
+    rows['agency'] = insert(db, 'agency', pd.DataFrame(OrderedDict([
+        ('agency_id', agencies['agency_id']), ('scenario', scenario)])))
+    routes = pd.read_csv(join(reference_dir, 'gtfs_data/routes.txt'))
+    rows['transitroute'] = insert(db, 'transitroute', pd.DataFrame(
+        OrderedDict([('route_id', routes['route_id']),
+                     ('scenario', scenario)])))
+
+    network = read_csv(join(submission_dir, 'network.csv'))
+    if network is not None:
+        rows['link'] = insert(db, 'link', pd.DataFrame(OrderedDict([
+            ('link_id', network['LinkId']),
+            ('original_node_id', network['fromLocationID']),
+            ('destination_node_id', network['toLocationID']),
+            ('scenario', scenario)])))
+        nodes = pd.concat([
+            pd.DataFrame({'node_id': network[end + 'LocationID'].values,
+                          'x': network[end + 'LocationX'].values,
+                          'y': network[end + 'LocationY'].values})
+            for end in ('from', 'to')])
+        nodes = nodes.drop_duplicates('node_id')[['node_id', 'x', 'y']]
+        nodes['scenario'] = scenario
+        rows['node'] = insert(db, 'node', nodes)
+
+    rows['person'] = 0
+    for chunk in chunks(join(submission_dir, 'persons_dataframe.csv'),
+                        usecols=['PID', 'Age', 'income']):
+        rows['person'] += insert(db, 'person', pd.DataFrame(OrderedDict([
+            ('person_id', chunk['PID']), ('age', chunk['Age']),
+            ('income', chunk['income']), ('scenario', scenario)])))
+
+    rows['activity'] = 0
+    for chunk in chunks(join(submission_dir, 'activities_dataframe.csv'),
+                        usecols=['PID', 'Activity_ID', 'Activity_Type']):
+        # <PID>_a-<number>
+        numbers = chunk['Activity_ID'].str.rsplit('-', n=1).str[-1]
+        rows['activity'] += insert(db, 'activity', pd.DataFrame(OrderedDict([
+            ('person_id', chunk['PID']),
+            ('activity_num', pd.to_numeric(numbers, errors='coerce')),
+            ('activity_type', chunk['Activity_Type']),
+            ('scenario', scenario)])))
+    return rows
+
+
+def delete_run(db, run_id):
+    for table in RUN_TABLES:
+        db.cursor.execute("DELETE FROM {} WHERE run_id = '{}'".format(
+            table, run_id))
+    db.cursor.execute(
+        "DELETE FROM simulationrun WHERE run_id = '{}'".format(run_id))
+    db.connection.commit()
+
+
+def import_submission(db, submission_dir, scenario, name=None, run_id=None,
+                      tag=None, reference_dir=REFERENCE_DIR):
+    """
+    Load the submission directory as a run of scenario, replacing the run
+    of the same run_id. The scenario tables are loaded first when the
+    scenario is new.
+
+    Parameters
+    ----------
+    db : BistroDB
+        Database created by connect()
+    submission_dir : str
+        Submission directory, in the layout read by Submission.get_data
+    scenario : str
+    name : str
+        Name of the run, the name of submission_dir by default
+    run_id : str
+        uuid of the run, derived from scenario and name by default so that
+        importing a submission again replaces it
+    tag : str
+        Tag of the name of the run in simulationtag
+
+    Returns
+    -------
+    run_id : str
+    rows : OrderedDict
+        Rows inserted per table
+    """
+    name = name or basename(abspath(submission_dir))
+    if run_id is None:
+        run_id = str(uuid.uuid5(uuid.NAMESPACE_URL,
+                                'bistro/{}/{}'.format(scenario, name)))
+    rows = OrderedDict()
+    if not scenario_loaded(db, scenario):
+        rows.update(import_scenario(db, submission_dir, scenario,
+                                    reference_dir))
+    delete_run(db, run_id)
+
+    run_date = datetime.datetime.fromtimestamp(getmtime(submission_dir))
+    rows['simulationrun'] = insert(db, 'simulationrun', pd.DataFrame(
+        [[run_id, run_date.isoformat(' '), scenario, name]],
+        columns=['run_id', 'datetime', 'scenario', 'name']))
+    if tag is not None:
+        rows['simulationtag'] = insert(db, 'simulationtag', pd.DataFrame(
+            [[name, tag]], columns=['name', 'tag']))
+
+    inputs_dir = join(submission_dir, 'competition/submission-inputs')
+    frequency = read_csv(join(inputs_dir, 'FrequencyAdjustment.csv'))
+    fleet = read_csv(join(inputs_dir, 'VehicleFleetMix.csv'))
+    if frequency is not None or fleet is not None:
+        # one row per frequency adjustment, with the vehicle type of its
+        # route, and one row of default service per other route of the fleet
+        if frequency is None:
+            frequency = pd.DataFrame(columns=['route_id', 'start_time',
+                                              'end_time', 'headway_secs'])
+        if fleet is None:
+            fleet = pd.DataFrame(columns=['agencyId', 'routeId',
+                                          'vehicleTypeId'])
+        fleet = fleet.drop_duplicates('routeId').rename(
+            columns={'routeId': 'route_id'})
+        fleetmix = pd.merge(frequency, fleet, on='route_id', how='outer')
+        defaults = dict(DEFAULT_SERVICE, vehicleTypeId=DEFAULT_VEHICLE_TYPE)
+        if len(fleet):
+            defaults['agencyId'] = fleet['agencyId'].iloc[0]
+        fleetmix = fleetmix.fillna(defaults)
+        rows['fleetmix'] = insert(db, 'fleetmix', pd.DataFrame(OrderedDict([
+            ('run_id', run_id), ('agency_id', fleetmix['agencyId']),
+            ('route_id', fleetmix['route_id']),
+            ('service_start', fleetmix['start_time']),
+            ('service_end', fleetmix['end_time']),
+            ('frequency', fleetmix['headway_secs']),
+            ('vehicle_type', fleetmix['vehicleTypeId'])])))
+
+    fares = read_csv(join(inputs_dir, 'MassTransitFares.csv'))
+    if fares is not None:
+        age_min, age_max = parse_range(fares['age'])
+        rows['transitfare'] = insert(db, 'transitfare', pd.DataFrame(
+            OrderedDict([('run_id', run_id), ('route_id', fares['routeId']),
+                         ('age_min', age_min), ('age_max', age_max),
+                         ('amount', fares['amount'])])))
+
+    incentives = read_csv(join(inputs_dir, 'ModeIncentives.csv'))
+    if incentives is not None:
+        age_min, age_max = parse_range(incentives['age'])
+        income_min, income_max = parse_range(incentives['income'])
+        rows['incentive'] = insert(db, 'incentive', pd.DataFrame(OrderedDict([
+            ('run_id', run_id), ('trip_mode', incentives['mode']),
+            ('age_min', age_min), ('age_max', age_max),
+            ('income_min', income_min), ('income_max', income_max),
+            ('amount', incentives['amount'])])))
+
+    scores = read_csv(join(submission_dir, 'competition/submissionScores.csv'))
+    if scores is not None:
+        rows['score'] = insert(db, 'score', pd.DataFrame(OrderedDict([
+            ('run_id', run_id), ('component', scores['Component Name']),
+            ('weight', scores['Weight']),
+            ('z_mean', scores.get('Z-Mean')),
+            ('z_stddev', scores.get('Z-StdDev')),
+            ('raw_score', scores['Raw Score']),
+            ('submission_score', scores['Weighted Score'])])))
+
+    rows['trip'] = 0
+    for chunk in chunks(join(submission_dir, 'trips_dataframe.csv')):
+        rows['trip'] += insert(db, 'trip', pd.DataFrame(OrderedDict([
+            ('run_id', run_id), ('person_id', chunk['PID']),
+            ('realized_mode', chunk['realizedTripMode']),
+            ('distance', chunk['Distance_m']), ('trip_num', chunk['Trip_ID']),
+            ('trip_start', chunk['Start_time']),
+            ('trip_end', chunk['End_time']), ('fuel_cost', chunk['fuelCost']),
+            ('fare', chunk['Fare']), ('toll', chunk['Toll']),
+            ('incentives', chunk['Incentive']),
+            ('dest_act', chunk['DestinationAct'])])))
+
+    rows['leg'] = 0
+    for chunk in chunks(join(submission_dir, 'legs_dataframe.csv')):
+        rows['leg'] += insert(db, 'leg', pd.DataFrame(OrderedDict([
+            ('run_id', run_id), ('person_id', chunk['PID']),
+            ('trip_num', chunk['Trip_ID']), ('leg_num', chunk['Leg_ID']),
+            ('distance', chunk['Distance_m']), ('leg_mode', chunk['Mode']),
+            ('vehicle', chunk['Veh']), ('leg_start', chunk['Start_time']),
+            ('fare', chunk['Fare']), ('fuel_cost', chunk['fuelCost']),
+            ('toll', chunk['Toll'])])))
+
+    # vehicles of the scenario first seen in this run
+    vehicles = set(row[0] for row in db.get_table(
+        'vehicle', cols=['vehicle_id'],
+        condition="WHERE scenario = '{}'".format(scenario)))
+    rows['pathtraversal'] = rows['vehicle'] = 0
+    for chunk in chunks(join(submission_dir, 'path_traversals_dataframe.csv')):
+        rows['pathtraversal'] += insert(
+            db, 'pathtraversal', pd.DataFrame(OrderedDict([
+                ('run_id', run_id), ('vehicle_id', chunk['vehicle']),
+                ('distance', chunk['length']), ('mode', chunk['mode']),
+                ('start_time', chunk['departureTime']),
+                ('end_time', chunk['arrivalTime']),
+                ('num_passengers', chunk['numPassengers']),
+                ('fuel_cost', chunk['fuelCost']),
+                ('fuel_consumed', chunk['fuelConsumed'])])))
+        new = chunk[['vehicle', 'vehicleType']].drop_duplicates('vehicle')
+        new = new.loc[~new['vehicle'].isin(vehicles)]
+        vehicles.update(new['vehicle'])
+        rows['vehicle'] += insert(db, 'vehicle', pd.DataFrame(OrderedDict([
+            ('vehicle_id', new['vehicle']), ('type', new['vehicleType']),
+            ('scenario', scenario)])))
+
+    for table, file_name in (('modechoice', 'modeChoice.csv'),
+                             ('realizedmodechoice', 'realizedModeChoice.csv')):
+        mode_choice = read_csv(join(submission_dir, file_name))
+        if mode_choice is not None:
+            mode_choice = pd.melt(mode_choice, id_vars=['iterations'],
+                                  var_name='mode', value_name='count')
+            mode_choice.insert(0, 'run_id', run_id)
+            rows[table] = insert(db, table, mode_choice)
+
+    rows['stopwatch'] = 0
+    for run_num, stopwatch_path in enumerate(
+            find_stopwatch_files(submission_dir)):
+        stopwatch = read_stopwatch(stopwatch_path)
+        # 'iteration' is also a stage of the stopwatch
+        durations = pd.DataFrame(OrderedDict([
+            ('run_id', run_id), ('run_num', run_num),
+            ('iteration', np.repeat(stopwatch.iterations,
+                                    len(stopwatch.kpis))),
+            ('stage', np.tile(stopwatch.kpis, len(stopwatch.iterations))),
+            ('duration', stopwatch.values.ravel())]))
+        rows['stopwatch'] += insert(db, 'stopwatch',
+                                    durations.dropna(subset=['duration']))
+
+    path, iter_num = last_iteration_dir(submission_dir)
+    if path is not None:
+        hourly = read_csv(join(path, '{}.modeChoice.csv'.format(iter_num)),
+                          index_col=0)
+        if hourly is not None:
+            # Bin_<hour> columns, and an empty one after the trailing comma
+            hourly = hourly[[col for col in hourly.columns
+                             if col.startswith('Bin_')]]
+            hourly.columns = [int(col[len('Bin_'):]) for col in hourly.columns]
+            hourly = hourly.rename_axis('mode').reset_index()
+            hourly = pd.melt(hourly, id_vars=['mode'], var_name='hour',
+                             value_name='count')
+            hourly.insert(0, 'run_id', run_id)
+            rows['hourlymodechoice'] = insert(db, 'hourlymodechoice', hourly)
+
+        travel_times = read_csv(
+            join(path, '{}.averageTravelTimes.csv'.format(iter_num)),
+            index_col=0)
+        if travel_times is not None:
+            travel_times.columns = travel_times.columns.astype(int)
+            travel_times = travel_times.rename_axis('mode').reset_index()
+            travel_times = pd.melt(travel_times, id_vars=['mode'],
+                                   var_name='hour', value_name='averagetime')
+            travel_times.insert(0, 'run_id', run_id)
+            rows['traveltime'] = insert(db, 'traveltime', travel_times)
+
+        parking = read_csv(join(path, '{}.parkingStats.csv'.format(iter_num)))
+        if parking is not None:
+            rows['parkingstats'] = insert(
+                db, 'parkingstats', pd.DataFrame(OrderedDict([
+                    ('run_id', run_id), ('time_bin', parking['timeBin']),
+                    ('taz', parking['TAZ']),
+                    ('outbound_overhead_time',
+                     parking['outboundParkingOverheadTime']),
+                    ('inbound_overhead_time',
+                     parking['inboundParkingOverheadTime']),
+                    ('inbound_overhead_cost',
+                     parking['inboundParkingOverheadCost'])])))
+    return run_id, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Import submissions into a local BISTRO database')
+    parser.add_argument('database', help='path of the database file')
+    parser.add_argument('submissions', nargs='+',
+                        help='submission directories, or <scenario>/<name> '
+                             'under data/submissions')
+    parser.add_argument('--scenario', default=None,
+                        help='scenario of the runs (default: the name of '
+                             'the parent directory of each submission)')
+    parser.add_argument('--backend', default='sqlite',
+                        choices=['sqlite', 'duckdb'])
+    parser.add_argument('--tag', default=None)
+    args = parser.parse_args()
+
+    db = connect(args.database, args.backend)
+    for submission in args.submissions:
+        if not isdir(submission):
+            submission = join(SUBMISSIONS_DIR, submission)
+        scenario = args.scenario or basename(dirname(abspath(submission)))
+        run_id, rows = import_submission(db, submission, scenario,
+                                         tag=args.tag)
+        print('{} {}/{}: {}'.format(
+            run_id, scenario, basename(abspath(submission)),
+            ', '.join('{} {}'.format(count, table)
+                      for table, count in rows.items() if count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,1058 +1,35 @@
 import glob
-import math
-from collections import defaultdict
-from os import listdir, makedirs
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from os import environ, makedirs
 from os.path import dirname, isdir, join
 
 import pandas as pd
 import yaml
 from bokeh.core.properties import value
-from bokeh.io import curdoc, show, output_file, export_png, export_svgs
-from bokeh.layouts import row, column, gridplot, layout, widgetbox
-from bokeh.models import (
-    BasicTicker, ColorBar, ColumnDataSource, DataRange1d, Label, LabelSet,
-    Legend, LinearColorMapper, Select, Title)
-from bokeh.models.markers import Circle
-from bokeh.models.formatters import NumeralTickFormatter
-from bokeh.models.glyphs import Segment, Text
-from bokeh.models.widgets import CheckboxButtonGroup, Div, Panel, Tabs
-from bokeh.palettes import Dark2, Category10, Category20, Plasma256, YlOrRd
-from bokeh.plotting import figure, show
-from bokeh.transform import dodge, transform
-from bokeh.tile_providers import CARTODBPOSITRON
+from bokeh.io import curdoc
+from bokeh.layouts import row, column, layout
+from bokeh.models import ColumnDataSource, GlyphRenderer, Select
+from bokeh.models.widgets import (
+    Button, Div, MultiSelect, Panel, RadioButtonGroup, Slider, Tabs, Toggle)
 from natsort import natsorted
 
-from submission import Submission
+from comparison import (
+    COMPARISON_KPIS, comparison_series, make_comparison_data)
+from plots import (
+    SOURCE_NAME_DATA_PAIR, create_dir_tree, make_sources,
+    make_submission_plots, make_tab_layouts, plot_comparison,
+    plot_convergence, plot_convergence_summary, plot_diagnostics,
+    plot_leaderboard, plot_parking_overhead_delta, plot_runtime_profile)
+from raster import LinkRasterizer
+from source_update import update_source
+from submission import (
+    UNSAMPLED_PRODUCTS, Submission, product_samples, to_column_data)
+import profiling
 from db_loader import BistroDB, parse_credential
-
-
-HOURS = [str(h) for h in range(24)]
-#ROUTE_IDS = ['1340', '1341', '1342', '1343', '1344', '1345', '1346', '1347', '1348', '1349', '1350', '1351']
-
-BUSES_LIST = ['BUS-DEFAULT', 'BUS-SMALL-HD', 'BUS-STD-HD', 'BUS-STD-ART']
-MODES = ['ride_hail', 'car', 'drive_transit', 'walk', 'walk_transit']#, 'mixed_mode']
-
-SOURCE_NAME_DATA_PAIR = [
-('normalized_scores_source', 'normalized_scores_data'),
-('fleetmix_input_source', 'fleetmix_input_data'),
-('routesched_input_line_source', 'routesched_input_line_data'),
-('routesched_input_start_source', 'routesched_input_start_data'),
-('routesched_input_end_source', 'routesched_input_end_data'),
-('fares_input_source', 'fares_input_data'),
-('modeinc_input_source', 'modeinc_input_data'),
-('link_source','link_data'),
-('toll_circle_source','toll_circle_data'),
-('mode_planned_pie_chart_source', 'mode_planned_pie_chart_data'),
-('mode_realized_pie_chart_source', 'mode_realized_pie_chart_data'),
-('mode_choice_by_time_source', 'mode_choice_by_time_data'),
-('mode_choice_by_income_group_source', 'mode_choice_by_income_group_data'),
-('mode_choice_by_age_group_source', 'mode_choice_by_age_group_data'),
-('mode_choice_by_distance_source', 'mode_choice_by_distance_data'),
-('congestion_travel_time_by_mode_source',
-    'congestion_travel_time_by_mode_data'),
-('congestion_travel_time_per_passenger_trip_source',
-    'congestion_travel_time_per_passenger_trip_data'),
-('congestion_miles_traveled_per_mode_source',
-    'congestion_miles_traveled_per_mode_data'),
-('congestion_car_vmt_by_time_source',
-    'congestion_car_vmt_by_time_data'),
-('congestion_bus_vmt_by_ridership_source',
-    'congestion_bus_vmt_by_ridership_data'),
-('congestion_on_demand_vmt_by_phases_source',
-    'congestion_on_demand_vmt_by_phases_data'),
-('congestion_travel_speed_source', 'congestion_travel_speed_data'),
-('los_travel_expenditure_source', 'los_travel_expenditure_data'),
-('los_crowding_source', 'los_crowding_data'),
-('transit_cb_costs_source', 'transit_cb_costs_data'),
-('transit_cb_benefits_source', 'transit_cb_benefits_data'),
-('transit_inc_by_mode_source', 'transit_inc_by_mode_data'),
-('toll_revenue_by_time_source','toll_revenue_by_time_data'),
-('sustainability_25pm_per_mode_source', 'sustainability_25pm_per_mode_data'),
-('sustainability_ghg_per_mode_source', 'sustainability_ghg_per_mode_data')
-]
-
-def save_png(plot, sub_key, name):
-    f_name = ""
-    f_name += "figures/" + sub_key + "/"
-    if name == 'toll_circle' or 'input' in name:
-        f_name += "inputs/"
-    elif 'scores' not in name:
-        f_name += "outputs/"
-    else:
-        pass
-    f_name += name + ".png"
-
-    export_png(plot, filename=f_name)
-
-def plot_normalized_scores(source, sub_key=1, savefig='None'):
-
-    p = figure(#x_range=(-6, 2),
-               y_range=CATEGORIES[::-1],
-               plot_height=350, plot_width=1200,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Weighted subscores for each KPI and Submission score",
-              text_font_style="normal"), 'above')
-    p.add_layout(
-        Title(text="Normalized Scores",
-              text_font_size="14pt"),
-        'above')
-
-    p.hbar(y='Component Name', height=0.5,
-           left=0,
-           right='Weighted Score',
-           source=source,
-           color='color')
-
-    p.xgrid.grid_line_color = None
-    p.ygrid.grid_line_color = None
-    p.outline_line_width = 1
-    p.outline_line_color = "black"
-    p.xaxis.axis_label = 'Weighted Score'
-    p.yaxis.axis_label = 'Score Component'
-    p.xaxis.axis_label_text_font_size = "12pt"
-    p.yaxis.axis_label_text_font_size = "12pt"
-    p.xaxis.major_label_text_font_size = "10pt"
-    p.yaxis.major_label_text_font_size = "10pt"
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/normalized_scores.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/normalized_scores.png".format(sub_key))
-
-    return p
-
-def plot_casestudy_scores(source, sub_key=1, savefig='None'):
-
-    p = figure(x_range=(-3, 6),
-               y_range=CASESTUDY_CAT[::-1],
-               plot_height=350, plot_width=1200,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="KPI score and aggregation for Sioux Faux",
-              text_font_style="normal"), 'above')
-    p.add_layout(
-        Title(text="Case Study Scores",
-              text_font_size="14pt"),
-        'above')
-
-    p.hbar(y='Component Name', height=0.5,
-           left=0,
-           right='Weighted Score',
-           source=source,
-           color='color')
-
-    p.xgrid.grid_line_color = None
-    p.ygrid.grid_line_color = None
-    p.outline_line_width = 1
-    p.outline_line_color = "black"
-    p.xaxis.axis_label = 'Weighted Score'
-    p.yaxis.axis_label = 'Score Component'
-    p.xaxis.axis_label_text_font_size = "12pt"
-    p.yaxis.axis_label_text_font_size = "12pt"
-    p.xaxis.major_label_text_font_size = "10pt"
-    p.yaxis.major_label_text_font_size = "10pt"
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/casestudy_scores.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/casestudy_scores.png".format(sub_key))
-
-    return p
-
-
-def plot_fleetmix_input(source, sub_key=1, savefig='None', route_ids=[]):
-
-    p = figure(x_range=BUSES_LIST, y_range=[str(route_id) for route_id in route_ids], 
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Bus fleet mix", text_font_size="14pt"), 'above')
-
-    p.circle(x='vehicleTypeId', y='routeId', source=source, size=8)
-
-    p.xaxis.axis_label = 'Bus Type'
-    p.yaxis.axis_label = 'Bus Route'
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/inputs/fleetmix_input.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/inputs/fleetmix_input.png".format(sub_key))
-
-    return p
-
-def plot_routesched_input(line_source, start_source, end_source, sub_key=1, savefig='None'):
-
-    p = figure(x_range=(0, 24), y_range=(-0.1, 2.1), 
-               plot_height=450, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Frequency adjustment", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Bus Route')
-
-    p.multi_line(xs='xs', ys='ys', source=line_source, color='color', line_width=4, legend='name') 
-    p.square(x='xs', y='ys', source=start_source, fill_color='color', line_color='color', size=8)
-    p.circle(x='xs', y='ys', source=end_source, fill_color='color', line_color='color', size=8)
-
-    p.xaxis.axis_label = 'Hour of day'
-    p.yaxis.axis_label = 'Headway [h]'
-    p.xaxis.ticker = BasicTicker(max_interval=4)
-    p.xgrid.ticker = BasicTicker(max_interval=4)
-    p.legend.label_text_font_size = '8pt'
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-    
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/inputs/routesched_input.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/inputs/routesched_input.png".format(sub_key))
-
-    return p
-
-def plot_fares_input(source, max_fare=10, max_age=121, sub_key=1, savefig='None', route_ids=[]):
-
-    mapper = LinearColorMapper(palette=Plasma256[:120:-1], low=0.0, high=max_fare)
-
-    p = figure(x_range=(0, max_age), y_range=route_ids, 
-               plot_height=350, plot_width=475,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Mass transit fares", text_font_size="14pt"), 'above')
-
-    p.hbar(y='routeId', height=0.5, 
-           left='min_age',
-           right='max_age',
-           source=source,
-           color=transform('amount', mapper)) 
-
-    p.xaxis.axis_label = 'Age'
-    p.yaxis.axis_label = 'Bus Route'
-
-    color_bar = ColorBar(color_mapper=mapper, ticker=BasicTicker(),
-                 label_standoff=12, border_line_color=None, location=(0,0))
-
-    color_bar_plot = figure(title="Fare Amount [$]",
-                            title_location="right", 
-                            height=350, width=125, 
-                            toolbar_location=None, tools="", min_border=0, 
-                            outline_line_color=None)
-
-    color_bar_plot.add_layout(color_bar, 'right')
-    color_bar_plot.title.align="center"
-    color_bar_plot.title.text_font_size = '10pt'
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(row(p, color_bar_plot), filename="figures/{}/inputs/fares_input.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(row(p, color_bar_plot), filename="figures/{}/inputs/fares_input.png".format(sub_key))
-
-    return row(p, color_bar_plot)
-
-def plot_modeinc_input(source, max_incentive=50, max_age=121, max_income=150000, sub_key=1, savefig='None'):
-
-    mapper = LinearColorMapper(palette=Plasma256[:120:-1], low=0.0, high=max_incentive)
-    inc_modes = ['ride_hail', 'drive_transit', 'walk_transit']
-
-    p1 = figure(x_range=(0, max_age), y_range=inc_modes, 
-               plot_height=175, plot_width=475,
-               toolbar_location=None, tools="")
-    p1.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p1.add_layout(Title(text="Incentives by age group", text_font_size="14pt"), 'above')
-
-    p1.hbar(y='mode', height=0.5, 
-           left='min_age',
-           right='max_age',
-           source=source,
-           color=transform('amount', mapper)) 
-
-    p1.xaxis.axis_label = 'Age'
-    p1.yaxis.axis_label = 'Mode Choice'
-
-    p2 = figure(x_range=(0, max_income), y_range=inc_modes, 
-               plot_height=175, plot_width=475,
-               toolbar_location=None, tools="")
-    p2.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p2.add_layout(Title(text="Incentives by income group", text_font_size="14pt"), 'above')
-
-    p2.hbar(y='mode', height=0.5, 
-           left='min_income',
-           right='max_income',
-           source=source,
-           color=transform('amount', mapper)) 
-
-    p2.xaxis[0].formatter = NumeralTickFormatter(format="$0a")
-    p2.xaxis.axis_label = 'Income'
-    p2.yaxis.axis_label = 'Mode Choice'
-
-    p = column(p1, p2)
-
-    color_bar = ColorBar(color_mapper=mapper, ticker=BasicTicker(),
-                 label_standoff=12, border_line_color=None, location=(0,0))
-
-    color_bar_plot = figure(title="Incentive Amount [$/person-trip]",
-                            title_location="right", 
-                            height=350, width=125, 
-                            toolbar_location=None, tools="", min_border=0, 
-                            outline_line_color=None)
-
-    color_bar_plot.add_layout(color_bar, 'right')
-    color_bar_plot.title.align="center"
-    color_bar_plot.title.text_font_size = '10pt'
-
-    if savefig == 'svg':
-      p1.output_backend = "svg"
-      p2.output_backend = "svg"
-      export_svgs(row(p, color_bar_plot), filename="figures/{}/inputs/modeinc_input.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(row(p, color_bar_plot), filename="figures/{}/inputs/modeinc_input.png".format(sub_key))
-
-    return row(p, color_bar_plot)
-
-def plot_toll_circle(link_source, circle_source, sub_key=1, savefig='None'):
-    title = 'Toll Circle'
-    d = circle_source.data
-
-    p = figure(
-        x_range=(d['x_low'][0], d['x_high'][0]),
-        y_range=(d['y_low'][0], d['y_high'][0]),
-        x_axis_type="mercator",
-        y_axis_type="mercator")
-    p.add_tile(CARTODBPOSITRON)
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Amount of toll applied and its range",
-              text_font_style="normal"), 'above')
-    p.add_layout(Title(text="Toll Circle", text_font_size="14pt"), 'above')
-
-    seg = Segment(x0="from_x", y0="from_y", x1="to_x", y1="to_y",
-                    line_color="#f4a582", line_width=1)
-    p.add_glyph(link_source, seg)
-
-    circle = Circle(
-        x='center_x', y='center_y', radius='radius', line_color="#00BFFF",
-        fill_color="#00BFFF", fill_alpha=0.05)
-    p.add_glyph(circle_source, circle)
-    label = Text(x='center_x', y='center_y', text='text')
-    p.add_glyph(circle_source, label)
-
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/inputs/toll_circle.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/inputs/toll_circle.png".format(sub_key))
-
-    return p
-
-def plot_mode_pie_chart(source, choice_type='planned', sub_key=1, savefig='None'):
-
-    title = 'Overall {} mode choice'.format(choice_type)
-    if choice_type == 'planned':
-        subtitle = ("Agent’s preferences (initial agent’s plan "
-                    "when leaving from his origin)")
-    else:
-        subtitle = ("Level of service (realized agent’s plan to "
-                    "go from his origin to his destination)")
-
-    p = figure(plot_height=400, toolbar_location=None,
-               x_range=(-0.5, 1.0))
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text=subtitle, text_font_style="normal"), 'above')
-    p.add_layout(Title(text=title, text_font_size="14pt"), 'above')
-
-    p.circle(-0.5, 1.0, size=0.00000001, color="#ffffff", legend='Mode Choice')
-
-    p.wedge(x=0, y=1, radius=0.4,
-            start_angle='start_angle', end_angle='end_angle',
-            line_color="white", fill_color='color', legend='Mode', source=source)
-
-    # labels = LabelSet(x='x_loc', y='y_loc', text='label', level='glyph',
-    #                   text_font_size='8pt', text_color='white',
-    #                   source=source, render_mode='canvas', text_align='left')
-    labels = LabelSet(x=0, y=1, text='label', level='glyph',
-                      angle='start_angle', text_font_size='8pt', text_color='white',
-                      source=source, render_mode='canvas')
-
-    p.add_layout(labels)
-    
-    p.axis.axis_label=None
-    p.axis.visible=False
-    p.legend.label_text_font_size = '8pt'
-    p.grid.grid_line_color = None
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/mode_{}_pie_chart.svg".format(sub_key, choice_type))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/mode_{}_pie_chart.png".format(sub_key, choice_type))
-
-    return p
-
-def plot_mode_choice_by_time(source, sub_key=1, savefig='None'):
-    p = figure(x_range=HOURS, y_range=(0, 15000),
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Mode choice by hour", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
-
-    p.vbar_stack(MODES,
-                 x='hours',
-                 width=0.85,
-                 source=source,
-                 color=Dark2[len(MODES)],
-                 legend=[value(x) for x in MODES])
-    
-    p.xaxis.axis_label = 'Hour of day'
-    p.yaxis.axis_label = 'Number of trips'
-    p.legend.orientation = "vertical"
-    p.legend.label_text_font_size = '8pt'
-    p.legend.location = 'top_left'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    # new_legend = p.legend[0]
-    # p.legend[0].plot = None
-    # p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_time.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/mode_choice_by_time.png".format(sub_key))
-
-    return p
-
-def plot_mode_choice_by_income_group(source, sub_key=1, savefig='None'):
-
-    bins = ['[$0, $10k)', '[$10k, $25k)', '[$25k, $50k)', '[$50k, $75k)', '[$75k, $100k)', '[$100k, inf)']
-
-    p = figure(x_range=MODES, y_range=(0, 15000),
-               plot_height=350,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Mode choice by income group", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Income Group')
-
-    nbins = len(bins)
-    total_width = 0.85
-    bin_width = total_width / nbins
-    bin_loc = -total_width / 2 + bin_width / 2
-    palette = Dark2[nbins]
-
-    for i, bin_i in enumerate(bins):
-        p.vbar(x=dodge('realizedTripMode', bin_loc, range=p.x_range), top=bin_i, width=bin_width-0.03, source=source,
-               color=palette[i], legend=value(bin_i))
-        bin_loc += bin_width
-
-    p.x_range.range_padding = bin_width
-    p.xgrid.grid_line_color = None
-    p.legend.orientation = "vertical"
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.axis_label = 'Mode Choice'
-    p.yaxis.axis_label = 'Number of People'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_income_group.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/mode_choice_by_income_group.png".format(sub_key))
-
-    return p
-
-def plot_mode_choice_by_age_group(source, sub_key=1, savefig='None'):
-
-    edges = [0, 18, 30, 40, 50, 60, float('inf')]
-    bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
-
-    p = figure(x_range=MODES, y_range=(0, 8000),
-               plot_height=350,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Mode choice by age group", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Age Group')
-
-    nbins = len(bins)
-    total_width = 0.85
-    bin_width = total_width / nbins
-    bin_loc = -total_width / 2 + bin_width / 2
-    palette = Dark2[nbins]
-
-    for i, bin_i in enumerate(bins):
-        p.vbar(x=dodge('realizedTripMode', bin_loc, range=p.x_range), top=bin_i, width=bin_width-0.03, source=source,
-               color=palette[i], legend=value(bin_i))
-        bin_loc += bin_width
-
-    p.x_range.range_padding = bin_width
-    p.xgrid.grid_line_color = None
-    p.legend.orientation = "vertical"
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.axis_label = 'Mode Choice'
-    p.yaxis.axis_label = 'Number of People'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_age_group.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/mode_choice_by_age_group.png".format(sub_key))
-
-    return p
-
-def plot_mode_choice_by_distance(source, sub_key=1, savefig='None'):
-
-    edges = [0, .5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 5, 7.5, 10, 40]
-    bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
-
-    p = figure(x_range=bins, y_range=(0, 6000),
-               plot_height=350, 
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Mode choice by trip distance", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
-
-    p.vbar_stack(MODES,
-                 x='Trip Distance (miles)', 
-                 width=0.5, 
-                 source=source,
-                 color=Dark2[len(MODES)],
-                 legend=[value(x) for x in MODES])
-    
-    p.xaxis.axis_label = 'Trip Distance (miles)'
-    p.yaxis.axis_label = 'Number of Trips'
-    p.legend.orientation = "vertical"
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_distance.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/mode_choice_by_distance.png".format(sub_key))
-
-    return p
-
-def plot_congestion_travel_time_by_mode(source, sub_key=1, savefig='None'):
-
-    p = figure(x_range=MODES, y_range=(0, 80),
-               plot_height=350, plot_width=700,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Average travel time per trip and by mode",
-              text_font_size="14pt"), 'above')
-
-    p.vbar(x='x', top='y', width=0.8, source=source, color='color')
-    
-    p.xaxis.axis_label = 'Mode'
-    p.yaxis.axis_label = 'Travel time [min]'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/congestion_travel_time_by_mode.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/congestion_travel_time_by_mode.png".format(sub_key))
-
-    return p
-
-def plot_congestion_travel_time_per_passenger_trip(source, sub_key=1, savefig='None'):
-
-    p = figure(x_range=HOURS, y_range=(0, 360),
-               plot_height=350, plot_width=800,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Average travel time per passenger-trip over the day",
-              text_font_size="14pt"), 'above')
-
-    nbins = len(MODES)
-    total_width = 0.85
-    bin_width = total_width / nbins
-    bin_loc = -total_width / 2 + bin_width / 2
-    palette = Dark2[nbins]
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
-
-    for i, mode_i in enumerate(MODES):
-        p.vbar(x=dodge('index', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source, color=palette[i], legend=value(mode_i))
-        bin_loc += bin_width
-
-    p.xaxis.axis_label = 'Hour of day'
-    p.yaxis.axis_label = 'Travel time [min]'
-    p.legend.label_text_font_size = '8pt'
-    p.legend.location = 'top_left'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/congestion_travel_time_per_passenger_trip.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/congestion_travel_time_per_passenger_trip.png".format(sub_key))
-
-    return p
-
-def plot_congestion_miles_traveled_per_mode(source, sub_key=1, savefig='None'):
-
-    p = figure(x_range=['ride_hail', 'car', 'walk', 'bus'], y_range=(0, 90000),
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Daily miles traveled per mode", text_font_size="14pt"), 'above')
-
-    p.vbar(x='modes', top='vmt', color='color', source=source, width=0.8)
-    
-    # p.xgrid.grid_line_color = None
-    # p.ygrid.grid_line_color = None
-    # p.outline_line_width = 1
-    # p.outline_line_color = "black"
-    p.xaxis.axis_label = 'Mode'
-    p.yaxis.axis_label = 'Miles traveled'
-    p.yaxis[0].formatter = NumeralTickFormatter(format="0a")
-    p.xaxis.major_label_orientation = math.pi / 6
-    # p.xaxis.axis_label_text_font_size = "12pt"
-    # p.yaxis.axis_label_text_font_size = "12pt"
-    # p.xaxis.major_label_text_font_size = "10pt"
-    # p.yaxis.major_label_text_font_size = "10pt"
-    
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/congestion_miles_traveled_per_mode.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/congestion_miles_traveled_per_mode.png".format(sub_key))
-
-    return p
-
-def plot_congestion_car_vmt_by_time(source, sub_key=1, savefig='None'):
-    p = figure(x_range=HOURS, y_range=(0, 25000),
-               plot_height=350, plot_width=700,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Car miles traveled by time of day", text_font_size="14pt"), 'above')
-
-    p.vbar(x='Hour', top='Distance_m', source=source, width=0.85)
-
-    p.xaxis.axis_label = 'Hour of day'
-    p.xaxis.major_label_orientation = math.pi / 2
-    p.yaxis.axis_label = 'Vehicle miles traveled'
-    p.yaxis[0].formatter = NumeralTickFormatter(format="0.0a")
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/congestion_car_vmt_by_time.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/congestion_car_vmt_by_time.png".format(sub_key))
-
-    return p
-
-def plot_congestion_bus_vmt_by_ridership(source, sub_key=1, savefig='None'):
-    
-    bins = [
-        'empty\n(0 passengers)', 
-        'low ridership\n(< 50% seating capacity)', 
-        'medium ridership\n(< seating capacity)', 
-        'high ridership\n(< 50% standing capacity)',
-        'crowded\n(<= standing capacity)'
-    ]
-    p = figure(x_range=HOURS, y_range=(0, 250),
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Bus vehicle miles traveled per bus occupancy"
-                   " state by hour of the day", text_font_style="normal"), 'above')
-    p.add_layout(Title(text="Bus VMT", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Ridership')
-
-    p.vbar_stack(bins,
-                 x='Hour',
-                 width=0.85,
-                 source=source,
-                 color=Dark2[len(bins)],
-                 legend=[value(x) for x in bins])
-    
-    # p.xgrid.grid_line_color = None
-    # p.ygrid.grid_line_color = None
-    # p.outline_line_width = 1
-    # p.outline_line_color = "black"
-    p.xaxis.axis_label = 'Hour of day'
-    p.yaxis.axis_label = 'Vehicle miles traveled'
-    p.yaxis[0].formatter = NumeralTickFormatter(format="0.0a")
-    p.legend.orientation = "vertical"
-    p.legend.label_text_font_size = '10pt'
-    p.xaxis.major_label_orientation = math.pi / 2
-    # p.xaxis.axis_label_text_font_size = "12pt"
-    # p.yaxis.axis_label_text_font_size = "12pt"
-    # p.xaxis.major_label_text_font_size = "10pt"
-    # p.yaxis.major_label_text_font_size = "10pt"
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-    
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/congestion_bus_vmt_by_ridership.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/congestion_bus_vmt_by_ridership.png".format(sub_key))
-
-    return p
-
-def plot_congestion_on_demand_vmt_by_phases(source, sub_key=1, savefig='None'):
-
-    driving_states = ["fetch", "fare"]
-    p = figure(x_range=HOURS, y_range=(0, 350),
-               plot_height=350, plot_width=700,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="On-demand ride vehicle miles traveled per occupancy "
-                   "state by hour of the day", text_font_style="normal"), 'above')
-    p.add_layout(Title(text="On-demand VMT", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Driving State')
-
-    p.vbar_stack(driving_states,
-                 x='Hour', 
-                 width=0.85, 
-                 source=source,
-                 color=Dark2[3][:len(driving_states)],
-                 legend=[value(x) for x in driving_states])
-    
-    p.xaxis.axis_label = 'Hour of day'
-    p.yaxis.axis_label = 'Vehicle miles traveled'
-    p.yaxis[0].formatter = NumeralTickFormatter(format="0.0a")
-    p.legend.location = "top_left"
-    p.legend.orientation = "vertical"
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/congestion_on_demand_vmt_by_phases.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/congestion_on_demand_vmt_by_phases.png".format(sub_key))
-
-    return p
-
-def plot_congestion_travel_speed(source, sub_key=1, savefig='None'):
-
-    edges = [6, 8, 10, 12, 14, 16, 18, 20, 22, 24]
-    bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
-
-    p = figure(x_range=bins, y_range=(0, 15),
-               plot_height=350, plot_width=700,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Average travel speed per passenger trip per mode"
-                   " by hours of the day", text_font_style="normal"), 'above')
-    p.add_layout(Title(text="Average travel speed", text_font_size="14pt"), 'above')
-
-    nbins = len(MODES)
-    total_width = 0.85
-    bin_width = total_width / nbins
-    bin_loc = -total_width / 2 + bin_width / 2
-    palette = Dark2[nbins]
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
-
-    for i, mode_i in enumerate(MODES):
-        p.vbar(x=dodge('Start time interval (hour)', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source,
-               color=palette[i], legend=value(mode_i))
-        bin_loc += bin_width
-
-    p.xaxis.axis_label = 'Start time interval (hour of day)'
-    p.yaxis.axis_label = 'Average speed (miles per hour)'
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/congestion_travel_speed.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/congestion_travel_speed.png".format(sub_key))
-
-    return p
-
-def plot_los_travel_expenditure(source, sub_key=1, savefig='None'):
-
-    p = figure(x_range=HOURS, y_range=(0, 25.0),
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Average agent’s travel expenditure per trip (per mode "
-                   "and by hour of the day)", text_font_style="normal"), 'above')
-    p.add_layout(Title(text="Travel Expenditure", text_font_size="14pt"), 'above')
-
-    spend_modes = set(['walk_transit', 'drive_transit', 'car', 'ride_hail'])
-    nbins = len(spend_modes)
-    total_width = 0.85
-    bin_width = total_width / nbins
-    bin_loc = -total_width / 2 + bin_width / 2
-    palette = Dark2[len(MODES)]
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
-
-    for i, mode_i in enumerate(MODES):
-        if mode_i in spend_modes:
-            p.vbar(x=dodge('hour_of_day', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source,
-                   color=palette[i], legend=value(mode_i))
-            bin_loc += bin_width
-
-    p.xaxis.axis_label = 'Hour of day'
-    p.yaxis.axis_label = 'Average cost [$]'
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/los_travel_expenditure.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/los_travel_expenditure.png".format(sub_key))
-
-    return p
-
-def plot_los_crowding(source, sub_key=1, savefig='None', route_ids=[]):
-
-    # AM peak = 7am-10am, PM Peak = 5pm-8pm, Early Morning, Midday, Late Evening = in between
-    labels = ["Early Morning (12a-7a)", "AM Peak (7a-10a)", "Midday (10a-5p)", "PM Peak (5p-8p)", "Late Evening (8p-12a)"]
-    p = figure(x_range=route_ids, y_range=(0, 10),
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Average Hours of Bus crowding per bus route"
-                   " (by period of the day)", text_font_style="normal"), 'above')
-    p.add_layout(Title(text="Bus Crowding", text_font_size="14pt"), 'above')
-
-    nbins = len(labels)
-    total_width = 0.85
-    bin_width = total_width / nbins
-    bin_loc = -total_width / 2 + bin_width / 2
-    palette = Dark2[nbins]
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Service Period')
-
-    for i, label_i in enumerate(labels):
-        p.vbar(x=dodge('route_id', bin_loc, range=p.x_range), top=label_i, width=bin_width-0.04, source=source,
-               color=palette[i], legend=value(label_i))
-        bin_loc += bin_width
-
-    p.xaxis.axis_label = 'Bus route'
-    p.yaxis.axis_label = 'Hours of bus crowding'
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/los_crowding.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/los_crowding.png".format(sub_key))
-
-    return p
-
-def plot_transit_cb(costs_source, benefits_source, sub_key=1, savefig='None', route_ids=[]):
-
-    costs_labels = ["OperationalCosts", "fuelCost"]
-    benefits_label = ["Fare"]
-    p = figure(x_range=route_ids, y_range=(-2.5e6, 2.5e6),
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Distribution of costs and benefits of Mass Transit Agencies "
-                   "by bus route", text_font_style="normal"), 'above')
-    p.add_layout(Title(text="Transit costs and benefits", text_font_size="14pt"), 'above')
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Costs and Benefits')
-
-    p.vbar_stack(benefits_label,
-                 x='route_id',
-                 width=0.85,
-                 source=benefits_source,
-                 color=Dark2[3][2],
-                 legend=value("Fare"))
-
-    p.vbar_stack(costs_labels,
-                 x='route_id',
-                 width=0.85,
-                 source=costs_source,
-                 color=Dark2[3][:2],
-                 legend=[value(x) for x in costs_labels])
-    
-    p.xaxis.axis_label = 'Bus route'
-    p.yaxis.axis_label = 'Amount [$]'
-    p.yaxis[0].formatter = NumeralTickFormatter(format="$0a")
-    p.legend.orientation = "vertical"
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/transit_cb.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/transit_cb.png".format(sub_key))
-
-    return p
-
-def plot_transit_inc_by_mode(source, sub_key=1, savefig='None'):
-
-    p = figure(x_range=HOURS, #y_range=(0, 35000),
-               plot_height=350, plot_width=600,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(
-        Title(text="Total incentives distributed per mode by hours of "
-                   "the day", text_font_style="normal"), 'above')
-    p.add_layout(Title(text="Mode Incentives", text_font_size="14pt"), 'above')
-
-
-    ride_modes = set(['walk_transit', 'drive_transit', 'ride_hail'])
-    nbins = len(ride_modes)
-    total_width = 0.85
-    bin_width = total_width / nbins
-    bin_loc = -total_width / 2 + bin_width / 2
-    palette = Dark2[len(MODES)]
-
-    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
-
-    for i, mode_i in enumerate(MODES):
-        if mode_i in ride_modes:
-            p.vbar(x=dodge('hour_of_day', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source,
-                   color=palette[i], legend=value(mode_i))
-            bin_loc += bin_width
-
-    p.xaxis.axis_label = 'Hour of day'
-    p.yaxis.axis_label = 'Incentives distributed [$]'
-    p.yaxis[0].formatter = NumeralTickFormatter(format="$0a")
-    p.legend.label_text_font_size = '8pt'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    new_legend = p.legend[0]
-    p.legend[0].plot = None
-    p.add_layout(new_legend, 'right')
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/transit_inc_by_mode.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/transit_inc_by_mode.png".format(sub_key))
-
-    return p
-
-
-def plot_toll_revenue_by_time(source, sub_key=1, savefig='None'):
-    p = figure(x_range=HOURS, y_range=(0,40000), plot_height=350,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Toll Revenue per hour", text_font_size="14pt"), 'above')
-
-    p.vbar(x='Hour', top='Toll', source=source, width=0.85)
-
-    p.xaxis.axis_label = 'Hour'
-    p.yaxis.axis_label = 'Toll Revenue [$]'
-    p.xaxis.major_label_orientation = math.pi / 6
-
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/toll_revenue_by_time.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/toll_revenue_by_time.png".format(sub_key))
-
-    return p
-
-def plot_sustainability_25pm_per_mode(source, sub_key=1, savefig='None'):
- 
-    modes = ['ride_hail', 'car', 'bus']
-    p = figure(x_range=modes, y_range=(0, 140),
-               plot_height=350,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Daily PM2.5 emissions per mode", text_font_size="14pt"), 'above')
-
-    p.vbar(x='modes', top='emissions', color='color', source=source, width=0.8)
-    
-    p.xaxis.axis_label = 'Mode'
-    p.yaxis.axis_label = 'Emissions [g]'
-    p.xaxis.major_label_orientation = math.pi / 6
-    
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/sustainability_25pm_per_mode.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/sustainability_25pm_per_mode.png".format(sub_key))
-
-    return p
-
-def plot_sustainability_ghg_per_mode(source, sub_key=1, savefig='None'):
-    modes = ['ride_hail', 'car', 'bus']
-    p = figure(x_range=modes, y_range=(0, 35000000),
-               plot_height=350,
-               toolbar_location=None, tools="")
-    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
-    p.add_layout(Title(text="Daily CO2 emissions per mode", text_font_size="14pt"), 'above')
-
-    p.vbar(x='modes', top='emissions', color='color', source=source, width=0.8)
-    
-    p.xaxis.axis_label = 'Mode'
-    p.yaxis.axis_label = 'CO2 [g]'
-    p.xaxis.major_label_orientation = math.pi / 6
-    
-    if savefig == 'svg':
-      p.output_backend = "svg"
-      export_svgs(p, filename="figures/{}/outputs/sustainability_ghg_per_mode.svg".format(sub_key))
-    elif savefig == 'png':
-      export_png(p, filename="figures/{}/outputs/sustainability_ghg_per_mode.png".format(sub_key))
-
-    return p
+from leaderboard import ALL, Leaderboard
 
 
 def find_submissions():
@@ -1088,25 +65,39 @@ def find_submissions():
     return submission_dirs
 
 
-def create_dir_tree(sub_key):
-    
-    try:
-        makedirs("figures/{}".format(sub_key))
-    except OSError:
-        pass
-
-    try:
-        makedirs("figures/{}/inputs".format(sub_key))
-    except OSError:
-        pass
-
-    try:
-        makedirs("figures/{}/outputs".format(sub_key))
-    except OSError:
-        pass
-
 title_div = Div(text="""<link href="https://fonts.googleapis.com/css?family=Kaushan+Script" rel="stylesheet" type="text/css"><font style='color:#fdb515ff; font-family:"Kaushan Script"'>BISTRO</font><b> Visualization Dashboard</b>""", width=800, height=10, style={'font-size': '200%'})
 
+### Diagnostics ###
+# BISTRO_DIAGNOSTICS=1 times every load_* and make_* call and shows the
+# Diagnostics tab, BISTRO_DIAGNOSTICS=memory also traces their memory
+DIAGNOSTICS = environ.get('BISTRO_DIAGNOSTICS', '')
+if DIAGNOSTICS:
+    profiling.instrument(Submission)
+    profiling.instrument(BistroDB)
+    profiling.enable(memory=DIAGNOSTICS == 'memory')
+###################
+
+# BISTRO_PUSHDOWN=1 aggregates the VMT, travel speed and toll revenue
+# products in the database, and only loads the legs, paths and trips of a
+# simulation when another product needs them: the products of the raw
+# tables are only made once a tab showing them is selected
+PUSHDOWN = bool(environ.get('BISTRO_PUSHDOWN', ''))
+
+# BISTRO_PROGRESSIVE=1 first shows a selected submission with estimates of
+# its products made from a sample of its trips, legs and paths
+# (submission.SAMPLED_PRODUCTS), then replaces them with the exact products
+# made in the background. BISTRO_SAMPLE_FRACTION and BISTRO_SAMPLE_SEED
+# change the sample of every product, and BISTRO_SAMPLES is a YAML file of
+# the fraction and seed of some products, keyed by product name.
+PROGRESSIVE = bool(environ.get('BISTRO_PROGRESSIVE', ''))
+sample_settings = None
+if environ.get('BISTRO_SAMPLES'):
+    with open(environ['BISTRO_SAMPLES']) as f:
+        sample_settings = yaml.safe_load(f)
+progressive_samples = product_samples(
+    environ.get('BISTRO_SAMPLE_FRACTION'), environ.get('BISTRO_SAMPLE_SEED'),
+    sample_settings)
+
 ### Instantiate all submission objects and generate data sources ###
 # try:
 #     submission_dirs = pd.read_csv(join(dirname(__file__), 'submission_files_override.csv'))
@@ -1129,7 +120,8 @@ for _, simulation in simulations.iterrows():
     submission_name = tag + '(' + name + ')' if tag is not None else name
     submissions.append(scenario + '/' +submission_name)
     submission = Submission(
-        name=submission_name, scenario=scenario, simulation_ids=[simulation_id])
+        name=submission_name, scenario=scenario, simulation_ids=[simulation_id],
+        pushdown=PUSHDOWN)
 
     summary_name = name+'_average'
     if summary_name not in submission_summary:
@@ -1181,10 +173,6 @@ if 'S0' in submission_dict.keys():
 else:
     scenario_key = sorted(list(submission_dict.keys()))[0]
 
-CATEGORIES = submission_dict[scenario_key]['categories']
-CASESTUDY_CAT = yaml.safe_load(
-    open(join(dirname(__file__), 'casestudy_kpis.yaml')))
-
 if 'warm-start' in submission_dict[scenario_key]['submissions']:
     submission1_key = 'warm-start'
 else:
@@ -1208,184 +196,258 @@ for sub_order, submission_key in \
         [('submission1', submission1_key), ('submission2', submission2_key)]:
     submission = submission_dict[scenario_key]['submissions'][submission_key]
     submission.get_data()
-    submission.make_data_sources()
-    for source_name, data_name in SOURCE_NAME_DATA_PAIR:
-        submission_sources[sub_order][source_name] = ColumnDataSource(
-            data=getattr(submission, data_name))
+    if PUSHDOWN:
+        # the sources of the products of the raw tables stay empty until
+        # their tab is selected
+        products = {
+            data_name: {} if submission.uses_raw_tables(data_name)
+            else submission.make_data_product(data_name)
+            for _, data_name in SOURCE_NAME_DATA_PAIR}
+    else:
+        submission.make_data_sources()
+        products = submission
+    # link sources are filled with the links of the current viewport once
+    # the map exists
+    submission_sources[sub_order] = make_sources(products)
 ###################################################
 
 ### Generate plots from ColumnDataSource's ###
 plots = {'submission1': {}, 'submission2': {}}
 for sub_order, sub_key in \
         [('submission1',submission1_key), ('submission2',submission2_key)]:
-    sources = submission_sources[sub_order]
     submission = submission_dict[scenario_key]['submissions'][sub_key]
-    plots[sub_order]['normalized_scores'] = plot_normalized_scores(
-        source=sources['normalized_scores_source'], sub_key=sub_key)
-    plots[sub_order]['casestudy_scores'] = plot_casestudy_scores(
-        source=sources['normalized_scores_source'], sub_key=sub_key)
-    plots[sub_order]['fleetmix_input'] = plot_fleetmix_input(
-        source=sources['fleetmix_input_source'], sub_key=sub_key,
-        route_ids=submission.route_ids)
-    plots[sub_order]['routesched_input'] = plot_routesched_input(
-        line_source=sources['routesched_input_line_source'],
-        start_source=sources['routesched_input_start_source'],
-        end_source=sources['routesched_input_end_source'],
-        sub_key=sub_key)
-    plots[sub_order]['fares_input'] = plot_fares_input(
-        source=sources['fares_input_source'], sub_key=sub_key,
-        route_ids=submission.route_ids)
-    plots[sub_order]['modeinc_input'] = plot_modeinc_input(
-        source=sources['modeinc_input_source'], sub_key=sub_key)
-    plots[sub_order]['toll_circle'] = plot_toll_circle(
-        link_source=sources['link_source'],
-        circle_source=sources['toll_circle_source'],  sub_key=sub_key)
-    plots[sub_order]['mode_planned_pie_chart'] = plot_mode_pie_chart(
-        source=sources['mode_planned_pie_chart_source'],
-        choice_type='planned', sub_key=sub_key)
-    plots[sub_order]['mode_realized_pie_chart'] = plot_mode_pie_chart(
-        source=sources['mode_realized_pie_chart_source'],
-        choice_type='realized', sub_key=sub_key)
-    plots[sub_order]['mode_choice_by_time'] = plot_mode_choice_by_time(
-        source=sources['mode_choice_by_time_source'], sub_key=sub_key)
-    plots[sub_order]['mode_choice_by_income_group'] = \
-        plot_mode_choice_by_income_group(
-            source=sources['mode_choice_by_income_group_source'],
-            sub_key=sub_key)
-    plots[sub_order]['mode_choice_by_age_group'] = \
-        plot_mode_choice_by_age_group(
-            source=sources['mode_choice_by_age_group_source'],
-            sub_key=sub_key)
-    plots[sub_order]['mode_choice_by_distance'] = \
-        plot_mode_choice_by_distance(
-            source=sources['mode_choice_by_distance_source'],
-            sub_key=sub_key)
-    plots[sub_order]['congestion_travel_time_by_mode'] = \
-        plot_congestion_travel_time_by_mode(
-            source=sources['congestion_travel_time_by_mode_source'],
-            sub_key=sub_key)
-    plots[sub_order]['congestion_travel_time_per_passenger_trip'] = \
-        plot_congestion_travel_time_per_passenger_trip(
-            source=sources['congestion_travel_time_per_passenger_trip_source'],
-            sub_key=sub_key)
-    plots[sub_order]['congestion_miles_traveled_per_mode'] = \
-        plot_congestion_miles_traveled_per_mode(
-            source=sources['congestion_miles_traveled_per_mode_source'],
-            sub_key=sub_key)
-    plots[sub_order]['congestion_car_vmt_by_time'] = \
-        plot_congestion_car_vmt_by_time(
-            source=sources['congestion_car_vmt_by_time_source'],
-            sub_key=sub_key)
-    plots[sub_order]['congestion_bus_vmt_by_ridership'] = \
-        plot_congestion_bus_vmt_by_ridership(
-            source=sources['congestion_bus_vmt_by_ridership_source'],
-            sub_key=sub_key)
-    plots[sub_order]['congestion_on_demand_vmt_by_phases'] = \
-        plot_congestion_on_demand_vmt_by_phases(
-            source=sources['congestion_on_demand_vmt_by_phases_source'],
-            sub_key=sub_key)
-    plots[sub_order]['congestion_travel_speed'] = \
-        plot_congestion_travel_speed(
-            source=sources['congestion_travel_speed_source'], sub_key=sub_key)
-    plots[sub_order]['los_travel_expenditure'] = \
-        plot_los_travel_expenditure(
-            source=sources['los_travel_expenditure_source'],
-            sub_key=sub_key)
-    plots[sub_order]['los_crowding'] = plot_los_crowding(
-        source=sources['los_crowding_source'], sub_key=sub_key,
-        route_ids=submission.route_ids)
-    plots[sub_order]['transit_cb'] = plot_transit_cb(
-        costs_source=sources['transit_cb_costs_source'],
-        benefits_source=sources['transit_cb_benefits_source'], sub_key=sub_key,
-        route_ids=submission.route_ids)
-    plots[sub_order]['transit_inc_by_mode'] = plot_transit_inc_by_mode(
-        source=sources['transit_inc_by_mode_source'], sub_key=sub_key)
-    plots[sub_order]['toll_revenue_by_time'] = plot_toll_revenue_by_time(
-        source=sources['toll_revenue_by_time_source'], sub_key=sub_key)
-    plots[sub_order]['sustainability_25pm_per_mode'] = \
-        plot_sustainability_25pm_per_mode(
-            source=sources['sustainability_25pm_per_mode_source'],
-            sub_key=sub_key)
-    plots[sub_order]['sustainability_ghg_per_mode'] = \
-        plot_sustainability_ghg_per_mode(
-            source=sources['sustainability_ghg_per_mode_source'],
-            sub_key=sub_key)
+    plots[sub_order] = make_submission_plots(
+        submission_sources[sub_order], sub_key, submission.route_ids)
 ##############################################
 
-### Gather plot objects into lists ###
+### Products made when the tab showing them is selected (BISTRO_PUSHDOWN) ###
+# data names of the sources of each submission not filled yet
+pending_products = {
+    sub_order: set(data_name for source_name, data_name in SOURCE_NAME_DATA_PAIR
+                   if not submission_sources[sub_order][source_name].data)
+    for sub_order in plots}
+
+
+def glyph_columns(plots, source):
+    # the columns of the glyphs drawn from source
+    columns = set()
+    for p in plots.values():
+        for renderer in p.select({'type': GlyphRenderer}):
+            if renderer.data_source is not source:
+                continue
+            for spec in renderer.glyph.properties_with_values().values():
+                if isinstance(spec, dict) and 'field' in spec:
+                    columns.add(spec['field'])
+    return columns
+
+
+# empty sources get the columns of their glyphs, so that the document is
+# valid before their products are made
+for sub_order, data_names in pending_products.items():
+    for source_name, data_name in SOURCE_NAME_DATA_PAIR:
+        if data_name in data_names:
+            source = submission_sources[sub_order][source_name]
+            source.data = {column: [] for column in
+                           glyph_columns(plots[sub_order], source)}
 
-submission_inputs_plots = [
-    'fleetmix_input',
-    'routesched_input',
-    'fares_input',
-    'modeinc_input'
-]
-submission_scores_plots = ['normalized_scores', 'casestudy_scores']
-submission_outputs_mode_plots = [
-    'mode_planned_pie_chart',
-    'mode_realized_pie_chart',
-    'mode_choice_by_time',
-    'mode_choice_by_income_group',
-    'mode_choice_by_age_group',
-    'mode_choice_by_distance'
-]
-submission_outputs_congestion_plots = [
-    'congestion_travel_time_by_mode',
-    'congestion_travel_time_per_passenger_trip',
-    'congestion_miles_traveled_per_mode',
-    'congestion_car_vmt_by_time',
-    'congestion_bus_vmt_by_ridership',
-    'congestion_on_demand_vmt_by_phases',
-    'congestion_travel_speed'
-]
-submission_outputs_los_plots = [
-    'los_travel_expenditure',
-    'los_crowding'
-]
-submission_outputs_transitcb_plots = [
-    'transit_cb',
-    'transit_inc_by_mode'
-]
-submission_outputs_toll_plots = [
-    'toll_revenue_by_time',
-    'toll_circle'
-]
-submission_outputs_sustainability_plots = [
-'sustainability_25pm_per_mode',
-'sustainability_ghg_per_mode'
-]
 
-######################################
+def make_tab_products(sub_order):
+    # fill the sources of the selected tab left empty by a pushdown load
+    used = set(source.id for source in
+               tabs.tabs[tabs.active].select({'type': ColumnDataSource}))
+    submission = current_submissions[sub_order]
+    for source_name, data_name in SOURCE_NAME_DATA_PAIR:
+        source = submission_sources[sub_order][source_name]
+        if data_name in pending_products[sub_order] and source.id in used:
+            update_source(source, submission.make_data_product(data_name))
+            pending_products[sub_order].discard(data_name)
+############################################################################
+
 sub_orders = ['submission1','submission2']
-# 
-# the code below is equivalent to:
-# row(column([plots['submission1'][p1], plots['submission1'][p2]], ...),
-#     column([plots['submission2'][p1], ...])
-#     ...)
-inputs_plots = row(
-    *[column([plots[sub_order][p] for p in submission_inputs_plots])
-    for sub_order in sub_orders])
-scores_plots = column(
-    *[column([plots[sub_order][p] for sub_order in sub_orders])
-    for p in submission_scores_plots])
-outputs_mode_plots = row(
-    *[column([plots[sub_order][p] for p in submission_outputs_mode_plots])
-    for sub_order in sub_orders])
-outputs_los_plots = row(
-    *[column([plots[sub_order][p] for p in submission_outputs_los_plots])
-    for sub_order in sub_orders])
-outputs_congestion_plots = row(
-    *[column([plots[sub_order][p] for p in submission_outputs_congestion_plots])
-    for sub_order in sub_orders])
-outputs_transitcb_plots = row(
-    *[column([plots[sub_order][p] for p in submission_outputs_transitcb_plots])
-    for sub_order in sub_orders])
-outputs_toll_plots = row(
-    *[column([plots[sub_order][p] for p in submission_outputs_toll_plots])
-    for sub_order in sub_orders])
-outputs_sustainability_plots = row(
-    *[column([plots[sub_order][p] for p in submission_outputs_sustainability_plots])
-    for sub_order in sub_orders])
+tab_layouts = make_tab_layouts(plots, sub_orders)
+
+### Convergence tab: both submissions share the same figures ###
+current_keys = {'submission1': submission1_key, 'submission2': submission2_key}
+current_submissions = {
+    sub_order: submission_dict[scenario_key]['submissions'][sub_key]
+    for sub_order, sub_key in current_keys.items()}
+convergence_kpis = sorted(
+    set(current_submissions['submission1'].iteration_history.kpis) |
+    set(current_submissions['submission2'].iteration_history.kpis))
+convergence_kpi = 'modeChoice: car' if 'modeChoice: car' in convergence_kpis \
+    else (convergence_kpis + [''])[0]
+convergence_sources = {
+    sub_order: ColumnDataSource(
+        data=current_submissions[sub_order].make_convergence_kpi_data(
+            convergence_kpi))
+    for sub_order in sub_orders}
+convergence_plot = plot_convergence(
+    convergence_sources, current_keys, convergence_kpi)
+convergence_summaries = {
+    sub_order: plot_convergence_summary(
+        submission_sources[sub_order]['convergence_summary_source'], sub_key)
+    for sub_order, sub_key in current_keys.items()}
+convergence_select = Select(value=convergence_kpi, title='KPI',
+                            options=convergence_kpis)
+
+
+def update_convergence_kpi(attrname, old, new):
+    # Only the line data of the selected KPI is sent to the browser
+    for sub_order in sub_orders:
+        update_source(
+            convergence_sources[sub_order],
+            current_submissions[sub_order].make_convergence_kpi_data(new))
+    convergence_plot.children[0].yaxis.axis_label = new
+
+
+convergence_select.on_change('value', update_convergence_kpi)
+##################################################################
+
+### Parking overhead difference between the two submissions ###
+parking_delta_source = ColumnDataSource(
+    data=current_submissions['submission1'].make_parking_overhead_delta_data(
+        current_submissions['submission2']))
+parking_delta_plot = plot_parking_overhead_delta(
+    parking_delta_source, current_keys)
+parking_delta_note = Div(
+    text='<i>No parking statistics were stored for the selected '
+         'submissions.</i>', width=1200)
+parking_delta_panel = column(parking_delta_plot)
+
+
+def show_parking_delta():
+    # the difference is left out when neither submission has parking stats
+    if any(submission.parking_df is not None
+           for submission in current_submissions.values()):
+        parking_delta_panel.children = [parking_delta_plot]
+    else:
+        parking_delta_panel.children = [parking_delta_note]
+
+
+show_parking_delta()
+###############################################################
+
+runtime_profile_plot = plot_runtime_profile(
+    {sub_order: submission_sources[sub_order]['runtime_profile_source']
+     for sub_order in sub_orders},
+    current_keys)
+runtime_profile_note = Div(
+    text='<i>No stopwatch timings were stored for the selected '
+         'submissions.</i>', width=1200)
+runtime_profile_panel = column(runtime_profile_plot)
+
+
+def show_runtime_profile():
+    # the profile is left out when neither submission has timings
+    if any(submission.stage_runtimes
+           for submission in current_submissions.values()):
+        runtime_profile_panel.children = [runtime_profile_plot]
+    else:
+        runtime_profile_panel.children = [runtime_profile_note]
+
+
+show_runtime_profile()
+
+### N-way comparison: one KPI across any number of submissions ###
+def comparison_submissions(sub_keys, kpi):
+    # Submissions keep their data products once computed, so each selected
+    # submission is loaded once and shared with the side by side panels.
+    # Only the product of the KPI is made.
+    selected = OrderedDict()
+    for sub_key in sub_keys:
+        scenario, name = sub_key.split('/')
+        submission = submission_dict[scenario]['submissions'][name]
+        submission.get_data()
+        submission.make_data_product(COMPARISON_KPIS[kpi][0])
+        selected[sub_key] = submission
+    return selected
+
+
+comparison_select = MultiSelect(
+    title='Submissions', options=submissions, size=10,
+    value=['{}/{}'.format(scenario_key, sub_key)
+           for sub_key in (submission1_key, submission2_key)])
+comparison_kpi_select = Select(title='KPI', value=list(COMPARISON_KPIS)[0],
+                               options=list(COMPARISON_KPIS))
+# series options and values are filled by refresh_comparison
+comparison_series_select = Select(title='Series', value='', options=[])
+comparison_mode = RadioButtonGroup(labels=['Overlay', 'Facets'], active=0)
+comparison_source = ColumnDataSource(
+    data=dict(x=[], submission=[], factor=[], value=[]))
+comparison_panel = column([])
+
+
+def refresh_comparison():
+    kpi = comparison_kpi_select.value
+    selected = comparison_submissions(comparison_select.value, kpi)
+    options = comparison_series(kpi, selected.values())
+    series = comparison_series_select.value if \
+        comparison_series_select.value in options else (options + [''])[0]
+    comparison_series_select.options = options
+    if comparison_series_select.value != series:
+        # refreshed again by the series callback
+        comparison_series_select.value = series
+        return
+
+    data, categories = make_comparison_data(kpi, series, selected)
+    update_source(comparison_source, data)
+    comparison_panel.children = [plot_comparison(
+        comparison_source, categories, list(selected), kpi, series,
+        facet=comparison_mode.active == 1)]
+
+
+for widget in (comparison_select, comparison_kpi_select,
+               comparison_series_select):
+    widget.on_change('value', lambda attrname, old, new: refresh_comparison())
+comparison_mode.on_change('active',
+                          lambda attrname, old, new: refresh_comparison())
+refresh_comparison()
+####################################################################
+
+### Links of the toll circle maps, rendered for the current viewport ###
+LINK_RENDER_DELAY_MS = 200
+link_rasterizers = {
+    sub_order: LinkRasterizer(Submission.load_link_index(
+        current_submissions[sub_order].scenario,
+        current_submissions[sub_order].make_data_product('link_data')))
+    for sub_order in sub_orders}
+pending_link_renders = {}
+
+
+def render_links(sub_order):
+    p = plots[sub_order]['toll_circle']
+    link_data, image_data = link_rasterizers[sub_order].render(
+        (p.x_range.start, p.x_range.end), (p.y_range.start, p.y_range.end),
+        p.plot_width, p.plot_height)
+    update_source(submission_sources[sub_order]['link_source'], link_data)
+    update_source(submission_sources[sub_order]['link_raster_source'],
+                  image_data)
+
+
+def schedule_link_render(sub_order):
+    # Pans and zooms fire many range changes: only render once they stop
+
+    def render_pending():
+        pending_link_renders.pop(sub_order, None)
+        render_links(sub_order)
+
+    def on_range_change(attrname, old, new):
+        pending = pending_link_renders.pop(sub_order, None)
+        if pending is not None:
+            curdoc().remove_timeout_callback(pending)
+        pending_link_renders[sub_order] = curdoc().add_timeout_callback(
+            render_pending, LINK_RENDER_DELAY_MS)
+
+    return on_range_change
+
+
+for sub_order in sub_orders:
+    render_links(sub_order)
+    p = plots[sub_order]['toll_circle']
+    for axis_range in (p.x_range, p.y_range):
+        axis_range.on_change('start', schedule_link_render(sub_order))
+        axis_range.on_change('end', schedule_link_render(sub_order))
+########################################################################
 
 submission1_select = Select(value='{}/{}'.format(scenario_key, submission1_key),
                      title='Submission 1', 
@@ -1397,9 +459,58 @@ submission2_select = Select(value='{}/{}'.format(scenario_key, submission2_key),
 pulldowns = row(submission1_select, submission2_select)
 
 
+def label_plots(sub_order, submission_key, estimated=()):
+    # the plots are labelled with the submission key, and the sample
+    # fraction of the estimated products of a progressive render
+    for plot_name, p in plots[sub_order].items():
+        label = submission_key
+        for data_name in estimated:
+            if data_name.startswith(plot_name + '_'):
+                label = '{} (estimate from a {:.0%} sample)'.format(
+                    submission_key, progressive_samples[data_name].fraction)
+        if plot_name == 'fares_input':
+            p.children[0].below[1].text = label
+        elif plot_name == 'modeinc_input':
+            p.children[0].children[0].below[1].text = label
+            p.children[0].children[1].below[1].text = label
+        else:
+            p.below[1].text = label
+
+
+def update_data_sources(sub_order, products):
+    # only the content that differs from the previous submission is sent
+    for source_name, data_name in SOURCE_NAME_DATA_PAIR:
+        if data_name in products:
+            update_source(submission_sources[sub_order][source_name],
+                          products[data_name])
+
+
+def refine_estimates(sub_order, submission, submission_key):
+    # replace the estimates of a progressive render with the exact products,
+    # made apart from the submission in a background thread, and set on the
+    # submission and sent on the next tick of the document
+    doc = curdoc()
+
+    def show_exact_products(products):
+        if not submission.data_source_made:
+            vars(submission).update(products)
+        if current_submissions[sub_order] is not submission:
+            return
+        update_data_sources(sub_order, products)
+        label_plots(sub_order, submission_key)
+
+    def make_exact_products():
+        products = submission.make_products_apart()
+        doc.add_next_tick_callback(partial(show_exact_products, products))
+
+    thread = threading.Thread(target=make_exact_products)
+    thread.daemon = True
+    thread.start()
+
+
 def update_submission(submission_sources, sub_order):
 
-    def update_sub_order(attrname, old, new):
+    def switch_sub_order(attrname, old, new):
         # This function updates the data source for plots whenever people select
         # a different submission from the dropdown
         scenario_key, submission_key = new.split('/')
@@ -1411,22 +522,73 @@ def update_submission(submission_sources, sub_order):
 
         submission = submission_dict[scenario_key]['submissions'][submission_key]
         submission.get_data()
-        submission.make_data_sources()
-        for source_name, data_name in SOURCE_NAME_DATA_PAIR:
-            submission_sources[sub_order][source_name].data = \
-                getattr(submission, data_name)
+        lazy = []
+        if PUSHDOWN:
+            # products of the raw tables not made yet wait for their tab
+            lazy = [data_name for _, data_name in SOURCE_NAME_DATA_PAIR
+                    if submission.uses_raw_tables(data_name) and
+                    data_name not in vars(submission)]
+            products = {data_name: submission.make_data_product(data_name)
+                        for _, data_name in SOURCE_NAME_DATA_PAIR
+                        if data_name not in lazy}
+            products['link_data'] = submission.make_data_product('link_data')
+            estimated = []
+        elif PROGRESSIVE and not submission.data_source_made:
+            products = submission.make_estimated_data_sources(
+                progressive_samples)
+            estimated = list(progressive_samples)
+            # the products without estimate are empty until the exact ones
+            for source_name, data_name in SOURCE_NAME_DATA_PAIR:
+                if data_name in UNSAMPLED_PRODUCTS:
+                    products[data_name] = {
+                        column: [] for column in
+                        submission_sources[sub_order][source_name].data}
+        else:
+            submission.make_data_sources()
+            products = {data_name: getattr(submission, data_name)
+                        for _, data_name in SOURCE_NAME_DATA_PAIR}
+            products['link_data'] = submission.link_data
+            estimated = []
+        update_data_sources(sub_order, products)
+        pending_products[sub_order] = set(lazy)
+
+        current_submissions[sub_order] = submission
+        current_keys[sub_order] = submission_key
+        link_rasterizers[sub_order] = LinkRasterizer(
+            Submission.load_link_index(submission.scenario,
+                                       products['link_data']))
+        render_links(sub_order)
+        update_source(
+            convergence_sources[sub_order],
+            submission.make_convergence_kpi_data(convergence_select.value))
+        convergence_select.options = sorted(
+            set(current_submissions['submission1'].iteration_history.kpis) |
+            set(current_submissions['submission2'].iteration_history.kpis))
+        convergence_summaries[sub_order].select_one({'type': Div}).text = \
+            '<b>{}</b>'.format(submission_key)
+        item = sub_orders.index(sub_order)
+        for p in convergence_plot.children:
+            p.legend[0].items[item].label = value(submission_key)
+
+        runtime_profile_plot.legend[0].items[item + 1].label = \
+            value(submission_key)
+        show_runtime_profile()
+
+        update_source(
+            parking_delta_source,
+            current_submissions['submission1'].make_parking_overhead_delta_data(
+                current_submissions['submission2']))
+        parking_delta_plot.above[0].text = (
+            "Daily inbound parking overhead time per TAZ, {} minus {}".format(
+                current_keys['submission2'], current_keys['submission1']))
+        show_parking_delta()
+
+        if estimated:
+            refine_estimates(sub_order, submission, submission_key)
 
         # change the title of plot based on different layout
-        for plot_name in plots[sub_order].keys():
-            if plot_name == 'fares_input':
-                plots[sub_order][plot_name].children[0].below[1].text = submission_key
-            elif plot_name == 'modeinc_input':
-                plots[sub_order][plot_name].children[0].children[0]\
-                    .below[1].text = submission_key
-                plots[sub_order][plot_name].children[0].children[1]\
-                    .below[1].text = submission_key
-            else:
-                plots[sub_order][plot_name].below[1].text = submission_key
+        label_plots(sub_order, submission_key, estimated)
+        make_tab_products(sub_order)
         #    save_png(plots[sub_order][plot_name], submission_key, plot_name)
         #print("finish")
         ########################################################################
@@ -1434,6 +596,12 @@ def update_submission(submission_sources, sub_order):
         ########################################################################
 
 
+    def update_sub_order(attrname, old, new):
+        if DIAGNOSTICS:
+            profiled_switch(switch_sub_order, attrname, old, new)
+        else:
+            switch_sub_order(attrname, old, new)
+
     return update_sub_order
 
 
@@ -1445,14 +613,130 @@ submission1_select.on_change(
 submission2_select.on_change(
     'value', update_submission(submission_sources, 'submission2'))
 
-inputs = layout([inputs_plots], sizing_mode='fixed')
-scores = layout([[scores_plots]], sizing_mode='fixed')
-outputs_mode = layout([outputs_mode_plots], sizing_mode='fixed')
-outputs_los = layout([outputs_los_plots], sizing_mode='fixed')
-outputs_congestion = layout([outputs_congestion_plots], sizing_mode='fixed')
-outputs_transitcb = layout([outputs_transitcb_plots], sizing_mode='fixed')
-outputs_toll = layout([outputs_toll_plots], sizing_mode='fixed')
-outputs_sustainability = layout([outputs_sustainability_plots], sizing_mode='fixed')
+### Leaderboard of all the simulations, from their scores only ###
+leaderboard = Leaderboard(
+    simulations,
+    bistro_db.load_score_table(list(simulations['simulation_id'])))
+leaderboard_source = ColumnDataSource(data=leaderboard.make_data())
+leaderboard_table = plot_leaderboard(
+    leaderboard_source, leaderboard.fields, leaderboard.components)
+leaderboard_scenario_select = Select(title='Scenario', value=ALL,
+                                     options=leaderboard.scenarios)
+leaderboard_tag_select = Select(title='Tag', value=ALL,
+                                options=leaderboard.tags)
+leaderboard_target = RadioButtonGroup(
+    labels=['Load into Submission 1', 'Load into Submission 2',
+            'Add to Compare'], active=0)
+
+
+# what-if weights: moving a slider ranks all the runs again
+scoring = leaderboard.scoring
+group_weight_sliders = [
+    Slider(title=group, start=0, end=1, step=0.05, value=weight, width=250)
+    for group, weight in zip(scoring.groups, scoring.default_group_weights)]
+component_weight_sliders = [
+    Slider(title=component, start=0, end=3, step=0.1, value=weight,
+           width=250)
+    for component, weight in zip(scoring.components,
+                                 scoring.default_component_weights)]
+
+
+def filter_leaderboard(attrname, old, new):
+    leaderboard_source.selected.indices = []
+    update_source(leaderboard_source, leaderboard.make_data(
+        leaderboard_scenario_select.value, leaderboard_tag_select.value,
+        group_weights=[slider.value for slider in group_weight_sliders],
+        component_weights=[slider.value
+                           for slider in component_weight_sliders]))
+
+
+def load_from_leaderboard(attrname, old, new):
+    # a click on a row loads its submission where leaderboard_target says
+    if not new:
+        return
+    sub_key = leaderboard_source.data['submission'][new[0]]
+    if leaderboard_target.active == 2:
+        if sub_key not in comparison_select.value:
+            comparison_select.value = comparison_select.value + [sub_key]
+    else:
+        [submission1_select, submission2_select][
+            leaderboard_target.active].value = sub_key
+
+
+leaderboard_scenario_select.on_change('value', filter_leaderboard)
+leaderboard_tag_select.on_change('value', filter_leaderboard)
+for slider in group_weight_sliders + component_weight_sliders:
+    slider.on_change('value', filter_leaderboard)
+leaderboard_source.selected.on_change('indices', load_from_leaderboard)
+##################################################################
+
+### Diagnostics tab: time, rows and memory of each load_* and make_* ###
+diagnostics_source = ColumnDataSource(data=to_column_data(profiling.summary()))
+diagnostics_table = plot_diagnostics(diagnostics_source)
+diagnostics_status = Div(text='', width=600)
+diagnostics_refresh = Button(label='Refresh', width=100)
+diagnostics_dump = Button(label='Dump JSON', width=100)
+profile_switch = Toggle(label='Profile next switch', width=150)
+profile_engine = RadioButtonGroup(labels=profiling.profile_engines(),
+                                  active=0, width=200)
+
+
+def refresh_diagnostics():
+    update_source(diagnostics_source, to_column_data(profiling.summary()))
+
+
+def dump_diagnostics():
+    try:
+        makedirs('diagnostics')
+    except OSError:
+        pass
+    path = profiling.dump(join('diagnostics', 'profile-{}.json'.format(
+        time.strftime('%Y%m%d-%H%M%S'))))
+    diagnostics_status.text = 'Saved to {}'.format(path)
+
+
+def profiled_switch(switch, attrname, old, new):
+    # with 'Profile next switch' on, the switch runs under cProfile or
+    # pyinstrument and the profile is saved next to the JSON dumps
+    if not profile_switch.active:
+        switch(attrname, old, new)
+        refresh_diagnostics()
+        return
+
+    profile_switch.active = False
+    engine = profile_engine.labels[profile_engine.active]
+    try:
+        makedirs('diagnostics')
+    except OSError:
+        pass
+    path = join('diagnostics', 'switch-{}.{}'.format(
+        time.strftime('%Y%m%d-%H%M%S'),
+        'html' if engine == 'pyinstrument' else 'prof'))
+    with profiling.capture(path, engine=engine):
+        switch(attrname, old, new)
+    diagnostics_status.text = 'Profile of the switch to {} saved to {}' \
+        .format(new, path)
+    refresh_diagnostics()
+
+
+diagnostics_refresh.on_click(refresh_diagnostics)
+diagnostics_dump.on_click(dump_diagnostics)
+########################################################################
+
+inputs = layout([tab_layouts['inputs']], sizing_mode='fixed')
+scores = layout([[tab_layouts['scores']]], sizing_mode='fixed')
+outputs_mode = layout([tab_layouts['outputs_mode']], sizing_mode='fixed')
+outputs_los = layout([[tab_layouts['outputs_los']], [parking_delta_panel]],
+                     sizing_mode='fixed')
+outputs_congestion = layout([tab_layouts['outputs_congestion']], sizing_mode='fixed')
+outputs_transitcb = layout([tab_layouts['outputs_transitcb']], sizing_mode='fixed')
+outputs_toll = layout([tab_layouts['outputs_toll']], sizing_mode='fixed')
+outputs_sustainability = layout([tab_layouts['outputs_sustainability']], sizing_mode='fixed')
+outputs_convergence = layout(
+    [[convergence_select],
+     [convergence_plot],
+     [convergence_summaries[sub_order] for sub_order in sub_orders]],
+    sizing_mode='fixed')
 
 inputs_tab = Panel(child=inputs,title="Inputs")
 scores_tab = Panel(child=scores,title="Scores")
@@ -1462,6 +746,24 @@ outputs_congestion_tab = Panel(child=outputs_congestion,title="Outputs - Congest
 outputs_transitcb_tab = Panel(child=outputs_transitcb,title="Outputs - Cost/Benefit")
 outputs_toll_tab = Panel(child=outputs_toll,title='Outputs - Toll Revenue')
 outputs_sustainability_tab = Panel(child=outputs_sustainability,title="Outputs - Sustainability")
+outputs_convergence_tab = Panel(child=outputs_convergence,title="Outputs - Convergence")
+runtime_tab = Panel(child=layout([[runtime_profile_panel]], sizing_mode='fixed'),
+                    title="Simulation Runtime")
+leaderboard_tab = Panel(
+    child=layout([[leaderboard_scenario_select, leaderboard_tag_select,
+                   leaderboard_target],
+                  [Div(text='<b>What-if weights</b>', width=1200)],
+                  group_weight_sliders] +
+                 [component_weight_sliders[i:i + 4]
+                  for i in range(0, len(component_weight_sliders), 4)] +
+                 [[leaderboard_table]], sizing_mode='fixed'),
+    title="Leaderboard")
+comparison_tab = Panel(
+    child=layout([[comparison_select,
+                   column(comparison_kpi_select, comparison_series_select,
+                          comparison_mode)],
+                  [comparison_panel]], sizing_mode='fixed'),
+    title="Compare")
 
 tabs=[
     inputs_tab, 
@@ -1471,9 +773,22 @@ tabs=[
     outputs_congestion_tab,
     outputs_transitcb_tab,
     outputs_toll_tab,
-    outputs_sustainability_tab
+    outputs_sustainability_tab,
+    outputs_convergence_tab,
+    runtime_tab,
+    comparison_tab,
+    leaderboard_tab
 ]
+if DIAGNOSTICS:
+    tabs.append(Panel(
+        child=layout([[diagnostics_refresh, diagnostics_dump, profile_switch,
+                       profile_engine],
+                      [diagnostics_status],
+                      [diagnostics_table]], sizing_mode='fixed'),
+        title="Diagnostics"))
 tabs = Tabs(tabs=tabs, width=1200)
+tabs.on_change('active', lambda attrname, old, new: [
+    make_tab_products(sub_order) for sub_order in sub_orders])
 
 curdoc().add_root(column([title_div, pulldowns, tabs]))
 curdoc().title = "Bistro Dashboard"
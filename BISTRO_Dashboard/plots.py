@@ -0,0 +1,1661 @@
+import math
+from os import makedirs
+from os.path import dirname, join
+
+import yaml
+from bokeh.core.properties import field, value
+from bokeh.io import export_png, export_svgs
+from bokeh.layouts import row, column
+from bokeh.models import (
+    BasicTicker, CDSView, ColorBar, ColumnDataSource, FactorRange, GroupFilter,
+    HoverTool, LabelSet, LinearColorMapper, Plot, Title, WMTSTileSource)
+from bokeh.models.markers import Circle
+from bokeh.models.formatters import NumeralTickFormatter
+from bokeh.models.glyphs import Segment, Text
+from bokeh.models.widgets import DataTable, Div, NumberFormatter, TableColumn
+from bokeh.palettes import Dark2, Category10, Plasma256
+from bokeh.plotting import figure
+from bokeh.transform import dodge, factor_cmap, transform
+from bokeh.tile_providers import CARTODBPOSITRON
+
+from iteration_history import STOPWATCH_STAGES
+from raster import LinkRasterizer
+from scoring import case_study_categories
+from source_update import data_digest
+
+
+HOURS = [str(h) for h in range(24)]
+#ROUTE_IDS = ['1340', '1341', '1342', '1343', '1344', '1345', '1346', '1347', '1348', '1349', '1350', '1351']
+
+BUSES_LIST = ['BUS-DEFAULT', 'BUS-SMALL-HD', 'BUS-STD-HD', 'BUS-STD-ART']
+MODES = ['ride_hail', 'car', 'drive_transit', 'walk', 'walk_transit']#, 'mixed_mode']
+
+# Width and height of the toll circle map, in pixels
+TOLL_CIRCLE_SIZE = (600, 600)
+
+CATEGORIES = yaml.safe_load(open(join(dirname(__file__), 'kpis.yaml')))
+CASESTUDY_CAT = case_study_categories()
+
+SOURCE_NAME_DATA_PAIR = [
+('normalized_scores_source', 'normalized_scores_data'),
+('fleetmix_input_source', 'fleetmix_input_data'),
+('routesched_input_line_source', 'routesched_input_line_data'),
+('routesched_input_start_source', 'routesched_input_start_data'),
+('routesched_input_end_source', 'routesched_input_end_data'),
+('fares_input_source', 'fares_input_data'),
+('modeinc_input_source', 'modeinc_input_data'),
+('toll_circle_source','toll_circle_data'),
+('mode_planned_pie_chart_source', 'mode_planned_pie_chart_data'),
+('mode_realized_pie_chart_source', 'mode_realized_pie_chart_data'),
+('mode_choice_by_time_source', 'mode_choice_by_time_data'),
+('mode_choice_by_income_group_source', 'mode_choice_by_income_group_data'),
+('mode_choice_by_age_group_source', 'mode_choice_by_age_group_data'),
+('mode_choice_by_distance_source', 'mode_choice_by_distance_data'),
+('congestion_travel_time_by_mode_source',
+    'congestion_travel_time_by_mode_data'),
+('congestion_travel_time_per_passenger_trip_source',
+    'congestion_travel_time_per_passenger_trip_data'),
+('congestion_miles_traveled_per_mode_source',
+    'congestion_miles_traveled_per_mode_data'),
+('congestion_car_vmt_by_time_source',
+    'congestion_car_vmt_by_time_data'),
+('congestion_bus_vmt_by_ridership_source',
+    'congestion_bus_vmt_by_ridership_data'),
+('congestion_on_demand_vmt_by_phases_source',
+    'congestion_on_demand_vmt_by_phases_data'),
+('congestion_travel_speed_source', 'congestion_travel_speed_data'),
+('los_travel_expenditure_source', 'los_travel_expenditure_data'),
+('los_cost_burden_by_income_source', 'los_cost_burden_by_income_data'),
+('los_crowding_source', 'los_crowding_data'),
+('los_parking_overhead_source', 'los_parking_overhead_data'),
+('transit_cb_costs_source', 'transit_cb_costs_data'),
+('transit_cb_benefits_source', 'transit_cb_benefits_data'),
+('transit_inc_by_mode_source', 'transit_inc_by_mode_data'),
+('toll_revenue_by_time_source','toll_revenue_by_time_data'),
+('sustainability_25pm_per_mode_source', 'sustainability_25pm_per_mode_data'),
+('sustainability_ghg_per_mode_source', 'sustainability_ghg_per_mode_data'),
+('convergence_summary_source', 'convergence_summary_data'),
+('runtime_profile_source', 'runtime_profile_data')
+]
+
+def figure_path(sub_key, name, fmt='png', root='figures'):
+    f_name = join(root, sub_key)
+    if name == 'toll_circle' or 'input' in name:
+        f_name = join(f_name, "inputs")
+    elif 'scores' not in name:
+        f_name = join(f_name, "outputs")
+    else:
+        pass
+    return join(f_name, name + "." + fmt)
+
+
+def export_figure(plot, sub_key, name, fmt='png', root='figures',
+                  webdriver=None):
+    """
+    Save a plot (or layout) to the figures tree of a submission as a png or
+    svg file. A webdriver can be given to reuse the same headless browser
+    across exports.
+    """
+    f_name = figure_path(sub_key, name, fmt=fmt, root=root)
+    if fmt == 'svg':
+        for p in plot.select({'type': Plot}):
+            p.output_backend = "svg"
+        export_svgs(plot, filename=f_name, webdriver=webdriver)
+    else:
+        export_png(plot, filename=f_name, webdriver=webdriver)
+    return f_name
+
+
+def save_png(plot, sub_key, name):
+    export_figure(plot, sub_key, name, fmt='png')
+
+
+def create_dir_tree(sub_key, root='figures'):
+    
+    try:
+        makedirs(join(root, sub_key))
+    except OSError:
+        pass
+
+    try:
+        makedirs(join(root, sub_key, "inputs"))
+    except OSError:
+        pass
+
+    try:
+        makedirs(join(root, sub_key, "outputs"))
+    except OSError:
+        pass
+
+
+def plot_normalized_scores(source, sub_key=1, savefig='None'):
+
+    p = figure(#x_range=(-6, 2),
+               y_range=CATEGORIES[::-1],
+               plot_height=350, plot_width=1200,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Weighted subscores for each KPI and Submission score",
+              text_font_style="normal"), 'above')
+    p.add_layout(
+        Title(text="Normalized Scores",
+              text_font_size="14pt"),
+        'above')
+
+    p.hbar(y='Component Name', height=0.5,
+           left=0,
+           right='Weighted Score',
+           source=source,
+           color='color')
+
+    p.xgrid.grid_line_color = None
+    p.ygrid.grid_line_color = None
+    p.outline_line_width = 1
+    p.outline_line_color = "black"
+    p.xaxis.axis_label = 'Weighted Score'
+    p.yaxis.axis_label = 'Score Component'
+    p.xaxis.axis_label_text_font_size = "12pt"
+    p.yaxis.axis_label_text_font_size = "12pt"
+    p.xaxis.major_label_text_font_size = "10pt"
+    p.yaxis.major_label_text_font_size = "10pt"
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/normalized_scores.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/normalized_scores.png".format(sub_key))
+
+    return p
+
+def plot_casestudy_scores(source, sub_key=1, savefig='None'):
+
+    p = figure(x_range=(-3, 6),
+               y_range=CASESTUDY_CAT[::-1],
+               plot_height=350, plot_width=1200,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="KPI score and aggregation for Sioux Faux",
+              text_font_style="normal"), 'above')
+    p.add_layout(
+        Title(text="Case Study Scores",
+              text_font_size="14pt"),
+        'above')
+
+    p.hbar(y='Component Name', height=0.5,
+           left=0,
+           right='Weighted Score',
+           source=source,
+           color='color')
+
+    p.xgrid.grid_line_color = None
+    p.ygrid.grid_line_color = None
+    p.outline_line_width = 1
+    p.outline_line_color = "black"
+    p.xaxis.axis_label = 'Weighted Score'
+    p.yaxis.axis_label = 'Score Component'
+    p.xaxis.axis_label_text_font_size = "12pt"
+    p.yaxis.axis_label_text_font_size = "12pt"
+    p.xaxis.major_label_text_font_size = "10pt"
+    p.yaxis.major_label_text_font_size = "10pt"
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/casestudy_scores.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/casestudy_scores.png".format(sub_key))
+
+    return p
+
+
+def plot_fleetmix_input(source, sub_key=1, savefig='None', route_ids=[]):
+
+    p = figure(x_range=BUSES_LIST, y_range=[str(route_id) for route_id in route_ids], 
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Bus fleet mix", text_font_size="14pt"), 'above')
+
+    p.circle(x='vehicleTypeId', y='routeId', source=source, size=8)
+
+    p.xaxis.axis_label = 'Bus Type'
+    p.yaxis.axis_label = 'Bus Route'
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/inputs/fleetmix_input.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/inputs/fleetmix_input.png".format(sub_key))
+
+    return p
+
+def plot_routesched_input(line_source, start_source, end_source, sub_key=1, savefig='None'):
+
+    p = figure(x_range=(0, 24), y_range=(-0.1, 2.1), 
+               plot_height=450, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Frequency adjustment", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Bus Route')
+
+    p.multi_line(xs='xs', ys='ys', source=line_source, color='color', line_width=4, legend='name') 
+    p.square(x='xs', y='ys', source=start_source, fill_color='color', line_color='color', size=8)
+    p.circle(x='xs', y='ys', source=end_source, fill_color='color', line_color='color', size=8)
+
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Headway [h]'
+    p.xaxis.ticker = BasicTicker(max_interval=4)
+    p.xgrid.ticker = BasicTicker(max_interval=4)
+    p.legend.label_text_font_size = '8pt'
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+    
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/inputs/routesched_input.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/inputs/routesched_input.png".format(sub_key))
+
+    return p
+
+def plot_fares_input(source, max_fare=10, max_age=121, sub_key=1, savefig='None', route_ids=[]):
+
+    mapper = LinearColorMapper(palette=Plasma256[:120:-1], low=0.0, high=max_fare)
+
+    p = figure(x_range=(0, max_age), y_range=route_ids, 
+               plot_height=350, plot_width=475,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Mass transit fares", text_font_size="14pt"), 'above')
+
+    p.hbar(y='routeId', height=0.5, 
+           left='min_age',
+           right='max_age',
+           source=source,
+           color=transform('amount', mapper)) 
+
+    p.xaxis.axis_label = 'Age'
+    p.yaxis.axis_label = 'Bus Route'
+
+    color_bar = ColorBar(color_mapper=mapper, ticker=BasicTicker(),
+                 label_standoff=12, border_line_color=None, location=(0,0))
+
+    color_bar_plot = figure(title="Fare Amount [$]",
+                            title_location="right", 
+                            height=350, width=125, 
+                            toolbar_location=None, tools="", min_border=0, 
+                            outline_line_color=None)
+
+    color_bar_plot.add_layout(color_bar, 'right')
+    color_bar_plot.title.align="center"
+    color_bar_plot.title.text_font_size = '10pt'
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(row(p, color_bar_plot), filename="figures/{}/inputs/fares_input.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(row(p, color_bar_plot), filename="figures/{}/inputs/fares_input.png".format(sub_key))
+
+    return row(p, color_bar_plot)
+
+def plot_modeinc_input(source, max_incentive=50, max_age=121, max_income=150000, sub_key=1, savefig='None'):
+
+    mapper = LinearColorMapper(palette=Plasma256[:120:-1], low=0.0, high=max_incentive)
+    inc_modes = ['ride_hail', 'drive_transit', 'walk_transit']
+
+    p1 = figure(x_range=(0, max_age), y_range=inc_modes, 
+               plot_height=175, plot_width=475,
+               toolbar_location=None, tools="")
+    p1.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p1.add_layout(Title(text="Incentives by age group", text_font_size="14pt"), 'above')
+
+    p1.hbar(y='mode', height=0.5, 
+           left='min_age',
+           right='max_age',
+           source=source,
+           color=transform('amount', mapper)) 
+
+    p1.xaxis.axis_label = 'Age'
+    p1.yaxis.axis_label = 'Mode Choice'
+
+    p2 = figure(x_range=(0, max_income), y_range=inc_modes, 
+               plot_height=175, plot_width=475,
+               toolbar_location=None, tools="")
+    p2.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p2.add_layout(Title(text="Incentives by income group", text_font_size="14pt"), 'above')
+
+    p2.hbar(y='mode', height=0.5, 
+           left='min_income',
+           right='max_income',
+           source=source,
+           color=transform('amount', mapper)) 
+
+    p2.xaxis[0].formatter = NumeralTickFormatter(format="$0a")
+    p2.xaxis.axis_label = 'Income'
+    p2.yaxis.axis_label = 'Mode Choice'
+
+    p = column(p1, p2)
+
+    color_bar = ColorBar(color_mapper=mapper, ticker=BasicTicker(),
+                 label_standoff=12, border_line_color=None, location=(0,0))
+
+    color_bar_plot = figure(title="Incentive Amount [$/person-trip]",
+                            title_location="right", 
+                            height=350, width=125, 
+                            toolbar_location=None, tools="", min_border=0, 
+                            outline_line_color=None)
+
+    color_bar_plot.add_layout(color_bar, 'right')
+    color_bar_plot.title.align="center"
+    color_bar_plot.title.text_font_size = '10pt'
+
+    if savefig == 'svg':
+      p1.output_backend = "svg"
+      p2.output_backend = "svg"
+      export_svgs(row(p, color_bar_plot), filename="figures/{}/inputs/modeinc_input.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(row(p, color_bar_plot), filename="figures/{}/inputs/modeinc_input.png".format(sub_key))
+
+    return row(p, color_bar_plot)
+
+def plot_toll_circle(link_source, circle_source, sub_key=1, savefig='None',
+                     raster_source=None):
+    d = circle_source.data
+
+    p = figure(
+        x_range=(d['x_low'][0], d['x_high'][0]),
+        y_range=(d['y_low'][0], d['y_high'][0]),
+        plot_width=TOLL_CIRCLE_SIZE[0], plot_height=TOLL_CIRCLE_SIZE[1],
+        x_axis_type="mercator",
+        y_axis_type="mercator")
+    # a tile source model can only belong to one document
+    p.add_tile(WMTSTileSource(
+        **CARTODBPOSITRON.properties_with_values(include_defaults=False)))
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Amount of toll applied and its range",
+              text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Toll Circle", text_font_size="14pt"), 'above')
+
+    # links too numerous to be drawn as glyphs are sent as an image
+    if raster_source is not None:
+        p.image_rgba(image='image', x='x', y='y', dw='dw', dh='dh',
+                     source=raster_source)
+    seg = Segment(x0="from_x", y0="from_y", x1="to_x", y1="to_y",
+                    line_color="#f4a582", line_width=1)
+    p.add_glyph(link_source, seg)
+
+    circle = Circle(
+        x='center_x', y='center_y', radius='radius', line_color="#00BFFF",
+        fill_color="#00BFFF", fill_alpha=0.05)
+    p.add_glyph(circle_source, circle)
+    label = Text(x='center_x', y='center_y', text='text')
+    p.add_glyph(circle_source, label)
+
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/inputs/toll_circle.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/inputs/toll_circle.png".format(sub_key))
+
+    return p
+
+def plot_mode_pie_chart(source, choice_type='planned', sub_key=1, savefig='None'):
+
+    title = 'Overall {} mode choice'.format(choice_type)
+    if choice_type == 'planned':
+        subtitle = ("Agent’s preferences (initial agent’s plan "
+                    "when leaving from his origin)")
+    else:
+        subtitle = ("Level of service (realized agent’s plan to "
+                    "go from his origin to his destination)")
+
+    p = figure(plot_height=400, toolbar_location=None,
+               x_range=(-0.5, 1.0))
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text=subtitle, text_font_style="normal"), 'above')
+    p.add_layout(Title(text=title, text_font_size="14pt"), 'above')
+
+    p.circle(-0.5, 1.0, size=0.00000001, color="#ffffff", legend='Mode Choice')
+
+    p.wedge(x=0, y=1, radius=0.4,
+            start_angle='start_angle', end_angle='end_angle',
+            line_color="white", fill_color='color', legend='Mode', source=source)
+
+    # labels = LabelSet(x='x_loc', y='y_loc', text='label', level='glyph',
+    #                   text_font_size='8pt', text_color='white',
+    #                   source=source, render_mode='canvas', text_align='left')
+    labels = LabelSet(x=0, y=1, text='label', level='glyph',
+                      angle='start_angle', text_font_size='8pt', text_color='white',
+                      source=source, render_mode='canvas')
+
+    p.add_layout(labels)
+    
+    p.axis.axis_label=None
+    p.axis.visible=False
+    p.legend.label_text_font_size = '8pt'
+    p.grid.grid_line_color = None
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/mode_{}_pie_chart.svg".format(sub_key, choice_type))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/mode_{}_pie_chart.png".format(sub_key, choice_type))
+
+    return p
+
+def plot_mode_choice_by_time(source, sub_key=1, savefig='None'):
+    p = figure(x_range=HOURS, y_range=(0, 15000),
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Mode choice by hour", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
+
+    p.vbar_stack(MODES,
+                 x='hours',
+                 width=0.85,
+                 source=source,
+                 color=Dark2[len(MODES)],
+                 legend=[value(x) for x in MODES])
+    
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Number of trips'
+    p.legend.orientation = "vertical"
+    p.legend.label_text_font_size = '8pt'
+    p.legend.location = 'top_left'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    # new_legend = p.legend[0]
+    # p.legend[0].plot = None
+    # p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_time.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/mode_choice_by_time.png".format(sub_key))
+
+    return p
+
+def plot_mode_choice_by_income_group(source, sub_key=1, savefig='None'):
+
+    bins = ['[$0, $10k)', '[$10k, $25k)', '[$25k, $50k)', '[$50k, $75k)', '[$75k, $100k)', '[$100k, inf)']
+
+    p = figure(x_range=MODES, y_range=(0, 15000),
+               plot_height=350,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Mode choice by income group", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Income Group')
+
+    nbins = len(bins)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[nbins]
+
+    for i, bin_i in enumerate(bins):
+        p.vbar(x=dodge('realizedTripMode', bin_loc, range=p.x_range), top=bin_i, width=bin_width-0.03, source=source,
+               color=palette[i], legend=value(bin_i))
+        bin_loc += bin_width
+
+    p.x_range.range_padding = bin_width
+    p.xgrid.grid_line_color = None
+    p.legend.orientation = "vertical"
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.axis_label = 'Mode Choice'
+    p.yaxis.axis_label = 'Number of People'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_income_group.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/mode_choice_by_income_group.png".format(sub_key))
+
+    return p
+
+def plot_mode_choice_by_age_group(source, sub_key=1, savefig='None'):
+
+    edges = [0, 18, 30, 40, 50, 60, float('inf')]
+    bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
+
+    p = figure(x_range=MODES, y_range=(0, 8000),
+               plot_height=350,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Mode choice by age group", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Age Group')
+
+    nbins = len(bins)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[nbins]
+
+    for i, bin_i in enumerate(bins):
+        p.vbar(x=dodge('realizedTripMode', bin_loc, range=p.x_range), top=bin_i, width=bin_width-0.03, source=source,
+               color=palette[i], legend=value(bin_i))
+        bin_loc += bin_width
+
+    p.x_range.range_padding = bin_width
+    p.xgrid.grid_line_color = None
+    p.legend.orientation = "vertical"
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.axis_label = 'Mode Choice'
+    p.yaxis.axis_label = 'Number of People'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_age_group.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/mode_choice_by_age_group.png".format(sub_key))
+
+    return p
+
+def plot_mode_choice_by_distance(source, sub_key=1, savefig='None'):
+
+    edges = [0, .5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 5, 7.5, 10, 40]
+    bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
+
+    p = figure(x_range=bins, y_range=(0, 6000),
+               plot_height=350, 
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Mode choice by trip distance", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
+
+    p.vbar_stack(MODES,
+                 x='Trip Distance (miles)', 
+                 width=0.5, 
+                 source=source,
+                 color=Dark2[len(MODES)],
+                 legend=[value(x) for x in MODES])
+    
+    p.xaxis.axis_label = 'Trip Distance (miles)'
+    p.yaxis.axis_label = 'Number of Trips'
+    p.legend.orientation = "vertical"
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/mode_choice_by_distance.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/mode_choice_by_distance.png".format(sub_key))
+
+    return p
+
+def plot_congestion_travel_time_by_mode(source, sub_key=1, savefig='None'):
+
+    p = figure(x_range=MODES, y_range=(0, 80),
+               plot_height=350, plot_width=700,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Average travel time per trip and by mode",
+              text_font_size="14pt"), 'above')
+
+    p.vbar(x='x', top='y', width=0.8, source=source, color='color')
+    
+    p.xaxis.axis_label = 'Mode'
+    p.yaxis.axis_label = 'Travel time [min]'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/congestion_travel_time_by_mode.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/congestion_travel_time_by_mode.png".format(sub_key))
+
+    return p
+
+def plot_congestion_travel_time_per_passenger_trip(source, sub_key=1, savefig='None'):
+
+    p = figure(x_range=HOURS, y_range=(0, 360),
+               plot_height=350, plot_width=800,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Average travel time per passenger-trip over the day",
+              text_font_size="14pt"), 'above')
+
+    nbins = len(MODES)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[nbins]
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
+
+    for i, mode_i in enumerate(MODES):
+        p.vbar(x=dodge('index', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source, color=palette[i], legend=value(mode_i))
+        bin_loc += bin_width
+
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Travel time [min]'
+    p.legend.label_text_font_size = '8pt'
+    p.legend.location = 'top_left'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/congestion_travel_time_per_passenger_trip.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/congestion_travel_time_per_passenger_trip.png".format(sub_key))
+
+    return p
+
+def plot_congestion_miles_traveled_per_mode(source, sub_key=1, savefig='None'):
+
+    p = figure(x_range=['ride_hail', 'car', 'walk', 'bus'], y_range=(0, 90000),
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Daily miles traveled per mode", text_font_size="14pt"), 'above')
+
+    p.vbar(x='modes', top='vmt', color='color', source=source, width=0.8)
+    
+    # p.xgrid.grid_line_color = None
+    # p.ygrid.grid_line_color = None
+    # p.outline_line_width = 1
+    # p.outline_line_color = "black"
+    p.xaxis.axis_label = 'Mode'
+    p.yaxis.axis_label = 'Miles traveled'
+    p.yaxis[0].formatter = NumeralTickFormatter(format="0a")
+    p.xaxis.major_label_orientation = math.pi / 6
+    # p.xaxis.axis_label_text_font_size = "12pt"
+    # p.yaxis.axis_label_text_font_size = "12pt"
+    # p.xaxis.major_label_text_font_size = "10pt"
+    # p.yaxis.major_label_text_font_size = "10pt"
+    
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/congestion_miles_traveled_per_mode.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/congestion_miles_traveled_per_mode.png".format(sub_key))
+
+    return p
+
+def plot_congestion_car_vmt_by_time(source, sub_key=1, savefig='None'):
+    p = figure(x_range=HOURS, y_range=(0, 25000),
+               plot_height=350, plot_width=700,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Car miles traveled by time of day", text_font_size="14pt"), 'above')
+
+    p.vbar(x='Hour', top='Distance_m', source=source, width=0.85)
+
+    p.xaxis.axis_label = 'Hour of day'
+    p.xaxis.major_label_orientation = math.pi / 2
+    p.yaxis.axis_label = 'Vehicle miles traveled'
+    p.yaxis[0].formatter = NumeralTickFormatter(format="0.0a")
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/congestion_car_vmt_by_time.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/congestion_car_vmt_by_time.png".format(sub_key))
+
+    return p
+
+def plot_congestion_bus_vmt_by_ridership(source, sub_key=1, savefig='None'):
+    
+    bins = [
+        'empty\n(0 passengers)', 
+        'low ridership\n(< 50% seating capacity)', 
+        'medium ridership\n(< seating capacity)', 
+        'high ridership\n(< 50% standing capacity)',
+        'crowded\n(<= standing capacity)'
+    ]
+    p = figure(x_range=HOURS, y_range=(0, 250),
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Bus vehicle miles traveled per bus occupancy"
+                   " state by hour of the day", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Bus VMT", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Ridership')
+
+    p.vbar_stack(bins,
+                 x='Hour',
+                 width=0.85,
+                 source=source,
+                 color=Dark2[len(bins)],
+                 legend=[value(x) for x in bins])
+    
+    # p.xgrid.grid_line_color = None
+    # p.ygrid.grid_line_color = None
+    # p.outline_line_width = 1
+    # p.outline_line_color = "black"
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Vehicle miles traveled'
+    p.yaxis[0].formatter = NumeralTickFormatter(format="0.0a")
+    p.legend.orientation = "vertical"
+    p.legend.label_text_font_size = '10pt'
+    p.xaxis.major_label_orientation = math.pi / 2
+    # p.xaxis.axis_label_text_font_size = "12pt"
+    # p.yaxis.axis_label_text_font_size = "12pt"
+    # p.xaxis.major_label_text_font_size = "10pt"
+    # p.yaxis.major_label_text_font_size = "10pt"
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+    
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/congestion_bus_vmt_by_ridership.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/congestion_bus_vmt_by_ridership.png".format(sub_key))
+
+    return p
+
+def plot_congestion_on_demand_vmt_by_phases(source, sub_key=1, savefig='None'):
+
+    driving_states = ["fetch", "fare"]
+    p = figure(x_range=HOURS, y_range=(0, 350),
+               plot_height=350, plot_width=700,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="On-demand ride vehicle miles traveled per occupancy "
+                   "state by hour of the day", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="On-demand VMT", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Driving State')
+
+    p.vbar_stack(driving_states,
+                 x='Hour', 
+                 width=0.85, 
+                 source=source,
+                 color=Dark2[3][:len(driving_states)],
+                 legend=[value(x) for x in driving_states])
+    
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Vehicle miles traveled'
+    p.yaxis[0].formatter = NumeralTickFormatter(format="0.0a")
+    p.legend.location = "top_left"
+    p.legend.orientation = "vertical"
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/congestion_on_demand_vmt_by_phases.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/congestion_on_demand_vmt_by_phases.png".format(sub_key))
+
+    return p
+
+def plot_congestion_travel_speed(source, sub_key=1, savefig='None'):
+
+    edges = [6, 8, 10, 12, 14, 16, 18, 20, 22, 24]
+    bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
+
+    p = figure(x_range=bins, y_range=(0, 15),
+               plot_height=350, plot_width=700,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Average travel speed per passenger trip per mode"
+                   " by hours of the day", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Average travel speed", text_font_size="14pt"), 'above')
+
+    nbins = len(MODES)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[nbins]
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
+
+    for i, mode_i in enumerate(MODES):
+        p.vbar(x=dodge('Start time interval (hour)', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source,
+               color=palette[i], legend=value(mode_i))
+        bin_loc += bin_width
+
+    p.xaxis.axis_label = 'Start time interval (hour of day)'
+    p.yaxis.axis_label = 'Average speed (miles per hour)'
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/congestion_travel_speed.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/congestion_travel_speed.png".format(sub_key))
+
+    return p
+
+def plot_los_travel_expenditure(source, sub_key=1, savefig='None'):
+
+    p = figure(x_range=HOURS, y_range=(0, 25.0),
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Average agent’s travel expenditure per trip (per mode "
+                   "and by hour of the day)", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Travel Expenditure", text_font_size="14pt"), 'above')
+
+    spend_modes = set(['walk_transit', 'drive_transit', 'car', 'ride_hail'])
+    nbins = len(spend_modes)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[len(MODES)]
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
+
+    for i, mode_i in enumerate(MODES):
+        if mode_i in spend_modes:
+            p.vbar(x=dodge('hour_of_day', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source,
+                   color=palette[i], legend=value(mode_i))
+            bin_loc += bin_width
+
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Average cost [$]'
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/los_travel_expenditure.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/los_travel_expenditure.png".format(sub_key))
+
+    return p
+
+def plot_los_cost_burden_by_income(source, sub_key=1, savefig='None'):
+
+    bins = ['[$0, $10k)', '[$10k, $25k)', '[$25k, $50k)', '[$50k, $75k)', '[$75k, $100k)', '[$100k, inf)']
+
+    p = figure(x_range=bins,
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Daily travel expenditure of the travellers as a percentage "
+                   "of their daily income (by income group)",
+              text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Travel Cost Burden", text_font_size="14pt"), 'above')
+
+    p.vbar(x='income_group', top='Cost burden (% of income)', width=0.85,
+           source=source, color=Dark2[3][0])
+
+    p.xgrid.grid_line_color = None
+    p.xaxis.axis_label = 'Income group'
+    p.yaxis.axis_label = 'Cost burden [% of income]'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/los_cost_burden_by_income.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/los_cost_burden_by_income.png".format(sub_key))
+
+    return p
+
+def plot_los_crowding(source, sub_key=1, savefig='None', route_ids=[]):
+
+    # AM peak = 7am-10am, PM Peak = 5pm-8pm, Early Morning, Midday, Late Evening = in between
+    labels = ["Early Morning (12a-7a)", "AM Peak (7a-10a)", "Midday (10a-5p)", "PM Peak (5p-8p)", "Late Evening (8p-12a)"]
+    p = figure(x_range=route_ids, y_range=(0, 10),
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Average Hours of Bus crowding per bus route"
+                   " (by period of the day)", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Bus Crowding", text_font_size="14pt"), 'above')
+
+    nbins = len(labels)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[nbins]
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Service Period')
+
+    for i, label_i in enumerate(labels):
+        p.vbar(x=dodge('route_id', bin_loc, range=p.x_range), top=label_i, width=bin_width-0.04, source=source,
+               color=palette[i], legend=value(label_i))
+        bin_loc += bin_width
+
+    p.xaxis.axis_label = 'Bus route'
+    p.yaxis.axis_label = 'Hours of bus crowding'
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/los_crowding.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/los_crowding.png".format(sub_key))
+
+    return p
+
+def plot_los_parking_overhead(source, sub_key=1, savefig='None'):
+
+    labels = ['outboundParkingOverheadTime', 'inboundParkingOverheadTime']
+    p = figure(plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Total parking overhead time over all TAZs by hour of "
+                   "the day", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Parking Overhead", text_font_size="14pt"), 'above')
+
+    p.vbar_stack(labels,
+                 x='Hour',
+                 width=0.85,
+                 source=source,
+                 color=Dark2[3][:len(labels)],
+                 legend=[value(x) for x in labels])
+
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Parking overhead time'
+    p.legend.location = "top_left"
+    p.legend.label_text_font_size = '8pt'
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/los_parking_overhead.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/los_parking_overhead.png".format(sub_key))
+
+    return p
+
+def plot_parking_overhead_delta(source, sub_keys, savefig='None'):
+
+    hover = HoverTool(tooltips=[
+        ('TAZ', '@TAZ'),
+        ('outbound time', '@outboundParkingOverheadTime{0.00}'),
+        ('inbound time', '@inboundParkingOverheadTime{0.00}'),
+        ('inbound cost', '@inboundParkingOverheadCost{$0.00}')])
+    p = figure(plot_height=350, plot_width=1200,
+               toolbar_location=None, tools=[hover])
+    p.add_layout(
+        Title(text="Daily inbound parking overhead time per TAZ, {} minus {}"
+                   .format(sub_keys['submission2'], sub_keys['submission1']),
+              text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Parking Overhead Difference", text_font_size="14pt"), 'above')
+
+    p.vbar(x='x', top='inboundParkingOverheadTime', source=source, width=0.85)
+
+    p.xaxis.axis_label = 'TAZ'
+    p.xaxis.major_label_text_font_size = '0pt'
+    p.yaxis.axis_label = 'Parking overhead time difference'
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/parking_overhead_delta.svg")
+    elif savefig == 'png':
+      export_png(p, filename="figures/parking_overhead_delta.png")
+
+    return p
+
+def plot_transit_cb(costs_source, benefits_source, sub_key=1, savefig='None', route_ids=[]):
+
+    costs_labels = ["OperationalCosts", "fuelCost"]
+    benefits_label = ["Fare"]
+    p = figure(x_range=route_ids, y_range=(-2.5e6, 2.5e6),
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Distribution of costs and benefits of Mass Transit Agencies "
+                   "by bus route", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Transit costs and benefits", text_font_size="14pt"), 'above')
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Costs and Benefits')
+
+    p.vbar_stack(benefits_label,
+                 x='route_id',
+                 width=0.85,
+                 source=benefits_source,
+                 color=Dark2[3][2],
+                 legend=value("Fare"))
+
+    p.vbar_stack(costs_labels,
+                 x='route_id',
+                 width=0.85,
+                 source=costs_source,
+                 color=Dark2[3][:2],
+                 legend=[value(x) for x in costs_labels])
+    
+    p.xaxis.axis_label = 'Bus route'
+    p.yaxis.axis_label = 'Amount [$]'
+    p.yaxis[0].formatter = NumeralTickFormatter(format="$0a")
+    p.legend.orientation = "vertical"
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/transit_cb.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/transit_cb.png".format(sub_key))
+
+    return p
+
+def plot_transit_inc_by_mode(source, sub_key=1, savefig='None'):
+
+    p = figure(x_range=HOURS, #y_range=(0, 35000),
+               plot_height=350, plot_width=600,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(
+        Title(text="Total incentives distributed per mode by hours of "
+                   "the day", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Mode Incentives", text_font_size="14pt"), 'above')
+
+
+    ride_modes = set(['walk_transit', 'drive_transit', 'ride_hail'])
+    nbins = len(ride_modes)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[len(MODES)]
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Trip Mode')
+
+    for i, mode_i in enumerate(MODES):
+        if mode_i in ride_modes:
+            p.vbar(x=dodge('hour_of_day', bin_loc, range=p.x_range), top=mode_i, width=bin_width-0.04, source=source,
+                   color=palette[i], legend=value(mode_i))
+            bin_loc += bin_width
+
+    p.xaxis.axis_label = 'Hour of day'
+    p.yaxis.axis_label = 'Incentives distributed [$]'
+    p.yaxis[0].formatter = NumeralTickFormatter(format="$0a")
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    new_legend = p.legend[0]
+    p.legend[0].plot = None
+    p.add_layout(new_legend, 'right')
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/transit_inc_by_mode.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/transit_inc_by_mode.png".format(sub_key))
+
+    return p
+
+
+def plot_toll_revenue_by_time(source, sub_key=1, savefig='None'):
+    p = figure(x_range=HOURS, y_range=(0,40000), plot_height=350,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Toll Revenue per hour", text_font_size="14pt"), 'above')
+
+    p.vbar(x='Hour', top='Toll', source=source, width=0.85)
+
+    p.xaxis.axis_label = 'Hour'
+    p.yaxis.axis_label = 'Toll Revenue [$]'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/toll_revenue_by_time.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/toll_revenue_by_time.png".format(sub_key))
+
+    return p
+
+def plot_sustainability_25pm_per_mode(source, sub_key=1, savefig='None'):
+ 
+    modes = ['ride_hail', 'car', 'bus']
+    p = figure(x_range=modes, y_range=(0, 140),
+               plot_height=350,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Daily PM2.5 emissions per mode", text_font_size="14pt"), 'above')
+
+    p.vbar(x='modes', top='emissions', color='color', source=source, width=0.8)
+    
+    p.xaxis.axis_label = 'Mode'
+    p.yaxis.axis_label = 'Emissions [g]'
+    p.xaxis.major_label_orientation = math.pi / 6
+    
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/sustainability_25pm_per_mode.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/sustainability_25pm_per_mode.png".format(sub_key))
+
+    return p
+
+def plot_sustainability_ghg_per_mode(source, sub_key=1, savefig='None'):
+    modes = ['ride_hail', 'car', 'bus']
+    p = figure(x_range=modes, y_range=(0, 35000000),
+               plot_height=350,
+               toolbar_location=None, tools="")
+    p.add_layout(Title(text=sub_key, text_font_style="italic"), 'below')
+    p.add_layout(Title(text="Daily CO2 emissions per mode", text_font_size="14pt"), 'above')
+
+    p.vbar(x='modes', top='emissions', color='color', source=source, width=0.8)
+    
+    p.xaxis.axis_label = 'Mode'
+    p.yaxis.axis_label = 'CO2 [g]'
+    p.xaxis.major_label_orientation = math.pi / 6
+    
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/{}/outputs/sustainability_ghg_per_mode.svg".format(sub_key))
+    elif savefig == 'png':
+      export_png(p, filename="figures/{}/outputs/sustainability_ghg_per_mode.png".format(sub_key))
+
+    return p
+
+def plot_convergence(sources, sub_keys, kpi, savefig='None'):
+    """
+    Overlay one KPI of both submissions over the iterations. sources and
+    sub_keys are dicts keyed by 'submission1' and 'submission2'. kpi is the
+    KPI of both, or a dict of the KPI of each submission: different KPIs
+    are named in the legend.
+    """
+    if not isinstance(kpi, dict):
+        kpi = {sub_order: kpi for sub_order in sources}
+    labels = dict(sub_keys)
+    if len(set(kpi.values())) > 1:
+        labels = {sub_order: '{} ({})'.format(sub_key, kpi[sub_order])
+                  for sub_order, sub_key in sub_keys.items()}
+    p1 = figure(plot_height=350, plot_width=1200,
+                toolbar_location=None, tools="")
+    p1.add_layout(
+        Title(text="KPI value over the iterations", text_font_style="normal"),
+        'above')
+    p1.add_layout(Title(text="Convergence", text_font_size="14pt"), 'above')
+
+    p2 = figure(x_range=p1.x_range, plot_height=250, plot_width=1200,
+                toolbar_location=None, tools="")
+    p2.add_layout(
+        Title(text="Relative change from previous iteration",
+              text_font_style="normal"), 'above')
+
+    palette = Dark2[3]
+    for i, sub_order in enumerate(sorted(sources.keys())):
+        p1.line(x='iteration', y='value', source=sources[sub_order],
+                color=palette[i], line_width=2,
+                legend=value(labels[sub_order]))
+        p2.line(x='iteration', y='relative_change', source=sources[sub_order],
+                color=palette[i], line_width=2,
+                legend=value(labels[sub_order]))
+
+    for p in (p1, p2):
+        p.xaxis.axis_label = 'Iteration'
+        p.legend.label_text_font_size = '8pt'
+        p.legend.location = 'top_right'
+    p1.yaxis.axis_label = kpi[sorted(kpi)[0]] if len(set(kpi.values())) == 1 \
+        else 'KPI value'
+    p2.yaxis.axis_label = 'Relative change'
+    p2.yaxis[0].formatter = NumeralTickFormatter(format="0.0%")
+
+    if savefig == 'svg':
+      p1.output_backend = "svg"
+      p2.output_backend = "svg"
+      export_svgs(column(p1, p2), filename="figures/convergence.svg")
+    elif savefig == 'png':
+      export_png(column(p1, p2), filename="figures/convergence.png")
+
+    return column(p1, p2)
+
+def plot_convergence_summary(source, sub_key=1):
+
+    columns = [
+        TableColumn(field='kpi', title='KPI', width=300),
+        TableColumn(field='last_value', title='Last value',
+                    formatter=NumberFormatter(format='0,0.00')),
+        TableColumn(field='last_relative_change', title='Last change',
+                    formatter=NumberFormatter(format='0.00%')),
+        TableColumn(field='iterations_to_stabilize',
+                    title='Iterations to stabilize')
+    ]
+    title = Div(text='<b>{}</b>'.format(sub_key), width=600)
+    table = DataTable(source=source, columns=columns, width=600, height=400,
+                      index_position=None)
+    return column(title, table)
+
+def plot_runtime_profile(sources, sub_keys, savefig='None'):
+    """
+    Box plot of the BEAM stage durations over all iterations (and runs) of
+    both submissions. sources and sub_keys are dicts keyed by 'submission1'
+    and 'submission2'.
+    """
+    p = figure(x_range=STOPWATCH_STAGES, plot_height=450, plot_width=1200,
+               toolbar_location=None, tools="")
+    p.add_layout(
+        Title(text="Distribution of the stage durations over all the "
+                   "iterations and runs", text_font_style="normal"), 'above')
+    p.add_layout(Title(text="Simulation Runtime", text_font_size="14pt"), 'above')
+
+    nbins = len(sources)
+    total_width = 0.85
+    bin_width = total_width / nbins
+    bin_loc = -total_width / 2 + bin_width / 2
+    palette = Dark2[3]
+
+    p.circle(0, 0, size=0.00000001, color="#ffffff", legend='Submission')
+
+    for i, sub_order in enumerate(sorted(sources.keys())):
+        x = dodge('stage', bin_loc, range=p.x_range)
+        p.segment(x0=x, y0='min', x1=x, y1='max', source=sources[sub_order],
+                  color=palette[i])
+        p.vbar(x=x, bottom='q1', top='q3', width=bin_width-0.04,
+               source=sources[sub_order], color=palette[i], fill_alpha=0.6,
+               legend=value(sub_keys[sub_order]))
+        p.rect(x=x, y='median', width=bin_width-0.04, height=0.01,
+               height_units='screen', source=sources[sub_order],
+               color='black')
+        bin_loc += bin_width
+
+    p.xaxis.axis_label = 'BEAM stage'
+    p.yaxis.axis_label = 'Duration [s]'
+    p.legend.location = 'top_left'
+    p.legend.label_text_font_size = '8pt'
+    p.xaxis.major_label_orientation = math.pi / 6
+
+    if savefig == 'svg':
+      p.output_backend = "svg"
+      export_svgs(p, filename="figures/runtime_profile.svg")
+    elif savefig == 'png':
+      export_png(p, filename="figures/runtime_profile.png")
+
+    return p
+
+
+def comparison_colors(sub_keys):
+    return [Category10[10][i % 10] for i in range(len(sub_keys))]
+
+def plot_comparison(source, categories, sub_keys, kpi, series, facet=False,
+                    facets_per_row=4):
+    """
+    Compare one series of a KPI across any number of submissions, from the
+    long-form data of comparison.make_comparison_data. The submissions are
+    either overlaid as grouped bars in a single figure, or drawn in one
+    small figure each (facets) sharing the same axes and the same source.
+    """
+    colors = comparison_colors(sub_keys)
+    hover = lambda: HoverTool(tooltips=[
+        ('submission', '@submission'), ('', '@x'),
+        (series, '@value{0,0.00}')])
+
+    if not facet:
+        p = figure(x_range=FactorRange(*[(category, sub_key)
+                                         for category in categories
+                                         for sub_key in sub_keys]),
+                   plot_height=450, plot_width=1200,
+                   toolbar_location=None, tools=[hover()])
+        p.add_layout(Title(text=series, text_font_style="normal"), 'above')
+        p.add_layout(Title(text=kpi, text_font_size="14pt"), 'above')
+        p.vbar(x='factor', top='value', width=0.9, source=source,
+               line_color='white', legend=field('submission'),
+               fill_color=factor_cmap('factor', palette=colors,
+                                      factors=sub_keys, start=1, end=2))
+        p.xaxis.major_label_text_font_size = '0pt'
+        p.xaxis.group_label_orientation = math.pi / 4
+        p.x_range.range_padding = 0.05
+        p.yaxis.axis_label = series
+        p.legend.location = 'top_right'
+        p.legend.label_text_font_size = '8pt'
+        return p
+
+    plots = []
+    for i, sub_key in enumerate(sub_keys):
+        p = figure(x_range=plots[0].x_range if plots else categories,
+                   y_range=plots[0].y_range if plots else None,
+                   plot_height=300, plot_width=300,
+                   toolbar_location=None, tools=[hover()])
+        p.add_layout(Title(text=sub_key, text_font_style="italic"), 'above')
+        view = CDSView(source=source, filters=[
+            GroupFilter(column_name='submission', group=sub_key)])
+        p.vbar(x='x', top='value', width=0.8, source=source, view=view,
+               color=colors[i])
+        p.xaxis.major_label_orientation = math.pi / 3
+        plots.append(p)
+
+    title = Div(text='<b style="font-size:14pt">{}</b> {}'.format(kpi, series),
+                width=1200)
+    return column([title] + [row(plots[i:i + facets_per_row])
+                             for i in range(0, len(plots), facets_per_row)])
+
+
+def plot_leaderboard(source, fields, components):
+    """
+    Sortable table of the scores of all the simulations, by rank of their
+    (what-if) aggregate score
+    """
+    columns = [
+        TableColumn(field='submission', title='Submission', width=250),
+        TableColumn(field='scenario', title='Scenario', width=120),
+        TableColumn(field='tag', title='Tag', width=100),
+        TableColumn(field='datetime', title='Date', width=150),
+        TableColumn(field='rank', title='Rank', width=60),
+        TableColumn(field='aggregate', title='Aggregate Score', width=120,
+                    formatter=NumberFormatter(format='0.0000'))
+    ] + [
+        TableColumn(field=field, title=component, width=120,
+                    formatter=NumberFormatter(format='0.0000'))
+        for field, component in zip(fields, components)]
+    return DataTable(source=source, columns=columns, width=1200, height=600,
+                     sortable=True, fit_columns=False, index_position=None)
+
+
+def plot_diagnostics(source):
+    """Time, rows and memory of the load_* and make_* calls"""
+    columns = [
+        TableColumn(field='submission', title='Submission', width=200),
+        TableColumn(field='method', title='Method', width=380),
+        TableColumn(field='calls', title='Calls', width=60),
+        TableColumn(field='seconds', title='Time [s]', width=100,
+                    formatter=NumberFormatter(format='0.000')),
+        TableColumn(field='rows_in', title='Rows in', width=110,
+                    formatter=NumberFormatter(format='0,0')),
+        TableColumn(field='rows_out', title='Rows out', width=110,
+                    formatter=NumberFormatter(format='0,0')),
+        TableColumn(field='memory_delta', title='Peak memory [B]', width=130,
+                    formatter=NumberFormatter(format='0,0'))]
+    return DataTable(source=source, columns=columns, width=1200, height=700,
+                     sortable=True, index_position=None)
+
+
+### Plot names of each tab ###
+submission_inputs_plots = [
+    'fleetmix_input',
+    'routesched_input',
+    'fares_input',
+    'modeinc_input'
+]
+submission_scores_plots = ['normalized_scores', 'casestudy_scores']
+submission_outputs_mode_plots = [
+    'mode_planned_pie_chart',
+    'mode_realized_pie_chart',
+    'mode_choice_by_time',
+    'mode_choice_by_income_group',
+    'mode_choice_by_age_group',
+    'mode_choice_by_distance'
+]
+submission_outputs_congestion_plots = [
+    'congestion_travel_time_by_mode',
+    'congestion_travel_time_per_passenger_trip',
+    'congestion_miles_traveled_per_mode',
+    'congestion_car_vmt_by_time',
+    'congestion_bus_vmt_by_ridership',
+    'congestion_on_demand_vmt_by_phases',
+    'congestion_travel_speed'
+]
+submission_outputs_los_plots = [
+    'los_travel_expenditure',
+    'los_cost_burden_by_income',
+    'los_crowding',
+    'los_parking_overhead'
+]
+submission_outputs_transitcb_plots = [
+    'transit_cb',
+    'transit_inc_by_mode'
+]
+submission_outputs_toll_plots = [
+    'toll_revenue_by_time',
+    'toll_circle'
+]
+submission_outputs_sustainability_plots = [
+'sustainability_25pm_per_mode',
+'sustainability_ghg_per_mode'
+]
+
+
+def share_source(data, shared=None):
+    """
+    ColumnDataSource of data, reusing the source of shared (a dict keyed by
+    content digest) that already holds the same data
+    """
+    if shared is None:
+        return ColumnDataSource(data=data)
+    digest = data_digest(data)
+    if digest not in shared:
+        shared[digest] = ColumnDataSource(data=data)
+    return shared[digest]
+
+
+def make_sources(products, link_index=None, shared=None):
+    """
+    ColumnDataSource's of the plots of a submission, keyed by source name.
+
+    Parameters
+    ----------
+    products : dict or Submission
+        Data products, as items of a dict or attributes of a Submission
+    link_index : raster.LinkIndex, optional
+        Links of the scenario: when given, the link sources are filled with
+        the links of the initial extent of the toll circle map
+    shared : dict, optional
+        Sources already made for other submissions, keyed by content digest.
+        A source whose data is the same as one of them is reused instead of
+        being duplicated, and new sources are added to it.
+
+    Returns
+    -------
+    sources : dict
+    """
+    get = products.get if isinstance(products, dict) else \
+        lambda name: getattr(products, name)
+    data = {source_name: get(data_name)
+            for source_name, data_name in SOURCE_NAME_DATA_PAIR}
+    data['link_source'] = LinkRasterizer.empty_links()
+    data['link_raster_source'] = LinkRasterizer.empty_image()
+    if link_index is not None:
+        circle = data['toll_circle_source']
+        data['link_source'], data['link_raster_source'] = \
+            LinkRasterizer(link_index).render(
+                (circle['x_low'][0], circle['x_high'][0]),
+                (circle['y_low'][0], circle['y_high'][0]),
+                *TOLL_CIRCLE_SIZE)
+
+    return {source_name: share_source(source_data, shared)
+            for source_name, source_data in data.items()}
+
+
+def make_submission_plots(sources, sub_key, route_ids):
+    """
+    Build all the plots of a submission from its data sources.
+
+    Parameters
+    ----------
+    sources : dict
+        ColumnDataSource's of the submission, keyed by the source names of
+        SOURCE_NAME_DATA_PAIR
+    sub_key : str
+        Submission name shown below every plot
+    route_ids : list of str
+        Bus routes of the scenario
+
+    Returns
+    -------
+    plots : dict
+        Plot (or layout) objects keyed by plot name
+    """
+    plots = {}
+    plots['normalized_scores'] = plot_normalized_scores(
+        source=sources['normalized_scores_source'], sub_key=sub_key)
+    plots['casestudy_scores'] = plot_casestudy_scores(
+        source=sources['normalized_scores_source'], sub_key=sub_key)
+    plots['fleetmix_input'] = plot_fleetmix_input(
+        source=sources['fleetmix_input_source'], sub_key=sub_key,
+        route_ids=route_ids)
+    plots['routesched_input'] = plot_routesched_input(
+        line_source=sources['routesched_input_line_source'],
+        start_source=sources['routesched_input_start_source'],
+        end_source=sources['routesched_input_end_source'],
+        sub_key=sub_key)
+    plots['fares_input'] = plot_fares_input(
+        source=sources['fares_input_source'], sub_key=sub_key,
+        route_ids=route_ids)
+    plots['modeinc_input'] = plot_modeinc_input(
+        source=sources['modeinc_input_source'], sub_key=sub_key)
+    plots['toll_circle'] = plot_toll_circle(
+        link_source=sources['link_source'],
+        circle_source=sources['toll_circle_source'],  sub_key=sub_key,
+        raster_source=sources['link_raster_source'])
+    plots['mode_planned_pie_chart'] = plot_mode_pie_chart(
+        source=sources['mode_planned_pie_chart_source'],
+        choice_type='planned', sub_key=sub_key)
+    plots['mode_realized_pie_chart'] = plot_mode_pie_chart(
+        source=sources['mode_realized_pie_chart_source'],
+        choice_type='realized', sub_key=sub_key)
+    plots['mode_choice_by_time'] = plot_mode_choice_by_time(
+        source=sources['mode_choice_by_time_source'], sub_key=sub_key)
+    plots['mode_choice_by_income_group'] = \
+        plot_mode_choice_by_income_group(
+            source=sources['mode_choice_by_income_group_source'],
+            sub_key=sub_key)
+    plots['mode_choice_by_age_group'] = \
+        plot_mode_choice_by_age_group(
+            source=sources['mode_choice_by_age_group_source'],
+            sub_key=sub_key)
+    plots['mode_choice_by_distance'] = \
+        plot_mode_choice_by_distance(
+            source=sources['mode_choice_by_distance_source'],
+            sub_key=sub_key)
+    plots['congestion_travel_time_by_mode'] = \
+        plot_congestion_travel_time_by_mode(
+            source=sources['congestion_travel_time_by_mode_source'],
+            sub_key=sub_key)
+    plots['congestion_travel_time_per_passenger_trip'] = \
+        plot_congestion_travel_time_per_passenger_trip(
+            source=sources['congestion_travel_time_per_passenger_trip_source'],
+            sub_key=sub_key)
+    plots['congestion_miles_traveled_per_mode'] = \
+        plot_congestion_miles_traveled_per_mode(
+            source=sources['congestion_miles_traveled_per_mode_source'],
+            sub_key=sub_key)
+    plots['congestion_car_vmt_by_time'] = \
+        plot_congestion_car_vmt_by_time(
+            source=sources['congestion_car_vmt_by_time_source'],
+            sub_key=sub_key)
+    plots['congestion_bus_vmt_by_ridership'] = \
+        plot_congestion_bus_vmt_by_ridership(
+            source=sources['congestion_bus_vmt_by_ridership_source'],
+            sub_key=sub_key)
+    plots['congestion_on_demand_vmt_by_phases'] = \
+        plot_congestion_on_demand_vmt_by_phases(
+            source=sources['congestion_on_demand_vmt_by_phases_source'],
+            sub_key=sub_key)
+    plots['congestion_travel_speed'] = \
+        plot_congestion_travel_speed(
+            source=sources['congestion_travel_speed_source'], sub_key=sub_key)
+    plots['los_travel_expenditure'] = \
+        plot_los_travel_expenditure(
+            source=sources['los_travel_expenditure_source'],
+            sub_key=sub_key)
+    plots['los_cost_burden_by_income'] = plot_los_cost_burden_by_income(
+        source=sources['los_cost_burden_by_income_source'], sub_key=sub_key)
+    plots['los_crowding'] = plot_los_crowding(
+        source=sources['los_crowding_source'], sub_key=sub_key,
+        route_ids=route_ids)
+    plots['los_parking_overhead'] = plot_los_parking_overhead(
+        source=sources['los_parking_overhead_source'], sub_key=sub_key)
+    plots['transit_cb'] = plot_transit_cb(
+        costs_source=sources['transit_cb_costs_source'],
+        benefits_source=sources['transit_cb_benefits_source'], sub_key=sub_key,
+        route_ids=route_ids)
+    plots['transit_inc_by_mode'] = plot_transit_inc_by_mode(
+        source=sources['transit_inc_by_mode_source'], sub_key=sub_key)
+    plots['toll_revenue_by_time'] = plot_toll_revenue_by_time(
+        source=sources['toll_revenue_by_time_source'], sub_key=sub_key)
+    plots['sustainability_25pm_per_mode'] = \
+        plot_sustainability_25pm_per_mode(
+            source=sources['sustainability_25pm_per_mode_source'],
+            sub_key=sub_key)
+    plots['sustainability_ghg_per_mode'] = \
+        plot_sustainability_ghg_per_mode(
+            source=sources['sustainability_ghg_per_mode_source'],
+            sub_key=sub_key)
+    return plots
+
+
+def make_tab_layouts(plots, sub_orders):
+    """
+    Arrange the plots of the compared submissions for each tab: one column
+    of plots per submission, except for the scores which are stacked.
+
+    Parameters
+    ----------
+    plots : dict
+        make_submission_plots() results keyed by sub_order
+    sub_orders : list of str
+        Compared submissions, from left to right
+
+    Returns
+    -------
+    layouts : dict
+        Tab layouts keyed by 'inputs', 'scores', 'outputs_mode'...
+    """
+    # the code below is equivalent to:
+    # row(column([plots['submission1'][p1], plots['submission1'][p2]], ...),
+    #     column([plots['submission2'][p1], ...])
+    #     ...)
+    def columns(names):
+        return row(*[column([plots[sub_order][p] for p in names])
+                     for sub_order in sub_orders])
+
+    return {
+        'inputs': columns(submission_inputs_plots),
+        'scores': column(
+            *[column([plots[sub_order][p] for sub_order in sub_orders])
+              for p in submission_scores_plots]),
+        'outputs_mode': columns(submission_outputs_mode_plots),
+        'outputs_los': columns(submission_outputs_los_plots),
+        'outputs_congestion': columns(submission_outputs_congestion_plots),
+        'outputs_transitcb': columns(submission_outputs_transitcb_plots),
+        'outputs_toll': columns(submission_outputs_toll_plots),
+        'outputs_sustainability': columns(
+            submission_outputs_sustainability_plots),
+    }
@@ -0,0 +1,120 @@
+import gzip
+import xml.etree.ElementTree as ET
+from os import listdir
+from os.path import exists, join
+
+import numpy as np
+import pandas as pd
+
+from id_index import IdIndex
+
+
+def read_person_attributes(path):
+    """
+    Parse outputPersonAttributes.xml.gz into a DataFrame with one row per
+    person ('PID' column) and one column per attribute.
+    """
+    records = []
+    with gzip.open(path) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag != 'object':
+                continue
+            record = {'PID': elem.get('id')}
+            for attribute in elem.iter('attribute'):
+                record[attribute.get('name')] = attribute.text
+            records.append(record)
+            elem.clear()
+    return pd.DataFrame.from_records(records)
+
+
+def read_population_ids(path):
+    """Return the person ids of a N.population.csv.gz plans file"""
+    # rows holding custom attributes have more fields than the header
+    ids = pd.read_csv(path, usecols=['id'], dtype=str, index_col=False)['id']
+    return pd.unique(ids.values)
+
+
+class PopulationStore(object):
+    """
+    Persons of a scenario, shared by all its submissions.
+
+    Person ids are dictionary encoded into int32 codes and the attributes are
+    kept as typed arrays indexed by code, so that trips can be joined with
+    their person by array indexing instead of merging on string ids.
+    """
+
+    def __init__(self, pids, age=None, income=None):
+        self.pid_index = IdIndex(pids)
+        n = len(self.pid_index)
+        self.age = self._typed(age, n, np.float32)
+        self.income = self._typed(income, n, np.float64)
+        self._persons_df = None
+
+    @staticmethod
+    def _typed(values, n, dtype):
+        if values is None:
+            return np.full(n, np.nan, dtype=dtype)
+        return pd.to_numeric(pd.Series(values), errors='coerce').values \
+            .astype(dtype)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the store from a persons table with PID, Age, income"""
+        df = df.drop_duplicates('PID')
+        return cls(df['PID'].values,
+                   age=df['Age'].values if 'Age' in df else None,
+                   income=df['income'].values if 'income' in df else None)
+
+    @classmethod
+    def from_directory(cls, path):
+        """
+        Build the store from the BEAM outputs of a submission directory.
+
+        Person ids come from the last iteration N.population.csv.gz and
+        incomes from outputPersonAttributes.xml.gz. BEAM only writes ages
+        there when they are person attributes of the scenario, otherwise they
+        are read from persons_dataframe.csv.
+        """
+        iters_path = join(path, 'ITERS')
+        iter_num = max([int(file.split('.')[1]) for file in listdir(iters_path)
+                        if file != '.DS_Store'])
+        population_path = join(iters_path, 'it.{0}/{0}.population.csv.gz'
+                               .format(iter_num))
+        attributes_path = join(path, 'outputPersonAttributes.xml.gz')
+        persons_path = join(path, 'persons_dataframe.csv')
+
+        if not exists(population_path) or not exists(attributes_path):
+            return cls.from_frame(pd.read_csv(persons_path))
+
+        pids = read_population_ids(population_path)
+        store = cls(pids)
+        attributes = read_person_attributes(attributes_path)
+        store.set_attribute('income', attributes)
+        if 'age' in attributes:
+            store.set_attribute('age', attributes)
+        elif exists(persons_path):
+            store.set_attribute(
+                'age', pd.read_csv(persons_path, usecols=['PID', 'Age'])
+                .rename(columns={'Age': 'age'}))
+        return store
+
+    def set_attribute(self, name, df):
+        """Fill the attribute array name from the (PID, name) columns of df"""
+        codes = self.pid_index.encode(df['PID'].values, grow=False)
+        known = codes >= 0
+        values = pd.to_numeric(df[name], errors='coerce').values
+        getattr(self, name)[codes[known]] = values[known]
+        self._persons_df = None
+
+    def encode(self, pids):
+        """int32 codes of pids, -1 for persons unknown to the scenario"""
+        return self.pid_index.encode(pids, grow=False)
+
+    @property
+    def persons_df(self):
+        """Persons table in the layout of BistroDB.load_person"""
+        if self._persons_df is None:
+            self._persons_df = pd.DataFrame({
+                'PID': self.pid_index.ids, 'Age': self.age,
+                'income': self.income})
+        return self._persons_df
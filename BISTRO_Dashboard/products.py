@@ -0,0 +1,115 @@
+import glob
+import pickle
+from os import makedirs
+from os.path import dirname, exists, join
+
+import numpy as np
+import pandas as pd
+
+from plots import SOURCE_NAME_DATA_PAIR
+from submission import PARKING_COLUMNS, Submission, compact_array
+
+# Data of the plot sources, and the projected links of the toll circle map
+PRODUCT_NAMES = [data_name for _, data_name in SOURCE_NAME_DATA_PAIR] + \
+    ['link_data']
+# KPI of the convergence plot when it was materialized, if the run has it
+CONVERGENCE_KPI = 'modeChoice: car'
+
+
+class DataProducts(object):
+    """
+    Materialized data products of a submission: everything its plots are
+    drawn from, so that they can be rendered again without the raw outputs
+    or the database.
+
+    Products are pickled to <root>/<scenario>/<name>.pkl.
+    """
+
+    def __init__(self, scenario, name, route_ids, products):
+        self.scenario = scenario
+        self.name = name
+        self.route_ids = route_ids
+        self.products = products
+
+    @property
+    def sub_key(self):
+        return '{}/{}'.format(self.scenario, self.name)
+
+    def __getitem__(self, name):
+        return self.products[name]
+
+    def get(self, name, default=None):
+        return self.products.get(name, default)
+
+    @classmethod
+    def from_submission(cls, submission):
+        """Compute (if needed) and collect the data products of submission"""
+        submission.get_data()
+        submission.make_data_sources()
+        products = {name: getattr(submission, name) for name in PRODUCT_NAMES}
+
+        kpis = submission.iteration_history.kpis
+        kpi = CONVERGENCE_KPI if CONVERGENCE_KPI in kpis else (kpis + [''])[0]
+        products['convergence_kpi'] = kpi
+        products['convergence_kpi_data'] = \
+            submission.make_convergence_kpi_data(kpi)
+
+        # daily parking overhead per TAZ, for the difference between a pair
+        taz_index = Submission.load_taz_index(submission.scenario)
+        parking = {'TAZ': taz_index.ids.astype(str)}
+        for col in PARKING_COLUMNS:
+            totals = submission.parking_overhead[col].sum(axis=1)
+            parking[col] = np.zeros(len(taz_index))
+            parking[col][:len(totals)] = totals
+        products['parking_overhead_by_taz'] = parking
+
+        return cls(submission.scenario, submission.name, submission.route_ids,
+                   products)
+
+    @staticmethod
+    def path(scenario, name, root='products'):
+        return join(root, scenario, name + '.pkl')
+
+    def save(self, root='products'):
+        path = self.path(self.scenario, self.name, root=root)
+        try:
+            makedirs(dirname(path))
+        except OSError:
+            pass
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=2)
+        return path
+
+    @classmethod
+    def load(cls, scenario, name, root='products'):
+        with open(cls.path(scenario, name, root=root), 'rb') as f:
+            return pickle.load(f)
+
+    @classmethod
+    def find(cls, root='products'):
+        """(scenario, name) of all the materialized submissions"""
+        return sorted(
+            tuple(path[len(root):].strip('/')[:-len('.pkl')].split('/', 1))
+            for path in glob.glob(join(root, '*', '*.pkl')))
+
+    @classmethod
+    def exists(cls, scenario, name, root='products'):
+        return exists(cls.path(scenario, name, root=root))
+
+
+def parking_overhead_delta_data(products1, products2):
+    """
+    Per-TAZ difference of the daily parking overhead between two
+    materialized submissions (products2 - products1), in the layout of
+    Submission.make_parking_overhead_delta_data.
+    """
+    frames = [pd.DataFrame(products['parking_overhead_by_taz']).set_index('TAZ')
+              for products in (products1, products2)]
+    frames = [frame.reindex(frames[0].index.union(frames[1].index),
+                            fill_value=0) for frame in frames]
+
+    data = {'x': compact_array(np.arange(len(frames[0]))),
+            'TAZ': frames[0].index.values.astype(str)}
+    for col in PARKING_COLUMNS:
+        data[col] = compact_array(frames[1][col].values - frames[0][col].values)
+    return data
@@ -0,0 +1,263 @@
+"""
+Instrumentation of the data loading and processing of the dashboard.
+
+instrument() wraps every load_* and make_* method of a class (and
+get_data) so that each call records its wall time, the rows of the
+tables it reads and returns, and its peak memory delta, attributed to the
+submission being processed. Nothing is recorded until enable() is called.
+
+>>> enable(memory=True)
+>>> instrument(Submission)
+>>> instrument(BistroDB)
+>>> submission.get_data()
+>>> summary()
+"""
+import cProfile
+import importlib.util
+import inspect
+import json
+import re
+import time
+import tracemalloc
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+INSTRUMENTED_PREFIXES = ('load_', 'make_', 'get_data')
+RECORD_COLUMNS = ['submission', 'method', 'seconds', 'rows_in', 'rows_out',
+                  'memory_delta']
+
+# Calls recorded since enable() or reset(), as tuples of RECORD_COLUMNS
+_records = []
+# Instrumented calls in progress, outermost first
+_stack = []
+_enabled = {'timing': False, 'memory': False}
+
+
+class _Call(object):
+    __slots__ = ('rows_in', 'memory_start', 'memory_peak')
+
+    def __init__(self):
+        self.rows_in = 0
+        self.memory_start = 0
+        self.memory_peak = 0
+
+
+def enable(memory=False):
+    """
+    Start recording. Memory tracing (tracemalloc) slows down allocations
+    noticeably and is only started with memory=True.
+    """
+    _enabled['timing'] = True
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled['memory'] = memory
+
+
+def disable():
+    _enabled['timing'] = False
+    if _enabled['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled['memory'] = False
+
+
+def is_enabled():
+    return _enabled['timing']
+
+
+def reset():
+    del _records[:]
+
+
+def count_rows(value):
+    """Rows of a table-like value: DataFrame, array, dict of columns..."""
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value)
+    if isinstance(value, dict):
+        # column data: length of its longest column
+        lengths = [len(col) for col in value.values()
+                   if isinstance(col, (list, np.ndarray, pd.Series))]
+        return max(lengths) if lengths else 0
+    if isinstance(value, (tuple, list)) and value and \
+            all(isinstance(item, (pd.DataFrame, dict)) for item in value):
+        # several tables, e.g. make_transit_cb_data
+        return sum(count_rows(item) for item in value)
+    return 0
+
+
+def input_tables(method):
+    """Names of the self.*_df tables that the source of method reads"""
+    try:
+        source = inspect.getsource(method)
+    except (IOError, TypeError):
+        return ()
+    return tuple(sorted(set(re.findall(r'self\.(\w+_df)\b', source))))
+
+
+def _submission_label(obj):
+    name = getattr(obj, 'name', None)
+    scenario = getattr(obj, 'scenario', None)
+    if isinstance(name, str) and isinstance(scenario, str):
+        return '{}/{}'.format(scenario, name)
+    return None
+
+
+def _memory_checkpoint():
+    """
+    Fold the traced peak into the calls in progress, and reset it. Before
+    Python 3.9 the peak cannot be reset and the deltas are upper bounds.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    for _, call in _stack:
+        call.memory_peak = max(call.memory_peak, peak)
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    return current
+
+
+def timed(method, name):
+    """
+    Wrap method so that its calls are recorded as name. Rows in are the
+    rows of the tables passed as arguments and of the self.*_df tables
+    the method reads.
+    """
+    tables = input_tables(method)
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if not _enabled['timing']:
+            return method(*args, **kwargs)
+
+        call = _Call()
+        call.rows_in = sum(count_rows(arg) for arg in args[1:]) + \
+            sum(count_rows(arg) for arg in kwargs.values())
+        if args and tables:
+            # tables not loaded yet are not loaded by counting their rows
+            loaded = getattr(args[0], '__dict__', {})
+            call.rows_in += sum(count_rows(loaded.get(table))
+                                for table in tables)
+        label = _submission_label(args[0]) if args else None
+        if label is None:
+            label = next((frame_label for frame_label, _ in reversed(_stack)
+                          if frame_label), '')
+        memory = _enabled['memory'] and tracemalloc.is_tracing()
+        if memory:
+            call.memory_start = call.memory_peak = _memory_checkpoint()
+
+        _stack.append((label, call))
+        start = time.time()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            seconds = time.time() - start
+            if memory:
+                _memory_checkpoint()
+            _stack.pop()
+            if _stack:
+                parent = _stack[-1][1]
+                parent.memory_peak = max(parent.memory_peak, call.memory_peak)
+        _records.append((
+            label, name, seconds, call.rows_in, count_rows(result),
+            call.memory_peak - call.memory_start if memory else np.nan))
+        return result
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def instrument(cls, prefixes=INSTRUMENTED_PREFIXES):
+    """
+    Wrap, in place, the methods (and class/static methods) of cls whose
+    name starts with one of prefixes. Instrumenting twice is a no-op.
+    """
+    for attr, member in list(vars(cls).items()):
+        if not attr.startswith(prefixes):
+            continue
+        name = '{}.{}'.format(cls.__name__, attr)
+        if isinstance(member, (classmethod, staticmethod)):
+            if getattr(member.__func__, 'instrumented', False):
+                continue
+            setattr(cls, attr, type(member)(timed(member.__func__, name)))
+        elif callable(member) and not getattr(member, 'instrumented', False):
+            setattr(cls, attr, timed(member, name))
+    return cls
+
+
+def records():
+    """All the recorded calls, one row per call"""
+    return pd.DataFrame.from_records(_records, columns=RECORD_COLUMNS)
+
+
+def summary(submission=None):
+    """
+    Calls aggregated per (submission, method), slowest first: number of
+    calls, total wall time, rows in and out, largest peak memory delta
+    """
+    df = records()
+    if submission is not None:
+        df = df.loc[df['submission'] == submission]
+    grouped = df.groupby(['submission', 'method'], sort=False)
+    out = grouped.agg(OrderedDict([
+        ('seconds', 'sum'), ('rows_in', 'max'), ('rows_out', 'max'),
+        ('memory_delta', 'max')]))
+    out.insert(0, 'calls', grouped.size())
+    return out.reset_index().sort_values('seconds', ascending=False)
+
+
+def dump(path):
+    """Write the recorded calls and their summary to a JSON file"""
+    def rows(df):
+        return [{col: (None if isinstance(value, float) and np.isnan(value)
+                       else value.item() if hasattr(value, 'item') else value)
+                 for col, value in row.items()}
+                for row in df.to_dict(orient='records')]
+
+    with open(path, 'w') as f:
+        json.dump({'memory_traced': _enabled['memory'],
+                   'summary': rows(summary()), 'calls': rows(records())},
+                  f, indent=1)
+    return path
+
+
+class capture(object):
+    """
+    Profile the code run in the context with cProfile, or pyinstrument
+    when installed and requested, and save the profile to path (.prof
+    stats for cProfile, .html for pyinstrument).
+
+    >>> with capture('switch.prof'):
+    ...     update_sub_order('value', old, new)
+    """
+
+    def __init__(self, path, engine='cprofile'):
+        self.path = path
+        self.engine = engine
+
+    def __enter__(self):
+        if self.engine == 'pyinstrument':
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.engine == 'pyinstrument':
+            self._profiler.stop()
+            with open(self.path, 'w') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.path)
+
+
+def profile_engines():
+    """Profilers available for capture()"""
+    engines = ['cprofile']
+    if importlib.util.find_spec('pyinstrument') is not None:
+        engines.append('pyinstrument')
+    return engines
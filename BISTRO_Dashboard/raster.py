@@ -0,0 +1,234 @@
+import numpy as np
+
+
+# Above this many visible links, the network is sent as an image
+MAX_LINK_GLYPHS = 20000
+# Links shorter than this many pixels are dropped at the current zoom level
+LOD_MIN_PIXELS = 1.0
+# Number of cells along each axis of the link grid index
+GRID_CELLS = 256
+LINK_COLOR = (0xf4, 0xa5, 0x82)
+
+LINK_COLUMNS = ['from_x', 'from_y', 'to_x', 'to_y']
+IMAGE_COLUMNS = ['image', 'x', 'y', 'dw', 'dh']
+
+
+def clip_segments(x0, y0, x1, y1, width, height):
+    """
+    Clip segments given in pixel coordinates to the [0, width] x [0, height]
+    viewport (vectorized Liang-Barsky).
+
+    Returns
+    -------
+    keep: np.ndarray of bool
+        Segments intersecting the viewport
+    x0, y0, x1, y1: np.ndarray
+        Clipped end points of the kept segments
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    t0 = np.zeros(len(x0))
+    t1 = np.ones(len(x0))
+    keep = np.ones(len(x0), dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, x0), (dx, width - x0), (-dy, y0), (dy, height - y0)):
+            r = q / p
+            keep &= ~((p == 0) & (q < 0))
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    keep &= t0 <= t1
+
+    t0, t1, dx, dy = t0[keep], t1[keep], dx[keep], dy[keep]
+    x0, y0 = x0[keep], y0[keep]
+    return keep, x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy
+
+
+def rasterize_segments(x0, y0, x1, y1, x_range, y_range, width, height,
+                       color=LINK_COLOR):
+    """
+    Draw segments into an RGBA image covering x_range x y_range.
+
+    Every segment is sampled once per pixel along its major axis (DDA) and
+    all the samples are accumulated with a single bincount. The alpha channel
+    follows the log of the number of samples per pixel so that dense areas
+    of the network stand out.
+
+    Returns
+    -------
+    image: np.ndarray of uint32, shape (height, width)
+        Packed RGBA pixels, row 0 at the bottom as expected by image_rgba
+    """
+    sx = width / float(x_range[1] - x_range[0])
+    sy = height / float(y_range[1] - y_range[0])
+    _, px0, py0, px1, py1 = clip_segments(
+        (np.asarray(x0, dtype=float) - x_range[0]) * sx,
+        (np.asarray(y0, dtype=float) - y_range[0]) * sy,
+        (np.asarray(x1, dtype=float) - x_range[0]) * sx,
+        (np.asarray(y1, dtype=float) - y_range[0]) * sy,
+        width, height)
+
+    n_samples = np.ceil(
+        np.maximum(np.abs(px1 - px0), np.abs(py1 - py0))).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(px0)), n_samples)
+    first = np.repeat(np.cumsum(n_samples) - n_samples, n_samples)
+    t = (np.arange(len(segment)) - first) / \
+        np.maximum(n_samples - 1, 1)[segment].astype(float)
+
+    ix = np.clip((px0[segment] + t * (px1 - px0)[segment]).astype(np.int64),
+                 0, width - 1)
+    iy = np.clip((py0[segment] + t * (py1 - py0)[segment]).astype(np.int64),
+                 0, height - 1)
+    counts = np.bincount(iy * width + ix, minlength=width * height)
+
+    rgba = np.zeros((height * width, 4), dtype=np.uint8)
+    hit = counts > 0
+    if hit.any():
+        rgba[hit, :3] = color
+        density = np.log1p(counts[hit]) / np.log1p(counts.max())
+        rgba[hit, 3] = (128 + 127 * density).astype(np.uint8)
+    return rgba.view(np.uint32).reshape(height, width)
+
+
+class LinkIndex(object):
+    """
+    Uniform grid index over the bounding boxes of the projected links.
+
+    Each link is registered in every cell its bounding box overlaps, and
+    the (cell, link) pairs are stored sorted by cell (CSR layout) so that a
+    viewport query only gathers the contiguous slices of the cells it
+    covers. The index is built once per scenario.
+    """
+
+    def __init__(self, link_data, cells=GRID_CELLS):
+        self.x0, self.y0, self.x1, self.y1 = [
+            np.asarray(link_data[col], dtype=float) for col in LINK_COLUMNS]
+        self.length = np.hypot(self.x1 - self.x0, self.y1 - self.y0)
+        self.xmin = np.minimum(self.x0, self.x1)
+        self.xmax = np.maximum(self.x0, self.x1)
+        self.ymin = np.minimum(self.y0, self.y1)
+        self.ymax = np.maximum(self.y0, self.y1)
+        self.cells = cells
+
+        if len(self.x0):
+            self.origin = (self.xmin.min(), self.ymin.min())
+            self.cell_size = (
+                max(self.xmax.max() - self.origin[0], 1.0) / cells,
+                max(self.ymax.max() - self.origin[1], 1.0) / cells)
+        else:
+            self.origin, self.cell_size = (0.0, 0.0), (1.0, 1.0)
+
+        cx0, cx1 = self._cell_span(self.xmin, self.xmax, 0)
+        cy0, cy1 = self._cell_span(self.ymin, self.ymax, 1)
+        n_x = cx1 - cx0 + 1
+        n_cover = n_x * (cy1 - cy0 + 1)
+        link = np.repeat(np.arange(len(self.x0)), n_cover)
+        k = np.arange(len(link)) - np.repeat(np.cumsum(n_cover) - n_cover,
+                                              n_cover)
+        cell = (cy0[link] + k // n_x[link]) * cells + cx0[link] + k % n_x[link]
+
+        order = np.argsort(cell, kind='mergesort')
+        self.cell_links = link[order]
+        self.cell_offsets = np.searchsorted(
+            cell[order], np.arange(cells * cells + 1))
+
+    def __len__(self):
+        return len(self.x0)
+
+    def _cell_span(self, low, high, axis):
+        """First and last cells covered by [low, high] along axis"""
+        to_cell = lambda v: np.clip(
+            ((v - self.origin[axis]) // self.cell_size[axis]).astype(np.int64),
+            0, self.cells - 1)
+        return to_cell(np.asarray(low)), to_cell(np.asarray(high))
+
+    def query(self, x_range, y_range, min_length=0.0):
+        """
+        Return the sorted ids of the links whose bounding box meets the
+        viewport and whose length is at least min_length.
+        """
+        if not len(self.x0):
+            return np.empty(0, dtype=np.int64)
+        cx0, cx1 = self._cell_span(x_range[0], x_range[1], 0)
+        cy0, cy1 = self._cell_span(y_range[0], y_range[1], 1)
+        rows = np.arange(cy0, cy1 + 1) * self.cells
+        candidates = np.unique(np.concatenate(
+            [self.cell_links[self.cell_offsets[r + cx0]:
+                             self.cell_offsets[r + cx1 + 1]] for r in rows]))
+
+        keep = ((self.xmax[candidates] >= x_range[0]) &
+                (self.xmin[candidates] <= x_range[1]) &
+                (self.ymax[candidates] >= y_range[0]) &
+                (self.ymin[candidates] <= y_range[1]) &
+                (self.length[candidates] >= min_length))
+        return candidates[keep]
+
+
+class LinkRasterizer(object):
+    """
+    Viewport rendering of the network links of a submission.
+
+    The projected link end points stay on the server in a LinkIndex;
+    render() returns, for the current viewport, either the visible links as
+    segment data when there are few enough of them to be drawn as glyphs, or
+    a single RGBA image of the network otherwise. Links shorter than
+    lod_min_pixels at the current zoom level are dropped in both cases.
+    Without rasterization, the glyphs are capped to the max_glyphs longest
+    visible links.
+    """
+
+    def __init__(self, index, max_glyphs=MAX_LINK_GLYPHS,
+                 lod_min_pixels=LOD_MIN_PIXELS, rasterize=True):
+        if not isinstance(index, LinkIndex):
+            index = LinkIndex(index)
+        self.index = index
+        self.max_glyphs = max_glyphs
+        self.lod_min_pixels = lod_min_pixels
+        self.rasterize = rasterize
+
+    @staticmethod
+    def empty_links():
+        return {col: [] for col in LINK_COLUMNS}
+
+    @staticmethod
+    def empty_image():
+        return {col: [] for col in IMAGE_COLUMNS}
+
+    def visible(self, x_range, y_range, width, height):
+        """Ids of the links to draw in the viewport at its zoom level"""
+        pixel_size = max((x_range[1] - x_range[0]) / float(width),
+                         (y_range[1] - y_range[0]) / float(height))
+        return self.index.query(x_range, y_range,
+                                min_length=self.lod_min_pixels * pixel_size)
+
+    def render(self, x_range, y_range, width, height):
+        """
+        Parameters
+        ----------
+        x_range, y_range: tuple of float
+            Viewport in projected (mercator) coordinates
+        width, height: int
+            Size of the plot in pixels
+
+        Returns
+        -------
+        link_data, image_data: dict
+            Data of the segment and image sources; one of them is empty
+        """
+        index = self.index
+        links = self.visible(x_range, y_range, width, height)
+        if len(links) > self.max_glyphs and not self.rasterize:
+            longest = np.argpartition(
+                -index.length[links], self.max_glyphs)[:self.max_glyphs]
+            links = np.sort(links[longest])
+        if len(links) <= self.max_glyphs:
+            return dict(from_x=index.x0[links], from_y=index.y0[links],
+                        to_x=index.x1[links], to_y=index.y1[links]), \
+                self.empty_image()
+
+        image = rasterize_segments(
+            index.x0[links], index.y0[links], index.x1[links],
+            index.y1[links], x_range, y_range, width, height)
+        return self.empty_links(), dict(
+            image=[image], x=[x_range[0]], y=[y_range[0]],
+            dw=[x_range[1] - x_range[0]], dh=[y_range[1] - y_range[0]])
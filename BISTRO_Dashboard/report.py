@@ -0,0 +1,307 @@
+"""
+Static HTML reports comparing pairs of submissions, without a Bokeh server.
+
+The data products of the submissions are computed once and materialized
+to disk; reports are then rendered from them only, so viewing or
+regenerating a report never touches the raw outputs or the database.
+Each report is a single self-contained HTML file (BokehJS inlined) with
+the tabs of the dashboard, in which the data sources that are identical
+for both submissions are only stored once.
+
+Usage::
+
+    # materialize submission directories under data/submissions, e.g. two
+    # synthetic runs...
+    python synthetic.py 15k
+    python synthetic.py 15k data/submissions/sioux_faux-15k/warm-start --seed 1
+    python report.py materialize sioux_faux-15k/warm-start sioux_faux-15k/synthetic
+    # ...or simulations of the database, by run id
+    python report.py materialize --run-ids 5673feca-f45a-11e9-ba19-acde48001122
+    # report comparing two materialized submissions
+    python report.py pair sioux_faux-15k/warm-start sioux_faux-15k/synthetic -o report.html
+    # every submission against the baseline of its scenario, and an index
+    python report.py leaderboard --output reports
+"""
+import argparse
+import io
+import multiprocessing
+from os import makedirs
+from os.path import dirname, exists, getmtime, join
+
+import numpy as np
+from bokeh.embed import file_html
+from bokeh.layouts import column, layout
+from bokeh.models.widgets import Div, Panel, Tabs
+from bokeh.resources import INLINE
+
+from export_figures import find_runs, find_submissions
+from plots import (
+    make_sources, make_submission_plots, make_tab_layouts, plot_convergence,
+    plot_convergence_summary, plot_parking_overhead_delta,
+    plot_runtime_profile, share_source)
+from products import DataProducts, parking_overhead_delta_data
+from submission import Submission
+
+SUB_ORDERS = ['submission1', 'submission2']
+BASELINE = 'warm-start'
+
+
+def materialize_submission(task):
+    """
+    Compute the data products of a submission and save them.
+
+    Parameters
+    ----------
+    task : tuple
+        (scenario, name, simulation_ids, root)
+
+    Returns
+    -------
+    path : str
+    """
+    scenario, name, simulation_ids, root = task
+    submission = Submission(name, scenario, simulation_ids=simulation_ids)
+    return DataProducts.from_submission(submission).save(root=root)
+
+
+def make_report(products1, products2):
+    """Bokeh layout of the report comparing two DataProducts"""
+    pair = dict(zip(SUB_ORDERS, (products1, products2)))
+    keys = {sub_order: products.sub_key for sub_order, products in pair.items()}
+
+    shared = {}
+    sources = {
+        sub_order: make_sources(
+            products.products, shared=shared,
+            link_index=Submission.load_link_index(
+                products.scenario, products['link_data']))
+        for sub_order, products in pair.items()}
+    plots = {
+        sub_order: make_submission_plots(
+            sources[sub_order], keys[sub_order], products.route_ids)
+        for sub_order, products in pair.items()}
+    tab_layouts = make_tab_layouts(plots, SUB_ORDERS)
+
+    convergence_plot = plot_convergence(
+        {sub_order: share_source(products['convergence_kpi_data'], shared)
+         for sub_order, products in pair.items()},
+        keys, {sub_order: products['convergence_kpi']
+               for sub_order, products in pair.items()})
+    convergence_summaries = [
+        plot_convergence_summary(
+            sources[sub_order]['convergence_summary_source'], keys[sub_order])
+        for sub_order in SUB_ORDERS]
+    parking_delta_plot = plot_parking_overhead_delta(
+        share_source(parking_overhead_delta_data(products1, products2), shared),
+        keys)
+    runtime_profile_plot = plot_runtime_profile(
+        {sub_order: sources[sub_order]['runtime_profile_source']
+         for sub_order in SUB_ORDERS}, keys)
+
+    panels = [
+        ("Inputs", [tab_layouts['inputs']]),
+        ("Scores", [[tab_layouts['scores']]]),
+        ("Outputs - Mode Choice", [tab_layouts['outputs_mode']]),
+        ("Outputs - Level of Service",
+         [[tab_layouts['outputs_los']], [parking_delta_plot]]),
+        ("Outputs - Congestion", [tab_layouts['outputs_congestion']]),
+        ("Outputs - Cost/Benefit", [tab_layouts['outputs_transitcb']]),
+        ("Outputs - Toll Revenue", [tab_layouts['outputs_toll']]),
+        ("Outputs - Sustainability", [tab_layouts['outputs_sustainability']]),
+        ("Outputs - Convergence",
+         [[convergence_plot], convergence_summaries]),
+        ("Simulation Runtime", [[runtime_profile_plot]]),
+    ]
+    tabs = Tabs(tabs=[
+        Panel(child=layout(children, sizing_mode='fixed'), title=title)
+        for title, children in panels], width=1200)
+    title_div = Div(
+        text="<b>BISTRO</b> {} vs {}".format(keys['submission1'],
+                                             keys['submission2']),
+        width=800, style={'font-size': '200%'})
+    return column([title_div, tabs])
+
+
+def write_html(path, html):
+    if dirname(path):
+        try:
+            makedirs(dirname(path))
+        except OSError:
+            pass
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+def report_pair(task):
+    """
+    Render the report of a pair of materialized submissions, unless it is
+    more recent than the products of both.
+
+    Parameters
+    ----------
+    task : tuple
+        (sub_key1, sub_key2, products_root, path, force)
+
+    Returns
+    -------
+    path, rendered : str, bool
+    """
+    sub_key1, sub_key2, root, path, force = task
+    keys = [sub_key.split('/', 1) for sub_key in (sub_key1, sub_key2)]
+    if not force and exists(path) and getmtime(path) >= max(
+            getmtime(DataProducts.path(scenario, name, root=root))
+            for scenario, name in keys):
+        return path, False
+
+    products1, products2 = [DataProducts.load(scenario, name, root=root)
+                            for scenario, name in keys]
+    write_html(path, file_html(
+        make_report(products1, products2), INLINE,
+        title='{} vs {}'.format(sub_key1, sub_key2)))
+    return path, True
+
+
+def submission_score(products):
+    """Submission Score of the normalized scores, nan when missing"""
+    scores = products['normalized_scores_data']
+    names = list(scores['Component Name'])
+    if 'Submission Score' not in names:
+        return np.nan
+    return float(scores['Weighted Score'][names.index('Submission Score')])
+
+
+def leaderboard_index(rows):
+    """
+    HTML page linking to the reports of the leaderboard.
+
+    Parameters
+    ----------
+    rows : list of tuple
+        (scenario, name, score, report path relative to the index)
+    """
+    lines = ['<html><head><meta charset="utf-8"><title>BISTRO leaderboard'
+             '</title></head><body>']
+    for scenario in sorted({row[0] for row in rows}):
+        lines.append('<h2>{}</h2><table><tr><th>Submission</th>'
+                     '<th>Submission Score</th></tr>'.format(scenario))
+        scenario_rows = sorted(
+            [row for row in rows if row[0] == scenario],
+            key=lambda row: (np.isnan(row[2]), row[2]))
+        for _, name, score, path in scenario_rows:
+            lines.append('<tr><td><a href="{}">{}</a></td><td>{:.4f}</td>'
+                         '</tr>'.format(path, name, score))
+        lines.append('</table>')
+    lines.append('</body></html>')
+    return '\n'.join(lines)
+
+
+def make_leaderboard(root='products', output='reports', baseline=BASELINE,
+                     jobs=1, force=False):
+    """
+    Render, in parallel, the report of every materialized submission
+    against the baseline of its scenario (the first submission when the
+    scenario has no baseline), and the index of all the reports.
+    """
+    materialized = DataProducts.find(root=root)
+    scenarios = {}
+    for scenario, name in materialized:
+        scenarios.setdefault(scenario, []).append(name)
+
+    tasks = []
+    rows = []
+    for scenario, names in sorted(scenarios.items()):
+        reference = baseline if baseline in names else names[0]
+        for name in names:
+            relative_path = join(scenario, '{}_vs_{}.html'.format(
+                reference, name))
+            tasks.append(('{}/{}'.format(scenario, reference),
+                          '{}/{}'.format(scenario, name), root,
+                          join(output, relative_path), force))
+            rows.append((scenario, name, submission_score(
+                DataProducts.load(scenario, name, root=root)), relative_path))
+
+    pool = multiprocessing.Pool(processes=max(1, min(jobs, len(tasks))))
+    try:
+        for path, rendered in pool.imap_unordered(report_pair, tasks):
+            print('{}: {}'.format(path, 'rendered' if rendered else
+                                  'up to date'))
+    finally:
+        pool.close()
+        pool.join()
+
+    index_path = join(output, 'index.html')
+    write_html(index_path, leaderboard_index(rows))
+    return index_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--products', default='products',
+                        help='root of the materialized data products '
+                             '(default: products)')
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='number of worker processes')
+    commands = parser.add_subparsers(dest='command')
+
+    materialize = commands.add_parser(
+        'materialize', help='compute and save the data products of '
+                            'submissions')
+    materialize.add_argument(
+        'submissions', nargs='+',
+        help='scenario/name submission directories, or run ids with '
+             '--run-ids')
+    materialize.add_argument('--run-ids', action='store_true',
+                             help='load the submissions from the database')
+
+    pair = commands.add_parser('pair', help='report comparing two submissions')
+    pair.add_argument('submission1', help='scenario/name')
+    pair.add_argument('submission2', help='scenario/name')
+    pair.add_argument('-o', '--output', default='report.html')
+
+    leaderboard = commands.add_parser(
+        'leaderboard', help='report of every submission against the baseline '
+                            'of its scenario')
+    leaderboard.add_argument('--output', default='reports',
+                             help='root of the reports (default: reports)')
+    leaderboard.add_argument('--baseline', default=BASELINE)
+    leaderboard.add_argument('--force', action='store_true',
+                             help='render even the reports whose products '
+                                  'did not change')
+    args = parser.parse_args(argv)
+
+    if args.command == 'materialize':
+        try:
+            runs = (find_runs if args.run_ids else find_submissions)(
+                args.submissions)
+        except IOError as e:
+            parser.error(str(e))
+        tasks = [(scenario, name, simulation_ids, args.products)
+                 for scenario, name, simulation_ids in runs]
+        pool = multiprocessing.Pool(processes=max(1, min(args.jobs,
+                                                         len(tasks))))
+        try:
+            for path in pool.imap_unordered(materialize_submission, tasks):
+                print(path)
+        finally:
+            pool.close()
+            pool.join()
+    elif args.command == 'pair':
+        missing = [sub_key for sub_key in (args.submission1, args.submission2)
+                   if not exists(DataProducts.path(*sub_key.split('/', 1),
+                                                   root=args.products))]
+        if missing:
+            parser.error('not materialized: {}'.format(', '.join(missing)))
+        path, _ = report_pair((args.submission1, args.submission2,
+                               args.products, args.output, True))
+        print(path)
+    elif args.command == 'leaderboard':
+        print(make_leaderboard(root=args.products, output=args.output,
+                               baseline=args.baseline, jobs=args.jobs,
+                               force=args.force))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
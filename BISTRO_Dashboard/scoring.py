@@ -0,0 +1,169 @@
+import warnings
+from os.path import dirname, join
+
+import numpy as np
+import pandas as pd
+import yaml
+
+SCORE_COMPONENT = 'Submission Score'
+CASE_STUDY = yaml.safe_load(
+    open(join(dirname(__file__), 'casestudy_kpis.yaml')))
+
+
+def make_score_matrix(scores, values='Weighted Score'):
+    """
+    (run x component) matrix of one column of the long score table of
+    BistroDB.load_score_table, with the Submission Score first.
+    """
+    matrix = scores.pivot_table(index='simulation_id',
+                                columns='Component Name', values=values,
+                                aggfunc='mean')
+    components = sorted(matrix.columns)
+    if SCORE_COMPONENT in components:
+        components.remove(SCORE_COMPONENT)
+        components.insert(0, SCORE_COMPONENT)
+    return matrix[components]
+
+
+def rank(scores):
+    """1-based ranks by increasing score, nan scores last"""
+    scores = np.asarray(scores, dtype=float)
+    order = np.lexsort((scores, np.isnan(scores)))
+    ranks = np.empty(len(scores), dtype=np.int32)
+    ranks[order] = np.arange(1, len(scores) + 1)
+    return ranks
+
+
+def case_study_categories(case_study=CASE_STUDY):
+    """Components, group and aggregate scores in the order of the plot"""
+    categories = []
+    for group in case_study['groups']:
+        categories += group['components']
+        if group['name'] not in group['components']:
+            categories.append(group['name'])
+    return categories + [case_study['aggregate']]
+
+
+class ScoringEngine(object):
+    """
+    Vectorized (what-if) scoring of any number of simulations.
+
+    The standardized score of every (run, component) is computed once from
+    the score table, as Weighted Score / Weight, or as (Raw Score - Z-Mean)
+    / Z-StdDev when the weight is zero or the weighted score missing.
+    Weighted, group and aggregate scores under any weights are then a few
+    matrix products over all the runs, with the groups of
+    casestudy_kpis.yaml:
+
+        weighted = standardized * component weights
+        group = mean of the weighted scores of the group components
+        aggregate = group scores . group weights
+
+    The default component weights are the median of the Weight of each
+    component over the runs: the runs of a scenario are scored with the
+    same weights, and the median keeps them when a few runs were scored
+    with others. Components without any weight in the table weigh 1.
+
+    Parameters
+    ----------
+    scores : pd.DataFrame
+        Score table, in the layout of BistroDB.load_score_table (a table
+        without 'simulation_id' is a single run)
+    case_study : dict
+        Groups and aggregate, in the layout of casestudy_kpis.yaml
+    """
+
+    def __init__(self, scores, case_study=CASE_STUDY):
+        if 'simulation_id' not in scores:
+            scores = scores.assign(simulation_id='')
+        scores = scores.copy()
+        for col in ('Weight', 'Z-Mean', 'Z-StdDev', 'Raw Score',
+                    'Weighted Score'):
+            if col not in scores:
+                scores[col] = np.nan
+            scores[col] = pd.to_numeric(scores[col], errors='coerce')
+
+        self.case_study = case_study
+        self.groups = [group['name'] for group in case_study['groups']]
+        self.default_group_weights = np.array(
+            [group['weight'] for group in case_study['groups']], dtype=float)
+
+        # components of the groups, in the order of the case study
+        self.components = []
+        for group in case_study['groups']:
+            self.components += [component for component in group['components']
+                                if component not in self.components]
+        membership = np.zeros((len(self.components), len(self.groups)))
+        for j, group in enumerate(case_study['groups']):
+            for component in group['components']:
+                membership[self.components.index(component), j] = 1.0
+        self.membership = membership
+
+        self.runs = list(pd.unique(scores['simulation_id']))
+        matrices = {col: make_score_matrix(scores, values=col)
+                    .reindex(index=self.runs, columns=self.components)
+                    for col in ('Weight', 'Z-Mean', 'Z-StdDev', 'Raw Score',
+                                'Weighted Score')}
+        self.run_index = {run: i for i, run in enumerate(self.runs)}
+
+        weight = matrices['Weight'].values
+        weighted = matrices['Weighted Score'].values
+        no_weight = np.isnan(weight)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = (matrices['Raw Score'].values -
+                       matrices['Z-Mean'].values) / matrices['Z-StdDev'].values
+            unweighted = weighted / np.where(no_weight, 1.0, weight)
+        # a zero weight (or a missing weighted score) loses the standardized
+        # score, which is then recovered from the standardization parameters
+        self.standardized = np.where(
+            np.isfinite(unweighted) & (no_weight | (weight != 0)) |
+            ~np.isfinite(z_score), unweighted, z_score)
+        # weights of the score table, 1 for components without any
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            # components without any weight are all-nan columns
+            warnings.simplefilter('ignore', RuntimeWarning)
+            default_weights = np.nanmedian(weight, axis=0) if len(weight) \
+                else np.full(len(self.components), np.nan)
+        self.default_component_weights = np.where(
+            np.isnan(default_weights), 1.0, default_weights)
+
+    def weighted_scores(self, component_weights=None):
+        """(run x component) weighted scores"""
+        if component_weights is None:
+            component_weights = self.default_component_weights
+        return self.standardized * np.asarray(component_weights, dtype=float)
+
+    def group_scores(self, component_weights=None):
+        """(run x group) mean weighted score of the components of each group"""
+        weighted = self.weighted_scores(component_weights)
+        known = ~np.isnan(weighted)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(known, weighted, 0.0).dot(self.membership) / \
+                known.dot(self.membership)
+
+    def aggregate_scores(self, group_weights=None, component_weights=None):
+        """Aggregate score of every run"""
+        if group_weights is None:
+            group_weights = self.default_group_weights
+        return self.group_scores(component_weights).dot(
+            np.asarray(group_weights, dtype=float))
+
+    def case_study_scores(self, run=''):
+        """
+        Components, group and aggregate scores of one run with the default
+        weights, as a 'Component Name' -> 'Weighted Score' DataFrame
+        """
+        i = self.run_index[run]
+        weighted = self.weighted_scores()[i]
+        groups = self.group_scores()[i]
+        aggregate = self.aggregate_scores()[i]
+
+        names = list(self.components)
+        values = list(weighted)
+        for group, value in zip(self.groups, groups):
+            if group not in names:
+                names.append(group)
+                values.append(value)
+        names.append(self.case_study['aggregate'])
+        values.append(aggregate)
+        return pd.DataFrame({'Component Name': names, 'Weighted Score': values})
@@ -0,0 +1,130 @@
+import hashlib
+
+import numpy as np
+from bokeh.protocol import Protocol
+
+
+# A same-length column is patched cell by cell when at most this fraction of
+# its values changed, otherwise the whole column is sent again
+PATCH_MAX_FRACTION = 0.25
+
+# Per-column content digests of the data last sent through each source,
+# keyed by source id
+_column_digests = {}
+
+
+def column_digest(values):
+    """Content digest of a data source column"""
+    arr = np.asarray(values)
+    digest = hashlib.sha1(str((arr.dtype.str, arr.shape)).encode())
+    if arr.dtype.kind in 'biufcmM':
+        digest.update(np.ascontiguousarray(arr).tobytes())
+    else:
+        digest.update('\x00'.join(map(str, arr.ravel())).encode())
+    return digest.hexdigest()
+
+
+def data_digest(data):
+    """Content digest of the whole data of a source"""
+    digest = hashlib.sha1()
+    for col in sorted(data):
+        digest.update('{}\x00{}'.format(col, column_digest(data[col])).encode())
+    return digest.hexdigest()
+
+
+def changed_cells(old, new):
+    """Indices of the cells that differ between two 1-D columns"""
+    old, new = np.asarray(old), np.asarray(new)
+    if old.dtype.kind == 'f' and new.dtype.kind == 'f':
+        same = (old == new) | (np.isnan(old) & np.isnan(new))
+    else:
+        same = old == new
+    return np.nonzero(~np.asarray(same, dtype=bool))[0]
+
+
+def update_source(source, data):
+    """
+    Send data to source, transmitting only what changed.
+
+    - nothing is sent when every column has the same content digest as the
+      data previously sent (links, toll circle bounds...)
+    - when the columns and their lengths are unchanged, the columns with few
+      changed values are sent with source.patch, cell by cell
+    - the other changed columns are sent alone with source.data.update,
+      unless the set of columns itself changed
+
+    Returns
+    -------
+    action: str
+        'skip', 'patch', 'columns' or 'replace'
+    """
+    digests = _column_digests.get(source.id)
+    if digests is None:
+        digests = {col: column_digest(values)
+                   for col, values in source.data.items()}
+    new_digests = {col: column_digest(values) for col, values in data.items()}
+    _column_digests[source.id] = new_digests
+
+    if new_digests == digests:
+        return 'skip'
+    if set(new_digests) != set(digests):
+        source.data = data
+        return 'replace'
+
+    changed = [col for col in data if new_digests[col] != digests[col]]
+    old_length = len(next(iter(source.data.values()), []))
+    new_length = len(next(iter(data.values()), []))
+    if old_length != new_length:
+        source.data.update({col: data[col] for col in changed})
+        return 'columns'
+
+    patches = {}
+    columns = {}
+    for col in changed:
+        old, new = source.data[col], data[col]
+        if np.ndim(new) != 1 or np.ndim(old) != 1:
+            columns[col] = new
+            continue
+        cells = changed_cells(old, new)
+        if len(cells) <= PATCH_MAX_FRACTION * new_length:
+            values = np.asarray(new)[cells].tolist()
+            patches[col] = list(zip(cells.tolist(), values))
+        else:
+            columns[col] = new
+
+    if columns:
+        source.data.update(columns)
+    if patches:
+        source.patch(patches)
+    return 'patch' if patches and not columns else 'columns'
+
+
+class DocumentTraffic(object):
+    """
+    Count the PATCH-DOC messages, and their size in bytes, that a document
+    sends to the browser while the context is active.
+
+    >>> with DocumentTraffic(curdoc()) as traffic:
+    ...     update_sub_order('value', old, new)
+    >>> traffic.bytes
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.messages = 0
+        self.bytes = 0
+        self._protocol = Protocol("1.0")
+
+    def _on_change(self, event):
+        message = self._protocol.create('PATCH-DOC', [event])
+        self.messages += 1
+        self.bytes += len(message.header_json) + len(message.metadata_json) + \
+            len(message.content_json) + \
+            sum(len(payload) for _, payload in message.buffers)
+
+    def __enter__(self):
+        self.doc.on_change(self._on_change)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.doc.remove_on_change(self._on_change)
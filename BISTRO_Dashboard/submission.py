@@ -1,8 +1,10 @@
 import pdb
+import copy
 import math
+from collections import OrderedDict, namedtuple
 import numpy as np 
 from os import listdir
-from os.path import dirname, join
+from os.path import dirname, exists, join
 import pandas as pd 
 # import seaborn as sns 
 
@@ -10,6 +12,18 @@ from bokeh.models import ColumnDataSource
 from bokeh.palettes import Dark2, Category10, Category20, Plasma256, YlOrRd
 
 from db_loader import BistroDB, parse_credential
+from fares import FareIndex, expand_fare_rules
+from id_index import IdDictionary, IdIndex, pad_to
+from iteration_history import (
+    IterationHistory, find_stopwatch_files, read_stopwatch,
+    stage_runtime_distribution)
+from population import PopulationStore
+from raster import LinkIndex
+from scoring import ScoringEngine
+from trip_cube import TripCube
+from timebins import (
+    DAY_HOURS, HOUR, bin_mean, bin_sum, flat_codes, fold_hours, hour_codes,
+    period_codes, value_codes)
 
 HOURS = [str(h) for h in range(24)]
 
@@ -17,6 +31,241 @@ BUSES_LIST = ['BUS-DEFAULT', 'BUS-SMALL-HD', 'BUS-STD-HD', 'BUS-STD-ART']
 
 TRANSIT_SCALE_FACTOR = 0.1
 
+# Outputs of a submission directory read by get_data in file mode
+SUBMISSION_FILES = [
+    'network.csv', 'competition/submission-inputs/FrequencyAdjustment.csv',
+    'competition/submission-inputs/MassTransitFares.csv',
+    'competition/submission-inputs/ModeIncentives.csv',
+    'competition/submission-inputs/VehicleFleetMix.csv',
+    'competition/submissionScores.csv', 'activities_dataframe.csv',
+    'households_dataframe.csv', 'persons_dataframe.csv',
+    'legs_dataframe.csv', 'path_traversals_dataframe.csv',
+    'trips_dataframe.csv', 'modeChoice.csv', 'realizedModeChoice.csv',
+    'ITERS']
+
+PARKING_COLUMNS = ['outboundParkingOverheadTime', 'inboundParkingOverheadTime',
+                   'inboundParkingOverheadCost']
+
+# Start time intervals of make_congestion_travel_speed_data, in hours
+TRAVEL_SPEED_EDGES = [6, 8, 10, 12, 14, 16, 18, 20, 22, 24]
+TRAVEL_SPEED_INTERVALS = ['[{}, {})'.format(start, end) for start, end in
+                          zip(TRAVEL_SPEED_EDGES[:-1], TRAVEL_SPEED_EDGES[1:])]
+
+# Bus ridership bins of make_congestion_bus_vmt_by_ridership_data, in
+# percents of the seating capacity then of the standing room
+RIDERSHIP_EDGES = [0, 0.01, 50, 100, 150.0, 200.0]
+RIDERSHIP_BINS = [
+    'empty\n(0 passengers)',
+    'low ridership\n(< 50% seating capacity)',
+    'medium ridership\n(< seating capacity)',
+    'high ridership\n(< 50% standing capacity)',
+    'crowded\n(<= standing capacity)'
+]
+DRIVING_STATES = ["fetch", "fare"]
+
+# Service periods of make_los_crowding_data: AM peak = 7am-10am, PM Peak =
+# 5pm-8pm, Early Morning, Midday, Late Evening = in between
+SERVICE_PERIOD_EDGES = [0, 25200, 36000, 61200, 72000, 86400]
+SERVICE_PERIODS = ["Early Morning (12a-7a)", "AM Peak (7a-10a)",
+                   "Midday (10a-5p)", "PM Peak (5p-8p)", "Late Evening (8p-12a)"]
+
+# Trip modes paying a fare (and getting incentives), and paying fuel and tolls
+FARE_MODES = ['walk_transit', 'drive_transit', 'ride_hail']
+DRIVE_MODES = ['car', 'drive_transit']
+
+# Age groups of the persons, in years
+AGE_EDGES = [0, 18, 30, 40, 50, 60, float('inf')]
+AGE_GROUPS = ['[{}, {})'.format(start, end) for start, end in
+              zip(AGE_EDGES[:-1], AGE_EDGES[1:])]
+
+# Income groups of the persons, in $ per year
+INCOME_EDGES = [0, 10000, 25000, 50000, 75000, 100000, float('inf')]
+INCOME_GROUPS = ['[$0, $10k)', '[$10k, $25k)', '[$25k, $50k)', '[$50k, $75k)',
+                 '[$75k, $100k)', '[$100k, inf)']
+
+# Distance groups of the trips, in miles
+DISTANCE_EDGES = [0, .5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 5, 7.5, 10, 40]
+DISTANCE_GROUPS = ['[{}, {})'.format(start, end) for start, end in
+                   zip(DISTANCE_EDGES[:-1], DISTANCE_EDGES[1:])]
+
+# Products made before the product of the key by make_data_product
+PRODUCT_DEPENDENCIES = {
+    'los_parking_overhead_data': ['parking_overhead'],
+    'los_travel_expenditure_data': ['trip_costs'],
+    'los_cost_burden_by_income_data': ['trip_costs'],
+    'transit_inc_by_mode_data': ['trip_costs'],
+    'mode_choice_by_age_group_data': ['trip_cube'],
+    'mode_choice_by_income_group_data': ['trip_cube'],
+    'mode_choice_by_distance_data': ['trip_cube'],
+}
+
+# Raw tables of a run, and the codes encoded from them, that pushdown
+# submissions only load when a make_* method needs them
+RAW_ATTRIBUTES = ('legs_df', 'paths_df', 'trips_df', 'trip_pid_codes',
+                  'path_vehicle_codes', 'leg_vehicle_codes', 'link_codes',
+                  'ride_hail_paths')
+
+# Products made from the raw tables, but for the PUSHDOWN_PRODUCTS of
+# pushdown submissions, aggregated by the database
+RAW_PRODUCTS = (
+    'trip_cube', 'mode_choice_by_income_group_data',
+    'mode_choice_by_age_group_data', 'mode_choice_by_distance_data',
+    'congestion_travel_time_by_mode_data',
+    'congestion_travel_time_per_passenger_trip_data',
+    'congestion_miles_traveled_per_mode_data',
+    'congestion_car_vmt_by_time_data', 'congestion_bus_vmt_by_ridership_data',
+    'congestion_on_demand_vmt_by_phases_data', 'congestion_travel_speed_data',
+    'trip_costs', 'los_travel_expenditure_data',
+    'los_cost_burden_by_income_data', 'los_crowding_data',
+    'transit_cb_costs_data', 'transit_cb_benefits_data',
+    'transit_inc_by_mode_data', 'toll_revenue_by_time_data',
+    'sustainability_25pm_per_mode_data', 'sustainability_ghg_per_mode_data')
+PUSHDOWN_PRODUCTS = (
+    'congestion_car_vmt_by_time_data', 'congestion_bus_vmt_by_ridership_data',
+    'congestion_on_demand_vmt_by_phases_data', 'congestion_travel_speed_data',
+    'toll_revenue_by_time_data')
+
+# Products made together, as a tuple, by one make_* method
+PRODUCT_TUPLES = OrderedDict([
+    ('make_routesched_input_data', ['routesched_input_line_data',
+                                    'routesched_input_start_data',
+                                    'routesched_input_end_data']),
+    ('make_transit_cb_data', ['transit_cb_costs_data',
+                              'transit_cb_benefits_data']),
+])
+
+# Raw tables sampled for estimates, with the codes aligned on their rows
+SAMPLED_TABLES = OrderedDict([
+    ('trips_df', ['trip_pid_codes']),
+    ('legs_df', ['leg_vehicle_codes']),
+    ('paths_df', ['path_vehicle_codes', 'ride_hail_paths']),
+])
+
+# The products made from the raw tables are first estimated, for the first
+# render of progressive dashboards, from a uniform sample of fraction of
+# the rows drawn with a RandomState of seed. Estimates are scaled by
+# 1 / fraction ** scale_power: 1 for sums and counts, 2 for the transit
+# costs and benefits (summed over a join of the sampled bus paths and legs)
+# and 0 for means and ratios, left as they are. product_samples changes the
+# fraction and seed of the products.
+ProductSample = namedtuple('ProductSample',
+                           ['fraction', 'seed', 'scale_power'])
+SAMPLE_FRACTION = 0.1
+SAMPLE_SEED = 0
+SAMPLED_PRODUCTS = OrderedDict(
+    (name, ProductSample(SAMPLE_FRACTION, SAMPLE_SEED, scale_power))
+    for name, scale_power in [
+        ('mode_choice_by_income_group_data', 1),
+        ('mode_choice_by_age_group_data', 1),
+        ('mode_choice_by_distance_data', 1),
+        ('congestion_travel_time_by_mode_data', 0),
+        ('congestion_travel_time_per_passenger_trip_data', 0),
+        ('congestion_miles_traveled_per_mode_data', 1),
+        ('congestion_car_vmt_by_time_data', 1),
+        ('congestion_bus_vmt_by_ridership_data', 1),
+        ('congestion_on_demand_vmt_by_phases_data', 1),
+        ('congestion_travel_speed_data', 0),
+        ('los_travel_expenditure_data', 0),
+        ('los_crowding_data', 1),
+        ('transit_cb_costs_data', 2),
+        ('transit_cb_benefits_data', 2),
+        ('transit_inc_by_mode_data', 1),
+        ('toll_revenue_by_time_data', 1),
+        ('sustainability_25pm_per_mode_data', 1),
+        ('sustainability_ghg_per_mode_data', 1),
+    ])
+
+
+
+def product_samples(fraction=None, seed=None, settings=None):
+    '''
+    Returns SAMPLED_PRODUCTS with the fraction and seed of every product
+    replaced by fraction and seed when given, then by the 'fraction' and
+    'seed' of the products of settings, a dict keyed by product name (as
+    read from a YAML file)
+    '''
+    samples = OrderedDict()
+    for name, product in SAMPLED_PRODUCTS.items():
+        if fraction is not None:
+            product = product._replace(fraction=float(fraction))
+        if seed is not None:
+            product = product._replace(seed=int(seed))
+        setting = (settings or {}).get(name, {})
+        if 'fraction' in setting:
+            product = product._replace(fraction=float(setting['fraction']))
+        if 'seed' in setting:
+            product = product._replace(seed=int(setting['seed']))
+        samples[name] = product
+    return samples
+
+
+# Products of the raw tables that a sample of their rows does not estimate
+# (per person values), left out of the estimates
+UNSAMPLED_PRODUCTS = ('los_cost_burden_by_income_data',)
+
+# Columns of the sampled products holding categories, never scaled
+SAMPLE_KEY_COLUMNS = ('Hour', 'hour_of_day')
+
+# float64 columns are sent as float32 when the float32 resolution is finer
+# than this fraction of the range of their values
+FLOAT32_RESOLUTION = 1e-6
+
+
+def compact_array(values):
+    '''
+    Returns values as a numpy array of the smallest dtype Bokeh can send
+    with its binary array encoding without visible loss: int64 as int32
+    when in range, float64 as float32 when precise enough. Object arrays
+    holding only numbers (left by appends of object frames) are converted
+    first; other arrays are returned unchanged.
+    '''
+    arr = np.asarray(values)
+    if arr.dtype == object and len(arr) and pd.api.types.infer_dtype(
+            arr, skipna=False) in ('integer', 'floating', 'mixed-integer-float'):
+        arr = arr.astype(np.float64)
+    if arr.dtype.kind in 'iu' and arr.dtype.itemsize > 4:
+        info = np.iinfo(np.int32)
+        if len(arr) == 0 or (arr.min() >= info.min and arr.max() <= info.max):
+            return arr.astype(np.int32)
+    elif arr.dtype == np.float64:
+        finite = arr[np.isfinite(arr)]
+        if len(finite) == 0:
+            return arr.astype(np.float32)
+        low, high = finite.min(), finite.max()
+        magnitude = max(abs(low), abs(high))
+        if magnitude < np.finfo(np.float32).max and (
+                np.spacing(np.float32(magnitude)) <=
+                FLOAT32_RESOLUTION * (high - low) or
+                (low == high and np.float32(low) == low)):
+            return arr.astype(np.float32)
+    return arr
+
+
+def to_column_data(df):
+    '''
+    Returns the data of a ColumnDataSource from df, keeping the numeric
+    columns as compact numpy arrays rather than lists of Python numbers
+    '''
+    return {col: compact_array(df[col].values) for col in df.columns}
+
+
+def scale_estimate(data, factor):
+    '''
+    Returns the data of a product estimated from a sample of the rows with
+    its numeric columns, other than SAMPLE_KEY_COLUMNS, multiplied by factor
+    '''
+    scaled = {}
+    for col, values in data.items():
+        arr = np.asarray(values)
+        if col in SAMPLE_KEY_COLUMNS or arr.dtype.kind not in 'iuf':
+            scaled[col] = values
+        elif isinstance(values, list):
+            scaled[col] = (arr * factor).tolist()
+        else:
+            scaled[col] = compact_array(arr * float(factor))
+    return scaled
+
+
 def reset_index(df):
     '''Returns DataFrame with index as columns'''
     index_df = df.index.to_frame(index=False)
@@ -27,20 +276,65 @@ def reset_index(df):
     return pd.merge(index_df, df, left_index=True, right_index=True)
 
 
-def calc_ridership_perc(row):
-    if row['numPassengers'] > row['seatingCapacity']:
-        return 100.0 + (row['numPassengers'] - row['seatingCapacity']) * 100.0 / row['standingRoomCapacity']
-    else:
-        return row['numPassengers'] * 100.0 / row['seatingCapacity']
+def complete_grid(df, levels, fill_value=0.0):
+    '''
+    Completes df, indexed by the names of levels, with a row of fill_value
+    for each combination of the values of levels missing from its index
+    (so that every category appears in the plots). The rows of df are kept
+    in their order, the missing ones come after them in the grid order.
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        Indexed by the names of levels, the index may repeat
+    levels : list of (name, values)
+        Categories of the grid
+    fill_value : scalar or dict
+        Values of the added rows, or of their columns by name (the other
+        columns being NaN)
+
+    Returns
+    -------
+    pandas DataFrame
+    '''
+    grid = pd.MultiIndex.from_product([values for _, values in levels],
+                                      names=[name for name, _ in levels])
+    if len(levels) == 1:
+        grid = grid.get_level_values(0)
+    missing = grid[~grid.isin(df.index)]
+    if df.index.is_unique and not isinstance(fill_value, dict):
+        return df.reindex(df.index.append(missing), fill_value=fill_value)
+    return pd.concat(
+        [df, pd.DataFrame(fill_value, index=missing, columns=df.columns)],
+        sort=False)
+
+
+def bin_by_mode(codes, n_bins, modes, values, statistic='sum'):
+    '''
+    Returns a DataFrame of the sum (or mean) of values per bin (rows) and
+    mode (columns, sorted) of the rows with a bin code, the bins without
+    rows being 0 (or NaN)
+    '''
+    codes = np.asarray(codes)
+    kept = codes >= 0
+    mode_codes, mode_names = pd.factorize(np.asarray(modes)[kept], sort=True)
+    cells = flat_codes(codes[kept], mode_codes, len(mode_names))
+    aggregate = bin_mean if statistic == 'mean' else bin_sum
+    return pd.DataFrame(
+        aggregate(cells, n_bins * len(mode_names),
+                  np.asarray(values, dtype=np.float64)[kept]).reshape(
+                      n_bins, len(mode_names)),
+        columns=mode_names)
 
 
 def merc(lat, lon):
     # https://gis.stackexchange.com/questions/156035/calculating-mercator-coordinates-from-lat-lon
+    # works on scalars as well as on arrays of coordinates
     r_major = 6378137.000
-    x = r_major * math.radians(lon)
-    scale = x/lon
-    y = (180.0/math.pi * math.log(math.tan(math.pi/4.0 +
-        lat * (math.pi/180.0)/2.0)) * scale)
+    x = r_major * np.radians(lon)
+    scale = r_major * math.pi / 180.0
+    y = (180.0/math.pi * np.log(np.tan(math.pi/4.0 +
+        np.asarray(lat) * (math.pi/180.0)/2.0)) * scale)
     return (x, y)
 
 
@@ -48,6 +342,11 @@ class Submission():
 
     links = dict()
     activities = dict()
+    taz_indexes = dict()
+    populations = dict()
+    id_dictionaries = dict()
+    link_indexes = dict()
+    route_palettes = dict()
 
     @classmethod
     def load_links(cls, db, scenario):
@@ -73,7 +372,66 @@ class Submission():
             cls.activities[scenario] = db.load_activities(scenario)
             return cls.activities[scenario]
 
-    def __init__(self, name, scenario, simulation_ids=None):
+    @classmethod
+    def load_taz_index(cls, scenario):
+        """
+        cache the TAZ index as a class variable so that the parking arrays of
+        all the simulations of a scenario share the same TAZ axis
+        """
+        if scenario not in cls.taz_indexes:
+            cls.taz_indexes[scenario] = IdIndex()
+        return cls.taz_indexes[scenario]
+
+    @classmethod
+    def load_population(cls, scenario, submissions_dir=None, db=None):
+        """
+        cache the persons as a class variable because all simulations for the
+        same scenario share the same population
+        """
+        if scenario not in cls.populations:
+            if db is None:
+                cls.populations[scenario] = PopulationStore.from_directory(
+                    submissions_dir)
+            else:
+                cls.populations[scenario] = PopulationStore.from_frame(
+                    db.load_person(scenario))
+            cls.load_id_dictionary(scenario).persons = \
+                cls.populations[scenario].pid_index
+        return cls.populations[scenario]
+
+    @classmethod
+    def load_id_dictionary(cls, scenario):
+        """
+        cache the id dictionary as a class variable so that all simulations
+        of a scenario encode their person, vehicle and link ids the same way
+        """
+        if scenario not in cls.id_dictionaries:
+            cls.id_dictionaries[scenario] = IdDictionary()
+        return cls.id_dictionaries[scenario]
+
+    @classmethod
+    def load_route_palette(cls, scenario, route_ids):
+        """
+        cache the colors of the bus routes (a Series indexed by route id) as
+        a class variable so that all simulations of a scenario share them
+        """
+        if scenario not in cls.route_palettes:
+            # palette = (Category20[20][::2] + Category20[20][1::2])[:len(route_ids)]
+            cls.route_palettes[scenario] = pd.Series(
+                Plasma256[:len(route_ids)], index=route_ids)
+        return cls.route_palettes[scenario]
+
+    @classmethod
+    def load_link_index(cls, scenario, link_data):
+        """
+        cache the spatial index of the links as a class variable because all
+        simulations for the same scenario share the same links
+        """
+        if scenario not in cls.link_indexes:
+            cls.link_indexes[scenario] = LinkIndex(link_data)
+        return cls.link_indexes[scenario]
+
+    def __init__(self, name, scenario, simulation_ids=None, pushdown=False):
         """
         Initialize class object.
 
@@ -81,6 +439,11 @@ class Submission():
         ----------
         name : str
         dfs : list of pd.DataFrame
+        pushdown : bool
+            Compute the aggregated products (VMT by hour, travel speed, toll
+            revenue) with aggregate queries of the database, and only load
+            the legs, paths and trips of the run when another product needs
+            them. Ignored without simulation_ids.
 
         Returns
         -------
@@ -89,6 +452,7 @@ class Submission():
         self.name = name
         self.scenario = scenario
         self.simulation_ids = simulation_ids
+        self.pushdown = pushdown and simulation_ids is not None
 #        self.scenario = 'sioux_faux-15k'
 #        self.simulation_id = '5673feca-f45a-11e9-ba19-acde48001122'
         self.modes = ['ride_hail', 'car', 'drive_transit', 'walk', 'walk_transit']
@@ -105,11 +469,23 @@ class Submission():
         # self.get_data()
         # self.make_data_sources()
 
+    def missing_files(self):
+        """SUBMISSION_FILES missing from the submission directory"""
+        if self.simulation_ids is not None:
+            return []
+        return [f for f in SUBMISSION_FILES
+                if not exists(join(self.submissions_dir, f))]
+
     def get_data(self):
         if self.data_loaded:
             return
 
         if self.simulation_ids is None:
+            missing = self.missing_files()
+            if missing:
+                raise IOError('{}/{} is missing {} in {}'.format(
+                    self.scenario, self.name, ', '.join(missing),
+                    self.submissions_dir))
             self.links_df = pd.read_csv(join(self.submissions_dir, 'network.csv'))
             self.frequency_df = pd.read_csv(join(self.submissions_dir, 'competition/submission-inputs/FrequencyAdjustment.csv'))
             self.fares_df = pd.read_csv(join(self.submissions_dir, 'competition/submission-inputs/MassTransitFares.csv'))
@@ -122,7 +498,9 @@ class Submission():
             self.households_df = pd.read_csv(join(self.submissions_dir, 'households_dataframe.csv'))
             self.legs_df = pd.read_csv(join(self.submissions_dir, 'legs_dataframe.csv'))
             self.paths_df = pd.read_csv(join(self.submissions_dir, 'path_traversals_dataframe.csv'))
-            self.persons_df = pd.read_csv(join(self.submissions_dir, 'persons_dataframe.csv'))
+            self.population = self.load_population(
+                self.scenario, submissions_dir=self.submissions_dir)
+            self.persons_df = self.population.persons_df
             self.trips_df = pd.read_csv(join(self.submissions_dir, 'trips_dataframe.csv'))
             self.mode_choice_df = pd.read_csv(join(self.submissions_dir, 'modeChoice.csv'))
             self.realized_mode_choice_df = pd.read_csv(join(self.submissions_dir, 'realizedModeChoice.csv'))
@@ -132,6 +510,13 @@ class Submission():
             path = join(path, 'it.{}'.format(iter_num))
             self.mode_choice_hourly_df = pd.read_csv(join(path, '{}.modeChoice.csv'.format(iter_num)), index_col=0).T
             self.travel_times_df = pd.read_csv(join(path, '{}.averageTravelTimes.csv'.format(iter_num)))
+            parking_path = join(path, '{}.parkingStats.csv'.format(iter_num))
+            self.parking_df = pd.read_csv(parking_path) if exists(parking_path) else None
+            self.iteration_history = IterationHistory.from_directory(
+                self.submissions_dir)
+            self.stage_runtimes = [
+                read_stopwatch(f)
+                for f in find_stopwatch_files(self.submissions_dir)]
 
             self.seating_capacities = pd.read_csv(join(self.reference_dir, "availableVehicleTypes.csv"))[[
                 "vehicleTypeId", "seatingCapacity"]].set_index("vehicleTypeId", drop=True).T.to_dict("records")[0]
@@ -141,11 +526,17 @@ class Submission():
                 "trip_id", "route_id"]].set_index("trip_id", drop=True).T.to_dict('records')[0]
             self.operational_costs = pd.read_csv(join(self.reference_dir, "vehicleCosts.csv"))[[
                 "vehicleTypeId", "opAndMaintCost"]].set_index("vehicleTypeId", drop=True).T.to_dict("records")[0]
+            self.agency_ids = pd.read_csv(join(self.reference_dir, "gtfs_data/agency.txt"))["agency_id"].tolist()
+            self.route_ids = [str(r_id) for r_id in pd.read_csv(join(self.reference_dir, "gtfs_data/routes.txt"))["route_id"]]
+            self.encode_ids()
             self.data_loaded = True
         else:
             db = BistroDB(
                 *parse_credential(join(dirname(__file__),'dashboard_profile.ini')
             ))
+            if self.pushdown:
+                # kept for the aggregate queries and the raw tables
+                self.db = db
             self.links_df = self.load_links(db, self.scenario)
             self.frequency_df = db.load_frequency(self.simulation_ids[0])
             self.fares_df = db.load_fares(self.simulation_ids[0])
@@ -154,14 +545,22 @@ class Submission():
             self.scores_df = db.load_scores(self.simulation_ids)
             self.activities_df = self.load_activities(db, self.scenario)
             self.households_df = None
-            self.legs_df = db.load_legs(self.simulation_ids)
-            self.paths_df = db.load_paths(self.simulation_ids, self.scenario)
-            self.persons_df = db.load_person(self.scenario)
-            self.trips_df = db.load_trips(self.simulation_ids)
+            if not self.pushdown:
+                self.load_raw_tables(db)
+            self.population = self.load_population(self.scenario, db=db)
+            self.persons_df = self.population.persons_df
             self.mode_choice_df = db.load_mode_choice(self.simulation_ids)
             self.realized_mode_choice_df = db.load_mode_choice(
                 self.simulation_ids, realized=True)
             self.toll_circle_df = db.load_toll_circle(self.simulation_ids[0])
+            # None in the databases without parking stats
+            self.parking_df = db.load_parking_stats(self.simulation_ids[0])
+            self.stage_runtimes = db.load_stage_runtimes(
+                self.simulation_ids[0])
+            self.iteration_history = IterationHistory.from_frames([
+                (self.mode_choice_df, 'modeChoice: ', 'iterations'),
+                (self.realized_mode_choice_df, 'realizedModeChoice: ',
+                 'iterations')])
             self.mode_choice_hourly_df = db.load_hourly_mode_choice(
                 self.simulation_ids)
 
@@ -186,8 +585,74 @@ class Submission():
             self.operational_costs = db.load_vehicle_cost(self.scenario)[
                 ["vehicleTypeId", "opAndMaintCost"]
             ].set_index("vehicleTypeId", drop=True).T.to_dict("records")[0]
+            if not self.pushdown:
+                self.encode_ids()
             self.data_loaded = True
 
+    def load_raw_tables(self, db):
+        """Load the legs, paths and trips of the run from db"""
+        self.legs_df = db.load_legs(self.simulation_ids)
+        self.paths_df = db.load_paths(
+            self.simulation_ids, self.scenario,
+            self.load_id_dictionary(self.scenario))
+        self.trips_df = db.load_trips(self.simulation_ids)
+
+    def __getattr__(self, attr):
+        # only called for the attributes not set: the raw tables of a
+        # pushdown submission are loaded by the first make_* method using
+        # them
+        state = self.__dict__
+        if attr in RAW_ATTRIBUTES and state.get('pushdown') and \
+                state.get('data_loaded') and 'legs_df' not in state:
+            self.load_raw_tables(self.db)
+            self.encode_ids()
+            return getattr(self, attr)
+        raise AttributeError(attr)
+
+    def make_data_product(self, name):
+        """
+        Returns the data product name of make_data_sources, making only it
+        (and the products it depends on, or made with it) when it has a
+        make_<name> method or is in PRODUCT_TUPLES, so that the products of
+        a pushdown submission which are aggregated by the database do not
+        load its raw tables.
+        """
+        if name not in self.__dict__:
+            method = next((method for method, names in PRODUCT_TUPLES.items()
+                           if name in names), None)
+            if method is not None:
+                for product, data in zip(PRODUCT_TUPLES[method],
+                                         getattr(self, method)()):
+                    setattr(self, product, data)
+            elif not hasattr(self, 'make_' + name):
+                self.make_data_sources()
+            else:
+                for dependency in PRODUCT_DEPENDENCIES.get(name, []) + [name]:
+                    if dependency not in self.__dict__:
+                        setattr(self, dependency,
+                                getattr(self, 'make_' + dependency)())
+        return getattr(self, name)
+
+    def uses_raw_tables(self, name):
+        """Whether making the product name loads the raw tables"""
+        return name in RAW_PRODUCTS and not (
+            self.pushdown and name in PUSHDOWN_PRODUCTS)
+
+    def encode_ids(self):
+        """
+        Encode the ids used in joins into the int32 codes of the scenario
+        indexes so that make_* methods join on integer arrays.
+        """
+        ids = self.load_id_dictionary(self.scenario)
+        self.trip_pid_codes = self.population.encode(
+            self.trips_df['PID'].values)
+        self.path_vehicle_codes = ids.vehicles.encode(
+            self.paths_df['vehicle'].values)
+        self.leg_vehicle_codes = ids.vehicles.encode(self.legs_df['Veh'].values)
+        self.link_codes = ids.links.encode(self.links_df['LinkId'].values)
+        self.ride_hail_paths = ids.vehicles_matching('rideHailVehicle')[
+            self.path_vehicle_codes]
+
     def make_data_sources(self):
         if self.data_source_made:
             return
@@ -201,11 +666,12 @@ class Submission():
         self.toll_circle_data = self.make_toll_circle_data()
         self.normalized_scores_data = self.make_normalized_scores_data()
 
-        self.mode_planned_pie_chart_data = self.make_mode_pie_chart_data(
-            self.mode_choice_df.copy())
-        self.mode_realized_pie_chart_data = self.make_mode_pie_chart_data(
-            self.realized_mode_choice_df.copy())
+        self.mode_planned_pie_chart_data = \
+            self.make_mode_planned_pie_chart_data()
+        self.mode_realized_pie_chart_data = \
+            self.make_mode_realized_pie_chart_data()
         self.mode_choice_by_time_data = self.make_mode_choice_by_time_data()
+        self.trip_cube = self.make_trip_cube()
         self.mode_choice_by_age_group_data = \
             self.make_mode_choice_by_age_group_data()
         self.mode_choice_by_income_group_data = \
@@ -228,9 +694,15 @@ class Submission():
         self.congestion_travel_speed_data = \
             self.make_congestion_travel_speed_data()
 
+        self.trip_costs = self.make_trip_costs()
         self.los_travel_expenditure_data = \
             self.make_los_travel_expenditure_data()
+        self.los_cost_burden_by_income_data = \
+            self.make_los_cost_burden_by_income_data()
         self.los_crowding_data = self.make_los_crowding_data()
+        self.parking_overhead = self.make_parking_overhead()
+        self.los_parking_overhead_data = \
+            self.make_los_parking_overhead_data()
 
         self.transit_cb_costs_data, self.transit_cb_benefits_data = \
             self.make_transit_cb_data()
@@ -241,8 +713,90 @@ class Submission():
             self.make_sustainability_25pm_per_mode_data()
         self.sustainability_ghg_per_mode_data = \
             self.make_sustainability_ghg_per_mode_data()
+
+        self.convergence_summary_data = self.make_convergence_summary_data()
+        self.runtime_profile_data = self.make_runtime_profile_data()
         self.data_source_made = True
 
+    def sample(self, fraction, seed):
+        """
+        Returns a copy of the submission, without any product made, whose
+        raw tables (and the codes aligned on their rows) are a uniform
+        sample of fraction of their rows, drawn with a RandomState of seed.
+        The copy makes all its products from the sample, pushdown ones
+        included.
+        """
+        sample = self.without_products()
+        sample.pushdown = False
+
+        rng = np.random.RandomState(seed)
+        for table, codes in SAMPLED_TABLES.items():
+            df = getattr(self, table)
+            kept = rng.random_sample(len(df)) < fraction
+            setattr(sample, table, df[kept].reset_index(drop=True))
+            for attr in codes:
+                setattr(sample, attr, getattr(self, attr)[kept])
+        return sample
+
+    def without_products(self):
+        """
+        Returns a copy of the submission sharing its data and tables, without
+        any of its products, whose products are made apart from the
+        submission
+        """
+        derived = set(sum(PRODUCT_DEPENDENCIES.values(), []))
+        made = copy.copy(self)
+        made.__dict__ = {
+            attr: value for attr, value in self.__dict__.items()
+            if not attr.endswith('_data') and attr not in derived}
+        made.data_source_made = False
+        return made
+
+    def make_products_apart(self):
+        """
+        Returns the attributes set by make_data_sources (the products, and
+        the raw tables it loaded) without setting them on the submission,
+        for a background thread making the products of a submission in use.
+        vars(submission).update sets them afterwards.
+        """
+        made = self.without_products()
+        before = dict(vars(made))
+        made.make_data_sources()
+        return {attr: value for attr, value in vars(made).items()
+                if attr not in before or value is not before[attr]}
+
+    def make_estimated_data_sources(self, samples=SAMPLED_PRODUCTS):
+        """
+        Returns the products of make_data_sources, keyed by name, for a fast
+        first render: the products of samples (SAMPLED_PRODUCTS or the
+        product_samples of another fraction and seed) are estimated from
+        samples of the raw tables, the others are exact but for
+        UNSAMPLED_PRODUCTS, left out.
+        """
+        sampled = {}
+
+        def sample_of(product):
+            key = (product.fraction, product.seed)
+            if key not in sampled:
+                sampled[key] = self.sample(*key)
+            return sampled[key]
+
+        # the products without estimate are made from the smallest sample
+        default = sample_of(min(samples.values(),
+                                key=lambda product: product.fraction))
+        default.make_data_sources()
+        products = {attr: value for attr, value in default.__dict__.items()
+                    if attr.endswith('_data') and
+                    attr not in UNSAMPLED_PRODUCTS}
+
+        for name, product in samples.items():
+            data = sample_of(product).make_data_product(name)
+            if product.scale_power:
+                data = scale_estimate(
+                    data, product.fraction ** -product.scale_power)
+            products[name] = data
+        return products
+
     def splitting_min_max(self, df, name_column):
         """ Parsing and splitting the ranges in the "age" (or "income") columns into two new columns:
         "min_age" (or "min_income") with the bottom value of the range and "max_age" (or "max_income") with the top value
@@ -278,29 +832,12 @@ class Submission():
         scores = self.scores_df
         scores = scores.loc[:,["Component Name", "Weighted Score"]]
 
-        # PM 2.5 score is not being generated properly from BEAM.
-        congestion_avg = scores[
-            scores["Component Name"].isin(
-                [#'Sustainability: Total grams PM 2.5 Emitted',
-                 'Sustainability: Total grams GHGe Emissions',
-                 'Congestion: average vehicle delay per passenger trip',
-                 'Congestion: total vehicle miles traveled'])
-        ]['Weighted Score'].mean()
-        social_avg = scores[
-            scores["Component Name"].isin(
-                ['Equity: average travel cost burden -  secondary',
-                 'Equity: average travel cost burden - work'])
-        ]['Weighted Score'].mean()
-        TR = float(scores[scores["Component Name"]=='Toll Revenue']['Weighted Score'])
-        aggregate = 0.4*social_avg+0.4*TR+0.2*congestion_avg
-
-        agg_scores = pd.DataFrame({
-            "Component Name":["Congestion: Average Score",
-                              "Social: Average Score",
-                              "Aggregate Score"],
-            "Weighted Score":[congestion_avg, social_avg, aggregate]})
-
-        scores = scores.append(agg_scores, ignore_index = True)
+        # group and aggregate scores of casestudy_kpis.yaml
+        case_study = ScoringEngine(self.scores_df).case_study_scores()
+        agg_scores = case_study.loc[
+            ~case_study["Component Name"].isin(scores["Component Name"])]
+
+        scores = pd.concat([scores, agg_scores], ignore_index=True)
 
         scores.set_index("Component Name", inplace=True)
         scores.reset_index(inplace=True)
@@ -315,7 +852,7 @@ class Submission():
         # min_score = min(scores['Weighted Score'].min(), 0.0) * 1.1
         # max_score = max(scores['Weighted Score'].max(), 1.0) * 1.1
 
-        data = scores.to_dict(orient='list')
+        data = to_column_data(scores)
         return data
 
     def make_case_study_scores_data(self):
@@ -334,7 +871,7 @@ class Submission():
         # min_score = min(scores['Weighted Score'].min(), 0.0) * 1.1
         # max_score = max(scores['Weighted Score'].max(), 1.0) * 1.1
 
-        data = scores.to_dict(orient='list')
+        data = to_column_data(scores)
         return data
 
     def make_fleetmix_input_data(self):
@@ -348,25 +885,20 @@ class Submission():
                   for agency_id in self.agency_ids],
                 columns=["agencyId", "routeId", "vehicleTypeId"])
 
-        df = pd.DataFrame([self.agency_ids[0], '1', BUSES_LIST[0]]).T
-        df.columns = ["agencyId", "routeId", "vehicleTypeId"]
+        fleet_mix = fleet_mix.assign(routeId=fleet_mix["routeId"].astype(str))
 
         # Adding the missing bus types in the dataframe so that they appear in the plot
-        for bus in BUSES_LIST:
-            if bus not in fleet_mix["vehicleTypeId"].values:
-                df.loc[0, "vehicleTypeId"] = bus
-                fleet_mix = fleet_mix.append(df, ignore_index=True, sort=False)
+        fleet_mix = complete_grid(
+            fleet_mix.set_index("vehicleTypeId"),
+            [("vehicleTypeId", BUSES_LIST)],
+            {"agencyId": self.agency_ids[0], "routeId": '1'}).reset_index()
 
         # Adding the missing bus routes in the dataframe so that they appear in the plot
-        fleet_mix.loc[:, "routeId"] = fleet_mix["routeId"].astype(str)
-
-        df = pd.DataFrame([self.agency_ids[0], "", BUSES_LIST[0]]).T
-        df.columns = ["agencyId", "routeId", "vehicleTypeId"]
-
-        for route in self.route_ids:
-            if route not in fleet_mix["routeId"].values:
-                df.loc[0, "routeId"] = route
-                fleet_mix = fleet_mix.append(df, ignore_index=True, sort=False)
+        fleet_mix = complete_grid(
+            fleet_mix.set_index("routeId"), [("routeId", self.route_ids)],
+            {"agencyId": self.agency_ids[0],
+             "vehicleTypeId": BUSES_LIST[0]}).reset_index()
+        fleet_mix = fleet_mix[["agencyId", "routeId", "vehicleTypeId"]]
 
         # Reodering bus types starting by "BUS-DEFAULT" and then by ascending bus size order
         fleet_mix.loc[:, "vehicleTypeId"] = fleet_mix["vehicleTypeId"].astype(
@@ -376,22 +908,19 @@ class Submission():
         fleet_mix.sort_values(by="vehicleTypeId", inplace=True)
         fleet_mix.reset_index(inplace=True, drop=True)
 
-        data = fleet_mix.to_dict(orient='list')
+        data = to_column_data(fleet_mix)
         return data 
 
     def make_routesched_input_data(self):
 
-        frequency = self.frequency_df
-        frequency.loc[:, "route_id"] = frequency["route_id"].astype(str)
+        frequency = self.frequency_df.assign(
+            route_id=self.frequency_df["route_id"].astype(str))
 
         # Add all missing routes (the ones that were not changed) in the DF so that they appear int he plot
-        df = pd.DataFrame([0, 0, 24*3600, 10800]).T
-        df.columns = ["route_id", "start_time", "end_time", "headway_secs"]
-
-        for route in self.route_ids:
-            if route not in frequency["route_id"].values:
-                df.loc[0, "route_id"] = route
-                frequency = frequency.append(df, ignore_index=True, sort=False)
+        frequency = complete_grid(
+            frequency.set_index("route_id"), [("route_id", self.route_ids)],
+            {"start_time": 0, "end_time": 24*3600, "headway_secs": 10800}
+        ).rename_axis("route_id").reset_index()
 
         frequency.loc[:, "start_time"] = (
             frequency["start_time"].astype(int) / 3600).round(1)
@@ -400,76 +929,65 @@ class Submission():
         frequency.loc[:, "headway_secs"] = (
             frequency["headway_secs"].astype(int) / 3600).round(1)
 
-        frequency = frequency.sort_values(by="route_id").set_index("route_id")
-
-        # palette_dict = dict(zip(ROUTE_IDS, (Category20[20][::2] + Category20[20][1::2])[:len(ROUTE_IDS)]))
-        palette_dict = dict(zip(self.route_ids, Plasma256[:len(self.route_ids)]))
-        line_data=dict( 
-            xs=[[f_row['start_time'], f_row['end_time']] for i, f_row in frequency.iterrows()], 
-            ys=[[f_row['headway_secs'], f_row['headway_secs']] for i, f_row in frequency.iterrows()],
-            color=[palette_dict[i] for i, f_row in frequency.iterrows()],
-            name=[i for i, f_row in frequency.iterrows()]
-        )
-        start_data=dict( 
-            xs=[f_row['start_time'] for i, f_row in frequency.iterrows()], 
-            ys=[f_row['headway_secs'] for i, f_row in frequency.iterrows()],
-            color=[palette_dict[i] for i, f_row in frequency.iterrows()]
-        )
-        end_data=dict( 
-            xs=[f_row['end_time'] for i, f_row in frequency.iterrows()], 
-            ys=[f_row['headway_secs'] for i, f_row in frequency.iterrows()],
-            color=[palette_dict[i] for i, f_row in frequency.iterrows()]
+        frequency = frequency.sort_values(by="route_id")
+
+        routes = frequency["route_id"].tolist()
+        start = frequency["start_time"].values
+        end = frequency["end_time"].values
+        headway = frequency["headway_secs"].values
+        color = self.load_route_palette(
+            self.scenario, self.route_ids).reindex(routes).tolist()
+
+        # one segment per frequency adjustment, from its start to its end
+        line_data = dict(
+            xs=list(compact_array(np.column_stack([start, end]))),
+            ys=list(compact_array(np.column_stack([headway, headway]))),
+            color=np.array(color, dtype=object),
+            name=np.array(routes, dtype=object)
         )
+        start_data = to_column_data(pd.DataFrame(
+            {'xs': start, 'ys': headway, 'color': color},
+            columns=['xs', 'ys', 'color']))
+        end_data = to_column_data(pd.DataFrame(
+            {'xs': end, 'ys': headway, 'color': color},
+            columns=['xs', 'ys', 'color']))
         return line_data, start_data, end_data
 
     def make_fares_input_data(self, max_fare=10, max_age=120):
-        fares = self.fares_df
-
-        fares.loc[:, "age"] = fares["age"].astype(str)
-        fares.loc[:, "routeId"] = fares["routeId"].astype(str)
-
-        df = pd.DataFrame(columns=["agencyId", "routeId", "age", "amount"])
-
-        # Replace RouteId = NaN values by all bus lines (12 rows)
-        for i, fare in fares.iterrows():
-            if fare['routeId'] == 'nan':
-                df1 = pd.DataFrame(
-                    [[fare['agencyId'], route, fare['age'], fare['amount']]
-                     for route in self.route_ids],
-                    columns=["agencyId", "routeId", "age", "amount"])
-                df = df.append(df1, ignore_index=True, sort=False)
-
-            else:
-                df = df.append(fare, ignore_index=True, sort=False)
-
-        # Splitting age ranges into 2 columns (min_age and max_age)
-        fares = self.splitting_min_max(df, "age")
-        fares.loc[:, "routeId"] = fares["routeId"].astype(str)
+        # Replace RouteId = NaN values by all bus lines (12 rows) and split
+        # age ranges into 2 columns (min_age and max_age)
+        fares = self.expand_fares()
         fares.loc[:, "amount"] = fares["amount"].astype(float)
 
         fares = fares.drop(labels=["age"], axis=1)
         fares = fares.sort_values(by=["amount", "routeId"])
-        data = fares.to_dict(orient='list')
+        data = to_column_data(fares)
         return data 
 
+    def expand_fares(self):
+        """
+        Fare rules of the submission, with the rules without routeId
+        replaced by one rule per bus line and the age ranges split into
+        min_age and max_age
+        """
+        fares = self.fares_df.assign(age=self.fares_df["age"].astype(str))
+        return self.splitting_min_max(
+            expand_fare_rules(fares, self.route_ids), "age")
+
+    def make_fare_index(self, max_age=120):
+        """FareIndex of the fare of the (route, age) pairs of the submission"""
+        return FareIndex(self.expand_fares(), max_age)
+
     def make_link_data(self):
-        links = self.links_df.copy()
-        from_x = []
-        from_y = []
-        to_x = []
-        to_y = []
-        for _, row in links.iterrows():
-            x0, y0 = merc(row['fromLocationX'],row['fromLocationY'])
-            x1, y1 = merc(row['toLocationX'],row['toLocationY'])
-            from_x.append(x0)
-            from_y.append(y0)
-            to_x.append(x1)
-            to_y.append(y1)
-
-        links['from_x'], links['from_y']  = from_x, from_y
-        links['to_x'], links['to_y'] = to_x, to_y
-
-        data = links[['from_x','from_y','to_x','to_y']].to_dict(orient='list')
+        links = pd.DataFrame()
+        links['from_x'], links['from_y'] = merc(
+            self.links_df['fromLocationX'].values,
+            self.links_df['fromLocationY'].values)
+        links['to_x'], links['to_y'] = merc(
+            self.links_df['toLocationX'].values,
+            self.links_df['toLocationY'].values)
+
+        data = to_column_data(links[['from_x','from_y','to_x','to_y']])
         return data
 
     def make_toll_circle_data(self):
@@ -489,7 +1007,7 @@ class Submission():
         data['text'] = ''
 
         if self.toll_circle_df is None or len(self.toll_circle_df) == 0:
-            return pd.DataFrame(data, index=[0]).to_dict(orient='list')
+            return to_column_data(pd.DataFrame(data, index=[0]))
 
         center_x, center_y = merc(self.toll_circle_df['center_lat'][0],
                                   self.toll_circle_df['center_lon'][0])
@@ -503,24 +1021,22 @@ class Submission():
         toll = self.toll_circle_df['toll'][0]
         unit = '[$/mile]' if  self.toll_circle_df['type'][0] == 'permile' else '[$]'
         data['text'] = f"{toll:.2f} " + unit
-        return pd.DataFrame(data, index=[0]).to_dict(orient='list')
+        return to_column_data(pd.DataFrame(data, index=[0]))
 
 
     def make_modeinc_input_data(self, max_incentive=50, max_age=120,
             max_income=150000):
 
-        incentives = self.incentives_df
-        incentives.loc[:, "amount"] = incentives["amount"].astype(float)
+        incentives = self.incentives_df.assign(
+            amount=self.incentives_df["amount"].astype(float))
 
         # Completing the dataframe with the missing subsidized modes (so that they appear in the plot)
-        df = pd.DataFrame(
-            ["", "(0:{})".format(max_age), "(0:{})".format(max_income), 0.00]).T
-        df.columns = ["mode", "age", "income", "amount"]
-
         modes = ["ride_hail", "drive_transit", "walk_transit"]
-        for mode in modes:
-            df.loc[0, "mode"] = mode
-            incentives = incentives.append(df, ignore_index=True, sort=False)
+        df = pd.DataFrame(
+            {"mode": modes, "age": "(0:{})".format(max_age),
+             "income": "(0:{})".format(max_income), "amount": 0.00},
+            columns=["mode", "age", "income", "amount"])
+        incentives = pd.concat([incentives, df], ignore_index=True, sort=False)
         incentives = incentives[incentives["mode"].isin(modes)].drop_duplicates()
 
         # Splitting age and income columns
@@ -533,7 +1049,7 @@ class Submission():
         incentives.loc[:, "mode"] = incentives["mode"].astype('category').cat.reorder_categories(modes)
 
         incentives = incentives.sort_values(by=["amount", "mode"])
-        data = incentives.to_dict(orient='list')
+        data = to_column_data(incentives)
         return data
 
     def make_mode_pie_chart_data(self, mode_choice):
@@ -544,16 +1060,17 @@ class Submission():
         mode_choice.loc[:, 'perc'] = mode_choice['value']/mode_choice['value'].sum() * 100.0
         mode_choice.loc[:, 'angle'] = mode_choice['value']/mode_choice['value'].sum() * 2*math.pi
         mode_choice = mode_choice.sort_values('angle', ascending=False)
-        cumangle = 0.0
         scale = 3.0
-        for i, row in mode_choice.iterrows():
-            mode_choice.loc[i, 'start_angle'] = cumangle
-            cumangle += row['angle'] / 2.0
-            mode_choice.loc[i, 'x_loc'] = math.cos(cumangle) * 0.2
-            mode_choice.loc[i, 'y_loc'] = 1 + (math.sin(cumangle) * 0.2 * scale)
-            cumangle += row['angle'] / 2.0
-            mode_choice.loc[i, 'end_angle'] = cumangle
-            
+        # wedges follow each other by decreasing angle, labels at their middle
+        end_angle = np.cumsum(mode_choice['angle'].values)
+        start_angle = end_angle - mode_choice['angle'].values
+        mid_angle = start_angle + mode_choice['angle'].values / 2.0
+        mode_choice.loc[:, 'start_angle'] = start_angle
+        mode_choice.loc[:, 'x_loc'] = np.cos(mid_angle) * 0.2
+        mode_choice.loc[:, 'y_loc'] = 1 + (np.sin(mid_angle) * 0.2 * scale)
+        mode_choice.loc[:, 'end_angle'] = end_angle
+
+
         sorterIndex = dict(zip(self.modes + ['others'], range(len(self.modes + ['others']))))
         #mode_choice.loc[:, 'Mode'].replace(to_replace='ride_hail', value='ride_hail', inplace=True)
         mode_choice.loc[:, 'Mode_order'] = mode_choice['Mode'].map(sorterIndex)
@@ -561,143 +1078,131 @@ class Submission():
 
         mode_choice.loc[:, 'color'] = Dark2[len(mode_choice)]
             
-        mode_choice.loc[:, "label"] = mode_choice.apply(lambda x: '{}%'.format(round(x['perc'], 1)) if x['perc']
-             >= 2.0 else '', axis=1)
+        mode_choice.loc[:, "label"] = np.where(
+            mode_choice['perc'] >= 2.0,
+            mode_choice['perc'].round(1).astype(str) + '%', '')
         mode_choice.loc[:, "label"] = mode_choice["label"].str.pad(30, side = "left")
-        data = mode_choice.to_dict(orient='list')
+        data = to_column_data(mode_choice)
         return data
 
+    def make_mode_planned_pie_chart_data(self):
+        return self.make_mode_pie_chart_data(self.mode_choice_df.copy())
+
+    def make_mode_realized_pie_chart_data(self):
+        return self.make_mode_pie_chart_data(
+            self.realized_mode_choice_df.copy())
+
+    def make_convergence_summary_data(self):
+        self.iteration_history.compute_diagnostics()
+        return self.iteration_history.summary_data()
+
+    def make_convergence_kpi_data(self, kpi):
+        """
+        Line data of a single KPI over all the iterations. Kept out of
+        make_data_sources so that only the selected KPI is sent to the plots.
+        """
+        return self.iteration_history.kpi_data(kpi)
+
+    def make_runtime_profile_data(self):
+        # durations of all the iterations of all the runs are pooled together
+        return stage_runtime_distribution(self.stage_runtimes)
+
     def make_mode_choice_by_time_data(self):
         
         mode_choice_by_hour = self.mode_choice_hourly_df.reset_index().dropna()
         
-        mode_choice_by_hour.loc[:, "hours"] = mode_choice_by_hour["index"].apply(
-            lambda x: x.split("_")[1])
+        # hours past midnight fold onto the hours of the day
+        hours = fold_hours(mode_choice_by_hour["index"].apply(
+            lambda x: x.split("_")[1]).astype(int).values)
         #mode_choice_by_hour.rename(columns={"ride_hail": "OnDemand_ride"}, inplace=True)
         mode_choice_by_hour = mode_choice_by_hour.drop(labels="index", axis=1)
 
-        max_hour = max([int(h) for h in mode_choice_by_hour['hours']])
-        if max_hour > 23:
-            hours = [str(h) for h in range(max_hour + 1)]
-        else:
-            hours = HOURS
-            max_hour = 23
-
         for mode in self.modes:
             if mode not in mode_choice_by_hour.columns:
                 mode_choice_by_hour[mode] = 0
 
-        # Completing the dataframe with the missing ridership bins (so that they appear in the plot)
-        df = pd.DataFrame([0, 0.0, 0.0, 0.0, 0.0, 0.0]).T
-        df.columns = ["hours"] + self.modes
-
-        for hour in range(max_hour + 1):
-            if str(hour) not in mode_choice_by_hour["hours"].values:
-                df.loc[0, "hours"] = str(hour)
-                mode_choice_by_hour = mode_choice_by_hour.append(
-                    df, ignore_index=True, sort=False)
-
-        mode_choice_by_hour = mode_choice_by_hour.set_index('hours')
+        mode_choice_by_hour = mode_choice_by_hour.loc[hours >= 0].groupby(
+            hours[hours >= 0]).sum().reindex(range(DAY_HOURS), fill_value=0)
+        mode_choice_by_hour.insert(0, 'hours', HOURS)
 
         # max_choice = mode_choice_by_hour.sum(axis=1).max() * 1.1
 
-        data = mode_choice_by_hour.reset_index().to_dict(orient='list')
+        data = to_column_data(mode_choice_by_hour)
         return data 
 
+    def join_trips_with_persons(self, attribute):
+        """
+        Inner join of the trip modes with a person attribute of the
+        population, done by indexing the attribute array with the PID codes.
+        """
+        codes = self.trip_pid_codes
+        known = codes >= 0
+        return pd.DataFrame({
+            'PID': codes[known],
+            attribute: getattr(self.population, attribute)[codes[known]],
+            'realizedTripMode': self.trips_df['realizedTripMode'].values[known]
+        })
+
     def make_mode_choice_by_income_group_data(self):
 
-        persons_cols = ['PID', 'income']
-        trips_cols = ['PID', 'realizedTripMode']
-        people_income_mode = self.persons_df[persons_cols].merge(
-            self.trips_df[trips_cols], on=['PID'])
-        edges = [0, 10000, 25000, 50000, 75000, 100000, float('inf')]
-        bins = ['[$0, $10k)', '[$10k, $25k)', '[$25k, $50k)', '[$50k, $75k)',
-                '[$75k, $100k)', '[$100k, inf)']
-        people_income_mode.loc[:, 'income_group'] = pd.cut(
-            people_income_mode['income'],
-            bins=edges,
-            labels=bins,
-            right=False
-        ).astype(str)
-        grouped = people_income_mode.groupby(
-            by=['realizedTripMode', 'income_group']).agg('count').reset_index()
-        # ymax = grouped['PID'].max() * 1.1
-
-        grouped.loc[:, 'PID'] = grouped['PID']
-
-        grouped = grouped.pivot(
-            index='realizedTripMode', 
-            columns='income_group', 
-            values='PID'
-        ).reset_index().rename(columns={'index':'realizedTripMode'})
-        data = grouped.to_dict(orient='list')
+        grouped = self.trip_cube.frame('mode', 'income')
+        # ymax = grouped.max().max() * 1.1
+
+        grouped = grouped.rename_axis('realizedTripMode').reset_index()
+        data = to_column_data(grouped)
 
         return data 
 
+    def make_trip_cube(self):
+        """
+        TripCube of the trips per realized mode, age and income group of the
+        person, distance group and hour of the day of the start, the
+        demographic cross-tabs of the mode choice products being its
+        marginals
+        """
+        trips = self.trips_df
+        # the modes of the dashboard are always in, even without trips
+        modes = sorted(set(self.modes) | set(
+            trips['realizedTripMode'].dropna().unique()))
+        mode_codes = pd.Index(modes).get_indexer(
+            trips['realizedTripMode'].values)
+
+        codes = self.trip_pid_codes
+        known = codes >= 0
+        ages = np.full(len(codes), np.nan)
+        ages[known] = self.population.age[codes[known]]
+        incomes = np.full(len(codes), np.nan)
+        incomes[known] = self.population.income[codes[known]]
+
+        return TripCube.from_codes([
+            ('mode', modes, mode_codes),
+            ('age', AGE_GROUPS, value_codes(ages, AGE_EDGES, right=False)),
+            ('income', INCOME_GROUPS,
+             value_codes(incomes, INCOME_EDGES, right=False)),
+            ('distance', DISTANCE_GROUPS,
+             value_codes(trips['Distance_m'].values * 0.000621371,
+                         DISTANCE_EDGES, right=False)),
+            ('hour', HOURS, hour_codes(trips['Start_time'].values)),
+        ])
+
     def make_mode_choice_by_age_group_data(self):
 
-        persons_cols = ['PID', 'Age']
-        trips_cols = ['PID', 'realizedTripMode']
-        people_age_mode = self.persons_df[persons_cols].merge(
-            self.trips_df[trips_cols], on=['PID'])
-        edges = [0, 18, 30, 40, 50, 60, float('inf')]
-        bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
-        people_age_mode.loc[:, 'age_group'] = pd.cut(people_age_mode['Age'],
-                                                     bins=edges,
-                                                     labels=bins,
-                                                     right=False).astype(str)
-        grouped = people_age_mode.groupby(
-            by=['realizedTripMode', 'age_group']).agg('count').reset_index()
-        # ymax = grouped['PID'].max() * 1.1
-
-        grouped.loc[:, 'PID'] = grouped['PID']
-
-        grouped = grouped.pivot(
-            index='realizedTripMode', 
-            columns='age_group', 
-            values='PID'
-        ).reset_index().rename(columns={'index':'realizedTripMode'})
-        data = grouped.to_dict(orient='list')
+        grouped = self.trip_cube.frame('mode', 'age')
+        # ymax = grouped.max().max() * 1.1
+
+        grouped = grouped.rename_axis('realizedTripMode').reset_index()
+        data = to_column_data(grouped)
         return data 
 
     def make_mode_choice_by_distance_data(self):
         
-        mode_df = self.trips_df[['Trip_ID', 'Distance_m', 'realizedTripMode']].copy()
-        mode_df.loc[:,'Distance_miles'] = mode_df['Distance_m'] * 0.000621371
-
-        edges = [0, .5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 5, 7.5, 10, 40]
-        bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
-        mode_df.loc[:,'Trip Distance (miles)'] = pd.cut(mode_df['Distance_miles'],
-                                                        bins=edges,
-                                                        labels=bins,
-                                                        right=False).astype(str)
-
-        mode_df_grouped = mode_df.groupby(
-            by=['realizedTripMode', 'Trip Distance (miles)']
-        ).agg('count').reset_index()
-
-        # rename df column to num_people due to grouping
-        mode_df_grouped = mode_df_grouped.rename(
-            index=str, columns={'Trip_ID': 'num_trips'})
-
-        mode_df_grouped.loc[:, 'num_trips'] = mode_df_grouped['num_trips']
+        for_plot = self.trip_cube.frame('distance', 'mode').astype(float)
+        # max_trips = for_plot.sum(axis=1).max() * 1.1
 
-        for_plot = mode_df_grouped[['realizedTripMode',
-                                    'Trip Distance (miles)',
-                                    'num_trips']]
-        # max_trips = for_plot.groupby('Trip Distance (miles)')['num_trips'].sum().max() * 1.1
-
-        for_plot = for_plot.rename(columns={'realizedTripMode': 'Trip Mode'})
-        for_plot = for_plot.pivot(
-            index='Trip Distance (miles)', columns='Trip Mode',
-            values='num_trips').fillna(0.0).reset_index()
-
-        for mode in self.modes:
-            if mode not in for_plot.columns:
-                for_plot[mode] = 0.0
+        for_plot = for_plot.rename_axis('Trip Distance (miles)').reset_index()
         # colors = Dark2[len(self.modes)]
 
-        data = for_plot.to_dict(orient='list')
+        data = to_column_data(for_plot)
         return data 
 
     def make_congestion_travel_time_by_mode_data(self):
@@ -721,11 +1226,12 @@ class Submission():
         modes = travel_time.columns.values.tolist()
         palette = Dark2[len(modes)]
 
-        data=dict( 
-            x=modes,
-            y=[travel_time[mode] for mode in modes],
-            color=palette,
-        )
+        # a single row of mean travel times, one bar per mode
+        data = to_column_data(pd.DataFrame(
+            {'x': modes,
+             'y': travel_time.iloc[0][modes].values.astype(np.float64),
+             'color': palette},
+            columns=['x', 'y', 'color']))
         return data
 
     def make_congestion_travel_time_per_passenger_trip_data(self):
@@ -733,20 +1239,12 @@ class Submission():
         # travel_time = self.travel_times_df.set_index(
         #     "TravelTimeMode\Hour").T.reset_index()
 
-        mode_df = self.trips_df[['realizedTripMode', 'Duration_sec', 'Start_time']].copy()
-        edges = range(0,25*3600,3600)
-        mode_df.loc[:, "Hour"] = pd.cut(
-            mode_df["Start_time"],
-            bins=edges,
-            labels=HOURS,
-            include_lowest=True)
-
-        travel_time = mode_df[['realizedTripMode', 'Duration_sec', 'Hour']].groupby(
-            ['realizedTripMode','Hour']).mean().fillna(0)
+        travel_time = bin_by_mode(
+            hour_codes(self.trips_df['Start_time'].values), DAY_HOURS,
+            self.trips_df['realizedTripMode'].values,
+            self.trips_df['Duration_sec'].values, 'mean')
         # translate travel time to minute
-        travel_time = (travel_time.reset_index().pivot(
-            index='realizedTripMode', columns='Hour') / 60
-        ).T.reset_index(drop=True).reset_index()
+        travel_time = (travel_time.fillna(0) / 60).reset_index()
 
         for mode in self.modes:
             if mode not in travel_time.columns:
@@ -755,16 +1253,9 @@ class Submission():
         #travel_time.rename(columns={"ride_hail": "OnDemand_ride"}, inplace=True)
         # del travel_time['others']
 
-        # max_hour = max([int(h) for h in travel_time['index']])
-        # if max_hour > 23:
-        #     hours = [str(h) for h in range(max_hour + 1)]
-        # else:
-        #     hours = HOURS
-        #     max_hour = 23
-
         # max_time = travel_time.max().max() * 1.1 
 
-        data = travel_time.to_dict(orient='list')
+        data = to_column_data(travel_time)
         return data
 
     def make_congestion_miles_traveled_per_mode_data(self):
@@ -776,7 +1267,7 @@ class Submission():
             self.paths_df[self.paths_df["mode"] == "bus"]["length"].apply(
                 lambda x: x * 0.000621371).sum(), 0)
         vmt_on_demand = round(
-            self.paths_df[self.paths_df["vehicle"].str.contains("rideHailVehicle")]["length"].apply(lambda x: x * 0.000621371).sum(), 0)
+            self.paths_df[self.ride_hail_paths]["length"].apply(lambda x: x * 0.000621371).sum(), 0)
         vmt_car = round(
             self.legs_df[self.legs_df["Mode"] == "car"]["Distance_m"].apply(
                 lambda x: x * 0.000621371).sum(), 0)
@@ -790,237 +1281,237 @@ class Submission():
         # max_vmt = vmt['value'].max() * 1.1
 
         palette = Dark2[5]
-        data = dict(modes=modes, vmt=[vmt_on_demand, vmt_car, vmt_walk, vmt_bus], 
-            color=[palette[0], palette[1], palette[3], palette[4]])
+        data = to_column_data(pd.DataFrame(
+            {'modes': modes,
+             'vmt': [vmt_on_demand, vmt_car, vmt_walk, vmt_bus],
+             'color': [palette[0], palette[1], palette[3], palette[4]]},
+            columns=['modes', 'vmt', 'color']))
         return data
 
     def make_congestion_car_vmt_by_time_data(self):
-        columns = ["Distance_m", "Start_time"]
-
-        vmt_car_ridership = self.legs_df[self.legs_df["Mode"] == "car"][columns]
-        # Split the travels by hour of the day
-        edges = range(0,25*3600,3600)
-        vmt_car_ridership.loc[:, "Hour"] = pd.cut(
-            vmt_car_ridership["Start_time"],
-            bins=edges,
-            labels=HOURS,
-            include_lowest=True)
-
-        vmt_car_ridership = vmt_car_ridership[["Hour","Distance_m"]].groupby(
-            "Hour").sum().reset_index()
+        if self.pushdown:
+            distance = self.db.load_car_vmt_by_hour(
+                self.simulation_ids[0]).set_index('Hour')['Distance_m'] \
+                .reindex(range(DAY_HOURS), fill_value=0.0).values
+        else:
+            car_legs = (self.legs_df["Mode"] == "car").values
+            # Split the travels by hour of the day
+            distance = bin_sum(
+                hour_codes(self.legs_df["Start_time"].values[car_legs]),
+                DAY_HOURS, self.legs_df["Distance_m"].values[car_legs])
+
         # translate meters to miles
-        vmt_car_ridership.loc[:, 'Distance_m'] = round(
-            vmt_car_ridership['Distance_m'].apply(
-                lambda x: x * 0.000621371), 0)
-        vmt_car_ridership.replace(np.nan, 0, inplace=True)
-        vmt_car_ridership.loc[:, "Hour"] = vmt_car_ridership["Hour"].astype("int")
-
-        for h in HOURS:
-            if int(h) not in vmt_car_ridership["Hour"].values:
-                df = pd.DataFrame([int(h), 0.0]).T
-                df.columns = ['Hour','Distance_m']
-                vmt_car_ridership = vmt_car_ridership.append(
-                    df, ignore_index=True, sort=False)
-
-        data = vmt_car_ridership.sort_values('Hour').to_dict(orient='list')
+        vmt_car_ridership = pd.DataFrame(
+            {'Hour': np.arange(DAY_HOURS),
+             'Distance_m': np.round(distance * 0.000621371, 0)},
+            columns=['Hour', 'Distance_m'])
+
+        data = to_column_data(vmt_car_ridership)
         return data
 
     def make_congestion_bus_vmt_by_ridership_data(self):
-        columns = ["numPassengers", "vehicleType", "length",
-                   "departureTime", "arrivalTime"]
-        vmt_bus_ridership = self.paths_df[self.paths_df["mode"] == "bus"][columns]
-        vmt_bus_ridership.loc[:, 'seatingCapacity'] = vmt_bus_ridership['vehicleType'].apply(
-            lambda x: self.seating_capacities[x])
-        vmt_bus_ridership.loc[:, 'standingRoomCapacity'] = vmt_bus_ridership['vehicleType'].apply(
-            lambda x: self.standing_room_capacities[x])
-
-        vmt_bus_ridership.loc[:, 'ridershipPerc'] = vmt_bus_ridership.apply(
-            lambda x: calc_ridership_perc(x), axis=1)
-
-        # Split the travels by hour of the day
-        edges = range(0,25*3600,3600)
-        vmt_bus_ridership.loc[:, "Hour"] = pd.cut(
-            vmt_bus_ridership["departureTime"], 
-            bins=edges,
-            labels=HOURS,
-            include_lowest=True)
-
-        # Group by hours of the day and number of passengers in the bus
-        vmt_bus_ridership = vmt_bus_ridership.groupby(
-            by=["Hour", "ridershipPerc"])['length'].sum().reset_index()
-        edges = [0, 0.01, 50, 100, 150.0, 200.0]
-        bins = [
-            'empty\n(0 passengers)', 
-            'low ridership\n(< 50% seating capacity)', 
-            'medium ridership\n(< seating capacity)', 
-            'high ridership\n(< 50% standing capacity)',
-            'crowded\n(<= standing capacity)'
-        ]
-        vmt_bus_ridership.loc[:, "ridership"] = pd.cut(
-            vmt_bus_ridership["ridershipPerc"], 
-            bins=edges,
-            labels=bins,
-            include_lowest=True)
-        vmt_bus_ridership.replace(np.nan, 0, inplace=True)
-        vmt_bus_ridership.loc[:, "Hour"] = vmt_bus_ridership["Hour"].astype("int")
-        # del vmt_bus_ridership['numPassengers']
-        # del vmt_bus_ridership['departureTime']
-        # del vmt_bus_ridership['arrivalTime']
-        # Completing the dataframe with the missing ridership bins (so that they appear in the plot)
-        df = pd.DataFrame([0, 0.0, ""]).T
-        df.columns = ["Hour", "length", "ridership"]
-
-        for ridership in bins:
-            for hour in range(24):
-                if len(vmt_bus_ridership[(vmt_bus_ridership['Hour'] == hour) & (vmt_bus_ridership['ridership'] == ridership)].index) == 0:
-                    df.loc[0, "ridership"] = ridership
-                    df.loc[0, "Hour"] = hour
-                    vmt_bus_ridership = vmt_bus_ridership.append(
-                        df, ignore_index=True, sort=False)
-
-        vmt_bus_ridership = vmt_bus_ridership.groupby(
-            ['Hour', 'ridership'])['length'].sum().reset_index()
+        if self.pushdown:
+            vmt_bus_ridership = self.db.load_bus_vmt_by_ridership(
+                self.simulation_ids[0], self.scenario)
+            hours = vmt_bus_ridership['Hour'].values
+        else:
+            columns = ["numPassengers", "vehicleType", "length",
+                       "departureTime"]
+            vmt_bus_ridership = self.paths_df[
+                self.paths_df["mode"] == "bus"][columns]
+            passengers = vmt_bus_ridership['numPassengers'].values
+            seating = vmt_bus_ridership['vehicleType'].map(
+                self.seating_capacities).values
+            standing = vmt_bus_ridership['vehicleType'].map(
+                self.standing_room_capacities).values
+            with np.errstate(divide='ignore', invalid='ignore'):
+                vmt_bus_ridership = vmt_bus_ridership.assign(
+                    ridershipPerc=np.where(
+                        passengers > seating,
+                        100.0 + (passengers - seating) * 100.0 / standing,
+                        passengers * 100.0 / seating))
+            # Split the travels by hour of the day
+            hours = hour_codes(vmt_bus_ridership["departureTime"].values)
+
+        # Group by hours of the day and ridership of the bus
+        ridership = value_codes(vmt_bus_ridership["ridershipPerc"].values,
+                                RIDERSHIP_EDGES, include_lowest=True)
+        length = bin_sum(
+            flat_codes(hours, ridership, len(RIDERSHIP_BINS)),
+            DAY_HOURS * len(RIDERSHIP_BINS),
+            vmt_bus_ridership['length'].values)
         # translate meters to miles
-        vmt_bus_ridership.loc[:, 'length'] = round(
-            vmt_bus_ridership['length'].apply(
-                lambda x: x * 0.000621371), 0)
-        vmt_bus_ridership = vmt_bus_ridership.pivot(
-            index='Hour',
-            columns='ridership', 
-            values='length')
+        vmt_bus_ridership = pd.DataFrame(
+            np.round(length.reshape(DAY_HOURS, len(RIDERSHIP_BINS)) *
+                     0.000621371, 0),
+            columns=RIDERSHIP_BINS)
+        vmt_bus_ridership.insert(0, 'Hour', np.arange(DAY_HOURS))
         # ymax = vmt_bus_ridership.sum(axis=1).max()*1.1
 
         # colors = Dark2[len(bins)]
 
-        data = vmt_bus_ridership.reset_index().to_dict(orient='list')
+        data = to_column_data(vmt_bus_ridership)
         return data 
 
     def make_congestion_on_demand_vmt_by_phases_data(self):
 
-        columns = ["numPassengers", "departureTime", "length"]
-        vmt_on_demand = self.paths_df[self.paths_df["vehicle"].str.contains("rideHailVehicle")].copy()[columns]
-        # Split the travels by hour of the day
-        edges = range(0,25*3600,3600)
-        vmt_on_demand.loc[:, "Hour"] = pd.cut(vmt_on_demand["departureTime"],
-                                              bins=edges,
-                                              labels=HOURS,
-                                              right=False)
-        driving_states = ["fetch", "fare"]
-        vmt_on_demand.loc[:, "drivingState"] = pd.cut(
-            vmt_on_demand["numPassengers"], bins=[0, 1, 2],
-            labels=driving_states, right=False)
-
-        vmt_on_demand = vmt_on_demand.groupby(
-            by=["Hour", "drivingState"])['length'].sum().reset_index()
-        vmt_on_demand.replace(np.nan, 0, inplace=True)
-        vmt_on_demand.loc[:, "Hour"] = vmt_on_demand["Hour"].astype("int")
-
+        if self.pushdown:
+            vmt_on_demand = self.db.load_on_demand_vmt_by_hour(
+                self.simulation_ids[0])
+            hours = vmt_on_demand['Hour'].values
+            states = pd.Index(DRIVING_STATES).get_indexer(
+                vmt_on_demand['drivingState'].values)
+        else:
+            columns = ["numPassengers", "departureTime", "length"]
+            vmt_on_demand = self.paths_df[self.ride_hail_paths][columns]
+            # Split the travels by hour of the day
+            hours = hour_codes(vmt_on_demand["departureTime"].values)
+            # fetch without passenger, fare with one
+            states = value_codes(vmt_on_demand["numPassengers"].values,
+                                 [0, 1, 2], right=False)
+
+        length = bin_sum(flat_codes(hours, states, len(DRIVING_STATES)),
+                         DAY_HOURS * len(DRIVING_STATES),
+                         vmt_on_demand['length'].values)
         # translate meters to miles
-        vmt_on_demand.loc[:,'length'] = round(
-            vmt_on_demand.loc[:,'length'].apply(
-                lambda x: x * 0.000621371), 0)
-
-        vmt_on_demand = vmt_on_demand.pivot(
-            index='Hour', 
-            columns='drivingState',
-            values='length')
-        vmt_on_demand = vmt_on_demand.reset_index()
-
-        for h in HOURS:
-            if int(h) not in vmt_on_demand["Hour"].values:
-                df = pd.DataFrame([int(h), 0.0, 0.0]).T
-                df.columns = ['Hour','fare','fetch']
-                vmt_on_demand = vmt_on_demand.append(
-                    df, ignore_index=True, sort=False)
+        vmt_on_demand = pd.DataFrame(
+            np.round(length.reshape(DAY_HOURS, len(DRIVING_STATES)) *
+                     0.000621371, 0),
+            columns=DRIVING_STATES)
+        vmt_on_demand.insert(0, 'Hour', np.arange(DAY_HOURS))
 
         # ymax = vmt_on_demand.sum(axis=1).max()*1.1
 
         # colors = Dark2[3][:len(driving_states)]
 
-        data = vmt_on_demand.sort_values('Hour').to_dict(orient='list')
+        data = to_column_data(vmt_on_demand)
         return data 
 
     def make_congestion_travel_speed_data(self):
 
-        trips = self.trips_df[self.trips_df['Duration_sec'] > 0].copy()
-        
-        trips.loc[:, 'average speed (meters/sec)'] = trips['Distance_m'] / trips['Duration_sec']
-        trips.loc[:, 'Average Speed (miles/hour)'] = 2.23694 * trips['average speed (meters/sec)']
-        trips.loc[:, 'Start_time_hour'] = trips['Start_time'] / 3600
-        
-        edges = [6, 8, 10, 12, 14, 16, 18, 20, 22, 24]
-        bins = ['[{}, {})'.format(edges[i], edges[i+1]) for i in range(len(edges)-1)]
-        trips.loc[:, 'time_interval'] = pd.cut(
-            trips['Start_time_hour'],
-            bins=edges,
-            labels=bins,
-            right=False).astype(str)
-
-        trips = trips.rename(
-            index=str, columns={"time_interval": "Start time interval (hour)"})
-
-        grouped = trips.groupby(
-            by=['Start time interval (hour)', 'realizedTripMode']
-        )['Average Speed (miles/hour)'].mean().reset_index()
+        if self.pushdown:
+            grouped = self.db.load_travel_speed(
+                self.simulation_ids[0], TRAVEL_SPEED_EDGES).pivot(
+                    index='Start time interval (hour)',
+                    columns='realizedTripMode',
+                    values='Average Speed (miles/hour)')
+            grouped = grouped.reindex(index=TRAVEL_SPEED_INTERVALS,
+                                      columns=sorted(grouped.columns))
+            grouped.columns.name = None
+            grouped = grouped.reset_index(drop=True)
+        else:
+            trips = self.trips_df[self.trips_df['Duration_sec'] > 0]
+            # average speed in miles/hour
+            speed = 2.23694 * trips['Distance_m'].values / \
+                trips['Duration_sec'].values
+            grouped = bin_by_mode(
+                period_codes(trips['Start_time'].values,
+                             np.array(TRAVEL_SPEED_EDGES) * HOUR),
+                len(TRAVEL_SPEED_INTERVALS), trips['realizedTripMode'].values,
+                speed, 'mean')
         # max_speed = grouped['Average Speed (miles/hour)'].max() * 1.2
 
-        grouped = grouped.pivot(
-            index='Start time interval (hour)', 
-            columns='realizedTripMode', 
-            values='Average Speed (miles/hour)')
-
         for mode in self.modes:
             if mode not in grouped.columns:
                 grouped[mode] = 0.0
 
-        grouped = grouped.reset_index().rename(
-            columns={'index':'Start time interval (hour)'})
+        grouped.insert(0, 'Start time interval (hour)', TRAVEL_SPEED_INTERVALS)
 
-        data = grouped.to_dict(orient='list')
+        data = to_column_data(grouped)
         return data 
 
-    def make_los_travel_expenditure_data(self):
-
-        trips = self.trips_df.copy()
-        trips.loc[:, 'trip_cost'] = np.zeros(trips.shape[0])
-
-        trips.loc[trips['realizedTripMode'] == 'car', 'trip_cost'] = \
-            trips[trips['realizedTripMode'] == 'car']['fuelCost'].values + \
-            trips[trips['realizedTripMode'] == 'car']['Toll'].values
-
-        fare_modes = ['walk_transit', 'drive_transit', 'ride_hail']
-        trips.loc[trips['realizedTripMode'].isin(fare_modes), 'trip_cost'] = \
-            trips[trips['realizedTripMode'].isin(fare_modes)]['Fare'].values - \
-            trips[trips['realizedTripMode'].isin(fare_modes)]['Incentive'].values
+    def make_trip_costs(self):
+        """
+        Money side of every trip, in one vectorized pass over trips_df,
+        shared by the expenditure, incentive and equity products.
 
-        trips.loc[trips['realizedTripMode'] == 'drive_transit', 'trip_cost'] = \
-            trips[trips['realizedTripMode'] == 'drive_transit']['trip_cost'].values + \
-            trips[trips['realizedTripMode'] == 'drive_transit']['fuelCost'].values + \
-            trips[trips['realizedTripMode'] == 'drive_transit']['Toll'].values
+        Returns
+        -------
+        costs : pandas DataFrame
+            Aligned on the rows of trips_df, with the 'cost' of the trip
+            before incentives (the fare of FARE_MODES plus the fuel and tolls
+            of DRIVE_MODES), the 'incentive' of the trip as recorded by BEAM
+            (of any mode) and the net 'expenditure' (the cost minus the
+            incentive of FARE_MODES). The expenditure is negative when the
+            incentive is larger than the cost: the products using it decide
+            how to count these trips.
+        """
+        trips = self.trips_df
+        modes = trips['realizedTripMode'].values
+        pays_fare = np.isin(modes, FARE_MODES)
+
+        cost = np.where(pays_fare, trips['Fare'].values, 0.0) + np.where(
+            np.isin(modes, DRIVE_MODES),
+            trips['fuelCost'].values + trips['Toll'].values, 0.0)
+        incentive = trips['Incentive'].values.astype(np.float64)
+        expenditure = cost - np.where(pays_fare, incentive, 0.0)
+        return pd.DataFrame(
+            {'cost': cost, 'incentive': incentive,
+             'expenditure': expenditure},
+            columns=['cost', 'incentive', 'expenditure'])
 
-        trips.loc[trips['trip_cost'] < 0,:] = 0
-        trips.loc[:, "hour_of_day"] = np.floor(trips.Start_time/3600)
+    def make_los_travel_expenditure_data(self):
 
-        grouped = trips.groupby(
-            by=["realizedTripMode", "hour_of_day"]
-        )["trip_cost"].mean().reset_index()
-        grouped = grouped[grouped['realizedTripMode'] != 0]
+        trips = self.trips_df
+        expenditure = self.trip_costs['expenditure'].values
+        # the trips with an incentive larger than their cost are left out
+        with np.errstate(invalid='ignore'):
+            kept = ~(expenditure < 0)
+        grouped = bin_by_mode(
+            hour_codes(trips['Start_time'].values[kept]), DAY_HOURS,
+            trips['realizedTripMode'].values[kept], expenditure[kept], 'mean')
         # max_cost = grouped['trip_cost'].max() * 1.1
 
-        grouped = grouped.pivot(
-            index='hour_of_day', 
-            columns='realizedTripMode', 
-            values='trip_cost')
-
         for mode in self.modes:
             if mode not in grouped.columns:
                 grouped[mode] = 0.0
 
-        grouped = grouped.reset_index().rename(columns={'index':'hour_of_day'})
+        grouped.insert(0, 'hour_of_day', np.arange(DAY_HOURS, dtype=float))
 
-        data = grouped.to_dict(orient='list')
+        data = to_column_data(grouped)
         return data 
 
+    def make_los_cost_burden_by_income_data(self):
+        """
+        Net travel expenditure of the persons per income group: per trip,
+        per traveller and day, and as a percentage of the daily income of
+        the travellers of the group (cost burden). Unlike the expenditure by
+        mode, the negative expenditure of trips with an incentive larger
+        than their cost is summed with the others.
+        """
+        codes = self.trip_pid_codes
+        known = codes >= 0
+        groups = value_codes(self.population.income[codes[known]],
+                             INCOME_EDGES, right=False)
+        n_groups = len(INCOME_GROUPS)
+        trips = bin_sum(groups, n_groups)
+        expenditure = bin_sum(
+            groups, n_groups, self.trip_costs['expenditure'].values[known])
+        incentive = bin_sum(
+            groups, n_groups, self.trip_costs['incentive'].values[known])
+
+        # the travellers, counted once whatever their number of trips
+        travellers = np.unique(codes[known])
+        income = self.population.income[travellers]
+        traveller_groups = value_codes(income, INCOME_EDGES, right=False)
+        persons = bin_sum(traveller_groups, n_groups)
+        daily_income = bin_sum(traveller_groups, n_groups, income) / 365.0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            burden = pd.DataFrame({
+                'income_group': INCOME_GROUPS,
+                'Expenditure per trip': expenditure / trips,
+                'Incentive per trip': incentive / trips,
+                'Daily expenditure per person': expenditure / persons,
+                'Cost burden (% of income)': 100.0 * expenditure / daily_income
+            }, columns=['income_group', 'Expenditure per trip',
+                        'Incentive per trip', 'Daily expenditure per person',
+                        'Cost burden (% of income)'])
+        burden = burden.replace([np.inf, -np.inf], np.nan)
+
+        data = to_column_data(burden)
+        return data
+
     def make_los_crowding_data(self):
 
         columns = ["vehicle", "numPassengers", "departureTime", "arrivalTime",
@@ -1035,43 +1526,80 @@ class Submission():
             lambda x: TRANSIT_SCALE_FACTOR * self.seating_capacities[x])
         bus_slice_df.loc[:, "passengerOverflow"] = (
             bus_slice_df['numPassengers'] > bus_slice_df['seatingCapacity'])
-        # AM peak = 7am-10am, PM Peak = 5pm-8pm, Early Morning, Midday, Late Evening = in between
-        bins = [0, 25200, 36000, 61200, 72000, 86400]
-        labels = ["Early Morning (12a-7a)", "AM Peak (7a-10a)",
-                  "Midday (10a-5p)", "PM Peak (5p-8p)", "Late Evening (8p-12a)"]
-        bus_slice_df.loc[:, "servicePeriod"] = pd.cut(
-            bus_slice_df['departureTime'],
-            bins=bins,
-            labels=labels)
-        grouped_data = bus_slice_df[bus_slice_df['passengerOverflow']].groupby(
-            ["route_id", "servicePeriod"]
-        )["serviceTime"].sum().fillna(0).reset_index()
+        labels = SERVICE_PERIODS
+        overflow = bus_slice_df[bus_slice_df['passengerOverflow']]
+        periods = period_codes(overflow['departureTime'].values,
+                               SERVICE_PERIOD_EDGES)
+        grouped_data = overflow[periods >= 0].groupby(
+            [overflow['route_id'].astype(str).values[periods >= 0],
+             periods[periods >= 0]]
+        )["serviceTime"].sum().rename_axis(['route_id', 'servicePeriod'])
         # max_crowding = grouped_data['serviceTime'].max() * 1.1
 
-        grouped_data.loc[:, 'serviceTime'] = grouped_data['serviceTime']
-
-        grouped_data = reset_index(grouped_data.pivot(
-            index='route_id', 
-            columns='servicePeriod', 
-            values='serviceTime')).rename(columns={'index':'route_id'})
-
         # Completing the dataframe with the missing service periods and route_ids (so that they appear in the plot)
-        for label in labels:
-            if label not in grouped_data.columns:
-                grouped_data.loc[:, label] = 0.0
-        
-        df = pd.DataFrame(['', 0.0, 0.0, 0.0, 0.0, 0.0]).T
-        df.columns = ["route_id"] + labels
+        grouped_data = complete_grid(
+            grouped_data.to_frame(),
+            [('route_id', self.route_ids),
+             ('servicePeriod', range(len(labels)))]
+        )['serviceTime'].unstack(fill_value=0.0)
+        grouped_data.columns = labels
+        grouped_data = grouped_data.reset_index()
+
+        data = to_column_data(grouped_data)
+        return data 
 
-        for route_id in self.route_ids:
-            if route_id not in set(grouped_data['route_id']):
-                df.loc[0, "route_id"] = route_id
-                grouped_data = grouped_data.append(
-                    df, ignore_index=True, sort=False)
+    def make_parking_overhead(self):
+        """
+        Pivot parkingStats into dense (TAZ x timeBin) arrays, one per parking
+        column. The TAZ axis follows the scenario TAZ index.
+        """
+        taz_index = self.load_taz_index(self.scenario)
+        parking = self.parking_df
+
+        if parking is None or parking.empty:
+            n_bins = len(HOURS)
+            return dict(
+                {col: np.zeros((len(taz_index), n_bins))
+                 for col in PARKING_COLUMNS}, n_bins=n_bins)
+
+        taz_codes = taz_index.encode(parking['TAZ'].values)
+        # hours past midnight fold onto the hours of the day
+        time_bins = fold_hours(parking['timeBin'].values.astype(int))
+        n_bins = DAY_HOURS
+        flat_index = flat_codes(taz_codes, time_bins, n_bins)
+        size = len(taz_index) * n_bins
+
+        overhead = {'n_bins': n_bins}
+        for col in PARKING_COLUMNS:
+            overhead[col] = bin_sum(
+                flat_index, size, parking[col].values
+            ).reshape(len(taz_index), n_bins)
+        return overhead
+
+    def make_los_parking_overhead_data(self):
+        n_bins = self.parking_overhead['n_bins']
+        data = {col: compact_array(self.parking_overhead[col].sum(axis=0))
+                for col in PARKING_COLUMNS}
+        data['Hour'] = compact_array(np.arange(n_bins))
+        return data
 
-        grouped_data.loc[:, 'route_id'] = grouped_data.loc[:, 'route_id'].astype(str)
-        data = grouped_data.to_dict(orient='list')
-        return data 
+    def make_parking_overhead_delta_data(self, other):
+        """
+        Per-TAZ difference of the daily parking overhead between another
+        submission of the same scenario and this one (other - self).
+        """
+        taz_index = self.load_taz_index(self.scenario)
+        n_taz = len(taz_index)
+
+        data = {'x': compact_array(np.arange(n_taz)),
+                'TAZ': taz_index.ids.astype(str)}
+        for col in PARKING_COLUMNS:
+            totals = [
+                pad_to(sub.make_data_product('parking_overhead')[col]
+                       .sum(axis=1), n_taz)
+                for sub in (self, other)]
+            data[col] = compact_array(totals[1] - totals[0])
+        return data
 
     def make_transit_cb_data(self):
 
@@ -1100,18 +1628,12 @@ class Submission():
         grouped_data = merged_df.groupby(by="route_id")[labels].sum()
 
         # max_cost = grouped_data.sum(axis=1).max() * 1.1
-        grouped_data.reset_index(inplace=True)
 
         # Completing the dataframe with the missing route_ids (so that they appear in the plot)
-        df = pd.DataFrame(['', 0.0, 0.0, 0.0]).T
-        df.columns = ["route_id"] + labels
-
-        for route_id in self.route_ids:
-            if int(route_id) not in grouped_data['route_id'].values:
-                df.loc[0, "route_id"] = int(route_id)
-                grouped_data = grouped_data.append(
-                    df, ignore_index=True, sort=False)
-        grouped_data.sort_values('route_id', inplace=True)
+        grouped_data = complete_grid(
+            grouped_data,
+            [("route_id", [int(route_id) for route_id in self.route_ids])])
+        grouped_data = grouped_data.sort_index().reset_index()
 
         grouped_data.loc[:, 'route_id'] = grouped_data.loc[:, 'route_id'].astype(str)
         grouped_data.loc[:, 'OperationalCosts'] *= -1
@@ -1119,75 +1641,49 @@ class Submission():
 
         # colors = Dark2[len(labels)]
 
-        costs_data = grouped_data[['route_id'] + costs_labels].to_dict(orient='list')
-        benefits_data = grouped_data[['route_id'] + benefits_labels].to_dict(orient='list')
+        costs_data = to_column_data(grouped_data[['route_id'] + costs_labels])
+        benefits_data = to_column_data(grouped_data[['route_id'] + benefits_labels])
         return costs_data, benefits_data
 
     def make_transit_inc_by_mode_data(self):
         
-        columns = ['fuelCost', 'Fare', 'Start_time', 'realizedTripMode', 'Incentive', 'Toll']
-        trips = self.trips_df.copy()[columns]
-
-        trips.loc[:, 'trip_cost'] = np.zeros(trips.shape[0])
-        trips.loc[:, 'ride_expenditure'] = trips['Fare'] - trips['Incentive']
-        ride_modes = set(['walk_transit', 'drive_transit', 'ride_hail'])
-
-        trips.loc[trips['realizedTripMode'] == 'car', 'trip_cost'] = \
-            trips[trips['realizedTripMode'] == 'car']['fuelCost'].values + \
-            trips[trips['realizedTripMode'] == 'car']['Toll'].values
-
-        trips.loc[trips['realizedTripMode'].isin(ride_modes), 'trip_cost'] = \
-            trips[trips['realizedTripMode'].isin(ride_modes)]['ride_expenditure'].values
-
-        trips.loc[trips['realizedTripMode'] == 'drive_transit', 'trip_cost'] += \
-            trips[trips['realizedTripMode'] == 'drive_transit']['fuelCost'].values + \
-            trips[trips['realizedTripMode'] == 'drive_transit']['Toll'].values
-
-        trips.loc[:, 'Incentives distributed'] = trips['Incentive'].values
-        trips.loc[trips['trip_cost'] < 0, 'Incentives distributed'] -= trips[trips['trip_cost'] < 0]['trip_cost'].values
-
-        trips.loc[:, "hour_of_day"] = np.floor(trips['Start_time'] / 3600).astype(int)
-        grouped = trips.groupby(
-            by=["realizedTripMode", "hour_of_day"]
-        )["Incentives distributed"].sum().reset_index()
+        trips = self.trips_df
+        incentive = self.trip_costs['incentive'].values
+        expenditure = self.trip_costs['expenditure'].values
+        # the incentive exceeding the cost of a trip is counted twice, as it
+        # always was in this product
+        with np.errstate(invalid='ignore'):
+            distributed = np.where(expenditure < 0, incentive - expenditure,
+                                   incentive)
+        grouped = bin_by_mode(
+            hour_codes(trips['Start_time'].values), DAY_HOURS,
+            trips['realizedTripMode'].values, distributed)
 
         # max_incentives = grouped['Incentives distributed'].max() * 1.1
         # if max_incentives == 0:
         #     max_incentives = 100
 
-        grouped = grouped.pivot(
-            index='hour_of_day', 
-            columns='realizedTripMode', 
-            values='Incentives distributed')
-
         for mode in self.modes:
             if mode not in grouped.columns:
                 grouped[mode] = 0.0
 
-        grouped = grouped.reset_index().rename(columns={'index':'hour_of_day'})
+        grouped.insert(0, 'hour_of_day', np.arange(DAY_HOURS))
 
-        data = grouped.to_dict(orient='list')
+        data = to_column_data(grouped)
         return data 
 
     def make_toll_revenue_by_time_data(self):
-        trip_columns = ["Start_time", "Toll", "PID", "DestinationAct"]
-        trips = self.trips_df.copy()[trip_columns]
-        #act_columns = ["PID", "ActNum", "Type"]
-        #acts = self.activities_df.copy()[act_columns]
-
-        hours = range(25)
-        seconds = [hour*3600 for hour in hours]
-
-        trips['Hour'] = pd.cut(
-            trips['Start_time'],
-            bins=seconds,
-            labels=[str(h) for h in hours[:-1]]
-        )
-
-        trips = trips[['Toll','Hour']].groupby('Hour').sum()
-        trips = trips.reset_index()
+        if self.pushdown:
+            tolls = self.db.load_toll_revenue_by_hour(
+                self.simulation_ids[0]).set_index('Hour')['Toll'].reindex(
+                    range(DAY_HOURS)).fillna(0.0).values
+        else:
+            tolls = bin_sum(hour_codes(self.trips_df['Start_time'].values),
+                            DAY_HOURS, self.trips_df['Toll'].values)
 
-        return trips.to_dict(orient='list')
+        trips = pd.DataFrame({'Hour': HOURS, 'Toll': tolls},
+                             columns=['Hour', 'Toll'])
+        return to_column_data(trips)
 
     def make_sustainability_25pm_per_mode_data(self):
         
@@ -1199,7 +1695,7 @@ class Submission():
             vmt[vmt["mode"] == "bus"]["length"].apply(
                 lambda x: x * 0.000621371 * 0.0025936648).sum(), 0)
         emissions_on_demand = round(
-            vmt[vmt["vehicle"].str.contains("rideHailVehicle")]["length"].apply(
+            vmt[self.ride_hail_paths]["length"].apply(
                 lambda x: x * 0.000621371 * 0.001716086).sum(), 0)
         emissions_car = round(
             self.legs_df[self.legs_df["Mode"] == "car"]["Distance_m"].apply(
@@ -1215,10 +1711,11 @@ class Submission():
         # max_emissions = emissions['value'].max() * 1.1
         
         palette = Dark2[len(modes)]
-        data=dict(
-            modes=modes,
-            emissions=[emissions_on_demand, emissions_car, emissions_bus],
-            color=palette)
+        data = to_column_data(pd.DataFrame(
+            {'modes': modes,
+             'emissions': [emissions_on_demand, emissions_car, emissions_bus],
+             'color': palette},
+            columns=['modes', 'emissions', 'color']))
         return data
 
     def make_sustainability_ghg_per_mode_data(self):
@@ -1232,11 +1729,11 @@ class Submission():
             vmt[vmt["mode"] == "bus"]["fuelConsumed"].apply(
                 lambda x: x/(1.55e8) * 13718.04).sum(), 0)
         emissions_on_demand = round(
-            vmt[vmt["vehicle"].str.contains("rideHailVehicle")]["fuelConsumed"].apply(
+            vmt[self.ride_hail_paths]["fuelConsumed"].apply(
                 lambda x: x/(1.2e8) * 11405.84).sum(), 0)
         emissions_car = round(
             vmt[(vmt["mode"] == "car") &
-                (~vmt["vehicle"].str.contains("rideHailVehicle"))
+                (~self.ride_hail_paths)
             ]["fuelConsumed"].apply(lambda x: x/(1.2e8) * 11405.84).sum(), 0)
 
         emissions = pd.DataFrame(
@@ -1249,8 +1746,9 @@ class Submission():
         # max_emissions = emissions['value'].max() * 1.1
         
         palette = Dark2[len(modes)]
-        data=dict(
-            modes=modes,
-            emissions=[emissions_on_demand, emissions_car, emissions_bus],
-            color=palette)
+        data = to_column_data(pd.DataFrame(
+            {'modes': modes,
+             'emissions': [emissions_on_demand, emissions_car, emissions_bus],
+             'color': palette},
+            columns=['modes', 'emissions', 'color']))
         return data
@@ -0,0 +1,612 @@
+"""
+Synthetic BEAM outputs of any number of agents.
+
+write_submission() writes a submission directory in the layout read by
+Submission.get_data in file mode: persons, households, activities, trips,
+legs and path traversals dataframes, the mode choice histories, the last
+iteration mode choice by hour, travel times, parking stats and linkstats,
+and a grid network. Transit runs the Sioux Faux bus lines and the
+submission inputs and scores are those of the S0 example run, so the
+synthetic runs only differ from the real ones by their size.
+
+Agents are generated (and written) in chunks so that the largest scales do
+not need to fit in memory.
+
+Usage: python synthetic.py scale [output directory] [--seed N]
+
+scale is one of SCALES or a number of agents. The default output directory
+is data/submissions/sioux_faux-<scale>/synthetic, i.e.
+Submission('synthetic', 'sioux_faux-<scale>') in file mode.
+"""
+import argparse
+import shutil
+from collections import OrderedDict
+from os import makedirs
+from os.path import dirname, exists, join
+
+import numpy as np
+import pandas as pd
+
+SCALES = OrderedDict([('15k', 15000), ('150k', 150000), ('1.5M', 1500000),
+                      ('15M', 15000000)])
+
+SUBMISSIONS_DIR = join(dirname(__file__), 'data/submissions')
+REFERENCE_DIR = join(dirname(__file__), 'data/sioux_faux_bus_lines')
+# submission inputs and scores of the synthetic runs
+INPUTS_DIR = join(SUBMISSIONS_DIR, 'S0/example_run')
+INPUT_FILES = ['competition/submissionScores.csv',
+               'competition/submission-inputs/FrequencyAdjustment.csv',
+               'competition/submission-inputs/MassTransitFares.csv',
+               'competition/submission-inputs/ModeIncentives.csv',
+               'competition/submission-inputs/VehicleFleetMix.csv']
+
+CHUNK_AGENTS = 250000
+ITERATIONS = 10
+AGENCY_ID = 217
+
+# Trip modes and their shares in the Sioux Faux 15k example run
+MODES = ['car', 'drive_transit', 'ride_hail', 'walk', 'walk_transit']
+MODE_SHARES = np.array([22123, 1644, 1218, 3967, 7852], dtype=float)
+MODE_SHARES /= MODE_SHARES.sum()
+# Legs of a trip of each mode, '' padded
+LEG_MODES = np.array([['car', '', ''],
+                      ['car', 'bus', 'walk'],
+                      ['ride_hail', '', ''],
+                      ['walk', '', ''],
+                      ['walk', 'bus', 'walk']])
+# Share of the trip distance travelled on each leg
+LEG_SHARES = np.array([[1., 0., 0.],
+                       [.3, .65, .05],
+                       [1., 0., 0.],
+                       [1., 0., 0.],
+                       [.1, .8, .1]])
+# Average speed (m/s) of the trips of each mode
+MODE_SPEEDS = np.array([12., 8., 11., 1.4, 5.])
+ACTIVITY_TYPES = np.array(['Work', 'Secondary', 'Shopping', 'Other'])
+ACTIVITY_SHARES = [.5, .25, .15, .1]
+
+# Fuel: joule per meter, joule per gallon and dollars per gallon
+CAR_JOULE_PER_METER = 3655.98
+BUS_JOULE_PER_METER = 20048.
+CAR_JOULE_PER_GALLON = 1.2e8
+BUS_JOULE_PER_GALLON = 1.55e8
+DOLLARS_PER_GALLON = 3.
+CAR_TYPE = 'CAR-TYPE-DEFAULT'
+BODY_TYPE = 'BODY-TYPE-DEFAULT'
+# Bus types with operational costs in vehicleCosts.csv
+BUS_TYPES = ['BUS-DEFAULT', 'BUS-SMALL-HD']
+
+# Trips starting later than this are counted in the last hour
+MAX_HOURS = 32
+AGENTS_PER_RIDE_HAIL_VEHICLE = 50
+AGENTS_PER_TAZ = 50
+# Sioux Falls bounding box (lat, lon) of the grid network
+LAT_RANGE = (43.46, 43.62)
+LON_RANGE = (-96.84, -96.64)
+# Grid side of the network at 15k agents, it grows with the square root of
+# the number of agents (the number of links with its square root)
+GRID_SIDE_15K = 23
+
+
+def scale_agents(scale):
+    """Number of agents of a scale label ('150k') or of a number ('150000')"""
+    if scale in SCALES:
+        return SCALES[scale]
+    return int(float(scale))
+
+
+def scale_label(n_agents):
+    for label, agents in SCALES.items():
+        if agents == n_agents:
+            return label
+    return str(n_agents)
+
+
+def default_path(scale):
+    return join(SUBMISSIONS_DIR, 'sioux_faux-{}'.format(scale), 'synthetic')
+
+
+def format_clock(seconds):
+    """HH:MM:SS strings of seconds after midnight (hours may exceed 24)"""
+    seconds = np.asarray(seconds, dtype=np.int64)
+    hours = pd.Series(seconds // 3600).astype(str).str.zfill(2)
+    minutes = pd.Series(seconds // 60 % 60).astype(str).str.zfill(2)
+    secs = pd.Series(seconds % 60).astype(str).str.zfill(2)
+    return (hours + ':' + minutes + ':' + secs).values
+
+
+def person_ids(first, n):
+    return np.array(['{}-{}-{:05d}'.format(i, 2012000131467 + i, i % 99999)
+                     for i in range(first, first + n)], dtype=object)
+
+
+def make_network(n_agents):
+    """Grid network: (links, node coordinates) with links in both ways"""
+    side = max(2, int(round(GRID_SIDE_15K * (n_agents / 15000.) ** .25)))
+    lat, lon = np.meshgrid(np.linspace(LAT_RANGE[0], LAT_RANGE[1], side),
+                           np.linspace(LON_RANGE[0], LON_RANGE[1], side),
+                           indexing='ij')
+    nodes = np.arange(side * side).reshape(side, side)
+    from_nodes = np.concatenate([nodes[:, :-1].ravel(), nodes[:-1, :].ravel()])
+    to_nodes = np.concatenate([nodes[:, 1:].ravel(), nodes[1:, :].ravel()])
+    from_nodes, to_nodes = (np.concatenate([from_nodes, to_nodes]),
+                            np.concatenate([to_nodes, from_nodes]))
+    lat, lon = lat.ravel(), lon.ravel()
+    links = pd.DataFrame({
+        'LinkId': np.arange(len(from_nodes)),
+        'fromLocationID': from_nodes, 'toLocationID': to_nodes,
+        'fromLocationX': lat[from_nodes], 'fromLocationY': lon[from_nodes],
+        'toLocationX': lat[to_nodes], 'toLocationY': lon[to_nodes]})
+    # 1 degree of latitude ~ 111 km, of longitude ~ 81 km at 43.5N
+    links['length'] = np.hypot(
+        (links['toLocationX'] - links['fromLocationX']) * 111000.,
+        (links['toLocationY'] - links['fromLocationY']) * 81000.)
+    return links
+
+
+def make_bus_segments():
+    """
+    Stop to stop segments of the GTFS trips of the Sioux Faux bus lines:
+    (trip_id, route_id, departure, arrival, length), times interpolated
+    between the timepoints of each trip
+    """
+    stop_times = pd.read_csv(
+        join(REFERENCE_DIR, 'gtfs_data/stop_times.txt'),
+        usecols=['trip_id', 'departure_time', 'stop_sequence',
+                 'shape_dist_traveled'])
+    stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'])
+    stop_times['time'] = pd.to_timedelta(
+        stop_times['departure_time']).dt.total_seconds()
+    stop_times['time'] = stop_times.groupby('trip_id')['time'].transform(
+        lambda times: times.interpolate(limit_direction='both'))
+    trips = pd.read_csv(join(REFERENCE_DIR, 'gtfs_data/trips.txt'),
+                        usecols=['trip_id', 'route_id'])
+
+    same_trip = (stop_times['trip_id'].values[1:] ==
+                 stop_times['trip_id'].values[:-1])
+    start = stop_times.iloc[:-1][same_trip]
+    end = stop_times.iloc[1:][same_trip]
+    segments = pd.DataFrame({
+        'trip_id': start['trip_id'].values,
+        'departure': start['time'].values,
+        'arrival': end['time'].values,
+        'length': np.maximum(end['shape_dist_traveled'].values -
+                             start['shape_dist_traveled'].values, 0.)})
+    return segments.merge(trips, on='trip_id')
+
+
+class SyntheticRun(object):
+    """
+    Generator of the tables of a synthetic run of n_agents agents. The
+    scenario-wide parts (network, bus schedule, ride hail fleet) are built
+    once, the agents and their trips, legs and path traversals chunk by
+    chunk.
+    """
+
+    def __init__(self, n_agents, seed=0):
+        self.n_agents = n_agents
+        self.seed = seed
+        self.links = make_network(n_agents)
+        self.bus_segments = make_bus_segments()
+        self.bus_trips = self.bus_segments['trip_id'].unique()
+        routes = np.sort(self.bus_segments['route_id'].unique())
+        self.bus_types = dict(zip(
+            routes, [BUS_TYPES[i % len(BUS_TYPES)] for i in range(len(routes))]))
+        self.n_ride_hail = max(1, n_agents // AGENTS_PER_RIDE_HAIL_VEHICLE)
+        self.n_taz = max(1, n_agents // AGENTS_PER_TAZ)
+
+        # aggregates over all the chunks
+        self.mode_counts = np.zeros(len(MODES), dtype=np.int64)
+        self.bus_legs_by_trip = np.zeros(len(self.bus_trips))
+        self.hourly_trips = np.zeros((len(MODES), MAX_HOURS), dtype=np.int64)
+        self.travel_minutes = np.zeros((len(MODES), MAX_HOURS))
+        self.car_paths_by_hour = np.zeros(24)
+        # outbound, inbound overhead times and inbound cost by (hour, TAZ)
+        self.parking = np.zeros((3, MAX_HOURS, self.n_taz))
+
+    def chunks(self, chunk_agents=CHUNK_AGENTS):
+        """Yield the tables of the agents, chunk by chunk"""
+        for first in range(0, self.n_agents, chunk_agents):
+            n = min(chunk_agents, self.n_agents - first)
+            # one random stream per chunk: the tables of an agent do not
+            # depend on the chunk size
+            rng = np.random.RandomState([self.seed, first])
+            yield self.make_chunk(rng, first, n)
+
+    def make_chunk(self, rng, first, n):
+        persons = self.make_persons(rng, first, n)
+        trips, activities = self.make_trips(rng, persons)
+        legs = self.make_legs(rng, trips, persons)
+        paths = self.make_paths(rng, legs)
+        self.count(trips, paths, rng)
+        households = persons[['PID', 'Household_ID', 'Household_num_vehicles',
+                              'Household_income [$]']]
+        return OrderedDict([
+            ('persons_dataframe.csv', persons),
+            ('households_dataframe.csv', households),
+            ('activities_dataframe.csv', activities),
+            ('trips_dataframe.csv', trips),
+            ('legs_dataframe.csv', legs),
+            ('path_traversals_dataframe.csv', paths)])
+
+    def make_persons(self, rng, first, n):
+        pids = person_ids(first, n)
+        # households of 3 consecutive agents
+        household = (np.arange(first, first + n) // 3)
+        household_ids = np.array(['{}-{}-0'.format(h, 2012000131467 + h)
+                                  for h in np.unique(household)], dtype=object)
+        household_codes = household - household[0]
+        household_vehicles = rng.randint(0, 5, len(household_ids))
+        household_income = np.round(rng.lognormal(11., .7, len(household_ids)))
+        age = rng.randint(1, 90, n)
+        income = np.where(age < 18, 0.,
+                          household_income[household_codes] *
+                          rng.uniform(0, .7, n)).round()
+        return pd.DataFrame(OrderedDict([
+            ('PID', pids), ('Age', age), ('Sex', rng.choice(['F', 'M'], n)),
+            ('Home_X', 684000. + rng.normal(0, 4000., n)),
+            ('Home_Y', 4827000. + rng.normal(0, 4000., n)),
+            ('excluded-modes', ''), ('income', income),
+            ('rank', rng.randint(0, 10, n)), ('valueOfTime', 18.),
+            ('Household_ID', household_ids[household_codes]),
+            ('Household_num_vehicles', household_vehicles[household_codes]),
+            ('Household_income [$]', household_income[household_codes])]))
+
+    def make_trips(self, rng, persons):
+        n = len(persons)
+        trips_per_person = rng.choice([2, 3, 4], n, p=[.6, .3, .1])
+        owner = np.repeat(np.arange(n), trips_per_person)
+        n_trips = len(owner)
+        first_trip = np.cumsum(trips_per_person) - trips_per_person
+        trip_num = np.arange(n_trips) - np.repeat(first_trip, trips_per_person)
+
+        mode = rng.choice(len(MODES), n_trips, p=MODE_SHARES)
+        distance = rng.lognormal(8.3, .8, n_trips)
+        distance[mode == MODES.index('walk')] *= .2
+        duration = (distance / MODE_SPEEDS[mode]).astype(np.int64) + 60
+        # first trip around the morning peak, then one every 2 to 5 hours
+        day_start = np.clip(rng.normal(7.5, 1.5, n), 4, 12) * 3600
+        gaps = rng.uniform(2, 5, n_trips) * 3600
+        gaps[trip_num == 0] = 0.
+        offset = np.cumsum(gaps)
+        offset -= np.repeat(offset[first_trip], trips_per_person)
+        start = (np.repeat(day_start, trips_per_person) + offset).astype(
+            np.int64)
+        end = start + duration
+
+        car = (mode == MODES.index('car')) | \
+            (mode == MODES.index('drive_transit'))
+        transit = (mode == MODES.index('walk_transit')) | \
+            (mode == MODES.index('drive_transit'))
+        ride_hail = mode == MODES.index('ride_hail')
+        car_distance = distance * np.where(
+            mode == MODES.index('drive_transit'), .3, 1.)
+        fuel_cost = np.where(car, car_distance * CAR_JOULE_PER_METER /
+                             CAR_JOULE_PER_GALLON * DOLLARS_PER_GALLON, 0.)
+        fare = np.where(transit, rng.choice([1., 1.5, 2., 2.5], n_trips), 0.)
+        fare = np.where(ride_hail, 2.5 + distance * .001, fare).round(2)
+        toll = np.where(car & (rng.rand(n_trips) < .1), 1., 0.)
+        incentive = np.where((transit | ride_hail) & (rng.rand(n_trips) < .2),
+                             np.minimum(rng.randint(1, 5, n_trips), fare), 0.)
+
+        # activities: home, one per trip destination, home
+        last_trip = trip_num == np.repeat(trips_per_person - 1,
+                                          trips_per_person)
+        destination = rng.choice(ACTIVITY_TYPES, n_trips, p=ACTIVITY_SHARES)
+        destination[last_trip] = 'Home'
+        trips = pd.DataFrame(OrderedDict([
+            ('PID', persons['PID'].values[owner]),
+            ('realizedTripMode', np.array(MODES)[mode]),
+            ('Distance_m', distance.round(1)), ('Trip_ID', trip_num),
+            ('Start_time', start), ('End_time', end),
+            ('fuelCost', fuel_cost), ('Fare', fare), ('Toll', toll),
+            ('Incentive', incentive), ('DestinationAct', destination),
+            ('Duration_sec', duration)]))
+
+        activity_owner = np.repeat(np.arange(n), trips_per_person + 1)
+        n_activities = len(activity_owner)
+        first_activity = np.cumsum(trips_per_person + 1) - trips_per_person - 1
+        activity_num = np.arange(n_activities) - np.repeat(
+            first_activity, trips_per_person + 1)
+        # activity k ends when trip k starts and starts when trip k - 1 ends
+        starts = np.full(n_activities, -1, dtype=np.int64)
+        ends = np.full(n_activities, -1, dtype=np.int64)
+        trip_activity = first_activity[owner] + trip_num
+        ends[trip_activity] = start
+        starts[trip_activity + 1] = end
+        types = np.full(n_activities, 'Home', dtype=object)
+        types[trip_activity + 1] = destination
+        pids = persons['PID'].values[activity_owner]
+        start_clock = format_clock(np.maximum(starts, 0))
+        end_clock = format_clock(np.maximum(ends, 0))
+        activities = pd.DataFrame(OrderedDict([
+            ('PID', pids),
+            ('Activity_ID', pids + '_a-' + (activity_num + 1).astype(str)),
+            ('Activity_Type', types),
+            ('Start_time', np.where(starts >= 0, start_clock, '')),
+            ('End_time', np.where(ends >= 0, end_clock, ''))]))
+        return trips, activities
+
+    def make_legs(self, rng, trips, persons):
+        mode = pd.Categorical(trips['realizedTripMode'],
+                              categories=MODES).codes
+        legs_per_trip = (LEG_MODES[mode] != '').sum(axis=1)
+        trip = np.repeat(np.arange(len(trips)), legs_per_trip)
+        first_leg = np.cumsum(legs_per_trip) - legs_per_trip
+        leg_num = np.arange(len(trip)) - np.repeat(first_leg, legs_per_trip)
+        trip_mode = mode[trip]
+        leg_mode = LEG_MODES[trip_mode, leg_num]
+        share = LEG_SHARES[trip_mode, leg_num]
+        # legs start after the previous legs of the trip
+        share_before = np.cumsum(LEG_SHARES, axis=1) - LEG_SHARES
+        start = trips['Start_time'].values[trip] + (
+            share_before[trip_mode, leg_num] *
+            trips['Duration_sec'].values[trip]).astype(np.int64)
+
+        pids = trips['PID'].values[trip]
+        households = persons.set_index('PID')['Household_ID'] \
+            .reindex(pids).values
+        vehicle = np.empty(len(trip), dtype=object)
+        is_car = leg_mode == 'car'
+        vehicle[is_car] = households[is_car] + '-car'
+        is_walk = leg_mode == 'walk'
+        vehicle[is_walk] = 'body-' + pids[is_walk]
+        is_ride_hail = leg_mode == 'ride_hail'
+        vehicle[is_ride_hail] = np.char.add(
+            'rideHailVehicle-',
+            rng.randint(0, self.n_ride_hail, is_ride_hail.sum()).astype(str))
+        is_bus = leg_mode == 'bus'
+        bus_trip = rng.randint(0, len(self.bus_trips), is_bus.sum())
+        vehicle[is_bus] = '{}:'.format(AGENCY_ID) + \
+            self.bus_trips[bus_trip].astype(object)
+        self.bus_legs_by_trip += np.bincount(bus_trip,
+                                             minlength=len(self.bus_trips))
+
+        # fares are paid on the bus or ride hail leg, fuel and tolls on the
+        # car leg
+        fare = np.where(is_bus | is_ride_hail, trips['Fare'].values[trip], 0.)
+        fuel_cost = np.where(is_car, trips['fuelCost'].values[trip], 0.)
+        toll = np.where(is_car, trips['Toll'].values[trip], 0.)
+        return pd.DataFrame(OrderedDict([
+            ('PID', pids), ('Trip_ID', trips['Trip_ID'].values[trip]),
+            ('Leg_ID', leg_num),
+            ('Distance_m', (trips['Distance_m'].values[trip] * share).round(1)),
+            ('Mode', leg_mode), ('Veh', vehicle), ('Start_time', start),
+            ('Fare', fare), ('fuelCost', fuel_cost), ('Toll', toll)]))
+
+    def make_paths(self, rng, legs):
+        """
+        Path traversals of the car, walk and ride hail legs (one per leg,
+        two per ride hail leg: fetch then fare). The bus path traversals
+        follow the schedule, see make_bus_paths.
+        """
+        legs = legs[legs['Mode'] != 'bus']
+        ride_hail = (legs['Mode'] == 'ride_hail').values
+        fetch = legs[ride_hail]
+        n_fetch = len(fetch)
+        mode = np.concatenate([legs['Mode'].values, np.full(n_fetch, 'car')])
+        mode[mode == 'ride_hail'] = 'car'
+        length = np.concatenate([legs['Distance_m'].values,
+                                 rng.uniform(.1, .5, n_fetch) *
+                                 fetch['Distance_m'].values])
+        departure = np.concatenate([
+            legs['Start_time'].values,
+            fetch['Start_time'].values - rng.randint(60, 600, n_fetch)])
+        speed = np.where(mode == 'walk', 1.4, 11.)
+        arrival = departure + (length / speed).astype(np.int64)
+        passengers = np.concatenate([
+            np.where(ride_hail, 1, 0), np.zeros(n_fetch, dtype=np.int64)])
+        fuel = np.where(mode == 'car', length * CAR_JOULE_PER_METER, 0.)
+        return pd.DataFrame(OrderedDict([
+            ('vehicle', np.concatenate([legs['Veh'].values,
+                                        fetch['Veh'].values])),
+            ('length', length.round(1)), ('mode', mode),
+            ('departureTime', departure), ('arrivalTime', arrival),
+            ('numPassengers', passengers),
+            ('fuelCost', fuel / CAR_JOULE_PER_GALLON * DOLLARS_PER_GALLON),
+            ('fuelConsumed', fuel),
+            ('vehicleType', np.where(mode == 'car', CAR_TYPE, BODY_TYPE))]))
+
+    def make_bus_paths(self, rng):
+        """
+        One path traversal per stop to stop segment of every bus trip, with
+        passengers in proportion of the bus legs on the trip
+        """
+        segments = self.bus_segments
+        trip_codes = pd.Categorical(segments['trip_id'],
+                                    categories=self.bus_trips).codes
+        # riders stay on board for a third of the trip on average, so every
+        # segment carries a third of the riders of the trip
+        passengers = rng.poisson(self.bus_legs_by_trip[trip_codes] / 3.)
+        fuel = segments['length'].values * BUS_JOULE_PER_METER
+        return pd.DataFrame(OrderedDict([
+            ('vehicle', '{}:'.format(AGENCY_ID) + segments['trip_id']),
+            ('length', segments['length'].values.round(1)), ('mode', 'bus'),
+            ('departureTime', segments['departure'].values.astype(np.int64)),
+            ('arrivalTime', segments['arrival'].values.astype(np.int64)),
+            ('numPassengers', passengers),
+            ('fuelCost', fuel / BUS_JOULE_PER_GALLON * DOLLARS_PER_GALLON),
+            ('fuelConsumed', fuel),
+            ('vehicleType', segments['route_id'].map(self.bus_types).values)]))
+
+    def count(self, trips, paths, rng):
+        """Add a chunk to the aggregated outputs"""
+        mode = pd.Categorical(trips['realizedTripMode'],
+                              categories=MODES).codes.astype(np.int64)
+        hour = np.minimum(trips['Start_time'].values // 3600, MAX_HOURS - 1)
+        self.mode_counts += np.bincount(mode, minlength=len(MODES))
+        flat_index = mode * MAX_HOURS + hour
+        self.hourly_trips += np.bincount(
+            flat_index, minlength=self.hourly_trips.size).reshape(
+                self.hourly_trips.shape)
+        self.travel_minutes += np.bincount(
+            flat_index, weights=trips['Duration_sec'].values / 60.,
+            minlength=self.travel_minutes.size).reshape(
+                self.travel_minutes.shape)
+
+        car = (paths['mode'] == 'car').values
+        self.car_paths_by_hour += np.bincount(
+            np.minimum(paths['departureTime'].values[car] // 3600, 23),
+            minlength=24)
+
+        # parking at the destination of the car trips
+        is_car = mode == MODES.index('car')
+        n_car = is_car.sum()
+        flat_index = hour[is_car] * self.n_taz + \
+            rng.randint(0, self.n_taz, n_car)
+        for i, values in enumerate([rng.exponential(120., n_car),
+                                    rng.exponential(60., n_car),
+                                    rng.choice([0., 0., 1., 2.], n_car)]):
+            self.parking[i] += np.bincount(
+                flat_index, weights=values,
+                minlength=self.parking[i].size).reshape(self.parking[i].shape)
+
+    def make_mode_choice(self, rng, iterations=ITERATIONS):
+        """
+        (planned, realized) mode choice histories, converging to the mode
+        counts of the last iteration
+        """
+        noise = np.exp(-np.arange(iterations + 1) / 3.)[:, None] * \
+            rng.normal(0, .1, (iterations + 1, len(MODES)))
+        counts = np.round(self.mode_counts * (1 + noise)).astype(np.int64)
+        counts[-1] = self.mode_counts
+        planned = pd.DataFrame(counts, columns=MODES)
+        planned.insert(0, 'iterations', np.arange(iterations + 1))
+
+        realized = planned.copy()
+        # part of the planned transit trips end up in other modes
+        others = np.zeros(iterations + 1, dtype=np.int64)
+        for mode in ['drive_transit', 'walk_transit']:
+            moved = (realized[mode] * .3).astype(np.int64)
+            realized[mode] -= moved
+            others += moved
+        realized.insert(3, 'others', others)
+        return planned, realized
+
+    def make_hourly_mode_choice(self):
+        """Last iteration modeChoice.csv: modes x hour bins"""
+        n_bins = np.nonzero(self.hourly_trips.any(axis=0))[0].max() + 1
+        hourly = pd.DataFrame(
+            self.hourly_trips[:, :n_bins],
+            index=pd.Index(MODES, name='Modes'),
+            columns=['Bin_{}'.format(h) for h in range(n_bins)])
+        # BEAM ends every line with a separator
+        hourly[''] = ''
+        return hourly
+
+    def make_travel_times(self):
+        """averageTravelTimes.csv: mean trip duration (min) by mode and hour"""
+        with np.errstate(invalid='ignore'):
+            times = self.travel_minutes[:, :25] / self.hourly_trips[:, :25]
+        times = pd.DataFrame(np.nan_to_num(times), index=MODES,
+                             columns=range(1, 26))
+        times.index.name = 'TravelTimeMode\\Hour'
+        return times
+
+    def make_parking_stats(self):
+        time_bin, taz = np.nonzero(self.parking.any(axis=0))
+        return pd.DataFrame(OrderedDict([
+            ('timeBin', time_bin), ('TAZ', taz.astype(float)),
+            ('outboundParkingOverheadTime', self.parking[0, time_bin, taz]),
+            ('inboundParkingOverheadTime', self.parking[1, time_bin, taz]),
+            ('inboundParkingOverheadCost', self.parking[2, time_bin, taz])]))
+
+    def make_linkstats(self, rng):
+        """linkstats: hourly average volume and travel time of every link"""
+        links = self.links
+        n_links = len(links)
+        # every car path traversal crosses about 20 links
+        volume = rng.poisson(np.repeat(self.car_paths_by_hour * 20. / n_links,
+                                       n_links).reshape(24, n_links).T)
+        freespeed = np.full(n_links, 13.9)
+        capacity = np.full(n_links, 1000.)
+        free_time = links['length'].values / freespeed
+        # BPR travel time
+        travel_time = free_time[:, None] * (
+            1 + .15 * (volume / capacity[:, None]) ** 4)
+        return pd.DataFrame(OrderedDict([
+            ('link', np.repeat(links['LinkId'].values, 24)),
+            ('from', np.repeat(links['fromLocationID'].values, 24)),
+            ('to', np.repeat(links['toLocationID'].values, 24)),
+            ('hour', np.tile(np.arange(24.), n_links)),
+            ('length', np.repeat(links['length'].values, 24)),
+            ('freespeed', np.repeat(freespeed, 24)),
+            ('capacity', np.repeat(capacity, 24)),
+            ('stat', 'AVG'),
+            ('volume', volume.ravel().astype(float)),
+            ('traveltime', travel_time.ravel())]))
+
+
+def write_submission(path, n_agents, seed=0, iterations=ITERATIONS,
+                     chunk_agents=CHUNK_AGENTS):
+    """
+    Write the outputs of a synthetic run of n_agents agents to path, in the
+    layout of a BEAM submission directory
+
+    Returns
+    -------
+    tables : dict
+        Number of rows written to each table, by file name
+    """
+    run = SyntheticRun(n_agents, seed=seed)
+    iteration_dir = join(path, 'ITERS', 'it.{}'.format(iterations))
+    for directory in (join(path, 'competition/submission-inputs'),
+                      iteration_dir):
+        if not exists(directory):
+            makedirs(directory)
+    for file_name in INPUT_FILES:
+        shutil.copy(join(INPUTS_DIR, file_name), join(path, file_name))
+
+    tables = OrderedDict()
+    for i, chunk in enumerate(run.chunks(chunk_agents)):
+        for file_name, df in chunk.items():
+            # households and activities keep their pandas index, as in the
+            # dataframes exported by BEAM
+            df.to_csv(join(path, file_name), mode='w' if i == 0 else 'a',
+                      header=i == 0, index=file_name in (
+                          'households_dataframe.csv',
+                          'activities_dataframe.csv'))
+            tables[file_name] = tables.get(file_name, 0) + len(df)
+
+    rng = np.random.RandomState([seed, n_agents])
+    bus_paths = run.make_bus_paths(rng)
+    bus_paths.to_csv(join(path, 'path_traversals_dataframe.csv'), mode='a',
+                     header=False, index=False)
+    tables['path_traversals_dataframe.csv'] += len(bus_paths)
+
+    run.links.drop(columns='length').to_csv(join(path, 'network.csv'),
+                                            index=False)
+    planned, realized = run.make_mode_choice(rng, iterations)
+    planned.to_csv(join(path, 'modeChoice.csv'), index=False)
+    realized.to_csv(join(path, 'realizedModeChoice.csv'), index=False)
+    prefix = join(iteration_dir, '{}.'.format(iterations))
+    run.make_hourly_mode_choice().to_csv(prefix + 'modeChoice.csv')
+    run.make_travel_times().to_csv(prefix + 'averageTravelTimes.csv')
+    run.make_parking_stats().to_csv(prefix + 'parkingStats.csv', index=False)
+    linkstats = run.make_linkstats(rng)
+    linkstats.to_csv(prefix + 'linkstats.csv.gz', index=False,
+                     compression='gzip')
+    tables['network.csv'] = len(run.links)
+    tables['linkstats.csv.gz'] = len(linkstats)
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write the outputs of a synthetic BEAM run')
+    parser.add_argument('scale', help='one of {} or a number of agents'
+                        .format(', '.join(SCALES)))
+    parser.add_argument('path', nargs='?', help='output directory')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    n_agents = scale_agents(args.scale)
+    path = args.path or default_path(scale_label(n_agents))
+    tables = write_submission(path, n_agents, seed=args.seed)
+    for file_name, rows in tables.items():
+        print('{:<32} {:>12,}'.format(file_name, rows))
+    print('written to {}'.format(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Time-of-day binning of the trips, legs and paths of a submission.
+
+Times are in seconds since the start of the simulated day. A time falls in
+hour floor(time / 3600) of the day, and in the period [start, end) of a
+set of edges that contains its hour. BEAM days run past midnight: times
+after 24:00 fold back onto the hours of the day (25:30 is in hour 1), so
+that every time-of-day product adds up to its daily total. Missing and
+negative times are left out.
+
+Values are binned into integer codes, -1 for the values left out, and
+aggregated into dense arrays with np.bincount:
+
+>>> codes = hour_codes(trips['Start_time'].values)
+>>> tolls = bin_sum(codes, DAY_HOURS, trips['Toll'].values)
+"""
+import numpy as np
+
+HOUR = 3600
+DAY_HOURS = 24
+DAY = DAY_HOURS * HOUR
+
+
+def _valid_times(seconds):
+    seconds = np.asarray(seconds, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return seconds, seconds >= 0
+
+
+def hour_codes(seconds):
+    """Hour of the day (0 to 23) of times in seconds, -1 if left out"""
+    seconds, valid = _valid_times(seconds)
+    codes = np.full(len(seconds), -1, dtype=np.int64)
+    codes[valid] = np.floor_divide(seconds[valid], HOUR).astype(np.int64) \
+        % DAY_HOURS
+    return codes
+
+
+def fold_hours(hours):
+    """
+    Hour of the day of hour bins counted from the start of the simulated
+    day (BEAM Bin_<hour> columns, parking stats time bins), -1 if negative
+    """
+    hours = np.asarray(hours, dtype=np.int64)
+    return np.where(hours >= 0, hours % DAY_HOURS, -1)
+
+
+def period_codes(seconds, edges):
+    """
+    Index of the period [edges[i], edges[i + 1]) of the time of day of
+    times in seconds, -1 if left out or out of the periods. edges are in
+    seconds and increasing.
+    """
+    seconds, valid = _valid_times(seconds)
+    edges = np.asarray(edges)
+    codes = np.full(len(seconds), -1, dtype=np.int64)
+    codes[valid] = np.searchsorted(edges, seconds[valid] % DAY,
+                                   side='right') - 1
+    codes[codes >= len(edges) - 1] = -1
+    return codes
+
+
+def value_codes(values, edges, right=True, include_lowest=False):
+    """
+    Index of the bin of values between consecutive edges, -1 if missing or
+    out of the bins, with the closed sides of pd.cut
+    """
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.asarray(edges, dtype=np.float64)
+    codes = np.searchsorted(edges, values, side='left' if right else 'right') \
+        - 1
+    if include_lowest and right:
+        codes[values == edges[0]] = 0
+    codes[(codes < 0) | (codes >= len(edges) - 1) | np.isnan(values)] = -1
+    return codes
+
+
+def flat_codes(row_codes, col_codes, n_cols):
+    """
+    Codes of the cells of a (row, column) grid of n_cols columns, -1 where
+    either code is -1
+    """
+    row_codes = np.asarray(row_codes)
+    col_codes = np.asarray(col_codes)
+    codes = row_codes * n_cols + col_codes
+    codes[(row_codes < 0) | (col_codes < 0)] = -1
+    return codes
+
+
+def _kept(codes, values):
+    kept = codes >= 0
+    if values is not None:
+        values = np.asarray(values, dtype=np.float64)
+        # missing values are skipped as by the sum and mean of pandas
+        kept &= ~np.isnan(values)
+        values = values[kept]
+    return codes[kept], values
+
+
+def bin_sum(codes, n_bins, values=None):
+    """Sum of values (count without values) per code, as a dense array"""
+    codes, values = _kept(np.asarray(codes), values)
+    return np.bincount(codes, weights=values, minlength=n_bins) \
+        .astype(np.float64)
+
+
+def bin_mean(codes, n_bins, values):
+    """Mean of values per code, NaN for the empty bins"""
+    codes, values = _kept(np.asarray(codes), values)
+    counts = np.bincount(codes, minlength=n_bins)
+    sums = np.bincount(codes, weights=values, minlength=n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class TripCube(object):
+    """
+    Number of trips per combination of integer coded categories (mode, age
+    group, income group, distance group, hour of the day...), counted with
+    a single np.bincount over the combined codes of the trips.
+
+    Every axis has one more bin than categories, counting the trips whose
+    category is unknown (code -1), so that the cube adds up to all the
+    trips. Charts are marginals of the cube: any cross-tab or filter of the
+    categories is a sum over the counts, without going back to the trips.
+    """
+
+    def __init__(self, labels, counts):
+        """
+        Parameters
+        ----------
+        labels : OrderedDict
+            Categories of each axis, keyed by axis name
+        counts : numpy array
+            Counts, one dimension of len(categories) + 1 per axis
+        """
+        self.labels = labels
+        self.counts = counts
+
+    @classmethod
+    def from_codes(cls, axes):
+        """
+        Parameters
+        ----------
+        axes : list of (name, categories, codes)
+            For each axis, its name, categories and the code of the category
+            of every trip (-1 if unknown)
+        """
+        shape = tuple(len(categories) + 1 for _, categories, _ in axes)
+        codes = [np.where(np.asarray(axis_codes) >= 0, axis_codes, size - 1)
+                 for (_, _, axis_codes), size in zip(axes, shape)]
+        flat = np.ravel_multi_index(codes, shape) if len(codes[0]) else \
+            np.empty(0, dtype=np.int64)
+        counts = np.bincount(flat, minlength=int(np.prod(shape))) \
+            .reshape(shape)
+        labels = OrderedDict(
+            (name, list(categories)) for name, categories, _ in axes)
+        return cls(labels, counts)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def marginal(self, *names, **filters):
+        """
+        Counts of the trips per category of the axes names, in that order,
+        summed over the other axes. The trips of unknown category of names
+        are left out.
+
+        Filters keep the trips in some categories of other axes, e.g.
+        cube.marginal('mode', 'distance', income=['[$0, $10k)']).
+        """
+        selection = []
+        for name, categories in self.labels.items():
+            if name in filters:
+                wanted = set(filters[name])
+                selection.append([code for code, category in
+                                  enumerate(categories) if category in wanted])
+            elif name in names:
+                selection.append(list(range(len(categories))))
+            else:
+                selection.append(list(range(len(categories) + 1)))
+
+        counts = self.counts[np.ix_(*selection)]
+        axes = list(self.labels)
+        summed = tuple(i for i, name in enumerate(axes) if name not in names)
+        counts = counts.sum(axis=summed)
+        kept = [name for name in axes if name in names]
+        return counts.transpose([kept.index(name) for name in names])
+
+    def frame(self, index, columns, **filters):
+        """marginal of (index, columns) as a DataFrame labelled by category"""
+        return pd.DataFrame(self.marginal(index, columns, **filters),
+                            index=self.labels[index],
+                            columns=self.labels[columns])
@@ -0,0 +1,73 @@
+"""
+Serialization time and message size of the link, crowding and VMT data
+sources, sent as lists of Python numbers (to_dict(orient='list')) versus
+compact numpy arrays (submission.to_column_data), which Bokeh encodes as
+base64 binary arrays.
+
+Usage: python benchmarks/bench_binary_transport.py [n_links] [n_routes]
+"""
+import json
+import sys
+import time
+from os.path import dirname, join
+
+import numpy as np
+import pandas as pd
+from bokeh.util.serialization import transform_column_source_data
+
+sys.path.insert(0, join(dirname(dirname(__file__)), 'BISTRO_Dashboard'))
+from submission import HOURS, merc, to_column_data  # noqa: E402
+
+SERVICE_PERIODS = ['Early Morning (12a-7a)', 'AM Peak (7a-10a)',
+                   'Midday (10a-5p)', 'PM Peak (5p-8p)',
+                   'Late Evening (8p-12a)']
+RIDERSHIP_BINS = ['empty\n(0 passengers)',
+                  'low ridership\n(< 50% seating capacity)',
+                  'medium ridership\n(< seating capacity)',
+                  'high ridership\n(< 50% standing capacity)',
+                  'crowded\n(<= standing capacity)']
+REPEAT = 5
+
+
+def make_frames(n_links, n_routes, seed=0):
+    """Frames shaped like the link, crowding and bus VMT products"""
+    rng = np.random.RandomState(seed)
+    lat = 43.5 + rng.rand(n_links) * 0.2
+    lon = -96.8 + rng.rand(n_links) * 0.2
+    links = pd.DataFrame()
+    links['from_x'], links['from_y'] = merc(lat, lon)
+    links['to_x'], links['to_y'] = merc(lat + rng.normal(0, 1e-3, n_links),
+                                        lon + rng.normal(0, 1e-3, n_links))
+
+    crowding = pd.DataFrame(rng.rand(n_routes, len(SERVICE_PERIODS)) * 3600,
+                            columns=SERVICE_PERIODS)
+    crowding.insert(0, 'route_id', [str(r) for r in range(n_routes)])
+
+    vmt = pd.DataFrame(rng.rand(len(HOURS), len(RIDERSHIP_BINS)) * 1e4,
+                       columns=RIDERSHIP_BINS)
+    vmt.insert(0, 'Hour', np.arange(len(HOURS)))
+    return [('link', links), ('crowding', crowding), ('bus vmt', vmt)]
+
+
+def serialize(make_data, df):
+    """Return (seconds, bytes) to build and JSON-encode the source data"""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        message = json.dumps(transform_column_source_data(make_data(df)))
+    return (time.perf_counter() - start) / REPEAT, len(message)
+
+
+def main(n_links, n_routes):
+    print('{:,} links, {:,} routes'.format(n_links, n_routes))
+    print('{:<10} {:>14} {:>14} {:>14} {:>14}'.format(
+        'source', 'lists ms', 'arrays ms', 'lists KB', 'arrays KB'))
+    for name, df in make_frames(n_links, n_routes):
+        t_list, b_list = serialize(lambda d: d.to_dict(orient='list'), df)
+        t_array, b_array = serialize(to_column_data, df)
+        print('{:<10} {:>14.2f} {:>14.2f} {:>14.1f} {:>14.1f}'.format(
+            name, t_list * 1e3, t_array * 1e3, b_list / 1e3, b_array / 1e3))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 500)
@@ -0,0 +1,122 @@
+"""
+Benchmark of the string-id merges against the int32 code joins of the
+scenario IdDictionary, at 1M agents.
+
+Usage: python benchmarks/bench_id_interning.py [n_agents]
+"""
+import sys
+import time
+import tracemalloc
+from os.path import dirname, join
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, join(dirname(dirname(__file__)), 'BISTRO_Dashboard'))
+from id_index import IdDictionary  # noqa: E402
+from population import PopulationStore  # noqa: E402
+
+TRIPS_PER_AGENT = 3
+PATHS_PER_AGENT = 5
+MODES = ['car', 'walk', 'walk_transit', 'drive_transit', 'ride_hail']
+
+
+def make_tables(n_agents, seed=0):
+    """Persons, trips, vehicles and path traversals shaped like BEAM ids"""
+    rng = np.random.RandomState(seed)
+    pids = np.array(['{}-{}-{:05d}'.format(i, 2012000131467 + i, i % 99999)
+                     for i in range(n_agents)], dtype=object)
+    persons = pd.DataFrame({'PID': pids,
+                            'Age': rng.randint(1, 90, n_agents),
+                            'income': rng.randint(0, 150000, n_agents) * 1.})
+
+    n_trips = TRIPS_PER_AGENT * n_agents
+    trips = pd.DataFrame({
+        'PID': pids[rng.randint(0, n_agents, n_trips)],
+        'realizedTripMode': rng.choice(MODES, n_trips)})
+
+    vehicle_ids = np.concatenate([
+        pids,
+        np.array(['rideHailVehicle-{}'.format(i)
+                  for i in range(n_agents // 20)], dtype=object)])
+    vehicles = pd.DataFrame({
+        'vehicle': vehicle_ids,
+        'vehicleType': rng.choice(['CAR', 'BUS-DEFAULT'], len(vehicle_ids))})
+
+    n_paths = PATHS_PER_AGENT * n_agents
+    paths = pd.DataFrame({
+        'vehicle': vehicle_ids[rng.randint(0, len(vehicle_ids), n_paths)],
+        'length': rng.rand(n_paths) * 5000})
+    return persons, trips, vehicles, paths
+
+
+def measure(func, *args):
+    """Return (result, seconds, peak MiB allocated) of func(*args)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2. ** 20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def merge_persons(persons, trips):
+    return persons[['PID', 'income']].merge(
+        trips[['PID', 'realizedTripMode']], on=['PID'])
+
+
+def join_persons(population, trip_codes, trips):
+    known = trip_codes >= 0
+    return pd.DataFrame({
+        'PID': trip_codes[known],
+        'income': population.income[trip_codes[known]],
+        'realizedTripMode': trips['realizedTripMode'].values[known]})
+
+
+def merge_vehicles(paths, vehicles):
+    return paths.merge(vehicles, left_on='vehicle', right_on='vehicle')
+
+
+def main(n_agents):
+    persons, trips, vehicles, paths = make_tables(n_agents)
+    print('{:,} agents, {:,} trips, {:,} path traversals'.format(
+        n_agents, len(trips), len(paths)))
+
+    population, t_pop, m_pop = measure(PopulationStore.from_frame, persons)
+    trip_codes, t_enc, m_enc = measure(
+        population.encode, trips['PID'].values)
+    ids = IdDictionary()
+    _, t_veh, m_veh = measure(ids.set_vehicle_types, vehicles)
+
+    rows = [
+        ('person join: string merge',) + measure(
+            merge_persons, persons, trips)[1:],
+        ('person join: code lookup',) + measure(
+            join_persons, population, trip_codes, trips)[1:],
+        ('vehicle join: string merge',) + measure(
+            merge_vehicles, paths, vehicles)[1:],
+        ('vehicle join: code lookup',) + measure(
+            ids.join_vehicle_types, paths)[1:],
+    ]
+
+    print('\none-off interning (once per scenario / submission)')
+    print('  {:<28} {:>8.3f} s {:>9.1f} MiB'.format(
+        'population store', t_pop, m_pop))
+    print('  {:<28} {:>8.3f} s {:>9.1f} MiB'.format(
+        'encode trip PIDs', t_enc, m_enc))
+    print('  {:<28} {:>8.3f} s {:>9.1f} MiB'.format(
+        'register vehicle types', t_veh, m_veh))
+    print('\njoins')
+    for name, elapsed, peak in rows:
+        print('  {:<28} {:>8.3f} s {:>9.1f} MiB'.format(name, elapsed, peak))
+
+    print('\nid column memory')
+    print('  {:<28} {:>8.1f} MiB'.format(
+        'trip PID strings', trips['PID'].memory_usage(deep=True) / 2. ** 20))
+    print('  {:<28} {:>8.1f} MiB'.format(
+        'trip PID int32 codes', trip_codes.nbytes / 2. ** 20))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,87 @@
+"""
+Latency and payload of the toll circle map links at several zoom levels,
+for a synthetic metro-scale network.
+
+Compares shipping every link (the former behaviour) with the viewport
+rendering of raster.LinkRasterizer, glyphs only (culling + LOD + segment
+budget) and with rasterization above the budget.
+
+Usage: python benchmarks/bench_link_viewport.py [n_links]
+"""
+import json
+import sys
+import time
+from os.path import dirname, join
+
+import numpy as np
+from bokeh.util.serialization import transform_column_source_data
+
+sys.path.insert(0, join(dirname(dirname(__file__)), 'BISTRO_Dashboard'))
+from raster import LinkIndex, LinkRasterizer  # noqa: E402
+
+WIDTH = HEIGHT = 600
+# Sioux Faux extent in web mercator, used as the full metro extent
+X_RANGE = (-10776977., -10759011.)
+Y_RANGE = (5388501., 5406742.)
+ZOOMS = [1, 4, 16, 64]
+
+
+def make_network(n_links, seed=0):
+    """Short local streets plus 5% longer arterials"""
+    rng = np.random.RandomState(seed)
+    x0 = rng.uniform(X_RANGE[0], X_RANGE[1], n_links)
+    y0 = rng.uniform(Y_RANGE[0], Y_RANGE[1], n_links)
+    length = np.where(rng.rand(n_links) < 0.05,
+                      rng.uniform(300, 1500, n_links),
+                      rng.exponential(40, n_links))
+    angle = rng.uniform(0, 2 * np.pi, n_links)
+    return dict(from_x=x0, from_y=y0,
+                to_x=x0 + length * np.cos(angle),
+                to_y=y0 + length * np.sin(angle))
+
+
+def payload(*datas):
+    """Size in bytes of the JSON messages of the given source data"""
+    return sum(len(json.dumps(transform_column_source_data(data)))
+               for data in datas)
+
+
+def viewport(zoom):
+    cx, cy = np.mean(X_RANGE), np.mean(Y_RANGE)
+    hw = (X_RANGE[1] - X_RANGE[0]) / 2. / zoom
+    hh = (Y_RANGE[1] - Y_RANGE[0]) / 2. / zoom
+    return (cx - hw, cx + hw), (cy - hh, cy + hh)
+
+
+def main(n_links):
+    link_data = make_network(n_links)
+    print('{:,} links'.format(n_links))
+
+    start = time.perf_counter()
+    full = {col: list(values) for col, values in link_data.items()}
+    full_bytes = payload(full)
+    print('all links as lists: {:.3f} s, {:.1f} MB'.format(
+        time.perf_counter() - start, full_bytes / 1e6))
+
+    start = time.perf_counter()
+    index = LinkIndex(link_data)
+    print('grid index build:   {:.3f} s\n'.format(time.perf_counter() - start))
+
+    renderers = [('glyphs', LinkRasterizer(index, rasterize=False)),
+                 ('glyphs/raster', LinkRasterizer(index))]
+    print('{:>5} {:<14} {:>9} {:>10} {:>9} {:>9}'.format(
+        'zoom', 'mode', 'segments', 'image', 'ms', 'KB'))
+    for zoom in ZOOMS:
+        x_range, y_range = viewport(zoom)
+        for name, renderer in renderers:
+            start = time.perf_counter()
+            links, image = renderer.render(x_range, y_range, WIDTH, HEIGHT)
+            elapsed = time.perf_counter() - start
+            print('{:>5} {:<14} {:>9,} {:>10} {:>9.1f} {:>9.1f}'.format(
+                zoom, name, len(links['from_x']),
+                'yes' if len(image['image']) else 'no', elapsed * 1e3,
+                payload(links, image) / 1e3))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,79 @@
+"""
+Bytes sent to the browser when switching submission, with whole-data
+replacement of every source versus source_update.update_source.
+
+The two synthetic submissions share their link geometry and toll circle
+bounds, as submissions of a scenario do, and differ in their outputs.
+
+Usage: python benchmarks/bench_source_updates.py [n_links]
+"""
+import sys
+import time
+from os.path import dirname, join
+
+import numpy as np
+from bokeh.document import Document
+from bokeh.models import ColumnDataSource
+
+sys.path.insert(0, join(dirname(dirname(__file__)), 'BISTRO_Dashboard'))
+from source_update import DocumentTraffic, update_source  # noqa: E402
+
+MODES = ['ride_hail', 'car', 'drive_transit', 'walk', 'walk_transit']
+HOURS = [str(h) for h in range(24)]
+
+
+def make_products(n_links, seed):
+    """Data products of a submission, keyed by source name"""
+    rng = np.random.RandomState(seed)
+    geometry = np.random.RandomState(0)
+    products = {
+        'link_source': {col: geometry.rand(n_links).tolist() for col in
+                        ['from_x', 'from_y', 'to_x', 'to_y']},
+        'toll_circle_source': dict(x_low=[-10776977], x_high=[-10759011],
+                                   y_low=[5388501], y_high=[5406742]),
+        'normalized_scores_source': dict(
+            Component_Name=['c{}'.format(i) for i in range(12)],
+            Weighted_Score=np.round(rng.rand(12), 1).tolist()),
+        'fares_input_source': dict(
+            routeId=[str(r) for r in range(1340, 1352)],
+            amount=[2.0] * 11 + [float(seed)]),
+        'crowding_source': dict(
+            route=[str(r) for r in range(1340, 1340 + 5 + seed)],
+            crowding=rng.rand(5 + seed).tolist()),
+    }
+    for i in range(20):
+        products['hourly_{}_source'.format(i)] = dict(
+            {mode: rng.rand(24).tolist() for mode in MODES}, hours=HOURS)
+    return products
+
+
+def switch(doc, sources, products, incremental):
+    with DocumentTraffic(doc) as traffic:
+        start = time.perf_counter()
+        for name, data in products.items():
+            if incremental:
+                update_source(sources[name], data)
+            else:
+                sources[name].data = data
+        elapsed = time.perf_counter() - start
+    return traffic, elapsed
+
+
+def main(n_links):
+    submissions = [make_products(n_links, seed) for seed in (1, 2)]
+    print('{:,} links, {} sources'.format(n_links, len(submissions[0])))
+    for incremental in (False, True):
+        doc = Document()
+        sources = {name: ColumnDataSource(data=data)
+                   for name, data in submissions[0].items()}
+        for source in sources.values():
+            doc.add_root(source)
+        for products in (submissions[1], submissions[0]):
+            traffic, elapsed = switch(doc, sources, products, incremental)
+            print('{:<12} {:>4} messages {:>12,} bytes {:>8.1f} ms'.format(
+                'incremental' if incremental else 'replace', traffic.messages,
+                traffic.bytes, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
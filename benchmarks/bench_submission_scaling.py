@@ -0,0 +1,60 @@
+"""
+pytest-benchmark suite timing Submission.get_data and every make_* step of
+make_data_sources on the synthetic runs of submission_scaling.py. The peak
+memory of each benchmark, from one traced call, is reported in its
+extra_info.
+
+The scales are set by BISTRO_BENCH_SCALES (comma separated, default 15k).
+
+Usage: BISTRO_BENCH_SCALES=15k,150k python -m pytest \
+           benchmarks/bench_submission_scaling.py [--benchmark-json=PATH]
+"""
+import os
+import sys
+from os.path import dirname
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+sys.path.insert(0, dirname(__file__))
+from submission_scaling import (  # noqa: E402
+    STEPS, ensure_data, fresh_submission, measure, run_step)
+
+SCALES = os.environ.get('BISTRO_BENCH_SCALES', '15k').split(',')
+
+_loaded = {}
+
+
+@pytest.fixture(scope='module', params=SCALES)
+def scale(request):
+    ensure_data(request.param)
+    return request.param
+
+
+def loaded_submission(scale):
+    """Submission of scale with its data loaded, shared by the make_* steps"""
+    if scale not in _loaded:
+        _loaded.clear()
+        submission = fresh_submission(scale)
+        submission.get_data()
+        submission.parking_overhead = submission.make_parking_overhead()
+        submission.trip_costs = submission.make_trip_costs()
+        submission.trip_cube = submission.make_trip_cube()
+        _loaded[scale] = submission
+    return _loaded[scale]
+
+
+def test_get_data(benchmark, scale):
+    _, peak = measure(lambda: fresh_submission(scale).get_data(), repeat=0)
+    benchmark.extra_info['peak_mib'] = peak
+    benchmark.pedantic(lambda submission: submission.get_data(),
+                       setup=lambda: ((fresh_submission(scale),), {}),
+                       rounds=3)
+
+
+@pytest.mark.parametrize('step', STEPS, ids=[step[0] for step in STEPS])
+def test_make_data(benchmark, scale, step):
+    submission = loaded_submission(scale)
+    _, peak = measure(lambda: run_step(submission, step), repeat=0)
+    benchmark.extra_info['peak_mib'] = peak
+    benchmark(run_step, submission, step)
@@ -0,0 +1,323 @@
+"""
+Scaling benchmark of Submission: wall time and peak memory of get_data and
+of every make_* step of make_data_sources, on synthetic runs of 15k, 150k,
+1.5M and 15M agents (BISTRO_Dashboard/synthetic.py). The runs are written
+on first use, in the default synthetic submission directories.
+
+Results are compared with submission_scaling_baseline.json: steps slower
+or larger than the baseline by more than THRESHOLD (and by more than the
+noise floors) are flagged. --update rewrites the baseline of the scales
+run, so that a performance change shows up in the diff of the baseline.
+
+A step running out of memory is recorded as such: on Linux, the address
+space of the benchmark is limited to MEMORY_FRACTION of the physical
+memory (--memory-limit) so that numpy raises MemoryError instead of the
+whole benchmark being killed.
+
+Usage: python benchmarks/submission_scaling.py [scale ...] [--update]
+                                                [--check] [--repeat N]
+
+See bench_submission_scaling.py for the same measurements as a
+pytest-benchmark suite.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+from collections import OrderedDict
+from multiprocessing import cpu_count
+from os.path import dirname, exists, join
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, join(dirname(dirname(__file__)), 'BISTRO_Dashboard'))
+import synthetic  # noqa: E402
+from submission import Submission  # noqa: E402
+
+BASELINE_PATH = join(dirname(__file__), 'submission_scaling_baseline.json')
+NAME = 'synthetic'
+# A step regresses when it is THRESHOLD times slower (or larger) than the
+# baseline and the difference is over the noise floor
+THRESHOLD = 1.5
+SECONDS_FLOOR = 0.05
+MIB_FLOOR = 10.
+MEMORY_FRACTION = 0.8
+
+# make_data_sources, step by step:
+# (label, method, Submission attributes passed as arguments (copied),
+#  attribute the result is stored in for the next steps)
+STEPS = [
+    ('make_modeinc_input_data', 'make_modeinc_input_data', (), None),
+    ('make_fleetmix_input_data', 'make_fleetmix_input_data', (), None),
+    ('make_fares_input_data', 'make_fares_input_data', (), None),
+    ('make_routesched_input_data', 'make_routesched_input_data', (), None),
+    ('make_link_data', 'make_link_data', (), None),
+    ('make_toll_circle_data', 'make_toll_circle_data', (), None),
+    ('make_normalized_scores_data', 'make_normalized_scores_data', (), None),
+    ('make_mode_pie_chart_data[planned]', 'make_mode_pie_chart_data',
+     ('mode_choice_df',), None),
+    ('make_mode_pie_chart_data[realized]', 'make_mode_pie_chart_data',
+     ('realized_mode_choice_df',), None),
+    ('make_mode_choice_by_time_data', 'make_mode_choice_by_time_data', (),
+     None),
+    ('make_trip_cube', 'make_trip_cube', (), 'trip_cube'),
+    ('make_mode_choice_by_age_group_data',
+     'make_mode_choice_by_age_group_data', (), None),
+    ('make_mode_choice_by_income_group_data',
+     'make_mode_choice_by_income_group_data', (), None),
+    ('make_mode_choice_by_distance_data',
+     'make_mode_choice_by_distance_data', (), None),
+    ('make_congestion_travel_time_by_mode_data',
+     'make_congestion_travel_time_by_mode_data', (), None),
+    ('make_congestion_travel_time_per_passenger_trip_data',
+     'make_congestion_travel_time_per_passenger_trip_data', (), None),
+    ('make_congestion_miles_traveled_per_mode_data',
+     'make_congestion_miles_traveled_per_mode_data', (), None),
+    ('make_congestion_car_vmt_by_time_data',
+     'make_congestion_car_vmt_by_time_data', (), None),
+    ('make_congestion_bus_vmt_by_ridership_data',
+     'make_congestion_bus_vmt_by_ridership_data', (), None),
+    ('make_congestion_on_demand_vmt_by_phases_data',
+     'make_congestion_on_demand_vmt_by_phases_data', (), None),
+    ('make_congestion_travel_speed_data',
+     'make_congestion_travel_speed_data', (), None),
+    ('make_trip_costs', 'make_trip_costs', (), 'trip_costs'),
+    ('make_los_travel_expenditure_data', 'make_los_travel_expenditure_data',
+     (), None),
+    ('make_los_cost_burden_by_income_data',
+     'make_los_cost_burden_by_income_data', (), None),
+    ('make_los_crowding_data', 'make_los_crowding_data', (), None),
+    ('make_parking_overhead', 'make_parking_overhead', (), 'parking_overhead'),
+    ('make_los_parking_overhead_data', 'make_los_parking_overhead_data', (),
+     None),
+    ('make_transit_cb_data', 'make_transit_cb_data', (), None),
+    ('make_transit_inc_by_mode_data', 'make_transit_inc_by_mode_data', (),
+     None),
+    ('make_toll_revenue_by_time_data', 'make_toll_revenue_by_time_data', (),
+     None),
+    ('make_sustainability_25pm_per_mode_data',
+     'make_sustainability_25pm_per_mode_data', (), None),
+    ('make_sustainability_ghg_per_mode_data',
+     'make_sustainability_ghg_per_mode_data', (), None),
+    ('make_convergence_summary_data', 'make_convergence_summary_data', (),
+     None),
+    ('make_runtime_profile_data', 'make_runtime_profile_data', (), None),
+    ('make_estimated_data_sources', 'make_estimated_data_sources', (), None),
+]
+# tables whose rows are reported with the results
+TABLES = ['persons_df', 'trips_df', 'legs_df', 'paths_df', 'activities_df',
+          'links_df']
+
+
+def scenario(scale):
+    return 'sioux_faux-{}'.format(scale)
+
+
+def ensure_data(scale):
+    """Write the synthetic run of scale unless it already exists"""
+    path = synthetic.default_path(scale)
+    if not exists(join(path, 'path_traversals_dataframe.csv')):
+        print('writing the {} synthetic run to {}'.format(scale, path))
+        synthetic.write_submission(path, synthetic.scale_agents(scale))
+    return path
+
+
+def fresh_submission(scale):
+    """
+    A Submission of the synthetic run of scale, with the scenario caches
+    of Submission cleared so that get_data loads everything
+    """
+    for cache in (Submission.links, Submission.activities,
+                  Submission.taz_indexes, Submission.populations,
+                  Submission.id_dictionaries, Submission.link_indexes,
+                  Submission.route_palettes):
+        cache.pop(scenario(scale), None)
+    return Submission(NAME, scenario(scale))
+
+
+def run_step(submission, step):
+    _, method, arguments, stored = step
+    args = [getattr(submission, name).copy() for name in arguments]
+    result = getattr(submission, method)(*args)
+    if stored is not None:
+        setattr(submission, stored, result)
+    return result
+
+
+def measure(func, repeat=1):
+    """
+    (best wall time in seconds of repeat calls of func, peak MiB allocated
+    by one more traced call)
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1] / 2. ** 20
+    finally:
+        tracemalloc.stop()
+    return (min(seconds) if seconds else None), peak
+
+
+def limit_memory(fraction=MEMORY_FRACTION, gib=None):
+    """
+    Limit the address space of the process to gib GiB (default fraction of
+    the physical memory). Returns the limit in GiB, None where unsupported.
+    """
+    try:
+        import resource
+        from os import sysconf
+        physical = sysconf('SC_PAGE_SIZE') * sysconf('SC_PHYS_PAGES')
+    except (ImportError, AttributeError, ValueError, OSError):
+        return None
+    limit = int(gib * 2 ** 30) if gib else int(fraction * physical)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return limit / 2. ** 30
+
+
+def significant(value, digits=3):
+    """value rounded to digits significant digits, for a readable baseline"""
+    if value is None or not np.isfinite(value) or value == 0:
+        return value
+    return round(value, digits - 1 - int(np.floor(np.log10(abs(value)))))
+
+
+def _failed(error):
+    return OrderedDict([('error', type(error).__name__)])
+
+
+def benchmark_scale(scale, repeat=1):
+    """Results of get_data and of every step at scale"""
+    ensure_data(scale)
+    results = OrderedDict()
+    try:
+        seconds, peak = measure(
+            lambda: fresh_submission(scale).get_data(), repeat)
+    except MemoryError as error:
+        results['get_data'] = _failed(error)
+        print('  {:<52} {:>25}'.format('get_data', 'MemoryError'))
+        return OrderedDict([('agents', synthetic.scale_agents(scale)),
+                            ('steps', results)])
+    results['get_data'] = OrderedDict([
+        ('seconds', significant(seconds)), ('peak_mib', significant(peak))])
+    print('  {:<52} {:>9.3f} s {:>9.1f} MiB'.format('get_data', seconds, peak))
+
+    submission = fresh_submission(scale)
+    submission.get_data()
+    tables = OrderedDict((name, len(getattr(submission, name)))
+                         for name in TABLES)
+    for step in STEPS:
+        try:
+            seconds, peak = measure(
+                lambda: run_step(submission, step), repeat)
+        except MemoryError as error:
+            results[step[0]] = _failed(error)
+            print('  {:<52} {:>25}'.format(step[0], 'MemoryError'))
+            continue
+        results[step[0]] = OrderedDict([
+            ('seconds', significant(seconds)),
+            ('peak_mib', significant(peak))])
+        print('  {:<52} {:>9.3f} s {:>9.1f} MiB'.format(step[0], seconds, peak))
+    return OrderedDict([('agents', synthetic.scale_agents(scale)),
+                        ('tables', tables), ('steps', results)])
+
+
+def machine():
+    return OrderedDict([
+        ('python', platform.python_version()), ('numpy', np.__version__),
+        ('pandas', pd.__version__), ('machine', platform.machine()),
+        ('system', platform.system()), ('cpus', cpu_count())])
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not exists(path):
+        return OrderedDict([('machine', machine()), ('scales', OrderedDict())])
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def regressions(results, baseline):
+    """
+    (step, field, baseline, new) of the steps of results slower or larger
+    than in baseline, or failing when they did not
+    """
+    found = []
+    for label, new in results['steps'].items():
+        old = baseline['steps'].get(label)
+        if old is None:
+            continue
+        if 'error' in new:
+            if 'error' not in old:
+                found.append((label, 'error', None, new['error']))
+            continue
+        if 'error' in old:
+            continue
+        for field, floor in (('seconds', SECONDS_FLOOR),
+                             ('peak_mib', MIB_FLOOR)):
+            if new[field] > THRESHOLD * old[field] and \
+                    new[field] - old[field] > floor:
+                found.append((label, field, old[field], new[field]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Scaling benchmark of Submission.get_data and make_*')
+    parser.add_argument('scales', nargs='*', default=['15k'],
+                        help='among {}'.format(', '.join(synthetic.SCALES)))
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='timed calls per step, the best one is kept')
+    parser.add_argument('--update', action='store_true',
+                        help='write the results to the baseline')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with an error on regressions')
+    parser.add_argument('--memory-limit', type=float, default=None,
+                        help='address space limit in GiB (default {:.0%} of '
+                             'the physical memory)'.format(MEMORY_FRACTION))
+    args = parser.parse_args()
+    # deprecation warnings of the newer pandas are not what is measured
+    warnings.simplefilter('ignore', FutureWarning)
+    warnings.simplefilter('ignore', DeprecationWarning)
+
+    limit = limit_memory(gib=args.memory_limit)
+    if limit is not None:
+        print('memory limited to {:.1f} GiB'.format(limit))
+    baseline = load_baseline()
+    found = []
+    for scale in args.scales:
+        print('\n{} agents'.format(scale))
+        results = benchmark_scale(scale, args.repeat)
+        if scale in baseline['scales']:
+            found += [(scale,) + regression for regression in
+                      regressions(results, baseline['scales'][scale])]
+        baseline['scales'][scale] = results
+
+    if found:
+        print('\nregressions against {}'.format(BASELINE_PATH))
+        for scale, label, field, old, new in found:
+            print('  {:>5} {:<52} {:<8} {} -> {}'.format(
+                scale, label, field, old, new))
+    if args.update:
+        baseline['machine'] = machine()
+        # keep the scales in the order of SCALES
+        baseline['scales'] = OrderedDict(
+            (scale, baseline['scales'][scale]) for scale in synthetic.SCALES
+            if scale in baseline['scales'])
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=2)
+            f.write('\n')
+        print('\nbaseline written to {}'.format(BASELINE_PATH))
+    if found and args.check:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import sys
+from os.path import dirname, join
+
+import pytest
+
+# the dashboard modules are imported as flat modules, as bokeh serve does
+sys.path.insert(0, join(dirname(dirname(__file__)), 'BISTRO_Dashboard'))
+
+
+@pytest.fixture(scope='session')
+def synthetic_submission(tmp_path_factory):
+    """Submission of a small synthetic run, with its data products made"""
+    from submission import Submission
+    import synthetic
+
+    path = str(tmp_path_factory.mktemp('synthetic'))
+    synthetic.write_submission(path, 300)
+    submission = Submission('synthetic', 'sioux_faux-tests')
+    submission.submissions_dir = path
+    submission.get_data()
+    submission.make_data_sources()
+    return submission
@@ -0,0 +1,16 @@
+import pytest
+
+from comparison import (
+    COMPARISON_KPIS, comparison_series, make_comparison_data)
+
+
+@pytest.mark.parametrize('kpi', list(COMPARISON_KPIS))
+def test_comparison_values_are_flat_numbers(synthetic_submission, kpi):
+    submissions = {'a': synthetic_submission, 'b': synthetic_submission}
+    series = comparison_series(kpi, submissions.values())
+    assert series
+    for name in series:
+        data, categories = make_comparison_data(kpi, name, submissions)
+        assert data['value'].ndim == 1
+        assert data['value'].dtype.kind == 'f'
+        assert len(data['value']) == len(data['x']) == 2 * len(categories)
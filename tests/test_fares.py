@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from fares import FARE_COLUMNS, FareIndex, expand_fare_rules
+
+ROUTES = ['1340', '1341', '1342']
+
+FARES = pd.DataFrame([
+    (217, '1341', '[0:10]', 0.5),
+    (217, np.nan, '[0:120]', 2.0),
+    (217, '1340', '[65:120]', 1.0),
+    (217, np.nan, '[11:18]', 1.5),
+], columns=FARE_COLUMNS)
+
+
+def expand_fare_rules_by_row(fares, route_ids):
+    # the expansion of make_fares_input_data before expand_fare_rules
+    fares = fares.copy()
+    fares.loc[:, "age"] = fares["age"].astype(str)
+    fares.loc[:, "routeId"] = fares["routeId"].astype(str)
+
+    frames = []
+    for i, fare in fares.iterrows():
+        if fare['routeId'] == 'nan':
+            frames.append(pd.DataFrame(
+                [[fare['agencyId'], route, fare['age'], fare['amount']]
+                 for route in route_ids],
+                columns=FARE_COLUMNS))
+        else:
+            frames.append(fare.to_frame().T)
+    return pd.concat(frames, ignore_index=True, sort=False)[FARE_COLUMNS]
+
+
+def split_ages(fares):
+    ages = fares["age"].str.strip("[]").str.split(":", expand=True)
+    return fares.assign(min_age=ages[0].astype(int),
+                        max_age=ages[1].astype(int))
+
+
+def test_expansion_gives_the_rows_of_the_row_loop():
+    expanded = expand_fare_rules(FARES, ROUTES)
+    by_row = expand_fare_rules_by_row(FARES, ROUTES)
+
+    assert len(expanded) == 2 + 2 * len(ROUTES)
+    pd.testing.assert_frame_equal(expanded.astype(str), by_row.astype(str))
+
+
+def test_expansion_keeps_integer_route_ids_of_a_float_column():
+    fares = FARES.assign(routeId=[1341.0, np.nan, 1340.0, np.nan])
+    expanded = expand_fare_rules(fares, ROUTES)
+
+    assert list(expanded['routeId'][:4]) == ['1341', '1340', '1341', '1342']
+    assert expanded['agencyId'].dtype.kind == 'i'
+
+
+def test_expansion_without_rules_for_every_route():
+    fares = FARES.dropna()
+
+    pd.testing.assert_frame_equal(
+        expand_fare_rules(fares, ROUTES).astype(str),
+        expand_fare_rules_by_row(fares, ROUTES).astype(str))
+
+
+def test_fare_index_hits_and_misses():
+    index = FareIndex(split_ages(expand_fare_rules(FARES, ROUTES)))
+
+    # the first rule of a route holding the age wins
+    assert index.fare('1341', 5) == 0.5
+    assert index.fare('1341', 10) == 0.5
+    assert index.fare('1341', 11) == 2.0
+    assert index.fare('1340', 70) == 2.0
+    assert index.fare(1342, 120) == 2.0
+    # unknown routes and ages out of the table have no fare
+    assert np.isnan(index.fare('9999', 30))
+    assert np.isnan(index.fare('1340', 121))
+    assert np.isnan(index.fare('1340', -1))
+
+    np.testing.assert_array_equal(
+        index.fares(['1341', '1340', '9999', '1342', '1342'],
+                    [5, 70, 30, np.nan, 15]),
+        [0.5, 2.0, np.nan, np.nan, 2.0])
+
+
+def test_fare_index_without_a_rule_for_an_age():
+    fares = split_ages(expand_fare_rules(FARES.iloc[[0, 2]], ROUTES))
+    index = FareIndex(fares)
+
+    assert index.fare('1341', 0) == 0.5
+    assert np.isnan(index.fare('1341', 11))
+    assert index.fare('1340', 65) == 1.0
+    assert np.isnan(index.fare('1340', 64))
+    assert np.isnan(index.fare('1342', 30))
@@ -0,0 +1,86 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import local_db
+from id_index import IdDictionary, IdIndex
+
+SCENARIO = 'scenario'
+
+# the vehicles of each run and their type; the second run shares a bus
+VEHICLES = {
+    'run-1': [('car-1', 'CAR'), ('bus-1', 'BUS')],
+    'run-2': [('car-2', 'CAR'), ('bus-2', 'BUS'), ('bus-1', 'BUS')],
+}
+
+
+def import_run(db, run_id, new_vehicles):
+    local_db.insert(db, 'vehicle', pd.DataFrame(
+        [(vehicle, vehicle_type, SCENARIO)
+         for vehicle, vehicle_type in VEHICLES[run_id]
+         if vehicle in new_vehicles],
+        columns=['vehicle_id', 'type', 'scenario']))
+    local_db.insert(db, 'pathtraversal', pd.DataFrame(
+        [(run_id, vehicle, 100.0 * i, 'car', 0, 60, 1, 0.0, 0.0)
+         for i, (vehicle, _) in enumerate(VEHICLES[run_id])],
+        columns=['run_id', 'vehicle_id', 'distance', 'mode', 'start_time',
+                 'end_time', 'num_passengers', 'fuel_cost', 'fuel_consumed']))
+
+
+def test_paths_of_submissions_with_different_vehicles(tmp_path):
+    db = local_db.connect(str(tmp_path / 'bistro.sqlite'))
+    ids = IdDictionary()
+
+    import_run(db, 'run-1', ['car-1', 'bus-1'])
+    paths = db.load_paths(['run-1'], SCENARIO, ids)
+    assert list(paths['vehicleType']) == ['CAR', 'BUS']
+
+    # the second run is imported after the types were registered, and its
+    # vehicles are encoded (as by Submission.encode_ids) before its paths
+    # are loaded
+    import_run(db, 'run-2', ['car-2', 'bus-2'])
+    ids.vehicles.encode(['car-2', 'bus-2', 'walker'])
+    paths = db.load_paths(['run-2'], SCENARIO, ids)
+    assert list(paths['vehicle']) == ['car-2', 'bus-2', 'bus-1']
+    assert list(paths['vehicleType']) == ['CAR', 'BUS', 'BUS']
+
+
+def test_join_drops_the_vehicles_without_a_registered_type():
+    ids = IdDictionary()
+    ids.set_vehicle_types(pd.DataFrame(VEHICLES['run-1'],
+                                       columns=['vehicle', 'vehicleType']))
+    # codes past the registered types, as after another submission
+    ids.vehicles.encode(['car-2', 'bus-2'])
+    paths = pd.DataFrame({'vehicle': ['car-2', 'car-1', 'unknown', 'bus-1'],
+                          'length': [1.0, 2.0, 3.0, 4.0]})
+
+    joined = ids.join_vehicle_types(paths)
+    expected = pd.merge(
+        paths, pd.DataFrame(VEHICLES['run-1'],
+                            columns=['vehicle', 'vehicleType']),
+        on='vehicle')
+    pd.testing.assert_frame_equal(joined, expected)
+
+
+def test_concurrent_encodes_give_every_id_one_code():
+    index = IdIndex()
+    # overlapping ids, as the TAZ of two submissions of a scenario
+    batches = [np.arange(start, start + 2000) % 3000
+               for start in range(0, 8000, 500)]
+    codes = [None] * len(batches)
+
+    def encode(i):
+        codes[i] = index.encode(batches[i])
+
+    threads = [threading.Thread(target=encode, args=(i,))
+               for i in range(len(batches))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(index) == 3000
+    assert index.index.is_unique
+    for batch, batch_codes in zip(batches, codes):
+        np.testing.assert_array_equal(index.decode(batch_codes), batch)
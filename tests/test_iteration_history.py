@@ -0,0 +1,55 @@
+from os.path import dirname, join
+
+import numpy as np
+
+from iteration_history import (
+    IterationHistory, read_stopwatch, stage_runtime_distribution)
+
+RUN = join(dirname(__file__), 'data', 'run')
+
+
+def test_history_aligns_files_on_their_iterations():
+    history = IterationHistory.from_directory(RUN)
+
+    assert list(history.iterations) == [0, 1, 2, 3]
+    assert history.kpis == ['agentHoursOnCrowdedTransit', 'totalVehicleDelay',
+                            'modeChoice: car', 'modeChoice: walk']
+    np.testing.assert_array_equal(
+        history.values,
+        [[10.0, 100.0, np.nan, np.nan],
+         [12.0, 90.0, 0.6, 0.4],
+         [11.0, np.nan, 0.5, 0.5],
+         [np.nan, np.nan, 0.55, 0.45]])
+
+
+def test_kpi_data_and_relative_change():
+    history = IterationHistory.from_directory(RUN)
+    data = history.kpi_data('agentHoursOnCrowdedTransit')
+
+    np.testing.assert_array_equal(data['iteration'], [0, 1, 2, 3])
+    np.testing.assert_allclose(data['relative_change'][1:3],
+                               [0.2, -1.0 / 12.0])
+    assert history.kpi_data('missing')['value'] == []
+
+
+def test_read_stopwatch_keeps_the_stage_durations():
+    stopwatch = read_stopwatch(join(RUN, 'stopwatch.txt'))
+
+    assert list(stopwatch.iterations) == [0, 1, 2]
+    assert stopwatch.kpis == ['mobsim', 'scoring', 'iteration']
+    np.testing.assert_array_equal(
+        stopwatch.values, [[39, 7, 50], [33, np.nan, 43], [62, 5, 72]])
+
+
+def test_stage_runtime_distribution():
+    stopwatch = read_stopwatch(join(RUN, 'stopwatch.txt'))
+    data = stage_runtime_distribution(
+        [stopwatch, stopwatch], stages=['mobsim', 'scoring', 'replanning'])
+
+    assert data['stage'] == ['mobsim', 'scoring', 'replanning']
+    np.testing.assert_array_equal(data['min'][:2], [33, 5])
+    np.testing.assert_array_equal(data['median'][:2], [39, 6])
+    np.testing.assert_array_equal(data['max'][:2], [62, 7])
+    np.testing.assert_allclose(data['mean'][:2], [134 / 3.0, 6])
+    # stages missing from every run are NaN
+    assert np.isnan(data['median'][2]) and np.isnan(data['mean'][2])
@@ -0,0 +1,37 @@
+import numpy as np
+
+from submission import (
+    SAMPLED_PRODUCTS, UNSAMPLED_PRODUCTS, product_samples)
+
+
+def test_product_samples_settings():
+    samples = product_samples(
+        0.25, None, {'toll_revenue_by_time_data': {'seed': 7},
+                     'los_crowding_data': {'fraction': 0.5, 'seed': 1}})
+
+    assert list(samples) == list(SAMPLED_PRODUCTS)
+    assert samples['toll_revenue_by_time_data'] == (0.25, 7, 1)
+    assert samples['los_crowding_data'] == (0.5, 1, 1)
+    assert samples['congestion_travel_speed_data'] == (0.25, 0, 0)
+    assert product_samples() == SAMPLED_PRODUCTS
+
+
+def test_products_made_apart_leave_the_submission_as_it_is(
+        synthetic_submission):
+    submission = synthetic_submission
+    before = dict(vars(submission))
+    products = submission.make_products_apart()
+
+    assert vars(submission) == before
+    for name in list(SAMPLED_PRODUCTS) + list(UNSAMPLED_PRODUCTS):
+        assert products[name] is not before[name]
+        for column, values in before[name].items():
+            np.testing.assert_array_equal(products[name][column], values)
+
+
+def test_estimates_leave_out_the_unsampled_products(synthetic_submission):
+    products = synthetic_submission.make_estimated_data_sources(
+        product_samples(0.5))
+
+    assert set(SAMPLED_PRODUCTS) <= set(products)
+    assert not set(UNSAMPLED_PRODUCTS) & set(products)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from scoring import CASE_STUDY, ScoringEngine, case_study_categories, rank
+
+CASE = {
+    'aggregate': 'Aggregate Score',
+    'groups': [
+        {'name': 'G1', 'weight': 0.25, 'components': ['A', 'B']},
+        {'name': 'G2', 'weight': 0.75, 'components': ['C']},
+    ],
+}
+
+# run, component, Weight, Z-Mean, Z-StdDev, Raw Score, Weighted Score
+SCORES = pd.DataFrame([
+    ('r1', 'A', 2.0, 0.0, 1.0, 9.0, 1.0),
+    # a zero weight: the standardized score is (Raw - Z-Mean) / Z-StdDev
+    ('r1', 'B', 0.0, 1.0, 2.0, 3.0, 0.0),
+    ('r1', 'C', 1.0, 0.0, 1.0, 9.0, -2.0),
+    ('r2', 'A', 2.0, 0.0, 1.0, 9.0, 3.0),
+    ('r2', 'B', 0.0, 1.0, 2.0, 0.0, 0.0),
+    ('r2', 'C', 3.0, 0.0, 1.0, 9.0, 3.0),
+    ('r3', 'A', 2.0, 0.0, 1.0, 9.0, 2.0),
+], columns=['simulation_id', 'Component Name', 'Weight', 'Z-Mean',
+            'Z-StdDev', 'Raw Score', 'Weighted Score'])
+
+
+def test_case_study_yaml_groups():
+    engine = ScoringEngine(SCORES.iloc[:0], case_study=CASE_STUDY)
+
+    assert engine.groups == [group['name'] for group in CASE_STUDY['groups']]
+    np.testing.assert_allclose(engine.default_group_weights, [0.2, 0.4, 0.4])
+    assert engine.components[:3] == [
+        'Congestion: average vehicle delay per passenger trip',
+        'Congestion: total vehicle miles traveled',
+        'Sustainability: Total grams GHGe Emissions']
+    # every component belongs to exactly its groups
+    assert engine.membership.shape == (len(engine.components), 3)
+    np.testing.assert_array_equal(engine.membership.sum(axis=0), [3, 2, 1])
+    # 'Toll Revenue' is both a component and a group: listed once
+    categories = case_study_categories()
+    assert categories.count('Toll Revenue') == 1
+    assert categories[-1] == 'Aggregate Score'
+
+
+def test_standardized_scores_and_default_weights():
+    engine = ScoringEngine(SCORES, case_study=CASE)
+
+    assert engine.runs == ['r1', 'r2', 'r3']
+    np.testing.assert_allclose(
+        engine.standardized,
+        [[0.5, 1.0, -2.0], [1.5, -0.5, 1.0], [1.0, np.nan, np.nan]])
+    # median weight of each component over the runs
+    np.testing.assert_allclose(engine.default_component_weights, [2, 0, 2])
+
+
+def test_weighted_group_and_aggregate_scores():
+    engine = ScoringEngine(SCORES, case_study=CASE)
+
+    np.testing.assert_allclose(
+        engine.weighted_scores(),
+        [[1.0, 0.0, -4.0], [3.0, 0.0, 2.0], [2.0, np.nan, np.nan]])
+    # missing components are left out of the mean of their group
+    np.testing.assert_allclose(
+        engine.group_scores(), [[0.5, -4.0], [1.5, 2.0], [2.0, np.nan]])
+    np.testing.assert_allclose(
+        engine.aggregate_scores(), [-2.875, 1.875, np.nan])
+    np.testing.assert_allclose(
+        engine.aggregate_scores([0.5, 0.5], [1.0, 1.0, 1.0])[:2],
+        [-0.625, 0.75])
+
+
+def test_case_study_scores_of_a_run():
+    engine = ScoringEngine(SCORES, case_study=CASE)
+    scores = engine.case_study_scores('r1')
+
+    assert list(scores['Component Name']) == [
+        'A', 'B', 'C', 'G1', 'G2', 'Aggregate Score']
+    np.testing.assert_allclose(scores['Weighted Score'],
+                               [1.0, 0.0, -4.0, 0.5, -4.0, -2.875])
+
+
+def test_rank_puts_missing_scores_last():
+    np.testing.assert_array_equal(rank([3.0, np.nan, 1.0, 2.0]), [3, 4, 1, 2])
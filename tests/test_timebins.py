@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from timebins import (
+    DAY, HOUR, bin_mean, bin_sum, flat_codes, fold_hours, hour_codes,
+    period_codes, value_codes)
+
+# 4:00 to 8:00 and 8:00 to 20:00, in seconds
+PERIODS = [4 * HOUR, 8 * HOUR, 20 * HOUR]
+
+
+def test_hour_is_floor_of_time_over_an_hour():
+    times = [0, 1, 3599, 3600, 3601, 23 * HOUR + 3599.5]
+
+    np.testing.assert_array_equal(hour_codes(times), [0, 0, 0, 1, 1, 23])
+
+
+def test_times_past_midnight_fold_back_into_the_day():
+    times = [DAY, DAY + 1.5 * HOUR, 2 * DAY + 23 * HOUR]
+
+    np.testing.assert_array_equal(hour_codes(times), [0, 1, 23])
+    np.testing.assert_array_equal(fold_hours([0, 23, 24, 25, 49, -1]),
+                                  [0, 23, 0, 1, 1, -1])
+
+
+def test_missing_and_negative_times_are_left_out():
+    times = [np.nan, -1, -HOUR, 0]
+
+    np.testing.assert_array_equal(hour_codes(times), [-1, -1, -1, 0])
+    np.testing.assert_array_equal(period_codes(times, PERIODS),
+                                  [-1, -1, -1, -1])
+
+
+def test_periods_are_closed_on_the_left():
+    times = [4 * HOUR - 1, 4 * HOUR, 8 * HOUR - 1, 8 * HOUR, 20 * HOUR - 1,
+             20 * HOUR, DAY + 4 * HOUR]
+
+    np.testing.assert_array_equal(period_codes(times, PERIODS),
+                                  [-1, 0, 0, 1, 1, -1, 0])
+
+
+def test_hours_match_pd_cut_of_times_in_the_day():
+    rng = np.random.RandomState(0)
+    # on the hour, and anywhere in the day
+    times = np.concatenate([np.arange(24) * HOUR, rng.uniform(0, DAY, 500)])
+    old = pd.cut(times, bins=range(0, 25 * HOUR, HOUR), labels=range(24),
+                 right=False)
+
+    np.testing.assert_array_equal(hour_codes(times),
+                                  np.asarray(old).astype(np.int64))
+    # the closed right side of the travel time by hour was only different
+    # for the times on the hour
+    off_the_hour = times[times % HOUR > 0]
+    old = pd.cut(off_the_hour, bins=range(0, 25 * HOUR, HOUR),
+                 labels=range(24), include_lowest=True)
+    np.testing.assert_array_equal(hour_codes(off_the_hour),
+                                  np.asarray(old).astype(np.int64))
+
+
+def test_value_codes_match_pd_cut():
+    values = np.array([np.nan, -5, 0, 1, 10, 10.5, 25, 100])
+    edges = [0, 10, 25, 50]
+
+    for right, include_lowest in [(True, False), (True, True), (False, False)]:
+        old = pd.cut(values, bins=edges, right=right,
+                     include_lowest=include_lowest).codes
+        np.testing.assert_array_equal(
+            value_codes(values, edges, right, include_lowest), old)
+
+
+def test_bin_sum_and_mean():
+    codes = flat_codes([0, 0, 1, -1, 1], [1, 1, 0, 0, -1], 2)
+    values = [1.0, 3.0, np.nan, 7.0, 9.0]
+
+    np.testing.assert_array_equal(codes, [1, 1, 2, -1, -1])
+    np.testing.assert_array_equal(bin_sum(codes, 4), [0, 2, 1, 0])
+    np.testing.assert_array_equal(bin_sum(codes, 4, values), [0, 4, 0, 0])
+    np.testing.assert_array_equal(bin_mean(codes, 4, values),
+                                  [np.nan, 2, np.nan, np.nan])
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from submission import (
+    AGE_EDGES, AGE_GROUPS, DISTANCE_EDGES, DISTANCE_GROUPS, HOURS,
+    INCOME_EDGES, INCOME_GROUPS)
+from timebins import hour_codes, value_codes
+from trip_cube import TripCube
+
+MODES = ['car', 'ride_hail', 'walk', 'walk_transit']
+
+# trips of unknown mode, person, distance or start time, and no ride_hail
+TRIPS = pd.DataFrame([
+    ('car', 35, 30000, 1.2, 8 * 3600),
+    ('car', 35, 30000, 0.2, 8.5 * 3600),
+    ('car', 70, 120000, 12.0, 17 * 3600),
+    ('walk', 16, 0, 0.4, 7 * 3600),
+    ('walk', np.nan, np.nan, 0.3, 9 * 3600),
+    ('walk_transit', 22, 9000, 3.0, 8 * 3600),
+    ('walk_transit', 22, 9000, 45.0, np.nan),
+    ('walk_transit', 52, 60000, 2.0, 26 * 3600),
+    (None, 41, 80000, 1.0, 12 * 3600),
+], columns=['mode', 'age', 'income', 'miles', 'start'])
+
+AXES = {
+    'mode': MODES,
+    'age': AGE_GROUPS,
+    'income': INCOME_GROUPS,
+    'distance': DISTANCE_GROUPS,
+    'hour': HOURS,
+}
+
+
+@pytest.fixture(scope='module')
+def cube():
+    return TripCube.from_codes([
+        ('mode', MODES, pd.Index(MODES).get_indexer(TRIPS['mode'].values)),
+        ('age', AGE_GROUPS,
+         value_codes(TRIPS['age'].values, AGE_EDGES, right=False)),
+        ('income', INCOME_GROUPS,
+         value_codes(TRIPS['income'].values, INCOME_EDGES, right=False)),
+        ('distance', DISTANCE_GROUPS,
+         value_codes(TRIPS['miles'].values, DISTANCE_EDGES, right=False)),
+        ('hour', HOURS, hour_codes(TRIPS['start'].values)),
+    ])
+
+
+def categories(trips):
+    # the categories of the trips, as the groupby cross-tabs cut them
+    return pd.DataFrame({
+        'mode': trips['mode'],
+        'age': pd.cut(trips['age'], bins=AGE_EDGES, labels=AGE_GROUPS,
+                      right=False).astype(str),
+        'income': pd.cut(trips['income'], bins=INCOME_EDGES,
+                         labels=INCOME_GROUPS, right=False).astype(str),
+        'distance': pd.cut(trips['miles'], bins=DISTANCE_EDGES,
+                           labels=DISTANCE_GROUPS, right=False).astype(str),
+        'hour': (trips['start'] // 3600 % 24).map(
+            lambda hour: 'nan' if np.isnan(hour) else str(int(hour))),
+    })
+
+
+def groupby_crosstab(index, columns, **filters):
+    trips = categories(TRIPS)
+    for name, wanted in filters.items():
+        trips = trips[trips[name].isin(wanted)]
+    trips = trips[(trips[index] != 'nan') & (trips[columns] != 'nan')]
+    grouped = trips.groupby(by=[index, columns]).size().reset_index(
+        name='trips')
+    return grouped.pivot(index=index, columns=columns, values='trips') \
+        .reindex(index=AXES[index], columns=AXES[columns]).fillna(0) \
+        .astype(np.int64)
+
+
+@pytest.mark.parametrize('index, columns', [
+    ('mode', 'income'), ('mode', 'age'), ('distance', 'mode'),
+    ('mode', 'hour'), ('hour', 'mode'), ('age', 'income')])
+def test_marginals_equal_the_groupby_crosstabs(cube, index, columns):
+    frame = cube.frame(index, columns)
+    expected = groupby_crosstab(index, columns)
+
+    np.testing.assert_array_equal(frame.values, expected.values)
+    assert list(frame.index) == AXES[index]
+    assert list(frame.columns) == AXES[columns]
+
+
+def test_filtered_marginal(cube):
+    low_income = INCOME_GROUPS[:2]
+    frame = cube.frame('mode', 'distance', income=low_income)
+
+    np.testing.assert_array_equal(
+        frame.values,
+        groupby_crosstab('mode', 'distance', income=low_income).values)
+    # the 45 miles trip is of unknown distance
+    assert frame.values.sum() == 2
+
+
+def test_cube_counts_the_trips_of_unknown_categories(cube):
+    assert cube.total == len(TRIPS)
+    assert cube.counts.shape == tuple(len(AXES[name]) + 1 for name in AXES)
+    # the trips of known mode and hour, one of them of an unknown person
+    assert cube.marginal('mode', 'hour').sum() == 7
+    np.testing.assert_array_equal(cube.marginal('mode'), [3, 0, 2, 3])
+    np.testing.assert_array_equal(cube.marginal('hour', 'mode'),
+                                  cube.marginal('mode', 'hour').T)
+
+
+def test_empty_cube():
+    empty = TripCube.from_codes([('mode', MODES, []), ('hour', HOURS, [])])
+
+    assert empty.total == 0
+    assert empty.frame('mode', 'hour').shape == (len(MODES), len(HOURS))
+
+
+def test_submission_cross_tabs_equal_the_groupby(synthetic_submission):
+    submission = synthetic_submission
+    for attribute, edges, groups, data in [
+            ('income', INCOME_EDGES, INCOME_GROUPS,
+             submission.mode_choice_by_income_group_data),
+            ('age', AGE_EDGES, AGE_GROUPS,
+             submission.mode_choice_by_age_group_data)]:
+        trips = submission.join_trips_with_persons(attribute)
+        trips['group'] = pd.cut(trips[attribute], bins=edges, labels=groups,
+                                right=False)
+        expected = trips.groupby(['realizedTripMode', 'group']).size() \
+            .unstack().reindex(index=list(data['realizedTripMode']),
+                               columns=groups).fillna(0)
+        for group in groups:
+            np.testing.assert_array_equal(data[group], expected[group])